@@ -1,7 +1,11 @@
-from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from typing import Dict, Any, Iterator, List, Optional, Union
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import asyncio
+import inspect
 import logging
+import time
 from datetime import datetime
 
 from ..query.parser.query_parser_sql import SQLParser
@@ -9,8 +13,10 @@ from ..query.parser.query_parser_nosql import NoSQLParser
 from ..query.validation.validation_sql import SQLValidator
 from ..query.validation.validation_nosql import NoSQLValidator
 from ..query.optimizer.optimizer_core import QueryOptimizer
-from ..query.executor.query_exec_core import QueryExecutor
+from ..query.executor.query_exec_core import QueryExecutor, ExecutionEngine
 from ..query.executor.streaming import StreamingExecutor
+from ..query.executor.explain import ExplainEngine
+from ..query.formatter.formatter_core import StreamingResultFormatter, STREAM_MEDIA_TYPES
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +29,8 @@ class QueryRequest(BaseModel):
     parameters: Optional[Dict[str, Any]] = None
     streaming: bool = False
     timeout_seconds: Optional[int] = None
+    stream_format: Optional[str] = None  # "ndjson", "csv" or "arrow"
+    batch_size: int = 1000
 
 class QueryResponse(BaseModel):
     """Query response model"""
@@ -30,6 +38,21 @@ class QueryResponse(BaseModel):
     metadata: Dict[str, Any]
     execution_time_ms: float
 
+class ExplainRequest(BaseModel):
+    """EXPLAIN request model"""
+    query: str
+    query_type: str  # "sql" or "nosql"
+    analyze: bool = False
+    format: str = "json"  # "json" or "text"
+    track_memory: bool = False
+
+class ExplainResponse(BaseModel):
+    """EXPLAIN response model"""
+    analyze: bool
+    plan: Optional[Dict[str, Any]] = None
+    text: Optional[str] = None
+    execution_time_ms: Optional[float] = None
+
 class StreamingQueryResponse(BaseModel):
     """Streaming query response model"""
     stream_id: str
@@ -46,10 +69,98 @@ def init_query_routes(
 ):
     """Initialize query routes with dependencies"""
 
-    @router.post("/execute", response_model=QueryResponse)
-    async def execute_query(request: QueryRequest):
+    def build_operator_tree(plan):
+        """Operator tree the configured executor runs for a plan"""
+        build_tree = getattr(executor, 'build_operator_tree', None)
+        if build_tree is None:
+            build_tree = ExecutionEngine(getattr(executor, 'cache_manager', None)).build_operator_tree
+        return build_tree(plan)
+
+    def run_explain(request: ExplainRequest) -> ExplainResponse:
+        """Build and optionally execute a profiled plan"""
+        if request.query_type == "sql":
+            parsed_query = sql_parser.parse(request.query)
+            sql_validator.validate(parsed_query)
+        else:
+            parsed_query = nosql_parser.parse(request.query)
+            nosql_validator.validate(parsed_query)
+
+        optimized_query = optimizer.optimize(parsed_query)
+
+        engine = ExplainEngine(track_memory=request.track_memory)
+        result = engine.explain(optimized_query, analyze=request.analyze,
+                                build_tree=build_operator_tree)
+
+        if request.format == "text":
+            return ExplainResponse(analyze=result.analyze, text=result.to_text(),
+                                   execution_time_ms=result.execution_time_ms)
+        return ExplainResponse(analyze=result.analyze, plan=result.to_dict()['plan'],
+                               execution_time_ms=result.execution_time_ms)
+
+    async def explain_in_worker(request: ExplainRequest) -> ExplainResponse:
+        """Run EXPLAIN [ANALYZE] off the event loop; analyze executes the whole query"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, run_explain, request)
+
+    @router.post("/explain", response_model=ExplainResponse)
+    async def explain_query(request: ExplainRequest):
+        """Return the physical plan, with runtime metrics when analyzing"""
+        try:
+            return await explain_in_worker(request)
+        except Exception as e:
+            logger.error(f"Query explain failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    def run_streaming(request: QueryRequest, http_request: Request) -> StreamingResponse:
+        """Pipe operator output to the client without materializing it"""
+        if request.stream_format not in STREAM_MEDIA_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported stream format: {request.stream_format}"
+            )
+
+        if request.query_type == "sql":
+            parsed_query = sql_parser.parse(request.query)
+            sql_validator.validate(parsed_query)
+        else:
+            parsed_query = nosql_parser.parse(request.query)
+            nosql_validator.validate(parsed_query)
+
+        optimized_query = optimizer.optimize(parsed_query)
+
+        # Stream from the configured executor's operators when it has them
+        execute_plan = getattr(executor, 'execute_plan', None)
+        if execute_plan is None:
+            execute_plan = ExecutionEngine(getattr(executor, 'cache_manager', None)).execute_plan
+        # Engines that take no parameters run the plan as given
+        if 'parameters' in inspect.signature(execute_plan).parameters:
+            rows = execute_plan(optimized_query, parameters=request.parameters)
+        else:
+            rows = execute_plan(optimized_query)
+
+        formatter = StreamingResultFormatter(batch_size=request.batch_size)
+        body = formatter.stream(
+            with_deadline(rows, request.timeout_seconds),
+            format_type=request.stream_format,
+            is_disconnected=http_request.is_disconnected
+        )
+        return StreamingResponse(
+            body,
+            media_type=STREAM_MEDIA_TYPES[request.stream_format],
+            headers={'X-Query-Type': request.query_type}
+        )
+
+    @router.post("/execute", response_model=Union[QueryResponse, ExplainResponse])
+    async def execute_query(request: QueryRequest, http_request: Request):
         """Execute a SQL or NoSQL query"""
         try:
+            explain_request = parse_explain_prefix(request)
+            if explain_request is not None:
+                return await explain_in_worker(explain_request)
+
+            if request.stream_format:
+                return run_streaming(request, http_request)
+
             start_time = datetime.now()
 
             # Parse query
@@ -81,6 +192,8 @@ def init_query_routes(
                 },
                 execution_time_ms=execution_time
             )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Query execution failed: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -125,6 +238,8 @@ def init_query_routes(
                     'optimizations_applied': optimizer.get_applied_optimizations()
                 }
             )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Streaming query failed: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -148,4 +263,42 @@ def init_query_routes(
             logger.error(f"Failed to cancel stream: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    return router 
\ No newline at end of file
+    return router
+
+def with_deadline(rows: Iterator[Dict[str, Any]],
+                  timeout_seconds: Optional[float]) -> Iterator[Dict[str, Any]]:
+    """Stop a row stream with TimeoutError once the query's timeout has passed"""
+    if not timeout_seconds:
+        return rows
+
+    deadline = time.monotonic() + timeout_seconds
+
+    def limited() -> Iterator[Dict[str, Any]]:
+        try:
+            for row in rows:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Query exceeded {timeout_seconds}s timeout")
+                yield row
+        finally:
+            close = getattr(rows, 'close', None)
+            if close is not None:
+                close()
+
+    return limited()
+
+def parse_explain_prefix(request: QueryRequest) -> Optional[ExplainRequest]:
+    """Turn an 'EXPLAIN [ANALYZE] <query>' SQL statement into an explain request"""
+    if request.query_type != "sql":
+        return None
+
+    words = request.query.lstrip().split(None, 2)
+    if not words or words[0].upper() != "EXPLAIN":
+        return None
+
+    analyze = len(words) > 1 and words[1].upper() == "ANALYZE"
+    query = request.query.lstrip()[len("EXPLAIN"):].lstrip()
+    if analyze:
+        query = query[len("ANALYZE"):].lstrip()
+
+    return ExplainRequest(query=query, query_type="sql", analyze=analyze,
+                          format=(request.parameters or {}).get("explain_format", "json")) 
\ No newline at end of file
@@ -49,25 +49,16 @@ def init_stream_routes(timeseries_store: TimeSeriesStore, spatial_store: Spatial
     async def process_location_history(request: LocationHistoryRequest):
         """Handle location history stream data"""
         try:
-            processed_count = 0
-            
-            for record in request.records:
-                # Create GeoJSON point
-                geom = {
-                    'type': 'Point',
-                    'coordinates': [record.longitude, record.latitude]
-                }
-                
-                # Store in spatial database
-                await spatial_store.insert_location(
-                    geom=geom,
-                    properties={
-                        'user_id': request.user_id,
-                        'timestamp': record.timestamp,
-                        'source': record.source
-                    }
-                )
-                processed_count += 1
+            # GeoJSON points, batched with other requests into one COPY; the
+            # response waits for the commit so failed writes surface as errors
+            features = [
+                ({'type': 'Point', 'coordinates': [record.longitude, record.latitude]},
+                 {'user_id': request.user_id,
+                  'timestamp': record.timestamp,
+                  'source': record.source})
+                for record in request.records
+            ]
+            processed_count = await spatial_store.insert_features(features, wait=True)
             
             return StreamResponse(
                 status='success',
@@ -77,16 +68,13 @@ def init_stream_routes(timeseries_store: TimeSeriesStore, spatial_store: Spatial
         except Exception as e:
             logger.error(f"Location history processing failed: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
-
+    
     @router.post("/activity", response_model=StreamResponse)
     async def process_activity_data(data: ActivityData):
         """Handle activity stream data"""
         try:
-            # Store in time series database
-            await timeseries_store.insert_metrics(
-                metrics=data.metrics,
-                timestamp=data.timestamp
-            )
+            # Batched with other requests; waits for the commit like /location
+            await timeseries_store.insert_points([(data.timestamp, data.metrics)], wait=True)
             
             return StreamResponse(
                 status='success',
@@ -96,7 +84,7 @@ def init_stream_routes(timeseries_store: TimeSeriesStore, spatial_store: Spatial
         except Exception as e:
             logger.error(f"Activity data processing failed: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
-
+    
     @router.get("/stats")
     async def get_stream_stats():
         """Get stream processing statistics"""
@@ -109,5 +97,5 @@ def init_stream_routes(timeseries_store: TimeSeriesStore, spatial_store: Spatial
         except Exception as e:
             logger.error(f"Failed to get stream stats: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
-
+    
     return router 
\ No newline at end of file
@@ -1,205 +1,380 @@
-from typing import Any, Dict, Iterator, List, Optional, Tuple
-from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import chain
+import copy
+import logging
+import math
 import time
-from .query_exec_core import ExecutionOperator, ExecutionContext
-from .joins import HashJoinOperator, MergeJoinOperator
+from .query_exec_core import ExecutionOperator, ExecutionContext, create_operator
+from .joins import HashJoinOperator, MergeJoinOperator, PartitionedHashJoinOperator
+from .caching import plan_fingerprint
 from ..parser.query_parser_core import QueryNode, QueryPlan
 
+@dataclass
+class AdaptationDecision:
+    """A re-planning decision taken at a pipeline breaker."""
+    operator_id: str
+    operation: str
+    estimated_rows: Optional[int]
+    actual_rows: int
+    action: str
+    details: Dict[str, Any] = field(default_factory=dict)
+    timestamp: datetime = field(default_factory=datetime.now)
+
 class Statistics:
     """Maintains runtime statistics for adaptive execution."""
-    
+
     def __init__(self):
         self.row_counts: Dict[str, int] = {}
         self.execution_times: Dict[str, float] = {}
         self.memory_usage: Dict[str, int] = {}
         self.cardinality_estimates: Dict[str, int] = {}
-        
+        # Observed cardinalities keyed by plan fingerprint, reused as estimates
+        self.observed_cardinalities: Dict[str, int] = {}
+
     def update_row_count(self, operator_id: str, count: int) -> None:
         """Update row count for an operator."""
         self.row_counts[operator_id] = count
-        
+
     def update_execution_time(self, operator_id: str, time: float) -> None:
         """Update execution time for an operator."""
         self.execution_times[operator_id] = time
-        
+
     def update_memory_usage(self, operator_id: str, memory: int) -> None:
         """Update memory usage for an operator."""
         self.memory_usage[operator_id] = memory
-        
+
     def update_cardinality(self, operator_id: str, estimate: int) -> None:
         """Update cardinality estimate for an operator."""
         self.cardinality_estimates[operator_id] = estimate
 
+    def record_observation(self, fingerprint: str, actual: int) -> None:
+        """Record the observed output cardinality of a subplan."""
+        self.observed_cardinalities[fingerprint] = actual
+
 class AdaptiveContext(ExecutionContext):
     """Extended context with adaptive execution support."""
-    
+
     def __init__(self):
         super().__init__()
         self.statistics = Statistics()
         self.adaptation_threshold = 0.5  # Threshold for plan changes
-        self.sample_size = 1000  # Size for sampling data
-        
-    def should_adapt(self, operator_id: str, actual: int, 
-                    estimated: int) -> bool:
+        self.hash_join_max_rows = 1_000_000  # Largest build side kept in one hash table
+        self.rows_per_partition = 100_000  # Target build rows per join partition
+        self.decisions: List[AdaptationDecision] = []
+        self.decision_listeners: List[Callable[[AdaptationDecision], None]] = []
+
+    def should_adapt(self, operator_id: str, actual: int,
+                    estimated: Optional[int]) -> bool:
         """Determine if adaptation is needed based on statistics."""
-        if estimated == 0:
+        if estimated is None:
             return True
+        if estimated == 0:
+            return actual > 0
         error = abs(actual - estimated) / estimated
         return error > self.adaptation_threshold
 
+    def estimate_cardinality(self, node: QueryNode) -> Optional[int]:
+        """Estimate a subplan's output rows, preferring past observations."""
+        observed = self.statistics.observed_cardinalities.get(plan_fingerprint(node))
+        if observed is not None:
+            return observed
+        for attr in ('estimated_rows', 'cardinality'):
+            estimate = getattr(node, attr, None)
+            if estimate is not None:
+                return int(estimate)
+        return None
+
+    def add_decision_listener(self, listener: Callable[[AdaptationDecision], None]) -> None:
+        """Register a callback notified of every adaptation decision."""
+        self.decision_listeners.append(listener)
+
+    def record_decision(self, decision: AdaptationDecision) -> None:
+        """Record an adaptation decision and notify listeners."""
+        self.decisions.append(decision)
+        for listener in self.decision_listeners:
+            try:
+                listener(decision)
+            except Exception as e:
+                logging.getLogger(__name__).warning(
+                    f"Adaptation listener failed: {e}")
+
+class MaterializedOperator(ExecutionOperator):
+    """Leaf operator replaying an intermediate result materialized at a checkpoint."""
+
+    def __init__(self, node: QueryNode, context: ExecutionContext,
+                 rows: List[Dict[str, Any]],
+                 remainder: Optional[Iterator[Dict[str, Any]]] = None):
+        super().__init__(node, context)
+        self.rows = rows
+        self.remainder = remainder
+
+    def execute(self) -> Iterator[Dict[str, Any]]:
+        if self.remainder is None:
+            yield from self.rows
+        else:
+            # Single pass over a buffered prefix plus the still-running input
+            remainder, self.remainder = self.remainder, None
+            yield from chain(self.rows, remainder)
+
 class AdaptiveOperator(ExecutionOperator):
-    """Base class for adaptive operators."""
-    
+    """Base class for operators that re-plan at a pipeline breaker.
+
+    The input that must be fully consumed anyway is materialized first. Its
+    observed cardinality is compared against the estimate and, on a large
+    misestimate, the rest of the operator is re-planned over the materialized
+    rows instead of the original child.
+    """
+
     def __init__(self, node: QueryNode, context: AdaptiveContext):
         super().__init__(node, context)
         self.context = context  # Type hint for IDE
         self.operator_id = str(id(self))
-        
+
     def execute(self) -> Iterator[Dict[str, Any]]:
         """Execute with runtime adaptation."""
         start_time = time.time()
-        
-        # Sample data for statistics
-        sample_iter = self._sample_data()
-        sample_stats = self._analyze_sample(sample_iter)
-        
-        # Choose execution strategy
-        strategy = self._choose_strategy(sample_stats)
-        
-        # Execute with chosen strategy
-        result_iter = strategy.execute()
-        
-        # Wrap iterator to collect statistics
-        for i, row in enumerate(result_iter, 1):
-            if i % 1000 == 0:  # Update stats periodically
-                self.context.statistics.update_row_count(self.operator_id, i)
-                current_time = time.time() - start_time
-                self.context.statistics.update_execution_time(
-                    self.operator_id, current_time)
-                
-                # Check if adaptation is needed
-                if self._should_adapt(i, sample_stats):
-                    # Re-choose strategy based on actual statistics
-                    new_strategy = self._choose_strategy({
-                        'row_count': i,
-                        'execution_time': current_time
-                    })
-                    if new_strategy != strategy:
-                        strategy = new_strategy
-                        result_iter = strategy.execute()
-            
+        row_count = 0
+
+        for row in self._execute_adaptive():
+            row_count += 1
             yield row
-            
-        # Final statistics update
-        end_time = time.time()
+
+        # Final statistics update feeds future estimates
+        self.context.statistics.update_row_count(self.operator_id, row_count)
         self.context.statistics.update_execution_time(
-            self.operator_id, end_time - start_time)
-            
-    def _sample_data(self) -> Iterator[Dict[str, Any]]:
-        """Sample input data for statistics."""
-        sample = []
-        for i, row in enumerate(super().execute()):
-            if i < self.context.sample_size:
-                sample.append(row)
-            else:
-                break
-        return iter(sample)
-        
-    def _analyze_sample(self, sample_iter: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
-        """Analyze sample data for statistics."""
-        stats = {'row_count': 0, 'distinct_values': set()}
-        
-        for row in sample_iter:
-            stats['row_count'] += 1
-            for key in row:
-                if key not in stats['distinct_values']:
-                    stats['distinct_values'].add(key)
-                    
-        return stats
-        
-    @abstractmethod
-    def _choose_strategy(self, stats: Dict[str, Any]) -> ExecutionOperator:
-        """Choose execution strategy based on statistics."""
-        pass
-        
-    def _should_adapt(self, current_count: int, 
-                     sample_stats: Dict[str, Any]) -> bool:
-        """Determine if adaptation is needed."""
-        estimated = sample_stats['row_count'] * \
-                   (current_count / self.context.sample_size)
-        return self.context.should_adapt(
-            self.operator_id, current_count, int(estimated))
+            self.operator_id, time.time() - start_time)
+        self.context.statistics.record_observation(
+            plan_fingerprint(self.node), row_count)
+
+    def _checkpoint(self, child_index: int) -> Tuple[List[Dict[str, Any]], Optional[int], bool]:
+        """Materialize a child and compare observed against estimated rows."""
+        child = self.children[child_index]
+        rows = list(child.execute())
+        estimated = self.context.estimate_cardinality(child.node)
+
+        if estimated is not None:
+            self.context.statistics.update_cardinality(self.operator_id, estimated)
+        self.context.statistics.record_observation(plan_fingerprint(child.node), len(rows))
+
+        misestimated = self.context.should_adapt(self.operator_id, len(rows), estimated)
+        return rows, estimated, misestimated
+
+    def _execute_adaptive(self) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _record(self, estimated: Optional[int], actual: int,
+                action: str, **details: Any) -> None:
+        self.context.record_decision(AdaptationDecision(
+            operator_id=self.operator_id,
+            operation=self.node.operation,
+            estimated_rows=estimated,
+            actual_rows=actual,
+            action=action,
+            details=details
+        ))
 
 class AdaptiveJoin(AdaptiveOperator):
-    """Adaptive join operator that switches strategies based on data."""
-    
-    def _choose_strategy(self, stats: Dict[str, Any]) -> ExecutionOperator:
-        """Choose join strategy based on statistics."""
-        row_count = stats['row_count']
-        
-        if row_count < 1000:
-            # For small datasets, use hash join
-            return HashJoinOperator(self.node, self.context)
+    """Adaptive join that picks algorithm, build side and partitioning at runtime."""
+
+    def _execute_adaptive(self) -> Iterator[Dict[str, Any]]:
+        join_condition = self.node.join_condition
+        probe_child, build_child = self.children[0], self.children[1]
+
+        # Checkpoint: the build side is a pipeline breaker
+        build_rows, estimated, misestimated = self._checkpoint(1)
+        planned = getattr(self.node, 'join_type', None) or 'hash'
+
+        if not misestimated:
+            strategy = self._create_strategy(planned, len(build_rows))
+            strategy.add_child(probe_child)
+            strategy.add_child(MaterializedOperator(build_child.node, self.context, build_rows))
+            yield from strategy.execute()
+            return
+
+        # Read the probe side up to the build size to learn which input is smaller
+        probe_iter = probe_child.execute()
+        probe_buffer: List[Dict[str, Any]] = []
+        for row in probe_iter:
+            probe_buffer.append(row)
+            if len(probe_buffer) > len(build_rows):
+                break
+        else:
+            probe_iter = None
+
+        flip = probe_iter is None and len(probe_buffer) < len(build_rows)
+        # A flipped build side is already buffered in memory, so hash it directly
+        build_size = len(probe_buffer) if flip else len(build_rows)
+        join_type = 'hash' if flip else self._choose_join_type(build_size)
+
+        details = {
+            'planned_join': planned,
+            'join_type': join_type,
+            'flipped_build_side': flip,
+            'build_rows': build_size,
+            'probe_table': _source_table(probe_child.node, join_condition['left']),
+            'probe_column': join_condition['left'],
+            'build_table': _source_table(build_child.node, join_condition['right']),
+            'build_column': join_condition['right']
+        }
+        if join_type == 'partitioned_hash':
+            details['num_partitions'] = self._choose_partitions(build_size)
+        self._record(estimated, len(build_rows), 'replan_join', **details)
+
+        if flip:
+            # Build on the smaller probe input; reuse the materialized build rows
+            yield from self._flipped_hash_join(probe_buffer, build_rows)
+            return
+
+        strategy = self._create_strategy(join_type, build_size)
+        strategy.add_child(MaterializedOperator(
+            probe_child.node, self.context, probe_buffer, probe_iter))
+        strategy.add_child(MaterializedOperator(build_child.node, self.context, build_rows))
+        yield from strategy.execute()
+
+    def _flipped_hash_join(self, probe_rows: List[Dict[str, Any]],
+                           build_rows: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Hash the probe input and stream the build input against it."""
+        left_key = self.node.join_condition['left']
+        right_key = self.node.join_condition['right']
+
+        hash_table: Dict[Any, List[Dict[str, Any]]] = {}
+        for probe_row in probe_rows:
+            key = probe_row.get(left_key)
+            if key is not None:
+                hash_table.setdefault(key, []).append(probe_row)
+
+        for build_row in build_rows:
+            key = build_row.get(right_key)
+            if key is not None and key in hash_table:
+                for probe_row in hash_table[key]:
+                    # Same column precedence as the unflipped join
+                    yield {**probe_row, **build_row}
+
+    def _choose_join_type(self, build_rows: int) -> str:
+        """Choose join algorithm from the observed build size."""
+        if build_rows <= self.context.rows_per_partition:
+            return 'hash'
+        if build_rows <= self.context.hash_join_max_rows:
+            return 'partitioned_hash'
+        return 'merge'
+
+    def _choose_partitions(self, build_rows: int) -> int:
+        """Choose partition count so each partition fits the target size."""
+        return max(2, math.ceil(build_rows / self.context.rows_per_partition))
+
+    def _create_strategy(self, join_type: str, build_rows: int,
+                         node: Optional[QueryNode] = None) -> ExecutionOperator:
+        node = node or self.node
+        if join_type == 'merge':
+            operator = MergeJoinOperator(node, self.context)
+        elif join_type == 'partitioned_hash':
+            operator = PartitionedHashJoinOperator(
+                node, self.context, self._choose_partitions(build_rows))
         else:
-            # For large datasets, use merge join
-            return MergeJoinOperator(self.node, self.context)
+            operator = HashJoinOperator(node, self.context)
+        operator.children = []
+        return operator
 
 class AdaptiveAggregation(AdaptiveOperator):
     """Adaptive aggregation operator."""
-    
-    def _choose_strategy(self, stats: Dict[str, Any]) -> ExecutionOperator:
-        """Choose aggregation strategy based on statistics."""
+
+    def _execute_adaptive(self) -> Iterator[Dict[str, Any]]:
+        """Choose aggregation strategy from the observed input."""
         from .aggregates import EnhancedAggregateOperator
         from .parallel import ParallelAggregation
-        
-        row_count = stats['row_count']
-        distinct_values = len(stats['distinct_values'])
-        
-        if row_count > 10000 and distinct_values < row_count / 10:
+
+        # Checkpoint: aggregation consumes its whole input
+        rows, estimated, misestimated = self._checkpoint(0)
+        group_by = self.node.group_by or []
+        distinct_groups = len({tuple(row.get(col) for col in group_by) for row in rows})
+
+        parallel = (len(rows) > 10000 and distinct_groups < len(rows) / 10 and
+                    hasattr(self.context, 'process_pool'))
+        if parallel:
             # Many rows, few distinct values: use parallel
-            return ParallelAggregation(self.node, self.context)
+            strategy = ParallelAggregation(self.node, self.context)
         else:
-            # Few rows or many distinct values: use standard
-            return EnhancedAggregateOperator(self.node, self.context)
+            strategy = EnhancedAggregateOperator(self.node, self.context)
+
+        if misestimated:
+            self._record(estimated, len(rows), 'replan_aggregate',
+                         strategy=type(strategy).__name__,
+                         distinct_groups=distinct_groups)
+
+        strategy.add_child(MaterializedOperator(self.children[0].node, self.context, rows))
+        yield from strategy.execute()
+
+def _source_table(node: QueryNode, column: str) -> Optional[str]:
+    """Find the scanned table that produces a column in a subplan."""
+    if node.operation == 'table_scan':
+        columns = getattr(node, 'columns', None) or []
+        if column in columns:
+            return node.table_name
+    for child in node.children:
+        table = _source_table(child, column)
+        if table:
+            return table
+    return None
 
 class AdaptiveExecutionEngine:
     """Execution engine with adaptive query processing."""
-    
-    def __init__(self):
+
+    def __init__(self, index_advisor: Optional[Any] = None):
         self.context = AdaptiveContext()
-        
-    def execute_plan(self, plan: QueryPlan) -> Iterator[Dict[str, Any]]:
+        if index_advisor is not None:
+            self.context.add_decision_listener(index_advisor.record_adaptation)
+
+    def execute_plan(self, plan: QueryPlan,
+                     parameters: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
         """Execute a query plan with runtime adaptation."""
         # Build initial execution tree
-        root_operator = self._build_adaptive_tree(plan.root)
-        
+        root_operator = self.build_operator_tree(plan, parameters)
+
         # Execute and collect results
         yield from root_operator.execute()
-        
+
         # Log execution statistics
         self._log_statistics()
-        
-    def _build_adaptive_tree(self, node: QueryNode) -> ExecutionOperator:
+
+    def build_operator_tree(self, plan: QueryPlan,
+                            parameters: Optional[Dict[str, Any]] = None) -> ExecutionOperator:
+        """Build the operator tree this engine runs for a plan.
+
+        Query parameters become variables of a per-query copy of the
+        context, which shares statistics and decisions with the engine's.
+        """
+        context = self.context
+        if parameters:
+            context = copy.copy(self.context)
+            context.variables = dict(parameters)
+        return self._build_adaptive_tree(plan.root, context)
+
+    def _build_adaptive_tree(self, node: QueryNode,
+                             context: Optional[AdaptiveContext] = None) -> ExecutionOperator:
         """Build an adaptive execution tree."""
+        context = context or self.context
         if node.operation == 'join':
-            operator = AdaptiveJoin(node, self.context)
+            operator = AdaptiveJoin(node, context)
         elif node.operation == 'aggregate':
-            operator = AdaptiveAggregation(node, self.context)
+            operator = AdaptiveAggregation(node, context)
         else:
-            operator = ExecutionOperator(node, self.context)
-            
+            operator = create_operator(node, context)
+
         # Recursively build children
         for child in node.children:
-            child_operator = self._build_adaptive_tree(child)
+            child_operator = self._build_adaptive_tree(child, context)
             operator.add_child(child_operator)
-            
+
         return operator
-        
+
     def _log_statistics(self) -> None:
         """Log execution statistics for analysis."""
         stats = self.context.statistics
-        print("Execution Statistics:")
-        print(f"Row counts: {stats.row_counts}")
-        print(f"Execution times: {stats.execution_times}")
-        print(f"Memory usage: {stats.memory_usage}")
-        print(f"Cardinality estimates: {stats.cardinality_estimates}") 
\ No newline at end of file
+        logger = logging.getLogger(__name__)
+        logger.info("Execution Statistics: row counts=%s, execution times=%s, "
+                    "cardinality estimates=%s", stats.row_counts,
+                    stats.execution_times, stats.cardinality_estimates)
+        for decision in self.context.decisions:
+            logger.info("Adaptation: %s", decision)
@@ -1,177 +1,419 @@
 from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from collections import OrderedDict
+from threading import RLock
+import copy
 import hashlib
+import itertools
 import json
-import time
+import pickle
+import zlib
 from datetime import datetime, timedelta
-from .query_exec_core import ExecutionOperator, ExecutionContext
+from .query_exec_core import ExecutionOperator, ExecutionContext, create_operator
 from ..parser.query_parser_core import QueryNode, QueryPlan
 
+# Node attributes that contribute to a plan fingerprint
+FINGERPRINT_ATTRIBUTES = (
+    'operation', 'columns', 'table_name', 'predicate', 'join_condition',
+    'group_by', 'aggregates', 'order_by', 'limit', 'offset', 'late_columns',
+    'row_id_tables'
+)
+
+# Operations that hold their whole input before emitting, where caching
+# the output saves the most work
+PIPELINE_BREAKERS = ('aggregate', 'join')
+
+def plan_fingerprint(node: QueryNode) -> str:
+    """Generate a canonical fingerprint for a plan subtree.
+
+    Unset attributes are dropped so that nodes built with and without
+    explicit None defaults produce the same fingerprint.
+    """
+    node_dict = {}
+    for attr in FINGERPRINT_ATTRIBUTES:
+        value = getattr(node, attr, None)
+        if value is not None:
+            node_dict[attr] = value
+    node_dict['children'] = [
+        plan_fingerprint(child) for child in getattr(node, 'children', [])
+    ]
+
+    json_str = json.dumps(node_dict, sort_keys=True, default=str)
+    return hashlib.sha256(json_str.encode()).hexdigest()
+
+def plan_dependencies(node: QueryNode) -> Set[str]:
+    """Collect the tables a plan subtree reads from."""
+    deps = set()
+    table_name = getattr(node, 'table_name', None)
+    if table_name:
+        deps.add(table_name)
+    for child in getattr(node, 'children', []):
+        deps.update(plan_dependencies(child))
+    return deps
+
+class TableVersionTracker:
+    """Tracks monotonically increasing per-table data versions.
+
+    Cache keys embed the versions of every table a plan depends on, so
+    bumping a version on write makes stale entries unreachable without
+    scanning the cache.
+    """
+
+    def __init__(self):
+        self.versions: Dict[str, int] = {}
+        self._lock = RLock()
+
+    def get(self, table_name: str) -> int:
+        """Get the current version of a table."""
+        return self.versions.get(table_name, 0)
+
+    def bump(self, table_name: str) -> int:
+        """Record a write to a table and return its new version."""
+        with self._lock:
+            version = self.versions.get(table_name, 0) + 1
+            self.versions[table_name] = version
+            return version
+
+    def snapshot(self, tables: Set[str]) -> Tuple[Tuple[str, int], ...]:
+        """Get a deterministic snapshot of versions for a set of tables."""
+        return tuple((table, self.get(table)) for table in sorted(tables))
+
+class ColumnarCodec:
+    """Encodes row chunks as compressed column vectors."""
+
+    def __init__(self, compression_level: int = 1):
+        self.compression_level = compression_level
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        """Encode a chunk of rows into a compressed columnar block."""
+        columns: Dict[str, List[Any]] = {}
+        missing: Dict[str, List[int]] = {}
+
+        # Collect column order from all rows, preserving first appearance
+        for row in rows:
+            for col in row:
+                if col not in columns:
+                    columns[col] = []
+
+        for i, row in enumerate(rows):
+            for col, values in columns.items():
+                if col in row:
+                    values.append(row[col])
+                else:
+                    values.append(None)
+                    missing.setdefault(col, []).append(i)
+
+        payload = (len(rows), list(columns.items()), missing)
+        return zlib.compress(
+            pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL),
+            self.compression_level
+        )
+
+    def decode(self, block: bytes) -> Iterator[Dict[str, Any]]:
+        """Decode a columnar block back into rows."""
+        row_count, columns, missing = pickle.loads(zlib.decompress(block))
+        missing_sets = {col: set(idx) for col, idx in missing.items()}
+
+        for i in range(row_count):
+            row = {}
+            for col, values in columns:
+                if col in missing_sets and i in missing_sets[col]:
+                    continue
+                row[col] = values[i]
+            yield row
+
+class CachedResult:
+    """A cached result stored as a sequence of compressed columnar chunks."""
+
+    def __init__(self, dependencies: Optional[Set[str]] = None,
+                 codec: Optional[ColumnarCodec] = None):
+        self.dependencies = dependencies or set()
+        self.codec = codec or ColumnarCodec()
+        self.chunks: List[bytes] = []
+        self.row_count = 0
+        self.size_bytes = 0
+        self.complete = False
+        self.created_at = datetime.now()
+
+    def append_chunk(self, rows: List[Dict[str, Any]]) -> None:
+        """Append a chunk of rows to the result."""
+        if not rows:
+            return
+        block = self.codec.encode(rows)
+        self.chunks.append(block)
+        self.row_count += len(rows)
+        self.size_bytes += len(block)
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the cached rows."""
+        for block in self.chunks:
+            yield from self.codec.decode(block)
+
+    def extend(self, other: 'CachedResult') -> None:
+        """Append the chunks of another result; chunks are immutable bytes."""
+        self.chunks.extend(other.chunks)
+        self.row_count += other.row_count
+        self.size_bytes += other.size_bytes
+
 class QueryCache:
-    """Cache for query results."""
-    
-    def __init__(self, max_size: int = 1000, ttl: timedelta = timedelta(hours=1)):
-        self.max_size = max_size
+    """Byte-budgeted LRU cache for query results.
+
+    Keys combine a plan fingerprint with the versions of the tables the plan
+    reads, so writes only need to bump a table version. Entries orphaned by a
+    version bump are never hit again and age out through LRU eviction.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024,
+                 ttl: timedelta = timedelta(hours=1),
+                 chunk_size: int = 1024):
+        self.max_bytes = max_bytes
         self.ttl = ttl
-        self.cache: Dict[str, Dict[str, Any]] = {}
-        self.access_times: Dict[str, datetime] = {}
-        self.dependencies: Dict[str, Set[str]] = {}
-        
+        self.chunk_size = chunk_size
+        self.versions = TableVersionTracker()
+        self.codec = ColumnarCodec()
+        self.entries: 'OrderedDict[str, CachedResult]' = OrderedDict()
+        # Sizes as accounted at insert time; entries are immutable once stored
+        self.entry_sizes: Dict[str, int] = {}
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = RLock()
+
+    def make_key(self, fingerprint: str, dependencies: Set[str]) -> str:
+        """Build a cache key from a plan fingerprint and table versions."""
+        versions = self.versions.snapshot(dependencies)
+        version_str = ','.join(f"{table}@{version}" for table, version in versions)
+        return f"{fingerprint}:{hashlib.sha256(version_str.encode()).hexdigest()[:16]}"
+
+    def lookup(self, key: str) -> Optional[CachedResult]:
+        """Get a cached entry."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # Check if entry has expired
+            if datetime.now() - entry.created_at > self.ttl:
+                self._remove_entry(key)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
     def get(self, key: str) -> Optional[Iterator[Dict[str, Any]]]:
-        """Get cached results for a query."""
-        if key not in self.cache:
+        """Get cached results for a fully materialized query."""
+        entry = self.lookup(key)
+        if entry is None or not entry.complete:
             return None
-            
-        entry = self.cache[key]
-        access_time = self.access_times[key]
-        
-        # Check if entry has expired
-        if datetime.now() - access_time > self.ttl:
+        return entry.iter_rows()
+
+    def put(self, key: str, entry: CachedResult) -> bool:
+        """Store an entry, evicting least recently used entries as needed.
+
+        An incomplete entry never replaces a complete or longer one.
+        """
+        if entry.size_bytes > self.max_bytes:
+            return False
+
+        with self._lock:
+            current = self.entries.get(key)
+            if (current is not None and not entry.complete
+                    and (current.complete or current.row_count >= entry.row_count)):
+                return False
             self._remove_entry(key)
-            return None
-            
-        # Update access time
-        self.access_times[key] = datetime.now()
-        
-        return iter(entry['results'])
-        
-    def set(self, key: str, results: List[Dict[str, Any]], 
+
+            while self.entries and self.size_bytes + entry.size_bytes > self.max_bytes:
+                self._evict_lru()
+
+            self.entries[key] = entry
+            self.entry_sizes[key] = entry.size_bytes
+            self.size_bytes += entry.size_bytes
+            return True
+
+    def set(self, key: str, results: List[Dict[str, Any]],
             dependencies: Optional[Set[str]] = None) -> None:
-        """Cache results for a query."""
-        # Evict entries if cache is full
-        while len(self.cache) >= self.max_size:
-            self._evict_lru()
-            
-        # Store results and metadata
-        self.cache[key] = {
-            'results': results,
-            'created_at': datetime.now()
-        }
-        self.access_times[key] = datetime.now()
-        
-        if dependencies:
-            self.dependencies[key] = dependencies
-            
+        """Cache a complete result list for a query."""
+        entry = self.new_entry(dependencies)
+        for start in range(0, len(results), self.chunk_size):
+            entry.append_chunk(results[start:start + self.chunk_size])
+        entry.complete = True
+        self.put(key, entry)
+
+    def new_entry(self, dependencies: Optional[Set[str]] = None) -> CachedResult:
+        """Create an empty entry using this cache's codec."""
+        return CachedResult(dependencies, self.codec)
+
+    def bump_version(self, table_name: str) -> int:
+        """Record a write to a table, making dependent entries stale."""
+        return self.versions.bump(table_name)
+
     def invalidate(self, table_name: str) -> None:
         """Invalidate cache entries dependent on a table."""
-        keys_to_remove = set()
-        
-        # Find all queries dependent on the table
-        for key, deps in self.dependencies.items():
-            if table_name in deps:
-                keys_to_remove.add(key)
-                
-        # Remove invalidated entries
-        for key in keys_to_remove:
-            self._remove_entry(key)
-            
+        self.bump_version(table_name)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self.entries.clear()
+            self.entry_sizes.clear()
+            self.size_bytes = 0
+
     def _remove_entry(self, key: str) -> None:
-        """Remove a cache entry and its metadata."""
-        self.cache.pop(key, None)
-        self.access_times.pop(key, None)
-        self.dependencies.pop(key, None)
-        
+        """Remove a cache entry and release its bytes."""
+        if self.entries.pop(key, None) is not None:
+            self.size_bytes -= self.entry_sizes.pop(key)
+
     def _evict_lru(self) -> None:
         """Evict least recently used cache entry."""
-        if not self.access_times:
-            return
-            
-        lru_key = min(self.access_times.items(), key=lambda x: x[1])[0]
-        self._remove_entry(lru_key)
+        key, _ = self.entries.popitem(last=False)
+        self.size_bytes -= self.entry_sizes.pop(key)
 
 class CachingContext(ExecutionContext):
     """Extended context with query result caching."""
-    
-    def __init__(self):
+
+    def __init__(self, query_cache: Optional[QueryCache] = None):
         super().__init__()
-        self.query_cache = QueryCache()
-        
+        self.query_cache = query_cache or QueryCache()
+
     def get_cache_key(self, node: QueryNode) -> str:
-        """Generate cache key for a query node."""
-        node_dict = {
-            'operation': node.operation,
-            'columns': getattr(node, 'columns', None),
-            'table_name': getattr(node, 'table_name', None),
-            'predicate': getattr(node, 'predicate', None),
-            'join_condition': getattr(node, 'join_condition', None),
-            'group_by': getattr(node, 'group_by', None),
-            'aggregates': getattr(node, 'aggregates', None),
-            'children': [self.get_cache_key(child) for child in node.children]
-        }
-        
-        # Create deterministic JSON string
-        json_str = json.dumps(node_dict, sort_keys=True)
-        
-        # Generate hash
-        return hashlib.sha256(json_str.encode()).hexdigest()
+        """Generate cache key for a query node at current table versions.
+
+        Query parameters are part of the key, since they can change results.
+        """
+        fingerprint = plan_fingerprint(node)
+        if self.variables:
+            variables = json.dumps(self.variables, sort_keys=True, default=str)
+            fingerprint = hashlib.sha256(
+                f"{fingerprint}:{variables}".encode()).hexdigest()
+        return self.query_cache.make_key(fingerprint, plan_dependencies(node))
 
 class CachingOperator(ExecutionOperator):
-    """Base operator with caching support."""
-    
-    def __init__(self, node: QueryNode, context: CachingContext):
+    """Operator that serves a subplan from the result cache.
+
+    Rows are encoded in chunks into a private entry while they stream to
+    the consumer, so stored entries never change and concurrent executions
+    of the same plan cannot interleave chunks. A consumer that stops early,
+    such as a LIMIT, stores the prefix it read flagged incomplete. A later
+    execution replays that prefix from the cache and only runs the subplan
+    if it reads past it, skipping the rows already cached; plans are
+    assumed to produce rows in a deterministic order.
+    """
+
+    def __init__(self, node: QueryNode, context: CachingContext,
+                 inner: ExecutionOperator):
         super().__init__(node, context)
         self.context = context  # Type hint for IDE
-        self.cache_key = context.get_cache_key(node)
-        
+        self.inner = inner
+        self.children = inner.children
+        self.cache_hits = 0
+        self.cache_misses = 0
+
     def execute(self) -> Iterator[Dict[str, Any]]:
         """Execute with caching support."""
-        # Try to get cached results
-        cached_results = self.context.query_cache.get(self.cache_key)
-        if cached_results is not None:
-            yield from cached_results
+        cache = self.context.query_cache
+        # Key is computed at execution time so it reflects current versions
+        cache_key = self.context.get_cache_key(self.node)
+
+        entry = cache.lookup(cache_key)
+        if entry is not None and entry.complete:
+            self.cache_hits += 1
+            yield from entry.iter_rows()
             return
-            
-        # Execute and cache results
-        results = list(super().execute())
-        self.context.query_cache.set(
-            self.cache_key,
-            results,
-            self._get_dependencies()
-        )
-        
-        yield from iter(results)
-        
+
+        self.cache_misses += 1
+        prefix = entry
+        entry = cache.new_entry(self._get_dependencies())
+        cached_rows = 0
+        buffer: List[Dict[str, Any]] = []
+
+        try:
+            if prefix is not None:
+                entry.extend(prefix)
+                cached_rows = prefix.row_count
+                yield from prefix.iter_rows()
+
+            for row in itertools.islice(self.inner.execute(), cached_rows, None):
+                buffer.append(row)
+                if len(buffer) >= cache.chunk_size:
+                    entry.append_chunk(buffer)
+                    buffer = []
+                yield row
+            entry.complete = True
+        finally:
+            entry.append_chunk(buffer)
+            if entry.complete or entry.row_count > cached_rows:
+                cache.put(cache_key, entry)
+
     def _get_dependencies(self) -> Set[str]:
         """Get table dependencies for this operator."""
-        deps = set()
-        
-        if hasattr(self.node, 'table_name'):
-            deps.add(self.node.table_name)
-            
-        for child in self.children:
-            if isinstance(child, CachingOperator):
-                deps.update(child._get_dependencies())
-                
-        return deps
+        return plan_dependencies(self.node)
 
 class CachingExecutionEngine:
     """Execution engine with result caching."""
-    
-    def __init__(self):
-        self.context = CachingContext()
-        
-    def execute_plan(self, plan: QueryPlan) -> Iterator[Dict[str, Any]]:
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024,
+                 ttl: timedelta = timedelta(hours=1)):
+        self.context = CachingContext(QueryCache(max_bytes=max_bytes, ttl=ttl))
+
+    def execute_plan(self, plan: QueryPlan,
+                     parameters: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
         """Execute a query plan with result caching."""
         # Build execution tree with caching
-        root_operator = self._build_caching_tree(plan.root)
-        
+        root_operator = self.build_operator_tree(plan, parameters)
+
         # Execute and return results
         yield from root_operator.execute()
-        
-    def _build_caching_tree(self, node: QueryNode) -> ExecutionOperator:
-        """Build an execution tree with caching operators."""
-        operator = CachingOperator(node, self.context)
-        
+
+    def build_operator_tree(self, plan: QueryPlan,
+                            parameters: Optional[Dict[str, Any]] = None) -> ExecutionOperator:
+        """Build the operator tree this engine runs for a plan.
+
+        Query parameters become variables of a per-query copy of the
+        context, which shares the result cache with the engine's context.
+        """
+        context = self.context
+        if parameters:
+            context = copy.copy(self.context)
+            context.variables = dict(parameters)
+        return self._build_caching_tree(plan.root, context)
+
+    def _build_caching_tree(self, node: QueryNode,
+                            context: Optional[CachingContext] = None) -> ExecutionOperator:
+        """Build an execution tree with caching operators.
+
+        The root and every pipeline breaker below it are wrapped, so
+        identical aggregates and joins shared between different queries are
+        matched by their fingerprints without re-encoding the same rows at
+        each streaming level. Bare scans are not cached; the table cache
+        already holds their rows.
+        """
+        return self._build_subtree(node, context or self.context, is_root=True)
+
+    def _build_subtree(self, node: QueryNode, context: CachingContext,
+                       is_root: bool = False) -> ExecutionOperator:
+        """Build a subtree, wrapping the root and pipeline breakers."""
+        inner = create_operator(node, context)
+
         # Recursively build children
         for child in node.children:
-            child_operator = self._build_caching_tree(child)
-            operator.add_child(child_operator)
-            
-        return operator
-        
+            inner.add_child(self._build_subtree(child, context))
+
+        if node.operation == 'table_scan':
+            return inner
+        if is_root or node.operation in PIPELINE_BREAKERS:
+            return CachingOperator(node, context, inner)
+        return inner
+
+    def record_write(self, table_name: str) -> None:
+        """Record a write to a table so dependent results become stale."""
+        self.context.query_cache.bump_version(table_name)
+
     def invalidate_cache(self, table_name: str) -> None:
         """Invalidate cache entries for a table."""
-        self.context.query_cache.invalidate(table_name)
-        
+        self.record_write(table_name)
+
     def clear_cache(self) -> None:
         """Clear the entire query cache."""
-        self.context.query_cache = QueryCache() 
\ No newline at end of file
+        self.context.query_cache.clear()
@@ -0,0 +1,411 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import json
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from .query_exec_core import ExecutionOperator, ExecutionContext, create_operator
+from ..parser.query_parser_core import QueryNode, QueryPlan
+
+# Operator counters surfaced in EXPLAIN ANALYZE when an operator exposes them
+OPERATOR_COUNTERS = ('spill_bytes', 'cache_hits', 'cache_misses', 'index_lookups')
+
+def _calibrate_timer_overhead(trials: int = 1000) -> Tuple[int, int]:
+    """Measure the fixed cost a timed window adds, to subtract per sample."""
+    cpu_costs, wall_costs = [], []
+    for _ in range(trials):
+        cpu_start = time.thread_time_ns()
+        wall_start = time.perf_counter_ns()
+        cpu = time.thread_time_ns() - cpu_start
+        wall = time.perf_counter_ns() - wall_start
+        cpu_costs.append(cpu)
+        wall_costs.append(wall)
+    return int(statistics.median(cpu_costs)), int(statistics.median(wall_costs))
+
+_TIMER_OVERHEAD: Optional[Tuple[int, int]] = None
+
+# Concurrent EXPLAIN ANALYZE runs share tracemalloc; the last one out stops it
+_TRACING_LOCK = threading.Lock()
+_TRACING_USERS = 0
+_TRACING_STARTED = False
+
+def timer_overhead() -> Tuple[int, int]:
+    """Get the calibrated (cpu, wall) timer overhead in nanoseconds."""
+    global _TIMER_OVERHEAD
+    if _TIMER_OVERHEAD is None:
+        _TIMER_OVERHEAD = _calibrate_timer_overhead()
+    return _TIMER_OVERHEAD
+
+class OperatorProfile:
+    """Estimated and observed metrics for one operator in a plan."""
+
+    def __init__(self, operator_name: str, node: QueryNode):
+        self.operator_name = operator_name
+        self.operation = node.operation
+        self.detail = _describe_node(node)
+        self.estimated_rows = _estimated_rows(node)
+        self.children: List['OperatorProfile'] = []
+
+        self.actual_rows = 0
+        self.calls = 0
+        self.net_memory_bytes = 0
+        self.peak_memory_bytes = 0
+        self.counters: Dict[str, int] = {}
+
+        # Timers: exact for warmup calls, extrapolated from samples afterwards
+        self.exact_cpu_ns = 0
+        self.exact_wall_ns = 0
+        self.sampled_cpu_ns = 0
+        self.sampled_wall_ns = 0
+        self.sampled_calls = 0
+        self.unsampled_calls = 0
+
+    @property
+    def total_cpu_ms(self) -> float:
+        # A pull always includes the child pulls it triggers; sampling noise
+        # must not make a parent look cheaper than its inputs
+        total = self._extrapolate(self.exact_cpu_ns, self.sampled_cpu_ns) / 1e6
+        return max(total, sum(c.total_cpu_ms for c in self.children))
+
+    @property
+    def total_wall_ms(self) -> float:
+        total = self._extrapolate(self.exact_wall_ns, self.sampled_wall_ns) / 1e6
+        return max(total, sum(c.total_wall_ms for c in self.children))
+
+    @property
+    def self_cpu_ms(self) -> float:
+        return max(0.0, self.total_cpu_ms - sum(c.total_cpu_ms for c in self.children))
+
+    @property
+    def self_wall_ms(self) -> float:
+        return max(0.0, self.total_wall_ms - sum(c.total_wall_ms for c in self.children))
+
+    def _extrapolate(self, exact_ns: int, sampled_ns: int) -> float:
+        if not self.sampled_calls:
+            return float(exact_ns)
+        scale = (self.sampled_calls + self.unsampled_calls) / self.sampled_calls
+        return exact_ns + sampled_ns * scale
+
+    def to_dict(self, analyze: bool = True) -> Dict[str, Any]:
+        """Convert profile to a JSON-serializable dictionary."""
+        result: Dict[str, Any] = {
+            'operator': self.operator_name,
+            'operation': self.operation,
+            'detail': self.detail,
+            'estimated_rows': self.estimated_rows
+        }
+        if analyze:
+            result.update({
+                'actual_rows': self.actual_rows,
+                'calls': self.calls,
+                'total_cpu_ms': round(self.total_cpu_ms, 3),
+                'self_cpu_ms': round(self.self_cpu_ms, 3),
+                'total_time_ms': round(self.total_wall_ms, 3),
+                'self_time_ms': round(self.self_wall_ms, 3),
+                'peak_memory_bytes': self.peak_memory_bytes,
+                **self.counters
+            })
+        result['children'] = [child.to_dict(analyze) for child in self.children]
+        return result
+
+class ProfiledOperator(ExecutionOperator):
+    """Wraps an operator and records its metrics with sampled timers.
+
+    The first ``warmup_calls`` pulls are always timed so blocking work done
+    on the first row (hash builds, sorts) is exact. Afterwards on average one
+    pull in ``sample_rate`` is timed, at randomized intervals so sampling does
+    not alias with periodic work such as garbage collection, and the rest are
+    extrapolated. Row counts are kept locally and flushed once per chunk.
+
+    With ``track_memory`` every pull is measured with tracemalloc. Bytes
+    allocated inside a child's pulls are charged to the child, so each
+    operator's peak is the high-water mark of its own net allocations.
+    ``memory_frames`` is the stack of open pulls shared by one tree.
+    """
+
+    def __init__(self, node: QueryNode, context: ExecutionContext,
+                 inner: ExecutionOperator, sample_rate: int = 64,
+                 warmup_calls: int = 128, chunk_size: int = 1024,
+                 track_memory: bool = False,
+                 memory_frames: Optional[List[int]] = None):
+        super().__init__(node, context)
+        self.inner = inner
+        self.children = inner.children
+        self.sample_rate = max(1, sample_rate)
+        self.warmup_calls = warmup_calls
+        self.chunk_size = chunk_size
+        self.track_memory = track_memory
+        self.memory_frames = memory_frames if memory_frames is not None else []
+        self.profile = OperatorProfile(type(inner).__name__, node)
+        self.profile.children = [
+            child.profile for child in inner.children
+            if isinstance(child, ProfiledOperator)
+        ]
+
+    def add_runtime_filter(self, runtime_filter: Any) -> bool:
+        """Forward runtime filters to the wrapped operator."""
+        add_filter = getattr(self.inner, 'add_runtime_filter', None)
+        return add_filter(runtime_filter) if add_filter else False
+
+    def execute(self) -> Iterator[Dict[str, Any]]:
+        profile = self.profile
+        iterator = self.inner.execute()
+        if self.track_memory:
+            iterator = self._measure_memory(iterator)
+        cpu_overhead, wall_overhead = timer_overhead()
+        calls = 0
+        next_sample = self.warmup_calls
+        pending_rows = 0
+
+        try:
+            while True:
+                calls += 1
+                if calls <= self.warmup_calls:
+                    sampled, exact = True, True
+                elif calls >= next_sample:
+                    sampled, exact = True, False
+                    next_sample = calls + random.randint(1, 2 * self.sample_rate - 1)
+                else:
+                    sampled = False
+
+                if not sampled:
+                    profile.unsampled_calls += 1
+                    try:
+                        row = next(iterator)
+                    except StopIteration:
+                        break
+                else:
+                    cpu_start = time.thread_time_ns()
+                    wall_start = time.perf_counter_ns()
+                    try:
+                        row = next(iterator)
+                        done = False
+                    except StopIteration:
+                        done = True
+                    cpu = max(0, time.thread_time_ns() - cpu_start - cpu_overhead)
+                    wall = max(0, time.perf_counter_ns() - wall_start - wall_overhead)
+
+                    if exact:
+                        profile.exact_cpu_ns += cpu
+                        profile.exact_wall_ns += wall
+                    else:
+                        profile.sampled_cpu_ns += cpu
+                        profile.sampled_wall_ns += wall
+                        profile.sampled_calls += 1
+
+                    if done:
+                        break
+
+                pending_rows += 1
+                if pending_rows >= self.chunk_size:
+                    profile.actual_rows += pending_rows
+                    pending_rows = 0
+
+                yield row
+        finally:
+            profile.actual_rows += pending_rows
+            profile.calls += calls
+            for counter in OPERATOR_COUNTERS:
+                value = getattr(self.inner, counter, None)
+                if isinstance(value, int):
+                    profile.counters[counter] = value
+
+    def _measure_memory(self, iterator: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Charge the bytes allocated by each pull, minus nested pulls, to this operator."""
+        profile = self.profile
+        frames = self.memory_frames
+        while True:
+            frames.append(0)
+            before = tracemalloc.get_traced_memory()[0]
+            try:
+                row = next(iterator)
+                done = False
+            except StopIteration:
+                done = True
+            finally:
+                allocated = tracemalloc.get_traced_memory()[0] - before
+                nested = frames.pop()
+                if frames:
+                    frames[-1] += allocated
+                profile.net_memory_bytes += allocated - nested
+                profile.peak_memory_bytes = max(profile.peak_memory_bytes,
+                                                profile.net_memory_bytes)
+            if done:
+                return
+            yield row
+
+class ExplainResult:
+    """Physical plan tree with optional runtime metrics."""
+
+    def __init__(self, root: OperatorProfile, analyze: bool,
+                 execution_time_ms: Optional[float] = None,
+                 rows: Optional[List[Dict[str, Any]]] = None):
+        self.root = root
+        self.analyze = analyze
+        self.execution_time_ms = execution_time_ms
+        self.rows = rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a JSON-serializable dictionary."""
+        result: Dict[str, Any] = {
+            'analyze': self.analyze,
+            'plan': self.root.to_dict(self.analyze)
+        }
+        if self.execution_time_ms is not None:
+            result['execution_time_ms'] = round(self.execution_time_ms, 3)
+        return result
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """Render the plan as JSON."""
+        return json.dumps(self.to_dict(), indent=indent, default=str)
+
+    def to_text(self) -> str:
+        """Render the plan as an indented text tree."""
+        lines: List[str] = []
+        self._render(self.root, 0, lines)
+        if self.execution_time_ms is not None:
+            lines.append(f"Execution Time: {self.execution_time_ms:.3f} ms")
+        return '\n'.join(lines)
+
+    def _render(self, profile: OperatorProfile, depth: int, lines: List[str]) -> None:
+        prefix = '' if depth == 0 else '  ' * (depth - 1) + '->  '
+        line = f"{prefix}{profile.operator_name}"
+        if profile.detail:
+            line += f" {profile.detail}"
+        if profile.estimated_rows is not None:
+            line += f"  (est rows={profile.estimated_rows})"
+        if self.analyze:
+            line += (f"  (actual rows={profile.actual_rows} "
+                     f"time={profile.self_wall_ms:.3f}/{profile.total_wall_ms:.3f} ms "
+                     f"cpu={profile.self_cpu_ms:.3f}/{profile.total_cpu_ms:.3f} ms)")
+        lines.append(line)
+
+        if self.analyze:
+            extras = []
+            if profile.peak_memory_bytes:
+                extras.append(f"Peak Memory: {profile.peak_memory_bytes} bytes")
+            extras.extend(f"{name.replace('_', ' ').title()}: {value}"
+                          for name, value in profile.counters.items())
+            indent = '  ' * depth + '    '
+            lines.extend(f"{indent}{extra}" for extra in extras)
+
+        for child in profile.children:
+            self._render(child, depth + 1, lines)
+
+class ExplainEngine:
+    """Builds profiled operator trees for EXPLAIN and EXPLAIN ANALYZE."""
+
+    def __init__(self, context: Optional[ExecutionContext] = None,
+                 sample_rate: int = 64, track_memory: bool = False):
+        self.context = context or ExecutionContext()
+        self.sample_rate = sample_rate
+        self.track_memory = track_memory
+
+    def explain(self, plan: QueryPlan, analyze: bool = False,
+                keep_rows: bool = False,
+                build_tree: Optional[Callable[[QueryPlan], ExecutionOperator]] = None
+                ) -> ExplainResult:
+        """Explain a plan, executing it when ``analyze`` is set.
+
+        ``build_tree`` builds the operator tree an execution engine would
+        run, so the plan shown is the one that engine executes. Without it
+        each node gets its default operator.
+        """
+        memory_frames: List[int] = []
+        if build_tree is not None:
+            root = self._profile_tree(build_tree(plan), memory_frames)
+        else:
+            root = self._build_profiled_tree(plan.root, memory_frames)
+        if not analyze:
+            return ExplainResult(root.profile, analyze=False)
+
+        rows: Optional[List[Dict[str, Any]]] = [] if keep_rows else None
+        start = time.perf_counter()
+        with _memory_tracing(self.track_memory):
+            for row in root.execute():
+                if rows is not None:
+                    rows.append(row)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return ExplainResult(root.profile, analyze=True,
+                             execution_time_ms=elapsed_ms, rows=rows)
+
+    def _build_profiled_tree(self, node: QueryNode,
+                             memory_frames: List[int]) -> ProfiledOperator:
+        """Build an operator tree with every operator profiled."""
+        inner = create_operator(node, self.context)
+
+        # Recursively build children
+        for child in node.children:
+            inner.add_child(self._build_profiled_tree(child, memory_frames))
+
+        return ProfiledOperator(node, self.context, inner,
+                                sample_rate=self.sample_rate,
+                                track_memory=self.track_memory,
+                                memory_frames=memory_frames)
+
+    def _profile_tree(self, operator: ExecutionOperator,
+                      memory_frames: List[int]) -> ProfiledOperator:
+        """Wrap every operator of an already built tree, children first."""
+        for i, child in enumerate(operator.children):
+            operator.children[i] = self._profile_tree(child, memory_frames)
+
+        return ProfiledOperator(operator.node, operator.context, operator,
+                                sample_rate=self.sample_rate,
+                                track_memory=self.track_memory,
+                                memory_frames=memory_frames)
+
+@contextmanager
+def _memory_tracing(enabled: bool) -> Iterator[None]:
+    """Keep tracemalloc running while any profiled run needs it."""
+    global _TRACING_USERS, _TRACING_STARTED
+    if not enabled:
+        yield
+        return
+
+    with _TRACING_LOCK:
+        if _TRACING_USERS == 0:
+            # Leave tracing alone if something else started it
+            _TRACING_STARTED = not tracemalloc.is_tracing()
+            if _TRACING_STARTED:
+                tracemalloc.start()
+        _TRACING_USERS += 1
+    try:
+        yield
+    finally:
+        with _TRACING_LOCK:
+            _TRACING_USERS -= 1
+            if _TRACING_USERS == 0 and _TRACING_STARTED:
+                tracemalloc.stop()
+
+def _estimated_rows(node: QueryNode) -> Optional[int]:
+    for attr in ('estimated_rows', 'cardinality'):
+        value = getattr(node, attr, None)
+        if value is not None:
+            return int(value)
+    return None
+
+def _describe_node(node: QueryNode) -> str:
+    """Short human-readable description of a plan node."""
+    if node.operation == 'table_scan':
+        return f"on {getattr(node, 'table_name', '?')}"
+    if node.operation == 'filter':
+        predicate = getattr(node, 'predicate', None) or {}
+        if predicate:
+            return f"({predicate.get('column')} {predicate.get('op')} {predicate.get('value')!r})"
+    if node.operation == 'join':
+        condition = getattr(node, 'join_condition', None) or {}
+        if condition:
+            return f"on {condition.get('left')} = {condition.get('right')}"
+    if node.operation == 'project':
+        return f"[{', '.join(getattr(node, 'columns', None) or [])}]"
+    if node.operation == 'materialize':
+        late_columns = getattr(node, 'late_columns', None) or {}
+        return ' '.join(f"{table}[{', '.join(cols)}]" for table, cols in late_columns.items())
+    if node.operation == 'aggregate':
+        group_by = getattr(node, 'group_by', None) or []
+        if group_by:
+            return f"group by {', '.join(group_by)}"
+    return ''
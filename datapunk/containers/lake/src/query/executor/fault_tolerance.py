@@ -1,53 +1,386 @@
 from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Callable
 from abc import ABC, abstractmethod
+from queue import Queue
+import os
+import struct
+import threading
 import time
 import json
 import pickle
 import logging
+import weakref
+import zlib
 from datetime import datetime, timedelta
 from pathlib import Path
-from .query_exec_core import ExecutionOperator, ExecutionContext
+from .query_exec_core import ExecutionOperator, ExecutionContext, create_operator
+from .caching import plan_fingerprint
 from ..parser.query_parser_core import QueryNode, QueryPlan
 
+# Checkpoint record layout: magic, version, kind, sequence, base sequence,
+# payload length, CRC32 of the payload, then the zlib-compressed payload
+CHECKPOINT_MAGIC = b'DPCK'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_HEADER = struct.Struct('>4sBBQQII')
+KIND_BASE = 0
+KIND_DELTA = 1
+
+class CheckpointCorruptError(Exception):
+    """Raised when a checkpoint record fails validation."""
+    pass
+
+def encode_checkpoint(kind: int, seq: int, base_seq: int,
+                      payload: Dict[str, Any]) -> bytes:
+    """Encode a checkpoint record in the binary format."""
+    return frame_checkpoint(kind, seq, base_seq, serialize_payload(payload))
+
+def serialize_payload(payload: Dict[str, Any]) -> bytes:
+    """Pickle a checkpoint payload, detaching it from live operator state."""
+    return pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+def frame_checkpoint(kind: int, seq: int, base_seq: int, pickled: bytes) -> bytes:
+    """Compress a pickled payload and prepend the record header."""
+    body = zlib.compress(pickled, 1)
+    header = CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, kind,
+                                    seq, base_seq, len(body), zlib.crc32(body))
+    return header + body
+
+def decode_checkpoint(data: bytes) -> Tuple[int, int, int, Dict[str, Any]]:
+    """Decode and verify a checkpoint record into (kind, seq, base_seq, payload)."""
+    if len(data) < CHECKPOINT_HEADER.size:
+        raise CheckpointCorruptError("Truncated checkpoint header")
+    magic, version, kind, seq, base_seq, length, crc = \
+        CHECKPOINT_HEADER.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+        raise CheckpointCorruptError("Unknown checkpoint format")
+    body = data[CHECKPOINT_HEADER.size:]
+    if len(body) != length or zlib.crc32(body) != crc:
+        raise CheckpointCorruptError("Checkpoint checksum mismatch")
+    return kind, seq, base_seq, pickle.loads(zlib.decompress(body))
+
+class IncrementalState(dict):
+    """Operator state that tracks which top-level entries changed.
+    
+    Each top-level key is a unit of incremental checkpointing, e.g. one
+    hash-table partition, one aggregate group or one stream offset.
+    Assignments and deletions are tracked automatically; in-place
+    mutations of a value must be reported with ``touch``.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty: Set[Any] = set(self.keys())
+        self.deleted: Set[Any] = set()
+        
+    def __setitem__(self, key: Any, value: Any) -> None:
+        super().__setitem__(key, value)
+        self.dirty.add(key)
+        self.deleted.discard(key)
+        
+    def __delitem__(self, key: Any) -> None:
+        super().__delitem__(key)
+        self.dirty.discard(key)
+        self.deleted.add(key)
+        
+    def pop(self, key: Any, *default: Any) -> Any:
+        if key in self:
+            self.dirty.discard(key)
+            self.deleted.add(key)
+        return super().pop(key, *default)
+        
+    def update(self, *args, **kwargs) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+            
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+        
+    def touch(self, key: Any) -> None:
+        """Mark an entry mutated in place as changed."""
+        if key in self:
+            self.dirty.add(key)
+            
+    def take_delta(self) -> Tuple[Dict[Any, Any], Set[Any]]:
+        """Capture changed entries and deletions, then reset tracking.
+        
+        Values are returned by reference; serialize them before the
+        operator mutates them again.
+        """
+        changed = {key: self[key] for key in self.dirty}
+        deleted = self.deleted
+        self.dirty = set()
+        self.deleted = set()
+        return changed, deleted
+        
+    def snapshot(self) -> Dict[Any, Any]:
+        """Capture the full state by reference and reset tracking."""
+        self.dirty = set()
+        self.deleted = set()
+        return dict(self)
+
+class CheckpointWriter:
+    """Background thread that compresses and writes checkpoint records.
+    
+    Payloads arrive already pickled, so the records reflect the state at
+    capture time however the operator mutates it afterwards.
+    """
+    
+    def __init__(self, max_pending: int = 64):
+        self.queue: Queue = Queue(maxsize=max_pending)
+        self.logger = logging.getLogger(__name__)
+        self.bytes_written = 0
+        self.records_written = 0
+        self.write_seconds = 0.0
+        self.errors = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer",
+                                        daemon=True)
+        self._thread.start()
+        
+    def submit(self, path: Path, kind: int, seq: int, base_seq: int,
+               payload: bytes,
+               on_written: Optional[Callable[[], None]] = None) -> None:
+        """Queue a pickled payload; blocks only when the writer falls far behind."""
+        if self._closed:
+            raise RuntimeError("Checkpoint writer is closed")
+        self.queue.put((path, kind, seq, base_seq, payload, on_written))
+        
+    def flush(self) -> None:
+        """Wait until every queued record has been written."""
+        self.queue.join()
+        
+    def close(self) -> None:
+        """Drain the queue and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(None)
+        self._thread.join()
+        
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            finally:
+                self.queue.task_done()
+                
+    def _write(self, path: Path, kind: int, seq: int, base_seq: int,
+               payload: bytes, on_written: Optional[Callable[[], None]]) -> None:
+        start = time.perf_counter()
+        try:
+            data = frame_checkpoint(kind, seq, base_seq, payload)
+            tmp_path = path.with_suffix(path.suffix + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # Atomic rename so readers never see a partial record
+            os.replace(tmp_path, path)
+            self.bytes_written += len(data)
+            self.records_written += 1
+            if on_written:
+                on_written()
+        except Exception as e:
+            self.errors += 1
+            self.logger.error(f"Failed to write checkpoint {path.name}: {e}")
+        finally:
+            self.write_seconds += time.perf_counter() - start
+
+class CheckpointPolicy:
+    """Adapts checkpoint frequency to operator cost.
+    
+    Checkpoints are spaced so roughly ``target_interval_seconds`` of work
+    is at risk between them, but never so close together that the time
+    spent capturing state exceeds ``max_overhead`` of the execution time.
+    """
+    
+    def __init__(self, target_interval_seconds: float = 30.0,
+                 max_overhead: float = 0.02,
+                 min_rows: int = 100,
+                 max_rows: int = 10_000_000,
+                 initial_rows: int = 1000):
+        self.target_interval_seconds = target_interval_seconds
+        self.max_overhead = max_overhead
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.interval_rows = initial_rows
+        self.row_seconds: Optional[float] = None
+        self.capture_seconds: Optional[float] = None
+        
+    def should_checkpoint(self, rows_since: int) -> bool:
+        return rows_since >= self.interval_rows
+        
+    def record(self, rows: int, work_seconds: float, capture_seconds: float) -> None:
+        """Update cost estimates after a checkpoint and re-derive the interval."""
+        if rows > 0:
+            self.row_seconds = _ewma(self.row_seconds, work_seconds / rows)
+        self.capture_seconds = _ewma(self.capture_seconds, capture_seconds)
+        
+        if not self.row_seconds:
+            return
+        # Rows of work that fit in the target interval
+        interval = self.target_interval_seconds / self.row_seconds
+        # Rows needed so capture cost stays under the overhead budget
+        floor = self.capture_seconds / (self.max_overhead * self.row_seconds)
+        self.interval_rows = int(round(min(self.max_rows, max(self.min_rows, interval, floor))))
+
+def _ewma(current: Optional[float], sample: float, alpha: float = 0.3) -> float:
+    return sample if current is None else alpha * sample + (1 - alpha) * current
+
 class CheckpointManager:
-    """Manages operator checkpoints for fault tolerance."""
+    """Manages incremental operator checkpoints for fault tolerance.
+    
+    Each operator has a chain of records on disk: a full base followed by
+    deltas holding only the entries changed since the previous record.
+    Records are written by a background writer; restore loads the latest
+    valid base and replays its deltas up to the first gap or corrupt record.
+    A new base is written every ``compact_every`` deltas so restore cost
+    stays bounded, and older chains are removed once it is durable.
+    A writer the manager creates is stopped by ``close`` (or when the
+    manager is garbage collected); a writer passed in belongs to the caller.
+    """
     
-    def __init__(self, checkpoint_dir: str = "checkpoints"):
+    def __init__(self, checkpoint_dir: str = "checkpoints",
+                 compact_every: int = 16,
+                 writer: Optional[CheckpointWriter] = None):
         self.checkpoint_dir = Path(checkpoint_dir)
         self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self.compact_every = compact_every
+        self.owns_writer = writer is None
+        self.writer = writer or CheckpointWriter()
+        self._finalizer = weakref.finalize(self, self.writer.close) \
+            if self.owns_writer else None
         self.logger = logging.getLogger(__name__)
+        # operator_id -> (last sequence, base sequence)
+        self.sequences: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
         
-    def save_checkpoint(self, operator_id: str, 
-                       state: Dict[str, Any]) -> None:
-        """Save operator state to checkpoint."""
-        checkpoint_path = self.checkpoint_dir / f"{operator_id}.checkpoint"
-        try:
-            with open(checkpoint_path, 'wb') as f:
-                pickle.dump(state, f)
-            self.logger.info(f"Checkpoint saved for operator {operator_id}")
-        except Exception as e:
-            self.logger.error(f"Failed to save checkpoint: {e}")
+    def save_checkpoint(self, operator_id: str,
+                       state: Dict[str, Any],
+                       meta: Optional[Dict[str, Any]] = None) -> int:
+        """Queue a checkpoint and return its sequence number.
+        
+        ``IncrementalState`` instances are written as deltas, with a full
+        base on the first checkpoint and every ``compact_every`` deltas.
+        Plain dicts are always written in full. The payload is serialized
+        before this returns, so the caller may keep mutating ``state``.
+        """
+        with self._lock:
+            last_seq, base_seq = self.sequences.get(operator_id, (0, 0))
+            seq = last_seq + 1
             
+            full = (not isinstance(state, IncrementalState) or base_seq == 0
+                    or seq - base_seq > self.compact_every)
+            if full:
+                snapshot = state.snapshot() if isinstance(state, IncrementalState) \
+                    else dict(state)
+                payload = {'state': snapshot, 'meta': meta or {}}
+                kind, base_seq = KIND_BASE, seq
+            else:
+                changed, deleted = state.take_delta()
+                payload = {'changed': changed, 'deleted': deleted, 'meta': meta or {}}
+                kind = KIND_DELTA
+            self.sequences[operator_id] = (seq, base_seq)
+            
+        # Pickle on the calling thread: the operator mutates its state in
+        # place as soon as this returns
+        pickled = serialize_payload(payload)
+        path = self._record_path(operator_id, seq, kind)
+        on_written = (lambda: self._remove_superseded(operator_id, seq)) \
+            if kind == KIND_BASE else None
+        self.writer.submit(path, kind, seq, base_seq, pickled, on_written)
+        return seq
+        
     def load_checkpoint(self, operator_id: str) -> Optional[Dict[str, Any]]:
-        """Load operator state from checkpoint."""
-        checkpoint_path = self.checkpoint_dir / f"{operator_id}.checkpoint"
-        if not checkpoint_path.exists():
-            return None
+        """Restore operator state from the latest base plus its deltas.
+        
+        Returns ``{'state': ..., 'meta': ..., 'sequence': ...}`` or None.
+        """
+        self.writer.flush()
+        records = self._list_records(operator_id)
+        
+        for base_seq in sorted((seq for seq, kind in records.items()
+                                if kind == KIND_BASE), reverse=True):
+            try:
+                _, _, _, payload = decode_checkpoint(
+                    self._record_path(operator_id, base_seq, KIND_BASE).read_bytes())
+            except (CheckpointCorruptError, OSError, pickle.UnpicklingError, zlib.error) as e:
+                self.logger.warning(f"Skipping base {base_seq} of {operator_id}: {e}")
+                continue
+                
+            state = payload['state']
+            meta = payload['meta']
+            seq = base_seq
+            while records.get(seq + 1) == KIND_DELTA:
+                try:
+                    _, _, delta_base, delta = decode_checkpoint(
+                        self._record_path(operator_id, seq + 1, KIND_DELTA).read_bytes())
+                except (CheckpointCorruptError, OSError, pickle.UnpicklingError, zlib.error) as e:
+                    self.logger.warning(f"Stopping replay of {operator_id} at {seq + 1}: {e}")
+                    break
+                if delta_base != base_seq:
+                    break
+                for key in delta['deleted']:
+                    state.pop(key, None)
+                state.update(delta['changed'])
+                meta = delta['meta']
+                seq += 1
+                
+            with self._lock:
+                # Start a fresh chain after the newest record on disk
+                self.sequences[operator_id] = (max(records), 0)
+            self.logger.info(f"Checkpoint {seq} loaded for operator {operator_id}")
+            return {'state': state, 'meta': meta, 'sequence': seq}
+        return None
+        
+    def clear_checkpoint(self, operator_id: str) -> None:
+        """Clear all checkpoint records for an operator."""
+        self.writer.flush()
+        for path in self.checkpoint_dir.glob(f"{operator_id}.*.ckpt*"):
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self.sequences.pop(operator_id, None)
             
-        try:
-            with open(checkpoint_path, 'rb') as f:
-                state = pickle.load(f)
-            self.logger.info(f"Checkpoint loaded for operator {operator_id}")
-            return state
-        except Exception as e:
-            self.logger.error(f"Failed to load checkpoint: {e}")
-            return None
+    def flush(self) -> None:
+        """Wait for queued checkpoints to reach disk."""
+        self.writer.flush()
+        
+    def close(self) -> None:
+        """Flush queued checkpoints and stop the writer if this manager owns it."""
+        if self._finalizer is not None:
+            self._finalizer()
+        else:
+            self.writer.flush()
             
-    def clear_checkpoint(self, operator_id: str) -> None:
-        """Clear operator checkpoint."""
-        checkpoint_path = self.checkpoint_dir / f"{operator_id}.checkpoint"
-        if checkpoint_path.exists():
-            checkpoint_path.unlink()
+    def __enter__(self) -> 'CheckpointManager':
+        return self
+        
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+        
+    def _record_path(self, operator_id: str, seq: int, kind: int) -> Path:
+        suffix = 'base' if kind == KIND_BASE else 'delta'
+        return self.checkpoint_dir / f"{operator_id}.{seq:012d}.{suffix}.ckpt"
+        
+    def _list_records(self, operator_id: str) -> Dict[int, int]:
+        """Map sequence numbers to record kinds for an operator."""
+        records = {}
+        for path in self.checkpoint_dir.glob(f"{operator_id}.*.ckpt"):
+            parts = path.name[len(operator_id) + 1:].split('.')
+            if len(parts) != 3 or not parts[0].isdigit():
+                continue
+            records[int(parts[0])] = KIND_BASE if parts[1] == 'base' else KIND_DELTA
+        return records
+        
+    def _remove_superseded(self, operator_id: str, base_seq: int) -> None:
+        """Delete records older than a durable base."""
+        for seq, kind in self._list_records(operator_id).items():
+            if seq < base_seq:
+                self._record_path(operator_id, seq, kind).unlink(missing_ok=True)
 
 class FailureDetector:
     """Detects and tracks operator failures."""
@@ -95,9 +428,9 @@ class FailureDetector:
 class FaultTolerantContext(ExecutionContext):
     """Extended context with fault tolerance support."""
     
-    def __init__(self, checkpoint_dir: str = "checkpoints"):
+    def __init__(self, checkpoint_dir: str = "checkpoints", compact_every: int = 16):
         super().__init__()
-        self.checkpoint_manager = CheckpointManager(checkpoint_dir)
+        self.checkpoint_manager = CheckpointManager(checkpoint_dir, compact_every)
         self.failure_detector = FailureDetector()
         self.recovery_handlers: Dict[str, List[Callable]] = {}
         
@@ -113,34 +446,69 @@ class FaultTolerantContext(ExecutionContext):
         if operator_id in self.recovery_handlers:
             for handler in self.recovery_handlers[operator_id]:
                 handler()
+                
+    def close(self) -> None:
+        """Flush checkpoints and stop the checkpoint writer."""
+        self.checkpoint_manager.close()
 
 class FaultTolerantOperator(ExecutionOperator):
-    """Base operator with fault tolerance capabilities."""
+    """Base operator with fault tolerance capabilities.
     
-    def __init__(self, node: QueryNode, context: FaultTolerantContext):
+    Wraps an inner operator (or a subclass's ``_produce``) and checkpoints
+    ``state`` incrementally alongside the output offset. Subclasses keep
+    hash-table partitions, aggregate groups and stream offsets as separate
+    top-level entries of ``state`` so each checkpoint only writes what
+    changed. On restart the state is restored; with ``resume_output`` the
+    rows already emitted are skipped too. Only the root of a plan resumes
+    its output: a child's rows are consumed again by a parent that tracks
+    in its own state how much input it has already folded in. Blocking
+    subclasses call ``tick`` per input row so long builds checkpoint before
+    producing any output.
+    """
+    
+    def __init__(self, node: QueryNode, context: FaultTolerantContext,
+                 inner: Optional[ExecutionOperator] = None,
+                 policy: Optional[CheckpointPolicy] = None,
+                 operator_id: Optional[str] = None,
+                 resume_output: bool = True):
         super().__init__(node, context)
         self.context = context  # Type hint for IDE
-        self.operator_id = str(id(self))
-        self.state: Dict[str, Any] = {}
-        self.checkpoint_interval = 1000  # Rows between checkpoints
+        self.inner = inner
+        if inner is not None:
+            self.children = inner.children
+        # Stable across restarts so checkpoints can be found again
+        self.operator_id = (operator_id or getattr(node, 'operator_id', None)
+                            or plan_fingerprint(node)[:16])
+        self.resume_output = resume_output
+        self.state = IncrementalState()
+        self.policy = policy or CheckpointPolicy()
         self.row_count = 0
+        self.checkpoints_taken = 0
+        self._work_units = 0
+        self._units_at_checkpoint = 0
+        self._work_started = time.perf_counter()
         
     def execute(self) -> Iterator[Dict[str, Any]]:
         """Execute with fault tolerance."""
         # Try to restore from checkpoint
-        saved_state = self.context.checkpoint_manager.load_checkpoint(
-            self.operator_id)
-        if saved_state:
-            self.state = saved_state
+        resume_offset = 0
+        saved = self.context.checkpoint_manager.load_checkpoint(self.operator_id)
+        if saved:
+            self.state = IncrementalState(saved['state'])
+            if self.resume_output:
+                resume_offset = saved['meta'].get('row_count', 0)
+            self.restore_state(self.state)
             
+        self.row_count = 0
+        self._work_units = 0
+        self._units_at_checkpoint = 0
+        self._work_started = time.perf_counter()
         try:
             for row in self._execute_with_retries():
                 self.row_count += 1
-                
-                # Periodic checkpointing
-                if self.row_count % self.checkpoint_interval == 0:
-                    self._save_checkpoint()
-                    
+                if self.row_count <= resume_offset:
+                    continue
+                self.tick()
                 yield row
                 
         except Exception as e:
@@ -148,14 +516,37 @@ class FaultTolerantOperator(ExecutionOperator):
             self._handle_failure(e)
             raise
             
+    def tick(self, units: int = 1) -> None:
+        """Count processed work and checkpoint when the policy says so."""
+        self._work_units += units
+        if self.policy.should_checkpoint(self._work_units - self._units_at_checkpoint):
+            self._save_checkpoint()
+            
+    def restore_state(self, state: IncrementalState) -> None:
+        """Hook for subclasses to rebuild in-memory structures from state."""
+        pass
+        
+    def _produce(self) -> Iterator[Dict[str, Any]]:
+        """Produce output rows; subclasses without an inner operator override this."""
+        if self.inner is None:
+            raise NotImplementedError("No inner operator to execute")
+        return self.inner.execute()
+            
     def _execute_with_retries(self) -> Iterator[Dict[str, Any]]:
-        """Execute with retry logic."""
+        """Execute with retry logic, skipping rows already emitted."""
         max_retries = 3
         retry_count = 0
+        emitted = 0
         
         while retry_count < max_retries:
             try:
-                yield from super().execute()
+                position = 0
+                for row in self._produce():
+                    position += 1
+                    if position <= emitted:
+                        continue
+                    emitted += 1
+                    yield row
                 break
                 
             except Exception as e:
@@ -170,59 +561,171 @@ class FaultTolerantOperator(ExecutionOperator):
                 time.sleep(2 ** retry_count)  # Exponential backoff
                 
     def _save_checkpoint(self) -> None:
-        """Save operator state to checkpoint."""
-        checkpoint_state = {
-            'state': self.state,
+        """Capture changed state and hand it to the background writer."""
+        capture_start = time.perf_counter()
+        meta = {
             'row_count': self.row_count,
             'timestamp': datetime.now().isoformat()
         }
         self.context.checkpoint_manager.save_checkpoint(
-            self.operator_id, checkpoint_state)
+            self.operator_id, self.state, meta)
+        capture_end = time.perf_counter()
+        
+        self.policy.record(self._work_units - self._units_at_checkpoint,
+                           capture_start - self._work_started,
+                           capture_end - capture_start)
+        self.checkpoints_taken += 1
+        self._units_at_checkpoint = self._work_units
+        self._work_started = capture_end
             
     def _handle_failure(self, error: Exception) -> None:
         """Handle operator failure."""
         logger = logging.getLogger(__name__)
         logger.error(f"Operator {self.operator_id} failed: {error}")
         
-        # Save final state before failure
+        # Save final state before failure and make sure it reaches disk
         self._save_checkpoint()
+        self.context.checkpoint_manager.flush()
         
         # Record failure
         if self.context.failure_detector.record_failure(self.operator_id):
             self.context.trigger_recovery(self.operator_id)
 
+class FaultTolerantAggregateOperator(FaultTolerantOperator):
+    """Hash aggregation whose groups are checkpointed incrementally.
+    
+    Each group is one entry of ``state``, so a checkpoint only writes the
+    groups touched since the previous one. ``input_offset`` counts the
+    input rows already folded into the groups; after a restart the input
+    is read again from the start and those rows are skipped.
+    """
+    
+    def _produce(self) -> Iterator[Dict[str, Any]]:
+        group_by = self.node.group_by or []
+        aggregates = self.node.aggregates or []
+        offset = self.state.get('input_offset', 0)
+        
+        for position, row in enumerate(self.children[0].execute()):
+            if position < offset:
+                continue
+            group_key = tuple(row.get(col) for col in group_by)
+            group = self.state.get(group_key)
+            if group is None:
+                group = {
+                    'row': {col: row.get(col) for col in group_by},
+                    'values': {agg['alias']: None for agg in aggregates},
+                    'counts': {agg['alias']: 0 for agg in aggregates}
+                }
+                self.state[group_key] = group
+            for agg in aggregates:
+                _fold_aggregate(group, agg, row.get(agg['column']))
+            self.state.touch(group_key)
+            self.state['input_offset'] = position + 1
+            self.tick()
+            
+        for key, group in self.state.items():
+            if key == 'input_offset':
+                continue
+            result = dict(group['row'])
+            for agg in aggregates:
+                result[agg['alias']] = _finish_aggregate(group, agg)
+            yield result
+
+def _fold_aggregate(group: Dict[str, Any], agg: Dict[str, Any], value: Any) -> None:
+    """Fold one input value into a group's aggregate."""
+    if value is None:
+        return
+    alias, func = agg['alias'], agg['function']
+    current = group['values'][alias]
+    group['counts'][alias] += 1
+    if func in ('sum', 'avg'):
+        group['values'][alias] = value if current is None else current + value
+    elif func == 'min':
+        group['values'][alias] = value if current is None or value < current else current
+    elif func == 'max':
+        group['values'][alias] = value if current is None or value > current else current
+    elif func != 'count':
+        raise ValueError(f"Unsupported aggregate function: {func}")
+
+def _finish_aggregate(group: Dict[str, Any], agg: Dict[str, Any]) -> Any:
+    alias, func = agg['alias'], agg['function']
+    count = group['counts'][alias]
+    if func == 'count':
+        return count
+    if func == 'avg':
+        return group['values'][alias] / count if count else None
+    if func == 'sum' and group['values'][alias] is None:
+        return 0
+    return group['values'][alias]
+
 class FaultTolerantExecutionEngine:
-    """Execution engine with fault tolerance capabilities."""
+    """Execution engine with fault tolerance capabilities.
+    
+    Checkpoints are named after the query id and each operator's position
+    in the plan, so a restarted query finds its own operators' records and
+    concurrent queries do not share them. Call ``close`` (or use the engine
+    as a context manager) to stop the checkpoint writer.
+    """
     
-    def __init__(self, checkpoint_dir: str = "checkpoints"):
-        self.context = FaultTolerantContext(checkpoint_dir)
+    def __init__(self, checkpoint_dir: str = "checkpoints", compact_every: int = 16):
+        self.context = FaultTolerantContext(checkpoint_dir, compact_every)
+        
+    def execute_plan(self, plan: QueryPlan,
+                     query_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Execute a query plan with fault tolerance.
+        
+        Pass the same ``query_id`` when re-running a failed query to resume
+        it; it defaults to the plan's ``query_id`` or its fingerprint.
+        """
+        query_id = (query_id or getattr(plan, 'query_id', None)
+                    or plan_fingerprint(plan.root)[:16])
         
-    def execute_plan(self, plan: QueryPlan) -> Iterator[Dict[str, Any]]:
-        """Execute a query plan with fault tolerance."""
         # Build fault-tolerant execution tree
-        root_operator = self._build_fault_tolerant_tree(plan.root)
+        root_operator = self._build_fault_tolerant_tree(plan.root, query_id, '0')
+        root_operator.resume_output = True
         
-        try:
-            # Execute with fault tolerance
-            yield from root_operator.execute()
-            
-        finally:
-            # Clean up checkpoints
-            self._cleanup_checkpoints(root_operator)
+        # Execute with fault tolerance; checkpoints survive failures so a
+        # restarted plan can resume from them
+        yield from root_operator.execute()
+        
+        # Clean up checkpoints
+        self._cleanup_checkpoints(root_operator)
             
     def register_recovery_handler(self, operator_id: str,
                                 handler: Callable[[], None]) -> None:
         """Register a recovery handler for an operator."""
         self.context.register_recovery_handler(operator_id, handler)
         
-    def _build_fault_tolerant_tree(self, 
-                                 node: QueryNode) -> FaultTolerantOperator:
-        """Build a fault-tolerant execution tree."""
-        operator = FaultTolerantOperator(node, self.context)
+    def close(self) -> None:
+        """Flush checkpoints and stop the checkpoint writer."""
+        self.context.close()
+        
+    def __enter__(self) -> 'FaultTolerantExecutionEngine':
+        return self
+        
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+        
+    def _build_fault_tolerant_tree(self, node: QueryNode, query_id: str,
+                                   position: str) -> FaultTolerantOperator:
+        """Build a fault-tolerant execution tree.
+        
+        ``position`` is the node's path from the root, e.g. ``0_1_0``.
+        """
+        operator_id = f"{query_id}-{position}"
+        if node.operation == 'aggregate':
+            operator = FaultTolerantAggregateOperator(
+                node, self.context, create_operator(node, self.context),
+                operator_id=operator_id, resume_output=False)
+        else:
+            operator = FaultTolerantOperator(
+                node, self.context, create_operator(node, self.context),
+                operator_id=operator_id, resume_output=False)
         
         # Recursively build children
-        for child in node.children:
-            child_operator = self._build_fault_tolerant_tree(child)
+        for i, child in enumerate(node.children):
+            child_operator = self._build_fault_tolerant_tree(
+                child, query_id, f"{position}_{i}")
             operator.add_child(child_operator)
             
         return operator
@@ -235,4 +738,4 @@ class FaultTolerantExecutionEngine:
         # Recursively clean up children
         for child in operator.children:
             if isinstance(child, FaultTolerantOperator):
-                self._cleanup_checkpoints(child) 
\ No newline at end of file
+                self._cleanup_checkpoints(child)
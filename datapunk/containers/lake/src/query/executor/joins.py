@@ -1,12 +1,14 @@
 from typing import Any, Dict, Iterator, List, Optional, Set
 from .query_exec_core import ExecutionOperator
+from .runtime_filters import build_runtime_filter, push_runtime_filter
 from ..parser.query_parser_core import QueryNode
 
 class HashJoinOperator(ExecutionOperator):
     """Operator that implements hash join algorithm."""
     
+    enable_runtime_filters = True
+    
     def execute(self) -> Iterator[Dict[str, Any]]:
-        left_iter = self.children[0].execute()
         right_iter = self.children[1].execute()
         join_condition = self.node.join_condition
         left_key = join_condition['left']
@@ -20,8 +22,13 @@ class HashJoinOperator(ExecutionOperator):
                 if key not in hash_table:
                     hash_table[key] = []
                 hash_table[key].append(right_row)
+                
+        # Push build-side keys to the probe side before it starts scanning
+        if self.enable_runtime_filters:
+            apply_runtime_filter(self, left_key, hash_table.keys())
         
         # Probe phase
+        left_iter = self.children[0].execute()
         for left_row in left_iter:
             key = left_row.get(left_key)
             if key is not None and key in hash_table:
@@ -104,7 +111,6 @@ class PartitionedHashJoinOperator(ExecutionOperator):
         self.num_partitions = num_partitions
     
     def execute(self) -> Iterator[Dict[str, Any]]:
-        left_iter = self.children[0].execute()
         right_iter = self.children[1].execute()
         join_condition = self.node.join_condition
         left_key = join_condition['left']
@@ -114,18 +120,22 @@ class PartitionedHashJoinOperator(ExecutionOperator):
         left_partitions: List[List[Dict[str, Any]]] = [[] for _ in range(self.num_partitions)]
         right_partitions: List[List[Dict[str, Any]]] = [[] for _ in range(self.num_partitions)]
         
-        # Partition phase
-        for row in left_iter:
-            key = row.get(left_key)
-            if key is not None:
-                partition = hash(key) % self.num_partitions
-                left_partitions[partition].append(row)
-                
+        # Partition phase, build side first so it can filter the probe side
+        build_keys: Set[Any] = set()
         for row in right_iter:
             key = row.get(right_key)
             if key is not None:
                 partition = hash(key) % self.num_partitions
                 right_partitions[partition].append(row)
+                build_keys.add(key)
+                
+        apply_runtime_filter(self, left_key, build_keys)
+        
+        for row in self.children[0].execute():
+            key = row.get(left_key)
+            if key is not None:
+                partition = hash(key) % self.num_partitions
+                left_partitions[partition].append(row)
         
         # Join each partition pair
         for left_part, right_part in zip(left_partitions, right_partitions):
@@ -145,6 +155,13 @@ class PartitionedHashJoinOperator(ExecutionOperator):
                     for right_row in hash_table[key]:
                         yield {**left_row, **right_row}
 
+def apply_runtime_filter(join: ExecutionOperator, probe_key: str,
+                         build_keys: Any) -> None:
+    """Build a runtime filter from build-side keys and push it to the probe side."""
+    runtime_filter = build_runtime_filter(probe_key, build_keys, origin=join)
+    if runtime_filter is not None:
+        push_runtime_filter(join.children[0], runtime_filter)
+
 def create_join_operator(node: QueryNode, context: Any, 
                         join_type: str = 'hash',
                         **kwargs) -> ExecutionOperator:
@@ -3,7 +3,8 @@ from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import multiprocessing
 from queue import Queue
 from threading import Lock
-from .query_exec_core import ExecutionOperator, ExecutionContext
+from .query_exec_core import ExecutionOperator, ExecutionContext, row_id_column
+from .runtime_filters import build_runtime_filter, push_runtime_filter
 from ..parser.query_parser_core import QueryNode
 
 class ParallelContext(ExecutionContext):
@@ -42,6 +43,22 @@ class ParallelOperator(ExecutionOperator):
 class ParallelTableScan(ParallelOperator):
     """Parallel implementation of table scan."""
     
+    def __init__(self, node: QueryNode, context: ParallelContext):
+        super().__init__(node, context)
+        self.runtime_filters: List[Any] = []
+        
+    def add_runtime_filter(self, runtime_filter: Any) -> bool:
+        """Attach a join runtime filter if this scan produces its column."""
+        if runtime_filter.column not in self.node.columns:
+            return False
+        # Joins push a new filter on every run; drop the one from the last run
+        self.runtime_filters = [
+            f for f in self.runtime_filters
+            if f.origin is None or f.origin is not runtime_filter.origin
+        ]
+        self.runtime_filters.append(runtime_filter)
+        return True
+        
     def execute(self) -> Iterator[Dict[str, Any]]:
         table_name = self.node.table_name
         columns = self.node.columns
@@ -49,17 +66,21 @@ class ParallelTableScan(ParallelOperator):
         if self.context.cache_manager:
             cached_data = self.context.cache_manager.get(table_name)
             if cached_data is not None:
-                # Partition cached data
+                # Partition cached data, keeping row positions
                 partitions = self.partition_data(
-                    iter(cached_data), 
+                    enumerate(cached_data), 
                     self.context.max_workers
                 )
+                rid_col = (row_id_column(table_name)
+                           if getattr(self.node, 'late_columns', None) else None)
+                if rid_col is not None:
+                    self.context.register_snapshot(table_name, cached_data)
                 
                 # Process partitions in parallel
                 futures = []
                 for partition in partitions:
                     future = self.context.thread_pool.submit(
-                        self._process_partition, partition, columns
+                        self._process_partition, partition, columns, rid_col
                     )
                     futures.append(future)
                     
@@ -67,17 +88,24 @@ class ParallelTableScan(ParallelOperator):
                 for future in futures:
                     yield from future.result()
                     
-    def _process_partition(self, partition: List[Dict[str, Any]], 
-                         columns: List[str]) -> List[Dict[str, Any]]:
+    def _process_partition(self, partition: List[Tuple[int, Dict[str, Any]]], 
+                         columns: List[str],
+                         rid_col: Optional[str] = None) -> List[Dict[str, Any]]:
         """Process a partition of the table data."""
-        return [{col: row[col] for col in columns if col in row}
-                for row in partition]
+        results = []
+        for row_id, row in partition:
+            if not all(f.might_contain(row.get(f.column)) for f in self.runtime_filters):
+                continue
+            result = {col: row[col] for col in columns if col in row}
+            if rid_col is not None:
+                result[rid_col] = row_id
+            results.append(result)
+        return results
 
 class ParallelHashJoin(ParallelOperator):
     """Parallel implementation of hash join."""
     
     def execute(self) -> Iterator[Dict[str, Any]]:
-        left_iter = self.children[0].execute()
         right_iter = self.children[1].execute()
         join_condition = self.node.join_condition
         left_key = join_condition['left']
@@ -100,9 +128,17 @@ class ParallelHashJoin(ParallelOperator):
         # Collect hash tables
         hash_tables = [future.result() for future in hash_table_futures]
         
+        # Push a runtime filter over the build keys to the probe side
+        build_keys = set()
+        for hash_table in hash_tables:
+            build_keys.update(hash_table.keys())
+        runtime_filter = build_runtime_filter(left_key, build_keys, origin=self)
+        if runtime_filter is not None:
+            push_runtime_filter(self.children[0], runtime_filter)
+        
         # Probe phase - partition left relation
         left_partitions = self.partition_data(
-            left_iter,
+            self.children[0].execute(),
             self.context.max_workers
         )
         
@@ -1,8 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Iterator, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 from ..parser.query_parser_core import QueryPlan, QueryNode
 from ...storage.cache import CacheManager
 
+# Late materialization: scans emit each row's position under this prefix
+ROW_ID_PREFIX = '__rowid__.'
+
+def row_id_column(table_name: str) -> str:
+    """Name of the row id column a late-materialized scan emits."""
+    return f"{ROW_ID_PREFIX}{table_name}"
+
 class ExecutionContext:
     """Holds the context for query execution including variables and statistics."""
     
@@ -10,6 +17,10 @@ class ExecutionContext:
         self.variables: Dict[str, Any] = {}
         self.statistics: Dict[str, Any] = {}
         self.cache_manager: Optional[CacheManager] = None
+        self.indexes: Dict[str, Any] = {}
+        # Table data each late-materialized scan read, so row ids resolve
+        # against the same version the scan emitted them from
+        self.table_snapshots: Dict[str, List[Dict[str, Any]]] = {}
         
     def set_variable(self, name: str, value: Any) -> None:
         """Set a context variable."""
@@ -22,6 +33,22 @@ class ExecutionContext:
     def update_statistics(self, key: str, value: Any) -> None:
         """Update execution statistics."""
         self.statistics[key] = value
+        
+    def register_index(self, table_name: str, column: str, index: Any) -> None:
+        """Register an index whose row ids are positions in the table data."""
+        self.indexes[f"{table_name}.{column}"] = index
+        
+    def get_index(self, table_name: str, column: str) -> Optional[Any]:
+        """Get a registered index for a table column."""
+        return self.indexes.get(f"{table_name}.{column}")
+        
+    def register_snapshot(self, table_name: str, data: List[Dict[str, Any]]) -> None:
+        """Record the table data a scan is emitting row ids into."""
+        self.table_snapshots[table_name] = data
+        
+    def get_snapshot(self, table_name: str) -> Optional[List[Dict[str, Any]]]:
+        """Get the table data row ids for a table refer to."""
+        return self.table_snapshots.get(table_name)
 
 class ExecutionOperator(ABC):
     """Base class for all execution operators."""
@@ -43,6 +70,23 @@ class ExecutionOperator(ABC):
 class TableScanOperator(ExecutionOperator):
     """Operator for scanning table data."""
     
+    def __init__(self, node: QueryNode, context: ExecutionContext):
+        super().__init__(node, context)
+        self.runtime_filters: List[Any] = []
+        self.index_lookups = 0
+        
+    def add_runtime_filter(self, runtime_filter: Any) -> bool:
+        """Attach a join runtime filter if this scan produces its column."""
+        if runtime_filter.column not in self.node.columns:
+            return False
+        # Joins push a new filter on every run; drop the one from the last run
+        self.runtime_filters = [
+            f for f in self.runtime_filters
+            if f.origin is None or f.origin is not runtime_filter.origin
+        ]
+        self.runtime_filters.append(runtime_filter)
+        return True
+        
     def execute(self) -> Iterator[Dict[str, Any]]:
         table_name = self.node.table_name
         columns = self.node.columns
@@ -51,13 +95,63 @@ class TableScanOperator(ExecutionOperator):
         if self.context.cache_manager:
             cached_data = self.context.cache_manager.get(table_name)
             if cached_data is not None:
-                for row in cached_data:
-                    yield {col: row[col] for col in columns if col in row}
+                if getattr(self.node, 'late_columns', None):
+                    # Emit row ids so deferred columns can be fetched later
+                    rid_col = row_id_column(table_name)
+                    self.context.register_snapshot(table_name, cached_data)
+                    for row_id in self._candidate_row_ids(cached_data):
+                        row = cached_data[row_id]
+                        if self._passes_runtime_filters(row):
+                            result = {col: row[col] for col in columns if col in row}
+                            result[rid_col] = row_id
+                            yield result
+                    return
+                    
+                for row in self._candidate_rows(cached_data):
+                    if self._passes_runtime_filters(row):
+                        yield {col: row[col] for col in columns if col in row}
                 return
                 
         # Fallback to direct table scan
         # This should be implemented based on your storage engine
         raise NotImplementedError("Direct table scan not implemented")
+        
+    def _candidate_rows(self, data: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Use index point or range lookups for runtime filters when possible."""
+        return (data[row_id] for row_id in self._candidate_row_ids(data))
+        
+    def _candidate_row_ids(self, data: List[Dict[str, Any]]) -> Iterable[int]:
+        """Row positions to scan, narrowed by index lookups when possible."""
+        for runtime_filter in self.runtime_filters:
+            index = self.context.get_index(self.node.table_name, runtime_filter.column)
+            if index is None:
+                continue
+                
+            if runtime_filter.values is not None:
+                row_ids = set()
+                for value in runtime_filter.values:
+                    row_ids.update(_index_hits(index.search(value)))
+                self.index_lookups += len(runtime_filter.values)
+            elif runtime_filter.min_value is not None:
+                try:
+                    row_ids = set(index.range_search(
+                        runtime_filter.min_value, runtime_filter.max_value))
+                    self.index_lookups += 1
+                except NotImplementedError:
+                    continue
+            else:
+                continue
+                
+            return sorted(row_ids)
+            
+        return range(len(data))
+        
+    def _passes_runtime_filters(self, row: Dict[str, Any]) -> bool:
+        """Check a row against all attached runtime filters."""
+        for runtime_filter in self.runtime_filters:
+            if not runtime_filter.might_contain(row.get(runtime_filter.column)):
+                return False
+        return True
 
 class FilterOperator(ExecutionOperator):
     """Operator for filtering rows based on predicates."""
@@ -92,6 +186,8 @@ class FilterOperator(ExecutionOperator):
             return row_value <= value
         elif operator == '!=':
             return row_value != value
+        elif operator == 'in':
+            return row_value in value
         else:
             raise ValueError(f"Unsupported operator: {operator}")
 
@@ -127,9 +223,58 @@ class ProjectOperator(ExecutionOperator):
         child_iter = self.children[0].execute()
         columns = self.node.columns
         
+        # Carry row ids through projections below a late materialization
+        row_id_tables = getattr(self.node, 'row_id_tables', None)
+        if row_id_tables:
+            columns = list(columns) + [row_id_column(t) for t in row_id_tables]
+        
         for row in child_iter:
             yield {col: row[col] for col in columns if col in row}
 
+class MaterializeOperator(ExecutionOperator):
+    """Fetches deferred columns by row id after selective operators have run."""
+    
+    def __init__(self, node: QueryNode, context: ExecutionContext,
+                 batch_size: int = 1024):
+        super().__init__(node, context)
+        self.batch_size = batch_size
+        self.rows_materialized = 0
+        
+    def execute(self) -> Iterator[Dict[str, Any]]:
+        late_columns: Dict[str, List[str]] = self.node.late_columns
+        
+        batch: List[Dict[str, Any]] = []
+        for row in self.children[0].execute():
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield from self._materialize(batch, late_columns)
+                batch = []
+        if batch:
+            yield from self._materialize(batch, late_columns)
+            
+    def _materialize(self, batch: List[Dict[str, Any]],
+                     late_columns: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        """Fill one batch of rows with their deferred columns.
+        
+        Rows are copied, since children may hand out rows they still hold.
+        Row ids are looked up in the data the scan read them from, which
+        it registered before emitting its first row.
+        """
+        batch = [dict(row) for row in batch]
+        for table, columns in late_columns.items():
+            rid_col = row_id_column(table)
+            data = self.context.get_snapshot(table)
+            for row in batch:
+                row_id = row.pop(rid_col, None)
+                if row_id is None or data is None:
+                    continue
+                source = data[row_id]
+                for col in columns:
+                    if col in source:
+                        row[col] = source[col]
+        self.rows_materialized += len(batch)
+        return batch
+
 class AggregateOperator(ExecutionOperator):
     """Operator for performing aggregations."""
     
@@ -203,41 +348,67 @@ class AggregateOperator(ExecutionOperator):
             return value / count if count > 0 else None
         return value
 
+def _index_hits(result: Any) -> Iterable[int]:
+    """Normalize an index point lookup into row positions.
+
+    Multi-valued indexes return lists while a B-tree returns the single
+    stored value, or None when the key is absent.
+    """
+    if result is None:
+        return ()
+    if isinstance(result, (list, tuple, set, frozenset)):
+        return result
+    return (result,)
+
+def create_operator(node: QueryNode, context: ExecutionContext) -> ExecutionOperator:
+    """Factory function to create the basic operator for a plan node."""
+    if node.operation == 'table_scan':
+        return TableScanOperator(node, context)
+    elif node.operation == 'filter':
+        return FilterOperator(node, context)
+    elif node.operation == 'join':
+        return JoinOperator(node, context)
+    elif node.operation == 'project':
+        return ProjectOperator(node, context)
+    elif node.operation == 'aggregate':
+        return AggregateOperator(node, context)
+    elif node.operation == 'materialize':
+        return MaterializeOperator(node, context)
+    else:
+        raise ValueError(f"Unsupported operation: {node.operation}")
+
 class ExecutionEngine:
     """Main execution engine that orchestrates query execution."""
     
     def __init__(self, cache_manager: Optional[CacheManager] = None):
         self.cache_manager = cache_manager
         
-    def execute_plan(self, plan: QueryPlan) -> Iterator[Dict[str, Any]]:
+    def execute_plan(self, plan: QueryPlan,
+                     parameters: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
         """Execute a query plan and return results."""
-        context = ExecutionContext()
-        if self.cache_manager:
-            context.cache_manager = self.cache_manager
-            
         # Build execution tree
-        root_operator = self._build_execution_tree(plan.root, context)
+        root_operator = self.build_operator_tree(plan, parameters)
         
         # Execute and return results
         yield from root_operator.execute()
         
+    def build_operator_tree(self, plan: QueryPlan,
+                            parameters: Optional[Dict[str, Any]] = None) -> ExecutionOperator:
+        """Build the operator tree this engine runs for a plan.
+        
+        Query parameters become context variables for the operators.
+        """
+        context = ExecutionContext()
+        if self.cache_manager:
+            context.cache_manager = self.cache_manager
+        for name, value in (parameters or {}).items():
+            context.set_variable(name, value)
+        return self._build_execution_tree(plan.root, context)
+        
     def _build_execution_tree(self, node: QueryNode, 
                             context: ExecutionContext) -> ExecutionOperator:
         """Recursively build the execution operator tree."""
-        operator: ExecutionOperator
-        
-        if node.operation == 'table_scan':
-            operator = TableScanOperator(node, context)
-        elif node.operation == 'filter':
-            operator = FilterOperator(node, context)
-        elif node.operation == 'join':
-            operator = JoinOperator(node, context)
-        elif node.operation == 'project':
-            operator = ProjectOperator(node, context)
-        elif node.operation == 'aggregate':
-            operator = AggregateOperator(node, context)
-        else:
-            raise ValueError(f"Unsupported operation: {node.operation}")
+        operator = create_operator(node, context)
             
         # Recursively build children
         for child in node.children:
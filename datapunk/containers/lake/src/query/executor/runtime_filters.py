@@ -0,0 +1,209 @@
+from typing import Any, Dict, Iterable, List, Optional, Set
+from decimal import Decimal
+import hashlib
+import math
+import numbers
+from .query_exec_core import ExecutionOperator
+
+class BloomFilter:
+    """Compact probabilistic set membership filter."""
+
+    def __init__(self, expected_items: int, false_positive_rate: float = 0.01):
+        expected_items = max(expected_items, 1)
+        self.num_bits = max(
+            8, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2))
+        )
+        self.num_hashes = max(
+            1, int(round(self.num_bits / expected_items * math.log(2)))
+        )
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, value: Any) -> Iterable[int]:
+        """Derive bit positions with double hashing."""
+        digest = hashlib.blake2b(repr(_canonical(value)).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, value: Any) -> None:
+        """Add a value to the filter."""
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def might_contain(self, value: Any) -> bool:
+        """Check whether a value may be in the filter."""
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(value)
+        )
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.bits)
+
+def _canonical(value: Any) -> Any:
+    """Map equal numbers of different types to one representation.
+
+    The join matches 7 with 7.0, so the filter must hash them alike.
+    """
+    if isinstance(value, (numbers.Real, Decimal)):
+        try:
+            if value == int(value):
+                return int(value)
+            return float(value)
+        except (OverflowError, ValueError):
+            # Infinities and NaN
+            return float(value)
+    return value
+
+class RuntimeFilter:
+    """Filter on a join key derived from the build side of a join.
+
+    Holds a bloom filter and min/max range for in-process scans, plus the exact
+    key set when it is small enough to ship to remote sources as an IN-list.
+    ``origin`` is the operator that built the filter; a scan keeps only the
+    latest filter from each origin, so re-running a join replaces its filter.
+    """
+
+    def __init__(self, column: str, keys: Set[Any],
+                 false_positive_rate: float = 0.01,
+                 in_list_threshold: int = 1000,
+                 origin: Any = None):
+        self.column = column
+        self.origin = origin
+        self.key_count = len(keys)
+        self.bloom = BloomFilter(len(keys), false_positive_rate)
+        for key in keys:
+            self.bloom.add(key)
+
+        self.values: Optional[Set[Any]] = set(keys) if len(keys) <= in_list_threshold else None
+
+        try:
+            self.min_value = min(keys) if keys else None
+            self.max_value = max(keys) if keys else None
+        except TypeError:
+            # Mixed, non-comparable key types
+            self.min_value = self.max_value = None
+
+        self.rows_checked = 0
+        self.rows_pruned = 0
+
+    def might_contain(self, value: Any) -> bool:
+        """Check whether a probe-side value can match the build side."""
+        self.rows_checked += 1
+        if value is None or not self._check(value):
+            self.rows_pruned += 1
+            return False
+        return True
+
+    def _check(self, value: Any) -> bool:
+        if self.values is not None:
+            return value in self.values
+        if self.min_value is not None:
+            try:
+                if value < self.min_value or value > self.max_value:
+                    return False
+            except TypeError:
+                return False
+        return self.bloom.might_contain(value)
+
+    def to_predicates(self) -> List[Dict[str, Any]]:
+        """Express the filter as executor predicates."""
+        if self.values is not None:
+            return [{'column': self.column, 'op': 'in', 'value': _sorted_values(self.values)}]
+        if self.min_value is None:
+            return []
+        return [
+            {'column': self.column, 'op': '>=', 'value': self.min_value},
+            {'column': self.column, 'op': '<=', 'value': self.max_value}
+        ]
+
+    def to_sql(self, column: Optional[str] = None) -> Optional[str]:
+        """Render the filter as a SQL predicate with literal values."""
+        column = column or self.column
+        if self.values is not None:
+            if not self.values:
+                return "1 = 0"
+            literals = ', '.join(_sql_literal(v) for v in _sorted_values(self.values))
+            return f"{column} IN ({literals})"
+        if self.min_value is None:
+            return None
+        return (f"{column} BETWEEN {_sql_literal(self.min_value)} "
+                f"AND {_sql_literal(self.max_value)}")
+
+    def to_mongo(self, field: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Render the filter as a MongoDB match expression."""
+        field = field or self.column
+        if self.values is not None:
+            return {field: {'$in': list(self.values)}}
+        if self.min_value is None:
+            return None
+        return {field: {'$gte': self.min_value, '$lte': self.max_value}}
+
+    def to_pandas_query(self, column: Optional[str] = None) -> Optional[str]:
+        """Render the filter as a DataFrame.query expression."""
+        column = column or self.column
+        if self.values is not None:
+            return f"{column} in {_sorted_values(self.values)!r}"
+        if self.min_value is None:
+            return None
+        return f"{column} >= {self.min_value!r} and {column} <= {self.max_value!r}"
+
+def _sorted_values(values: Set[Any]) -> List[Any]:
+    """Sort values for deterministic rendering, tolerating mixed types."""
+    try:
+        return sorted(values)
+    except TypeError:
+        return sorted(values, key=repr)
+
+def _sql_literal(value: Any) -> str:
+    """Render a Python value as a SQL literal."""
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def build_runtime_filter(column: str, keys: Iterable[Any],
+                         max_build_keys: int = 1_000_000,
+                         **kwargs) -> Optional[RuntimeFilter]:
+    """Build a runtime filter from build-side join keys.
+
+    Returns None when the build side is too large for the filter to be selective.
+    """
+    key_set = set(keys)
+    key_set.discard(None)
+    if len(key_set) > max_build_keys:
+        return None
+    return RuntimeFilter(column, key_set, **kwargs)
+
+def push_runtime_filter(operator: ExecutionOperator,
+                        runtime_filter: RuntimeFilter) -> int:
+    """Push a runtime filter down a probe-side operator tree.
+
+    Filters pass through filters and projections and attach to any operator
+    exposing ``add_runtime_filter``. Aggregations stop the push unless the key
+    is a grouping column, and joins unless both sides join on the key column
+    itself. Returns the number of operators that accepted the filter.
+    """
+    accepted = 0
+    add_filter = getattr(operator, 'add_runtime_filter', None)
+    if add_filter is not None and add_filter(runtime_filter):
+        accepted += 1
+
+    node = operator.node
+    operation = getattr(node, 'operation', None)
+    if operation == 'aggregate':
+        group_by = getattr(node, 'group_by', None) or []
+        if runtime_filter.column not in group_by:
+            return accepted
+    elif operation == 'join':
+        condition = getattr(node, 'join_condition', None) or {}
+        if condition.get('left') != runtime_filter.column or \
+           condition.get('right') != runtime_filter.column:
+            return accepted
+
+    for child in operator.children:
+        accepted += push_runtime_filter(child, runtime_filter)
+    return accepted
@@ -0,0 +1,185 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import asyncio
+import logging
+import re
+import time
+
+@dataclass
+class PoolStats:
+    """Counters describing a connection pool."""
+    size: int = 0
+    idle: int = 0
+    created: int = 0
+    discarded: int = 0
+    waits: int = 0
+    health_checks: int = 0
+
+class AsyncConnectionPool:
+    """Bounded pool of connections shared by every query against a source.
+    
+    Connections idle for longer than ``health_check_interval`` are checked
+    before being handed out, and a connection whose user raised is checked
+    before it is returned; connections failing a check are replaced.
+    """
+    
+    def __init__(self,
+                 connect: Callable[[], Awaitable[Any]],
+                 close: Callable[[Any], Awaitable[None]],
+                 check: Callable[[Any], Awaitable[Any]],
+                 max_size: int = 10,
+                 health_check_interval: float = 30.0,
+                 max_idle_seconds: float = 300.0):
+        self._connect = connect
+        self._close = close
+        self._check = check
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.max_idle_seconds = max_idle_seconds
+        self._idle: List[Tuple[Any, float]] = []  # (connection, released_at)
+        self._size = 0
+        self._available = asyncio.Condition()
+        self._loop = asyncio.get_running_loop()
+        self._closed = False
+        self.stats = PoolStats()
+        self.logger = logging.getLogger(__name__)
+    
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Any]:
+        """Borrow a healthy connection for the duration of the block."""
+        conn = await self._checkout()
+        healthy = True
+        try:
+            yield conn
+        except BaseException:
+            healthy = await self._healthy(conn)
+            raise
+        finally:
+            await self._checkin(conn, healthy)
+    
+    async def close(self) -> None:
+        """Close idle connections; borrowed ones close when returned."""
+        self._closed = True
+        async with self._available:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._available.notify_all()
+        for conn, _ in idle:
+            await self._discard(conn)
+    
+    async def _checkout(self) -> Any:
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        async with self._available:
+            while True:
+                await self._expire_idle()
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                self.stats.waits += 1
+                await self._available.wait()
+        
+        if conn is None:
+            return await self._open()
+        if time.monotonic() - released_at > self.health_check_interval:
+            if not await self._healthy(conn):
+                await self._discard(conn)
+                return await self._open()
+        return conn
+    
+    async def _open(self) -> Any:
+        try:
+            conn = await self._connect()
+        except BaseException:
+            async with self._available:
+                self._size -= 1
+                self._available.notify()
+            raise
+        self.stats.created += 1
+        return conn
+    
+    async def _checkin(self, conn: Any, healthy: bool) -> None:
+        if not healthy or self._closed:
+            await self._discard(conn)
+            async with self._available:
+                self._size -= 1
+                self._available.notify()
+            return
+        async with self._available:
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+    
+    async def _healthy(self, conn: Any) -> bool:
+        self.stats.health_checks += 1
+        try:
+            await self._check(conn)
+            return True
+        except Exception as e:
+            self.logger.warning(f"Discarding unhealthy connection: {e}")
+            return False
+    
+    async def _expire_idle(self) -> None:
+        """Close connections idle past ``max_idle_seconds``; caller holds the lock."""
+        cutoff = time.monotonic() - self.max_idle_seconds
+        expired = [conn for conn, released_at in self._idle if released_at < cutoff]
+        if expired:
+            self._idle = [(c, t) for c, t in self._idle if t >= cutoff]
+            self._size -= len(expired)
+            for conn in expired:
+                await self._discard(conn)
+    
+    async def _discard(self, conn: Any) -> None:
+        self.stats.discarded += 1
+        try:
+            await self._close(conn)
+        except Exception as e:
+            self.logger.warning(f"Error closing connection: {e}")
+    
+    def get_stats(self) -> PoolStats:
+        """Current pool counters."""
+        self.stats.size = self._size
+        self.stats.idle = len(self._idle)
+        return self.stats
+
+_shared_pools: Dict[Tuple[str, int], AsyncConnectionPool] = {}
+
+def shared_pool(key: str, factory: Callable[[], AsyncConnectionPool]) -> AsyncConnectionPool:
+    """Get the pool for a source on the running loop, creating it once.
+    
+    Pools are per event loop because async drivers bind connections to
+    the loop that opened them.
+    """
+    loop = asyncio.get_running_loop()
+    for stale in [k for k, p in _shared_pools.items() if p._loop.is_closed()]:
+        del _shared_pools[stale]
+    pool_key = (key, id(loop))
+    pool = _shared_pools.get(pool_key)
+    if pool is None or pool._closed:
+        pool = _shared_pools[pool_key] = factory()
+    return pool
+
+_NAMED_PARAM = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+def to_positional(sql: str, params: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """Rewrite ``:name`` parameters as ``$n`` for drivers such as asyncpg.
+    
+    ``::type`` casts are left alone; a name used twice binds one argument.
+    """
+    params = params or {}
+    order: Dict[str, int] = {}
+    
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in params:
+            return match.group(0)
+        if name not in order:
+            order[name] = len(order) + 1
+        return f"${order[name]}"
+    
+    rewritten = _NAMED_PARAM.sub(replace, sql)
+    return rewritten, [params[name] for name in order]
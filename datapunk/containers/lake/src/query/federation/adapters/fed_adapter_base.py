@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, AsyncIterator, Iterator, Optional, Sequence, Set, Tuple
 from dataclasses import dataclass
-from ..fed_planner import DataSource, DataSourceType
+import asyncio
+from ..fed_planner import DataSource, DataSourceType, ScanPartition, ScanPartitioning
 
 @dataclass
 class AdapterMetrics:
@@ -13,6 +14,12 @@ class AdapterMetrics:
     cache_misses: int = 0
     error_count: int = 0
 
+@dataclass
+class BoundQuery:
+    """A SQL statement with named bind parameters."""
+    sql: str
+    params: Dict[str, Any]
+
 class DataSourceAdapter(ABC):
     """Base class for data source adapters."""
     
@@ -46,6 +53,89 @@ class DataSourceAdapter(ABC):
         """Get schema information from the data source."""
         pass
         
+    def apply_runtime_filters(self, query: Any, filters: List[Any]) -> Any:
+        """Restrict a query with join runtime filters.
+        
+        SQL string queries are wrapped in a filtering subquery; other query
+        types are returned unchanged unless an adapter overrides this.
+        """
+        if not isinstance(query, str):
+            return query
+            
+        predicates = [p for p in (f.to_sql() for f in filters) if p]
+        if not predicates:
+            return query
+            
+        query = query.strip().rstrip(';')
+        return f"SELECT * FROM ({query}) AS rf_source WHERE {' AND '.join(predicates)}"
+        
+    def bind_join_keys(self, query: Any, column: str, keys: List[Any],
+                       style: str = "in") -> Any:
+        """Restrict a query to one batch of bind-join keys.
+        
+        SQL strings become a ``BoundQuery`` that filters on a parameterized
+        IN-list, or joins a VALUES list when ``style`` is ``"values"``. JSON
+        queries gain an ``in`` condition. Keys are always sent as bind
+        parameters so each batch reuses the same statement shape.
+        """
+        if isinstance(query, dict):
+            bound = dict(query)
+            conditions = dict(bound.get("conditions", {}))
+            conditions[column] = {"operator": "in", "value": list(keys)}
+            bound["conditions"] = conditions
+            return bound
+            
+        if not isinstance(query, str):
+            raise QueryError(f"Cannot bind join keys to query type: {type(query)}")
+            
+        names = [f"bk{i}" for i in range(len(keys))]
+        params = dict(zip(names, keys))
+        query = query.strip().rstrip(';')
+        if style == "values":
+            rows = ', '.join(f"(:{name})" for name in names)
+            sql = (f"SELECT bj_inner.* FROM ({query}) AS bj_inner "
+                   f"JOIN (VALUES {rows}) AS bj_keys(key) "
+                   f"ON bj_inner.{column} = bj_keys.key")
+        elif style == "in":
+            placeholders = ', '.join(f":{name}" for name in names)
+            sql = (f"SELECT * FROM ({query}) AS bj_inner "
+                   f"WHERE {column} IN ({placeholders})")
+        else:
+            raise QueryError(f"Unknown bind join style: {style}")
+        return BoundQuery(sql, params)
+        
+    def table_statistics(self, table_name: str) -> Dict[str, Any]:
+        """Get size statistics used to choose a scan's degree of parallelism."""
+        return {}
+        
+    def plan_partitions(self, scan: ScanPartitioning,
+                        degree: int) -> List[ScanPartition]:
+        """Split a table scan into ranges that can be read concurrently.
+        
+        Adapters that cannot split scans read the table as one partition.
+        """
+        return [ScanPartition(0, "TRUE", {})]
+        
+    def execute_partition(self, scan: ScanPartitioning,
+                          partition: ScanPartition) -> Iterator[List[Dict[str, Any]]]:
+        """Read one partition of a scan as a stream of row batches."""
+        yield self.execute_query(BoundQuery(scan_partition_sql(scan, partition),
+                                            partition.params))
+        
+    async def _stream_executed(self, query: Any,
+                               fetch_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Run ``execute_query`` and yield its rows in batches of ``fetch_size``.
+        
+        Only adapters with server-side cursors define ``stream_query``, so
+        the federated executor keeps its cached ``execute`` path for the
+        rest. Those adapters use this for queries their cursors cannot run.
+        """
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, self.execute_query, query)
+        size = fetch_size or len(rows) or 1
+        for start in range(0, len(rows), size):
+            yield rows[start:start + size]
+        
     def get_metrics(self) -> AdapterMetrics:
         """Get current adapter metrics."""
         return self.metrics
@@ -70,6 +160,68 @@ class SchemaError(AdapterException):
     """Error retrieving schema information."""
     pass
 
+def scan_partition_sql(scan: ScanPartitioning, partition: ScanPartition) -> str:
+    """Render the SQL reading one partition of a table scan."""
+    columns = ', '.join(scan.columns) if scan.columns else '*'
+    sql = f"SELECT {columns} FROM {scan.table} WHERE ({partition.predicate})"
+    if scan.where:
+        sql += f" AND ({scan.where})"
+    return sql
+
+def range_partitions(column: str, bounds: Sequence[Any],
+                     nullable: bool = True,
+                     cast: Optional[str] = None) -> List[ScanPartition]:
+    """Build partitions covering every value of a column, split at bounds.
+    
+    The first and last partitions are open-ended so rows outside the
+    sampled range, or added since, are still read exactly once.
+    """
+    if not bounds:
+        return [ScanPartition(0, "TRUE", {})]
+        
+    def param(name: str) -> str:
+        return f"CAST(:{name} AS {cast})" if cast else f":{name}"
+        
+    partitions = []
+    for i in range(len(bounds) + 1):
+        params = {}
+        clauses = []
+        if i > 0:
+            clauses.append(f"{column} >= {param(f'p{i}_lo')}")
+            params[f"p{i}_lo"] = bounds[i - 1]
+        if i < len(bounds):
+            clauses.append(f"{column} < {param(f'p{i}_hi')}")
+            params[f"p{i}_hi"] = bounds[i]
+        predicate = ' AND '.join(clauses)
+        if i == 0 and nullable:
+            predicate = f"({predicate} OR {column} IS NULL)"
+        partitions.append(ScanPartition(i, predicate, params))
+    return partitions
+
+def split_weighted(weights: Sequence[float], parts: int) -> List[Tuple[int, int]]:
+    """Split consecutive weighted items into at most ``parts`` balanced runs.
+    
+    Returns ``(start, end)`` index pairs, end exclusive.
+    """
+    if not weights:
+        return []
+    parts = max(1, min(parts, len(weights)))
+    target = sum(weights) / parts
+    runs = []
+    start = 0
+    total = 0.0
+    for i, weight in enumerate(weights):
+        total += weight
+        remaining_items = len(weights) - i - 1
+        remaining_runs = parts - len(runs) - 1
+        # Close a run at its share of the weight, keeping an item per later run
+        if remaining_runs and remaining_items and (
+                total >= target * (len(runs) + 1) or remaining_items == remaining_runs):
+            runs.append((start, i + 1))
+            start = i + 1
+    runs.append((start, len(weights)))
+    return runs
+
 def validate_query_result(result: List[Dict[str, Any]]) -> bool:
     """Validate query result format."""
     if not isinstance(result, list):
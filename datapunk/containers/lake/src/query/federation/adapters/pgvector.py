@@ -1,15 +1,43 @@
-from typing import Dict, List, Any, Set, Optional, Union
+from typing import Dict, List, Any, Set, Optional, Sequence, Tuple, Union
+import asyncio
+import math
+import re
 import numpy as np
 from sqlalchemy.sql import text
 from .postgres import PostgresAdapter
 from .fed_adapter_base import DataSourceType, QueryError
 
+_DISTANCE_OPERATORS = {"l2": "<->", "cosine": "<=>"}
+
+def search_settings(index_type: Optional[str], recall_target: float, k: int,
+                    lists: Optional[int] = None) -> Dict[str, int]:
+    """Choose index search breadth for a recall target.
+    
+    The candidate list grows with log(1 / (1 - recall)): each doubling of
+    ef_search or probes roughly halves the neighbours missed. The result
+    is clamped to what pgvector accepts.
+    """
+    if not 0 < recall_target < 1:
+        raise ValueError("recall_target must be between 0 and 1")
+    effort = math.log(1 / (1 - recall_target))
+    if index_type == "hnsw":
+        return {"hnsw.ef_search": min(1000, max(k, math.ceil(k * (1 + 2 * effort))))}
+    if index_type == "ivfflat":
+        lists = lists or 100
+        return {"ivfflat.probes": min(lists, max(1, math.ceil(math.sqrt(lists) * effort)))}
+    return {}
+
+def _vector_literal(vector: np.ndarray) -> str:
+    """Format a vector in pgvector's text input form."""
+    return "[" + ",".join(map(str, vector.tolist())) + "]"
+
 class PgVectorAdapter(PostgresAdapter):
     """Adapter for PostgreSQL with pgvector extension for vector operations."""
     
     def __init__(self, name: str, connection_string: str):
         super().__init__(name, connection_string)
         self.source_type = DataSourceType.VECTOR
+        self._vector_indexes: Dict[str, Tuple[Optional[str], Optional[int]]] = {}
         
     def connect(self) -> None:
         """Establish connection and verify pgvector extension."""
@@ -119,60 +147,116 @@ class PgVectorAdapter(PostgresAdapter):
         if filter_conditions:
             sql += f"\nWHERE {filter_conditions}"
             
+        # Restrict to a batch of bind-join keys
+        params = {}
+        bind = query.get("bind_keys")
+        if bind:
+            sql += "\nAND" if filter_conditions else "\nWHERE"
+            sql += f" {bind['column']} = ANY(:bind_keys)"
+            params["bind_keys"] = list(bind["values"])
+            
         sql += f"\nORDER BY embedding {operator} ARRAY{vector}::vector"
         sql += f"\nLIMIT {k}"
         
-        return self._execute_raw_sql(sql)
+        return self._execute_raw_sql(sql, params)
         
-    def bulk_vector_search(self, table_name: str, vectors: List[List[float]],
-                          k: int = 10, batch_size: int = 100) -> List[List[Dict[str, Any]]]:
-        """Perform bulk nearest neighbor search."""
-        results = []
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            batch_results = []
+    def bind_join_keys(self, query: Any, column: str, keys: List[Any],
+                       style: str = "in") -> Any:
+        """Bind join keys into vector queries as an array parameter."""
+        if isinstance(query, dict) and query.get("type") == "vector":
+            return dict(query, bind_keys={"column": column, "values": list(keys)})
+        return super().bind_join_keys(query, column, keys, style)
+        
+    async def bulk_vector_search(self, table_name: str,
+                                 vectors: Union[np.ndarray, Sequence[Sequence[float]]],
+                                 k: int = 10, batch_size: int = 100,
+                                 distance: str = "l2", recall_target: float = 0.95,
+                                 filter: Optional[str] = None, id_column: str = "id",
+                                 ef_search: Optional[int] = None,
+                                 probes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the k nearest rows to each query vector.
+        
+        Each query vector gets its own index-assisted top-k through a
+        LATERAL subquery, with the batch bound as one array parameter.
+        Batches run concurrently on the shared connection pool.
+        
+        Returns ``(ids, distances)`` arrays of shape ``(len(vectors), k)``.
+        ``ids`` is an object array holding ``id_column`` values as the
+        driver returns them, so integer, UUID and text keys all fit;
+        queries with fewer than k matches are padded with None and inf.
+        """
+        if distance not in _DISTANCE_OPERATORS:
+            raise ValueError("Distance must be 'l2' or 'cosine'")
+        queries = np.asarray(vectors, dtype=np.float32)
+        if queries.ndim != 2:
+            raise ValueError("vectors must be a 2-D array of query vectors")
             
-            # Build batch query
-            value_list = [f"ARRAY{v}::vector" for v in batch]
-            sql = f"""
-            WITH query_vectors AS (
-                SELECT unnest(ARRAY[{', '.join(value_list)}]) as qv
-            )
-            SELECT t.*, qv as query_vector,
-                   t.embedding <-> qv as distance
+        operator = _DISTANCE_OPERATORS[distance]
+        where = f"WHERE {filter}" if filter else ""
+        sql = f"""
+        SELECT q.ord, n.id, n.distance
+        FROM unnest($1::text[]) WITH ORDINALITY AS q(vec, ord)
+        CROSS JOIN LATERAL (
+            SELECT t.{id_column} AS id, t.embedding {operator} q.vec::vector AS distance
             FROM {table_name} t
-            CROSS JOIN query_vectors qv
-            ORDER BY qv, distance
-            LIMIT {k * len(batch)};
-            """
+            {where}
+            ORDER BY t.embedding {operator} q.vec::vector
+            LIMIT $2
+        ) n
+        ORDER BY q.ord, n.distance
+        """
+        
+        index_type, lists = await self._vector_index(table_name)
+        settings = search_settings(index_type, recall_target, k, lists)
+        if ef_search is not None and index_type == "hnsw":
+            settings["hnsw.ef_search"] = ef_search
+        if probes is not None and index_type == "ivfflat":
+            settings["ivfflat.probes"] = probes
             
-            with self.engine.connect() as conn:
-                result = conn.execute(text(sql))
-                
-                # Group results by query vector
-                current_results = []
-                current_vector = None
-                
-                for row in result:
-                    row_dict = dict(row)
-                    vector = row_dict.pop("query_vector")
-                    
-                    if current_vector is None:
-                        current_vector = vector
-                        
-                    if vector != current_vector:
-                        batch_results.append(current_results)
-                        current_results = []
-                        current_vector = vector
-                        
-                    current_results.append(row_dict)
-                    
-                if current_results:
-                    batch_results.append(current_results)
-                    
-            results.extend(batch_results)
+        ids = np.full((len(queries), k), None, dtype=object)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        pool = self._pool()
+        matched = 0
+        
+        async def search(start: int) -> None:
+            nonlocal matched
+            batch = [_vector_literal(v) for v in queries[start:start + batch_size]]
+            async with pool.acquire() as conn:
+                async with conn.transaction(readonly=True):
+                    # SET LOCAL scopes search breadth to this batch's transaction
+                    for name, value in settings.items():
+                        await conn.execute(f"SET LOCAL {name} = {int(value)}")
+                    rows = await conn.fetch(sql, batch, k)
+            if not rows:
+                return
+            matched += len(rows)
+            ords = np.fromiter((row["ord"] for row in rows), dtype=np.int64, count=len(rows))
+            # Rows arrive grouped by query in distance order
+            ranks = np.arange(len(ords)) - np.searchsorted(ords, ords)
+            positions = start + ords - 1
+            ids[positions, ranks] = [row["id"] for row in rows]
+            distances[positions, ranks] = [row["distance"] for row in rows]
             
-        return results
+        await asyncio.gather(*(search(start) for start in range(0, len(queries), batch_size)))
+        self.metrics.query_count += 1
+        self.metrics.rows_processed += matched
+        return ids, distances
+        
+    async def _vector_index(self, table_name: str) -> Tuple[Optional[str], Optional[int]]:
+        """Find the type and list count of a table's vector index."""
+        if table_name not in self._vector_indexes:
+            async with self._pool().acquire() as conn:
+                rows = await conn.fetch(
+                    "SELECT indexdef FROM pg_indexes WHERE tablename = $1", table_name)
+            found: Tuple[Optional[str], Optional[int]] = (None, None)
+            for row in rows:
+                method = re.search(r"USING (hnsw|ivfflat)", row["indexdef"], re.IGNORECASE)
+                if method:
+                    lists = re.search(r"lists\s*=\s*'?(\d+)", row["indexdef"])
+                    found = (method.group(1).lower(), int(lists.group(1)) if lists else None)
+                    break
+            self._vector_indexes[table_name] = found
+        return self._vector_indexes[table_name]
         
     def get_capabilities(self) -> Set[str]:
         """Get pgvector capabilities."""
@@ -1,25 +1,35 @@
+import re
 import time
-from typing import Dict, List, Any, Set, Optional
+from typing import Dict, List, Any, AsyncIterator, Iterator, Set, Optional
+import asyncpg
 import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.sql import text
 from psycopg2.extras import Json, DictCursor
 from .fed_adapter_base import (
+    BoundQuery,
     DataSourceAdapter,
     DataSourceType,
     AdapterMetrics,
     ConnectionError,
     QueryError,
     SchemaError,
+    range_partitions,
+    scan_partition_sql,
     standardize_schema
 )
+from .connection_pool import AsyncConnectionPool, shared_pool, to_positional
+from ..fed_planner import ScanPartition, ScanPartitioning
 
 class PostgresAdapter(DataSourceAdapter):
     """Adapter for PostgreSQL with advanced features support."""
     
-    def __init__(self, name: str, connection_string: str):
+    def __init__(self, name: str, connection_string: str,
+                 fetch_size: int = 10000, pool_size: int = 10):
         super().__init__(name, DataSourceType.RELATIONAL)
         self.connection_string = connection_string
+        self.fetch_size = fetch_size
+        self.pool_size = pool_size
         self.engine: Optional[sa.Engine] = None
         self.metadata: Optional[sa.MetaData] = None
         
@@ -28,6 +38,8 @@ class PostgresAdapter(DataSourceAdapter):
         try:
             self.engine = sa.create_engine(
                 self.connection_string,
+                pool_pre_ping=True,
+                pool_size=self.pool_size,
                 json_serializer=lambda obj: Json(obj),
                 connect_args={'cursor_factory': DictCursor}
             )
@@ -60,6 +72,8 @@ class PostgresAdapter(DataSourceAdapter):
             # Handle different query types
             if isinstance(query, str):
                 result = self._execute_raw_sql(query)
+            elif isinstance(query, BoundQuery):
+                result = self._execute_raw_sql(query.sql, query.params)
             elif isinstance(query, sa.sql.Select):
                 result = self._execute_sqlalchemy(query)
             elif isinstance(query, dict):
@@ -79,10 +93,65 @@ class PostgresAdapter(DataSourceAdapter):
             self.metrics.error_count += 1
             raise QueryError(f"Query execution failed: {str(e)}")
             
-    def _execute_raw_sql(self, query: str) -> List[Dict[str, Any]]:
+    async def stream_query(self, query: Any,
+                           fetch_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Execute a query through a named asyncpg cursor, yielding row batches.
+        
+        Connections come from a pool shared by every adapter on the same
+        database, so concurrent queries do not each open their own. JSON
+        queries have no SQL to open a cursor on and run through
+        ``execute_query``.
+        """
+        if isinstance(query, dict):
+            async for batch in self._stream_executed(query, fetch_size):
+                yield batch
+            return
+        if isinstance(query, str):
+            sql, args = query, []
+        elif isinstance(query, BoundQuery):
+            sql, args = to_positional(query.sql, query.params)
+        elif isinstance(query, sa.sql.Select):
+            compiled = query.compile(dialect=postgresql.dialect(),
+                                     compile_kwargs={"literal_binds": True})
+            sql, args = str(compiled), []
+        else:
+            raise QueryError(f"Unsupported query type for streaming: {type(query)}")
+            
+        size = fetch_size or self.fetch_size
+        start_time = time.time()
+        try:
+            async with self._pool().acquire() as conn:
+                # Cursors only live inside a transaction
+                async with conn.transaction(readonly=True):
+                    cursor = await conn.cursor(sql, *args)
+                    while True:
+                        rows = await cursor.fetch(size)
+                        if not rows:
+                            break
+                        self.metrics.rows_processed += len(rows)
+                        yield [dict(row) for row in rows]
+            self.metrics.query_count += 1
+        except Exception as e:
+            self.metrics.error_count += 1
+            raise QueryError(f"Query execution failed: {str(e)}")
+        finally:
+            self.metrics.total_execution_time += time.time() - start_time
+            
+    def _pool(self) -> AsyncConnectionPool:
+        """Get the asyncpg pool shared across queries to this database."""
+        # asyncpg takes a plain libpq URL, without SQLAlchemy's driver suffix
+        dsn = re.sub(r"^postgres(ql)?\+\w+://", "postgresql://", self.connection_string)
+        return shared_pool(dsn, lambda: AsyncConnectionPool(
+            connect=lambda: asyncpg.connect(dsn),
+            close=lambda conn: conn.close(),
+            check=lambda conn: conn.fetchval("SELECT 1"),
+            max_size=self.pool_size))
+            
+    def _execute_raw_sql(self, query: str,
+                         params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Execute raw SQL query."""
         with self.engine.connect() as conn:
-            result = conn.execute(text(query))
+            result = conn.execute(text(query), params or {})
             return [dict(row) for row in result]
             
     def _execute_sqlalchemy(self, query: sa.sql.Select) -> List[Dict[str, Any]]:
@@ -119,6 +188,10 @@ class PostgresAdapter(DataSourceAdapter):
                     stmt = stmt.where(
                         table.c[field].has_key(compare_value)
                     )
+                elif operator == "in":
+                    stmt = stmt.where(
+                        table.c[field].in_(compare_value)
+                    )
                 elif path:
                     # JSON path query
                     path_expr = f"$.{'.'.join(path)}"
@@ -130,6 +203,82 @@ class PostgresAdapter(DataSourceAdapter):
                 
         return self._execute_sqlalchemy(stmt)
         
+    def table_statistics(self, table_name: str) -> Dict[str, Any]:
+        """Get planner statistics for a table from pg_class."""
+        sql = """
+        SELECT c.reltuples::bigint AS rows,
+            c.relpages AS pages,
+            pg_total_relation_size(c.oid) AS bytes
+        FROM pg_class c
+        WHERE c.oid = to_regclass(:table_name)
+        """
+        with self.engine.connect() as conn:
+            row = conn.execute(text(sql), {"table_name": table_name}).fetchone()
+        return dict(row) if row else {}
+        
+    def plan_partitions(self, scan: ScanPartitioning,
+                        degree: int) -> List[ScanPartition]:
+        """Split a scan on key histogram bounds, or on ctid page ranges."""
+        if degree <= 1:
+            return [ScanPartition(0, "TRUE", {})]
+            
+        if scan.key_column:
+            bounds = self._histogram_bounds(scan.table, scan.key_column, degree)
+            if bounds:
+                return range_partitions(scan.key_column, bounds)
+                
+        # Physical page ranges; PostgreSQL 14+ reads these with TID range scans
+        pages = self.table_statistics(scan.table).get("pages") or 0
+        if pages < degree:
+            return [ScanPartition(0, "TRUE", {})]
+        step = pages // degree
+        bounds = [f"({step * i},0)" for i in range(1, degree)]
+        return range_partitions("ctid", bounds, nullable=False, cast="tid")
+        
+    def execute_partition(self, scan: ScanPartitioning, partition: ScanPartition,
+                          batch_size: int = 10000) -> Iterator[List[Dict[str, Any]]]:
+        """Stream one partition over its own pooled connection."""
+        sql = scan_partition_sql(scan, partition)
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(
+                text(sql), partition.params)
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                self.metrics.rows_processed += len(rows)
+                yield [dict(row) for row in rows]
+                
+    def _histogram_bounds(self, table_name: str, column: str,
+                          degree: int) -> List[str]:
+        """Pick equal-frequency split points from the column's histogram.
+        
+        The table is resolved through the search path like ``to_regclass``,
+        and PostgreSQL parses the bounds array so quoted values survive.
+        """
+        sql = """
+        SELECT b.bound
+        FROM (
+            SELECT s.histogram_bounds
+            FROM pg_stats s
+            JOIN pg_namespace n ON n.nspname = s.schemaname
+            JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+            WHERE c.oid = to_regclass(:table_name) AND s.attname = :column
+            ORDER BY s.inherited DESC
+            LIMIT 1
+        ) h,
+        unnest(h.histogram_bounds::text::text[]) WITH ORDINALITY AS b(bound, position)
+        ORDER BY b.position
+        """
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql), {"table_name": table_name,
+                                            "column": column}).fetchall()
+        # Values are compared as untyped literals so the column's own type applies
+        values = [row[0] for row in rows]
+        if len(values) < degree:
+            return []
+        return [values[len(values) * i // degree] for i in range(1, degree)]
+        
     def get_capabilities(self) -> Set[str]:
         """Get PostgreSQL capabilities."""
         capabilities = {
@@ -1,8 +1,10 @@
+import asyncio
 import time
-from typing import Dict, List, Any, Set, Optional
+from typing import Dict, List, Any, AsyncIterator, Set, Optional, Tuple
 import sqlalchemy as sa
 from sqlalchemy.sql import text
 from .fed_adapter_base import (
+    BoundQuery,
     DataSourceAdapter,
     DataSourceType,
     AdapterMetrics,
@@ -15,16 +17,25 @@ from .fed_adapter_base import (
 class SQLAdapter(DataSourceAdapter):
     """Adapter for SQL databases."""
     
-    def __init__(self, name: str, connection_string: str):
+    def __init__(self, name: str, connection_string: str,
+                 fetch_size: int = 10000, pool_size: int = 5,
+                 pool_recycle: int = 1800):
         super().__init__(name, DataSourceType.RELATIONAL)
         self.connection_string = connection_string
+        self.fetch_size = fetch_size
+        self.pool_size = pool_size
+        self.pool_recycle = pool_recycle
         self.engine: Optional[sa.Engine] = None
         self.metadata: Optional[sa.MetaData] = None
         
     def connect(self) -> None:
         """Establish connection to SQL database."""
         try:
-            self.engine = sa.create_engine(self.connection_string)
+            # Pooled connections are pinged on checkout and replaced if dead
+            options = {'pool_pre_ping': True, 'pool_recycle': self.pool_recycle}
+            if not self.connection_string.startswith('sqlite'):
+                options['pool_size'] = self.pool_size
+            self.engine = sa.create_engine(self.connection_string, **options)
             self.metadata = sa.MetaData()
             self.metadata.reflect(bind=self.engine)
         except Exception as e:
@@ -46,6 +57,8 @@ class SQLAdapter(DataSourceAdapter):
             # Handle different query types
             if isinstance(query, str):
                 result = self._execute_raw_sql(query)
+            elif isinstance(query, BoundQuery):
+                result = self._execute_raw_sql(query.sql, query.params)
             elif isinstance(query, sa.sql.Select):
                 result = self._execute_sqlalchemy(query)
             else:
@@ -63,10 +76,50 @@ class SQLAdapter(DataSourceAdapter):
             self.metrics.error_count += 1
             raise QueryError(f"Query execution failed: {str(e)}")
             
-    def _execute_raw_sql(self, query: str) -> List[Dict[str, Any]]:
+    async def stream_query(self, query: Any,
+                           fetch_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Execute a query through a server-side cursor, yielding row batches."""
+        if not self.engine:
+            raise ConnectionError("Not connected to database")
+            
+        size = fetch_size or self.fetch_size
+        statement, params = self._statement(query)
+        loop = asyncio.get_running_loop()
+        start_time = time.time()
+        conn = await loop.run_in_executor(None, self.engine.connect)
+        try:
+            # stream_results asks the driver for a named cursor where it has one
+            streaming = conn.execution_options(stream_results=True, max_row_buffer=size)
+            result = await loop.run_in_executor(None, streaming.execute, statement, params)
+            while True:
+                rows = await loop.run_in_executor(None, result.fetchmany, size)
+                if not rows:
+                    break
+                self.metrics.rows_processed += len(rows)
+                yield [dict(row) for row in rows]
+            self.metrics.query_count += 1
+        except Exception as e:
+            self.metrics.error_count += 1
+            raise QueryError(f"Query execution failed: {str(e)}")
+        finally:
+            self.metrics.total_execution_time += time.time() - start_time
+            await loop.run_in_executor(None, conn.close)
+            
+    def _statement(self, query: Any) -> Tuple[Any, Dict[str, Any]]:
+        """Normalize a query into an executable statement and its parameters."""
+        if isinstance(query, str):
+            return text(query), {}
+        if isinstance(query, BoundQuery):
+            return text(query.sql), query.params
+        if isinstance(query, sa.sql.Select):
+            return query, {}
+        raise QueryError(f"Unsupported query type: {type(query)}")
+            
+    def _execute_raw_sql(self, query: str,
+                         params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Execute raw SQL query."""
         with self.engine.connect() as conn:
-            result = conn.execute(text(query))
+            result = conn.execute(text(query), params or {})
             return [dict(row) for row in result]
             
     def _execute_sqlalchemy(self, query: sa.sql.Select) -> List[Dict[str, Any]]:
@@ -127,6 +127,14 @@ class TimescaleAdapter(PostgresAdapter):
             if "end_time" in query:
                 sql += f"\nAND {time_column} < '{query['end_time']}'"
                 
+        # Restrict to a batch of bind-join keys
+        params = {}
+        bind = query.get("bind_keys")
+        if bind:
+            sql += "\nAND" if "start_time" in query else "\nWHERE"
+            sql += f" {bind['column']} = ANY(:bind_keys)"
+            params["bind_keys"] = list(bind["values"])
+            
         # Add grouping
         group_items = ["bucket"]
         if group_by:
@@ -136,7 +144,14 @@ class TimescaleAdapter(PostgresAdapter):
         # Add ordering
         sql += "\nORDER BY bucket"
         
-        return self._execute_raw_sql(sql)
+        return self._execute_raw_sql(sql, params)
+        
+    def bind_join_keys(self, query: Any, column: str, keys: List[Any],
+                       style: str = "in") -> Any:
+        """Bind join keys into time series queries as an array parameter."""
+        if isinstance(query, dict) and query.get("type") == "time_series":
+            return dict(query, bind_keys={"column": column, "values": list(keys)})
+        return super().bind_join_keys(query, column, keys, style)
         
     def get_capabilities(self) -> Set[str]:
         """Get TimescaleDB capabilities."""
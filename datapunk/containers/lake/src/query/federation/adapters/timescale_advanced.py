@@ -1,6 +1,9 @@
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime, timedelta
+from sqlalchemy.sql import text
 from .timescale import TimescaleAdapter
+from .fed_adapter_base import range_partitions, split_weighted
+from ..fed_planner import ScanPartition, ScanPartitioning
 
 class AdvancedTimescaleAdapter(TimescaleAdapter):
     """Advanced TimescaleDB adapter with specialized operations."""
@@ -148,6 +151,35 @@ class AdvancedTimescaleAdapter(TimescaleAdapter):
         with self.engine.connect() as conn:
             return [dict(row) for row in conn.execute(text(sql))]
             
+    def plan_partitions(self, scan: ScanPartitioning,
+                        degree: int) -> List[ScanPartition]:
+        """Split a hypertable scan on chunk boundaries, balanced by chunk size."""
+        if degree <= 1:
+            return [ScanPartition(0, "TRUE", {})]
+            
+        sql = """
+        SELECT d.column_name, c.range_start, c.range_end,
+            pg_total_relation_size(
+                format('%I.%I', c.chunk_schema, c.chunk_name)
+            ) as bytes
+        FROM timescaledb_information.chunks c
+        JOIN timescaledb_information.dimensions d
+            ON d.hypertable_schema = c.hypertable_schema
+            AND d.hypertable_name = c.hypertable_name
+            AND d.dimension_number = 1
+        WHERE c.hypertable_name = :table_name
+        ORDER BY c.range_start
+        """
+        with self.engine.connect() as conn:
+            chunks = conn.execute(text(sql), {"table_name": scan.table}).fetchall()
+        if len(chunks) < 2:
+            return super().plan_partitions(scan, degree)
+            
+        # Split where a run of chunks starts; outer ranges stay open-ended
+        runs = split_weighted([float(chunk[3] or 1) for chunk in chunks], degree)
+        bounds = [chunks[start][1] for start, _ in runs[1:]]
+        return range_partitions(chunks[0][0], bounds, nullable=False)
+        
     def get_retention_stats(self, table_name: str) -> Dict[str, Any]:
         """Get statistics about data retention."""
         sql = f"""
@@ -1,15 +1,32 @@
-from typing import Any, Dict, List, Set
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 from .query_fed_core import DataSourceAdapter, QueryPlan
+from .fed_planner import ScanPartition, ScanPartitioning
+from .adapters.connection_pool import AsyncConnectionPool, shared_pool
+from .adapters.fed_adapter_base import range_partitions, scan_partition_sql
+import asyncio
+import copy
+import itertools
 import sqlite3
+import threading
 import pymongo
 import pandas as pd
+import pyarrow as pa
+
+def _rows_to_table(rows: Sequence[tuple], names: List[str]) -> pa.Table:
+    """Build an Arrow table from a batch of cursor rows."""
+    columns = list(zip(*rows))
+    return pa.table([pa.array(column) for column in columns], names=names)
 
 class SQLiteAdapter(DataSourceAdapter):
     """Adapter for SQLite databases."""
     
-    def __init__(self, database_path: str):
+    def __init__(self, database_path: str, fetch_size: int = 10000,
+                 pool_size: int = 4):
         self.database_path = database_path
-        self.connection = sqlite3.connect(database_path)
+        self.fetch_size = fetch_size
+        self.pool_size = pool_size
+        # Streamed batches are fetched from executor threads
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
         
     def get_capabilities(self) -> Set[str]:
         """Get SQLite capabilities."""
@@ -35,12 +52,143 @@ class SQLiteAdapter(DataSourceAdapter):
         """Translate query plan to SQL."""
         return self._plan_to_sql(plan)
         
+    def apply_runtime_filters(self, plan: QueryPlan, filters: List[Any]) -> QueryPlan:
+        """Return a copy of the plan with runtime filters in its WHERE clause."""
+        predicates = [p for p in (f.to_sql() for f in filters) if p]
+        if not predicates:
+            return plan
+        filtered = copy.deepcopy(plan)
+        existing = getattr(filtered.root, 'condition', '')
+        if existing:
+            predicates.insert(0, f"({existing})")
+        filtered.root.condition = ' AND '.join(predicates)
+        return filtered
+        
     def execute_plan(self, plan: QueryPlan) -> List[Dict[str, Any]]:
         """Execute SQL query."""
         sql = self.translate_plan(plan)
         df = pd.read_sql_query(sql, self.connection)
         return df.to_dict('records')
         
+    def execute_plan_arrow(self, plan: QueryPlan, batch_size: int = 65536) -> pa.Table:
+        """Execute SQL query, building Arrow columns straight from cursor rows."""
+        cursor = self.connection.cursor()
+        cursor.execute(self.translate_plan(plan))
+        names = [column[0] for column in cursor.description]
+        
+        batches = []
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            batches.append(pa.RecordBatch.from_arrays(
+                [pa.array(column) for column in columns], names=names))
+            
+        if not batches:
+            return pa.table({name: pa.array([], type=pa.null()) for name in names})
+        # Sources can infer different types per batch (e.g. all-null batches)
+        return pa.concat_tables([pa.Table.from_batches([b]) for b in batches],
+                                promote_options='default')
+        
+    def table_statistics(self, table_name: str) -> Dict[str, Any]:
+        """Estimate table size from its rowid range."""
+        connection = self._worker_connection()
+        try:
+            row = connection.execute(
+                f"SELECT MIN(rowid), MAX(rowid) FROM {table_name}").fetchone()
+        finally:
+            if connection is not self.connection:
+                connection.close()
+        if row[0] is None:
+            return {'rows': 0, 'min_rowid': None, 'max_rowid': None}
+        return {'rows': row[1] - row[0] + 1, 'min_rowid': row[0], 'max_rowid': row[1]}
+        
+    def plan_partitions(self, scan: ScanPartitioning,
+                        degree: int) -> List[ScanPartition]:
+        """Split a scan into rowid ranges."""
+        # Ranges of an in-memory database would share one connection
+        if degree <= 1 or self.database_path == ':memory:':
+            return [ScanPartition(0, "1 = 1", {})]
+            
+        stats = self.table_statistics(scan.table)
+        if not stats['rows'] or stats['rows'] < degree:
+            return [ScanPartition(0, "1 = 1", {})]
+        step = stats['rows'] // degree
+        bounds = [stats['min_rowid'] + step * i for i in range(1, degree)]
+        return range_partitions('rowid', bounds, nullable=False)
+        
+    def execute_partition(self, scan: ScanPartitioning, partition: ScanPartition,
+                          batch_size: int = 65536) -> Iterator[pa.Table]:
+        """Read one partition as Arrow batches."""
+        sql = scan_partition_sql(scan, partition)
+        connection = self._worker_connection()
+        try:
+            cursor = connection.execute(sql, partition.params)
+            names = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield _rows_to_table(rows, names)
+        finally:
+            if connection is not self.connection:
+                connection.close()
+                
+    async def stream_query(self, plan: QueryPlan,
+                           fetch_size: Optional[int] = None) -> AsyncIterator[pa.Table]:
+        """Execute a plan with stepwise fetches, yielding Arrow batches."""
+        sql = self.translate_plan(plan)
+        size = fetch_size or self.fetch_size
+        # An in-memory database exists only on the adapter's own connection
+        if self.database_path == ':memory:':
+            async for batch in self._fetch_stepwise(self.connection, sql, size):
+                yield batch
+            return
+        async with self._pool().acquire() as connection:
+            async for batch in self._fetch_stepwise(connection, sql, size):
+                yield batch
+                
+    async def _fetch_stepwise(self, connection: sqlite3.Connection, sql: str,
+                              size: int) -> AsyncIterator[pa.Table]:
+        """Step a cursor ``size`` rows at a time off the event loop."""
+        loop = asyncio.get_running_loop()
+        cursor = await loop.run_in_executor(None, connection.execute, sql)
+        try:
+            names = [column[0] for column in cursor.description]
+            while True:
+                rows = await loop.run_in_executor(None, cursor.fetchmany, size)
+                if not rows:
+                    break
+                yield _rows_to_table(rows, names)
+        finally:
+            cursor.close()
+            
+    def _pool(self) -> AsyncConnectionPool:
+        """Get the connection pool shared across queries to this file."""
+        loop = asyncio.get_running_loop()
+        
+        async def connect() -> sqlite3.Connection:
+            return await loop.run_in_executor(
+                None, lambda: sqlite3.connect(self.database_path, check_same_thread=False))
+                
+        async def close(connection: sqlite3.Connection) -> None:
+            connection.close()
+            
+        async def check(connection: sqlite3.Connection) -> None:
+            connection.execute("SELECT 1").fetchone()
+            
+        return shared_pool(f"sqlite:{self.database_path}", lambda: AsyncConnectionPool(
+            connect, close, check, max_size=self.pool_size))
+                
+    def _worker_connection(self) -> sqlite3.Connection:
+        """Open a connection usable from a worker thread."""
+        # An in-memory database exists only on the adapter's own connection
+        if self.database_path == ':memory:':
+            return self.connection
+        # Batches of one partition may be pulled from different pool threads
+        return sqlite3.connect(self.database_path, check_same_thread=False)
+        
     def _plan_to_sql(self, plan: QueryPlan) -> str:
         """Convert query plan to SQL string."""
         # Basic implementation - could be enhanced
@@ -71,12 +219,31 @@ class SQLiteAdapter(DataSourceAdapter):
         extract(plan.root)
         return tables
 
+_mongo_clients: Dict[Tuple[str, int], pymongo.MongoClient] = {}
+_mongo_clients_lock = threading.Lock()
+
+def _shared_mongo_client(connection_string: str, max_pool_size: int) -> pymongo.MongoClient:
+    """Get the client for a deployment, shared by every adapter using it.
+    
+    A client owns a connection pool and monitors server health itself,
+    so one per deployment lets queries share checked connections.
+    """
+    key = (connection_string, max_pool_size)
+    with _mongo_clients_lock:
+        client = _mongo_clients.get(key)
+        if client is None:
+            client = _mongo_clients[key] = pymongo.MongoClient(
+                connection_string, maxPoolSize=max_pool_size)
+        return client
+
 class MongoDBAdapter(DataSourceAdapter):
     """Adapter for MongoDB databases."""
     
-    def __init__(self, connection_string: str, database: str):
-        self.client = pymongo.MongoClient(connection_string)
+    def __init__(self, connection_string: str, database: str,
+                 fetch_size: int = 1000, max_pool_size: int = 50):
+        self.client = _shared_mongo_client(connection_string, max_pool_size)
         self.db = self.client[database]
+        self.fetch_size = fetch_size
         
     def get_capabilities(self) -> Set[str]:
         """Get MongoDB capabilities."""
@@ -100,12 +267,52 @@ class MongoDBAdapter(DataSourceAdapter):
         """Translate query plan to MongoDB pipeline."""
         return self._plan_to_pipeline(plan)
         
+    def apply_runtime_filters(self, plan: QueryPlan, filters: List[Any]) -> QueryPlan:
+        """Return a copy of the plan with runtime filters merged into $match."""
+        matches = [m for m in (f.to_mongo() for f in filters) if m]
+        if not matches:
+            return plan
+        filtered = copy.deepcopy(plan)
+        existing = getattr(filtered.root, 'filter', None)
+        if existing:
+            matches.insert(0, existing)
+        filtered.root.filter = matches[0] if len(matches) == 1 else {'$and': matches}
+        return filtered
+        
+    def bind_join_keys(self, plan: QueryPlan, field: str, keys: List[Any],
+                       style: str = 'in') -> QueryPlan:
+        """Restrict a copy of the plan to one batch of bind-join keys via $in."""
+        bound = copy.deepcopy(plan)
+        match = {field: {'$in': list(keys)}}
+        existing = getattr(bound.root, 'filter', None)
+        bound.root.filter = {'$and': [existing, match]} if existing else match
+        return bound
+        
     def execute_plan(self, plan: QueryPlan) -> List[Dict[str, Any]]:
         """Execute MongoDB query."""
         pipeline = self.translate_plan(plan)
         collection = self._extract_collections(plan)[0]
         return list(self.db[collection].aggregate(pipeline))
         
+    async def stream_query(self, plan: QueryPlan,
+                           fetch_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Execute a plan on a batch cursor, yielding one server batch at a time."""
+        pipeline = self.translate_plan(plan)
+        collection = self.db[self._extract_collections(plan)[0]]
+        size = fetch_size or self.fetch_size
+        loop = asyncio.get_running_loop()
+        cursor = await loop.run_in_executor(
+            None, lambda: collection.aggregate(pipeline, batchSize=size))
+        try:
+            while True:
+                batch = await loop.run_in_executor(
+                    None, lambda: list(itertools.islice(cursor, size)))
+                if not batch:
+                    break
+                yield batch
+        finally:
+            cursor.close()
+            
     def _plan_to_pipeline(self, plan: QueryPlan) -> List[Dict[str, Any]]:
         """Convert query plan to MongoDB pipeline."""
         pipeline = []
@@ -166,12 +373,29 @@ class PandasAdapter(DataSourceAdapter):
         """Translate query plan to Pandas operations."""
         return self._plan_to_ops(plan)
         
+    def apply_runtime_filters(self, plan: QueryPlan, filters: List[Any]) -> QueryPlan:
+        """Return a copy of the plan with runtime filters in its query condition."""
+        expressions = [e for e in (f.to_pandas_query() for f in filters) if e]
+        if not expressions:
+            return plan
+        filtered = copy.deepcopy(plan)
+        existing = getattr(filtered.root, 'condition', '')
+        if existing:
+            expressions.insert(0, f"({existing})")
+        filtered.root.condition = ' and '.join(expressions)
+        return filtered
+        
     def execute_plan(self, plan: QueryPlan) -> pd.DataFrame:
         """Execute Pandas operations."""
         ops = self.translate_plan(plan)
         result = self._execute_ops(ops)
         return result.to_dict('records')
         
+    def execute_plan_arrow(self, plan: QueryPlan) -> pa.Table:
+        """Execute Pandas operations and hand back the frame as Arrow."""
+        ops = self.translate_plan(plan)
+        return pa.Table.from_pandas(self._execute_ops(ops), preserve_index=False)
+        
     def _plan_to_ops(self, plan: QueryPlan) -> Dict[str, Any]:
         """Convert query plan to Pandas operations."""
         ops = {'type': plan.root.operation}
@@ -294,14 +294,21 @@ class BatchAdapter(EnhancedAdapter):
         pass
 
 class CachingAdapter(EnhancedAdapter):
-    """Adapter with query result caching."""
+    """Adapter with query result caching.
+    
+    A ``cache_strategy`` from query_fed_cache_strategies decides what is
+    cached and is told about every removal, so semantic strategies drop
+    evicted queries from their similarity index.
+    """
     
     def __init__(self,
                  name: str,
                  capabilities: AdapterCapabilities,
-                 cache_size_mb: int = 1024):
+                 cache_size_mb: int = 1024,
+                 cache_strategy: Optional[Any] = None):
         super().__init__(name, capabilities)
         self.cache_size_bytes = cache_size_mb * 1024 * 1024
+        self.cache_strategy = cache_strategy
         self._cache: Dict[str, Any] = {}
         self._cache_metadata: Dict[str, Dict[str, Any]] = {}
     
@@ -320,8 +327,13 @@ class CachingAdapter(EnhancedAdapter):
         result = await super().execute_query(query, timeout_ms)
         
         # Cache result if appropriate
-        if self._should_cache(query, result):
-            self._add_to_cache(cache_key, result)
+        if self.cache_strategy is not None:
+            should_cache = await self.cache_strategy.should_cache(
+                query, {'estimated_size': self._estimate_size(result)})
+        else:
+            should_cache = self._should_cache(query, result)
+        if should_cache:
+            self._add_to_cache(cache_key, result, query)
         
         return result
     
@@ -340,7 +352,8 @@ class CachingAdapter(EnhancedAdapter):
                 self._remove_from_cache(key)
         return None
     
-    def _add_to_cache(self, key: str, value: Any) -> None:
+    def _add_to_cache(self, key: str, value: Any,
+                      query: Optional[QueryPlan] = None) -> None:
         """Add result to cache."""
         # Check cache size
         while self._get_cache_size() + self._estimate_size(value) > self.cache_size_bytes:
@@ -350,14 +363,17 @@ class CachingAdapter(EnhancedAdapter):
         self._cache_metadata[key] = {
             'added_time': datetime.utcnow(),
             'size_bytes': self._estimate_size(value),
-            'access_count': 0
+            'access_count': 0,
+            'query': query
         }
     
     def _remove_from_cache(self, key: str) -> None:
         """Remove item from cache."""
         if key in self._cache:
             del self._cache[key]
-            del self._cache_metadata[key]
+            metadata = self._cache_metadata.pop(key)
+            if self.cache_strategy is not None and metadata.get('query') is not None:
+                self.cache_strategy.on_evict(metadata['query'])
     
     def _should_cache(self, query: QueryPlan, result: Any) -> bool:
         """Determine if result should be cached."""
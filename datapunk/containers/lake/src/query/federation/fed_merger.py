@@ -3,6 +3,8 @@ from dataclasses import dataclass
 from enum import Enum
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from .fed_planner import DataSourceType
 from .query_fed_executor import QueryResult
 from datetime import datetime
@@ -30,8 +32,22 @@ class MergeConfig:
     sort_columns: Optional[List[str]] = None
     dedup_columns: Optional[List[str]] = None
 
+# Arrow join types for key-based merge strategies
+ARROW_JOIN_TYPES = {
+    MergeStrategy.INTERSECTION: "inner",
+    MergeStrategy.LEFT_JOIN: "left outer",
+    MergeStrategy.RIGHT_JOIN: "right outer",
+    MergeStrategy.OUTER_JOIN: "full outer"
+}
+
 class ResultMerger:
-    """Handles merging of query results from different sources."""
+    """Handles merging of query results from different sources.
+    
+    Results are merged as Arrow tables: concatenation, joins, sorting and
+    deduplication run in Arrow compute, and rows are only materialized as
+    dicts when a caller asks for them. Time series results, which need
+    pandas resampling, keep the DataFrame path.
+    """
     
     def __init__(self):
         self._type_handlers = {
@@ -48,6 +64,9 @@ class ResultMerger:
         if not results:
             return []
             
+        if all(r.source.type != DataSourceType.TIME_SERIES for r in results):
+            return self.merge_arrow(results, config).to_pylist()
+            
         # Group results by source type
         by_type = self._group_by_type(results)
         
@@ -62,6 +81,91 @@ class ResultMerger:
         # Final merge across types
         return self._merge_dataframes(intermediate_results, config)
         
+    def merge_arrow(self, results: List[QueryResult],
+                    config: MergeConfig) -> pa.Table:
+        """Merge query results into a single Arrow table.
+        
+        As in the DataFrame path, key-based strategies join relational
+        results only; other source types are concatenated per type and the
+        per-type results are concatenated last.
+        """
+        by_type = self._group_by_type(results)
+        merged = []
+        for source_type, type_results in by_type.items():
+            tables = [self._result_to_arrow(r) for r in type_results]
+            tables = [t for t in tables if t.num_columns]
+            if not tables:
+                continue
+            join_type = ARROW_JOIN_TYPES.get(config.strategy)
+            if source_type == DataSourceType.RELATIONAL and join_type and config.key_columns:
+                merged.append(self._join_arrow(tables, config.key_columns, join_type))
+            else:
+                merged.append(self._concat_arrow(tables))
+        if not merged:
+            return pa.table({})
+        result = self._concat_arrow(merged)
+            
+        # Apply filters
+        if config.filters:
+            for column, filter_func in config.filters.items():
+                if column in result.column_names:
+                    mask = pa.array([bool(filter_func(v))
+                                     for v in result.column(column).to_pylist()])
+                    result = result.filter(mask)
+                    
+        # Sort if requested
+        if config.sort_columns:
+            result = result.sort_by([(c, "ascending") for c in config.sort_columns])
+            
+        # Remove duplicates if requested
+        if config.dedup_columns:
+            result = self._drop_duplicates(result, config.dedup_columns)
+            
+        return result
+        
+    def _result_to_arrow(self, result: QueryResult) -> pa.Table:
+        """Convert one source result to Arrow, reshaping non-tabular sources."""
+        source_type = result.source.type
+        if source_type == DataSourceType.DOCUMENT:
+            rows = self._flatten_documents(result.data)
+            # Nested arrays and objects are rendered as strings, as in the frame path
+            for row in rows:
+                for key, value in row.items():
+                    if isinstance(value, (list, dict)):
+                        row[key] = str(value)
+            return pa.Table.from_pylist(rows)
+        elif source_type == DataSourceType.GRAPH:
+            return pa.Table.from_pylist(self._graph_to_tabular(result.data))
+        elif source_type == DataSourceType.OBJECT_STORE:
+            return pa.Table.from_pylist(self._combine_object_metadata(result.data))
+        return result.to_arrow()
+        
+    def _join_arrow(self, tables: List[pa.Table], keys: List[str],
+                    join_type: str) -> pa.Table:
+        """Join tables on key columns, suffixing clashing columns like pandas."""
+        result = tables[0]
+        for table in tables[1:]:
+            result, table = _common_types([result, table], keys)
+            result = result.join(table, keys=keys, join_type=join_type,
+                                 left_suffix="_x", right_suffix="_y",
+                                 coalesce_keys=True, use_threads=True)
+        return result
+        
+    def _concat_arrow(self, tables: List[pa.Table]) -> pa.Table:
+        """Concatenate tables; missing columns become nulls."""
+        if len(tables) == 1:
+            return tables[0]
+        names = list(dict.fromkeys(name for t in tables for name in t.column_names))
+        return pa.concat_tables(_common_types(tables, names),
+                                promote_options="permissive")
+        
+    def _drop_duplicates(self, table: pa.Table, columns: List[str]) -> pa.Table:
+        """Keep the first row for each distinct key, preserving order."""
+        indexed = table.append_column("__row", pa.array(np.arange(table.num_rows)))
+        firsts = indexed.group_by(columns, use_threads=False).aggregate(
+            [("__row", "min")]).column("__row_min")
+        return table.take(pc.take(firsts, pc.sort_indices(firsts)))
+        
     def _group_by_type(self, 
                       results: List[QueryResult]) -> Dict[DataSourceType, List[QueryResult]]:
         """Group results by source type."""
@@ -251,8 +355,44 @@ class ResultMerger:
         # Convert to list of dictionaries
         return result.to_dict("records")
 
+def _common_types(tables: List[pa.Table], columns: List[str]) -> List[pa.Table]:
+    """Cast each shared column to one type across tables.
+    
+    Compatible types are widened (int64 and double become double); types
+    with no common Arrow type (int and string) are compared as strings.
+    """
+    tables = list(tables)
+    for name in columns:
+        types = {t.schema.field(name).type for t in tables if name in t.column_names}
+        if len(types) <= 1:
+            continue
+        try:
+            target = pa.unify_schemas([pa.schema([(name, t)]) for t in types],
+                                      promote_options="permissive").field(name).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            target = pa.string()
+        for i, table in enumerate(tables):
+            if name not in table.column_names:
+                continue
+            index = table.schema.get_field_index(name)
+            tables[i] = table.set_column(index, pa.field(name, target),
+                                         _cast_column(table.column(index), target))
+    return tables
+
+def _cast_column(column: pa.ChunkedArray, target: pa.DataType) -> pa.ChunkedArray:
+    if column.type == target:
+        return column
+    try:
+        return column.cast(target)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        if target != pa.string():
+            raise
+        # Nested values have no Arrow cast to string; render them as pandas would
+        return pa.chunked_array([pa.array(
+            [None if v is None else str(v) for v in column.to_pylist()], pa.string())])
+
 @dataclass
-class MergeStrategy:
+class MergeOperation:
     """Strategy for merging query results."""
     operation: str  # 'union', 'join', 'aggregate', etc.
     parameters: Dict[str, Any]
@@ -310,11 +450,11 @@ class QueryMerger:
     def _determine_merge_strategy(self,
                                 subqueries: List[SubQuery],
                                 original_plan: QueryPlan,
-                                dfs: List[pd.DataFrame]) -> MergeStrategy:
+                                dfs: List[pd.DataFrame]) -> MergeOperation:
         """Determine how to merge the results."""
         # Check for joins in original plan
         if self._has_joins(original_plan):
-            return MergeStrategy(
+            return MergeOperation(
                 operation='join',
                 parameters=self._extract_join_params(original_plan),
                 estimated_memory=self._estimate_join_memory(dfs),
@@ -323,7 +463,7 @@ class QueryMerger:
         
         # Check for aggregations
         elif self._has_aggregates(original_plan):
-            return MergeStrategy(
+            return MergeOperation(
                 operation='aggregate',
                 parameters=self._extract_aggregate_params(original_plan),
                 estimated_memory=self._estimate_aggregate_memory(dfs),
@@ -332,7 +472,7 @@ class QueryMerger:
         
         # Default to union
         else:
-            return MergeStrategy(
+            return MergeOperation(
                 operation='union',
                 parameters={},
                 estimated_memory=sum(df.memory_usage(deep=True).sum() for df in dfs),
@@ -340,7 +480,7 @@ class QueryMerger:
             )
     
     def _check_memory_requirements(self,
-                                 strategy: MergeStrategy,
+                                 strategy: MergeOperation,
                                  dfs: List[pd.DataFrame]) -> None:
         """Check if merge operation fits in memory."""
         if strategy.estimated_memory > self.max_memory_bytes:
@@ -359,7 +499,7 @@ class QueryMerger:
     
     async def _merge_union(self,
                           dfs: List[pd.DataFrame],
-                          strategy: MergeStrategy) -> pd.DataFrame:
+                          strategy: MergeOperation) -> pd.DataFrame:
         """Merge results using union operation."""
         try:
             # Ensure consistent column names
@@ -398,7 +538,7 @@ class QueryMerger:
     
     async def _merge_join(self,
                          dfs: List[pd.DataFrame],
-                         strategy: MergeStrategy) -> pd.DataFrame:
+                         strategy: MergeOperation) -> pd.DataFrame:
         """Merge results using join operation."""
         try:
             join_keys = strategy.parameters.get('keys', [])
@@ -454,7 +594,7 @@ class QueryMerger:
     
     async def _merge_aggregate(self,
                              dfs: List[pd.DataFrame],
-                             strategy: MergeStrategy) -> pd.DataFrame:
+                             strategy: MergeOperation) -> pd.DataFrame:
         """Merge results using aggregation."""
         try:
             group_by = strategy.parameters.get('group_by', [])
@@ -556,7 +696,7 @@ class QueryMerger:
     
     def _optimize_join_memory(self,
                             dfs: List[pd.DataFrame],
-                            strategy: MergeStrategy) -> None:
+                            strategy: MergeOperation) -> None:
         """Optimize memory usage for join operation."""
         # Convert object columns to categories where beneficial
         for df in dfs:
@@ -569,7 +709,7 @@ class QueryMerger:
     
     def _optimize_aggregate_memory(self,
                                  dfs: List[pd.DataFrame],
-                                 strategy: MergeStrategy) -> None:
+                                 strategy: MergeOperation) -> None:
         """Optimize memory usage for aggregation."""
         # Convert numeric columns to smaller types where possible
         for df in dfs:
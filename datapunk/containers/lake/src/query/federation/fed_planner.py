@@ -1,8 +1,13 @@
-from typing import Dict, List, Optional, Set, Tuple, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
 from ..parser.query_parser_core import QueryNode, QueryType
 from ..optimizer.index_aware import IndexAwareOptimizer
+from .query_fed_core import FederatedQueryOptimizer, JoinStrategyCost
+from .querry_fed_profiling import describe_query
+
+if TYPE_CHECKING:
+    from .query_fed_views import MaterializedViewManager
 
 class DataSourceType(Enum):
     """Types of data sources supported by federation."""
@@ -11,6 +16,7 @@ class DataSourceType(Enum):
     GRAPH = "graph"
     OBJECT_STORE = "object_store"
     TIME_SERIES = "time_series"
+    VECTOR = "vector"
 
 @dataclass
 class DataSource:
@@ -21,6 +27,36 @@ class DataSource:
     cost_factors: Dict[str, float]  # Operation costs
     statistics: Dict[str, Any]  # Source statistics
 
+@dataclass
+class BindJoinSpec:
+    """Runs a sub-query once per batch of join keys from another sub-query."""
+    outer_source: str  # Source whose results supply the keys
+    outer_key: str
+    inner_key: str
+    style: str = "in"  # 'in' for IN-lists, 'values' for a VALUES join
+    batch_size: int = 256  # Initial keys per batch, adapted at runtime
+    min_batch_size: int = 16
+    max_batch_size: int = 4096
+    max_in_flight: int = 4
+    target_batch_seconds: float = 0.25
+
+@dataclass
+class ScanPartitioning:
+    """Marks a sub-query as a single-table scan that may be read in ranges."""
+    table: str
+    columns: Optional[List[str]] = None  # None reads every column
+    where: Optional[str] = None
+    key_column: Optional[str] = None  # None splits on physical row ranges
+    max_degree: int = 8
+    min_rows_per_partition: int = 1_000_000
+
+@dataclass
+class ScanPartition:
+    """One range of a partitioned scan, as a predicate with bind parameters."""
+    index: int
+    predicate: str
+    params: Dict[str, Any]
+
 @dataclass
 class SubQuery:
     """Represents a portion of query to be executed on a data source."""
@@ -29,13 +65,18 @@ class SubQuery:
     estimated_cost: float
     dependencies: List['SubQuery']
     result_size: int
+    bind_join: Optional[BindJoinSpec] = None
+    partitioning: Optional[ScanPartitioning] = None
 
 class DistributedQueryPlanner:
     """Plans and optimizes federated query execution."""
     
-    def __init__(self):
+    def __init__(self, optimizer: Optional[FederatedQueryOptimizer] = None,
+                 views: Optional["MaterializedViewManager"] = None):
         self.data_sources: Dict[str, DataSource] = {}
         self.optimizers: Dict[str, IndexAwareOptimizer] = {}
+        self.federation_optimizer = optimizer or FederatedQueryOptimizer()
+        self.views = views
         
     def register_data_source(self, source: DataSource,
                            optimizer: Optional[IndexAwareOptimizer] = None) -> None:
@@ -44,8 +85,20 @@ class DistributedQueryPlanner:
         if optimizer:
             self.optimizers[source.name] = optimizer
             
-    def plan_query(self, query: QueryNode) -> List[SubQuery]:
-        """Create an optimized distributed query plan."""
+    def plan_query(self, query: QueryNode,
+                   max_staleness: Optional[float] = None) -> List[SubQuery]:
+        """Create an optimized distributed query plan.
+        
+        With a staleness bound in seconds, a query matching a materialized
+        view refreshed within the bound is read from the view instead.
+        """
+        if self.views and max_staleness is not None:
+            view = self.views.match(query, max_staleness)
+            if view:
+                return [SubQuery(source=self.views.source, query=view.name,
+                                 estimated_cost=0.0, dependencies=[],
+                                 result_size=view.table.num_rows)]
+                
         # Analyze query requirements
         required_capabilities = self._analyze_requirements(query)
         
@@ -61,6 +114,32 @@ class DistributedQueryPlanner:
         # Create execution plan
         return self._create_execution_plan(optimized_queries)
         
+    def plan_join(self, outer: SubQuery, inner: SubQuery,
+                  outer_key: str, inner_key: str,
+                  spec: Optional[BindJoinSpec] = None) -> JoinStrategyCost:
+        """Choose how to join two sub-queries on different sources.
+        
+        When a bind join is cheaper, the inner sub-query is made to depend
+        on the outer one and is run per batch of outer keys instead of
+        being pulled whole.
+        """
+        spec = spec or BindJoinSpec(outer.source.name, outer_key, inner_key)
+        choice = self.federation_optimizer.choose_join_strategy(
+            inner.source.name,
+            outer_keys=outer.result_size,
+            inner_rows=inner.result_size or None,
+            inner_distinct_keys=inner.source.statistics.get("distinct_keys", {}).get(inner_key),
+            batch_size=spec.batch_size,
+            max_in_flight=spec.max_in_flight
+        )
+        
+        if choice.strategy == "bind":
+            inner.bind_join = spec
+            if not any(dep is outer for dep in inner.dependencies):
+                inner.dependencies.append(outer)
+            inner.estimated_cost = choice.bind_cost_ms
+        return choice
+        
     def _analyze_requirements(self, query: QueryNode) -> Set[str]:
         """Analyze query to determine required capabilities."""
         requirements = set()
@@ -182,9 +261,51 @@ class DistributedQueryPlanner:
         # a new query node with only the relevant parts
         return query
         
+    def explain(self, sub_queries: List[SubQuery]) -> List[Dict[str, Any]]:
+        """Describe a plan with the cost parameters behind its estimates."""
+        explanation = []
+        for sub_query in sub_queries:
+            operation, shape = describe_query(sub_query.query)
+            entry = {
+                "source": sub_query.source.name,
+                "operation": operation,
+                "predicate_shape": shape,
+                "estimated_cost": sub_query.estimated_cost,
+                "result_size": sub_query.result_size,
+                "depends_on": [dep.source.name for dep in sub_query.dependencies],
+                "cost_model": self.federation_optimizer.describe_calibration(
+                    sub_query.source.name) or "static"
+            }
+            if sub_query.bind_join:
+                entry["bind_join"] = {
+                    "outer_source": sub_query.bind_join.outer_source,
+                    "outer_key": sub_query.bind_join.outer_key,
+                    "inner_key": sub_query.bind_join.inner_key,
+                    "style": sub_query.bind_join.style
+                }
+            if sub_query.partitioning:
+                entry["partitioning"] = {
+                    "table": sub_query.partitioning.table,
+                    "key_column": sub_query.partitioning.key_column or "physical",
+                    "max_degree": sub_query.partitioning.max_degree
+                }
+            explanation.append(entry)
+        return explanation
+        
     def _estimate_cost(self, sub_query: SubQuery) -> float:
         """Estimate cost of executing a sub-query."""
         source = sub_query.source
+        
+        # Prefer parameters fitted from observed executions
+        calibrator = self.federation_optimizer.calibrator
+        if calibrator:
+            operation, shape = describe_query(sub_query.query)
+            predicted = calibrator.predict_ms(source.name, operation,
+                                              sub_query.result_size,
+                                              predicate_shape=shape)
+            if predicted is not None:
+                return predicted
+                
         cost = 0.0
         
         # Factor in operation costs
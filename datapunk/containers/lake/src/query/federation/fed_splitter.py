@@ -1,7 +1,9 @@
 from typing import Dict, List, Optional, Any, Set, Tuple
 from dataclasses import dataclass
 from ..parser.query_parser_core import QueryPlan, QueryNode
-from .query_fed_core import DataSourceStats
+from .query_fed_core import DataSourceStats, FederatedQueryOptimizer
+from .fed_planner import BindJoinSpec, ScanPartitioning
+from .querry_fed_profiling import describe_query
 
 @dataclass
 class SubQuery:
@@ -12,13 +14,16 @@ class SubQuery:
     estimated_cost: float
     estimated_rows: int
     push_down_operations: List[str]
+    bind_join: Optional[BindJoinSpec] = None
+    partitioning: Optional[ScanPartitioning] = None
 
 class QuerySplitter:
     """Splits complex queries into subqueries for federated execution."""
     
-    def __init__(self):
+    def __init__(self, optimizer: Optional[FederatedQueryOptimizer] = None):
         self.source_capabilities: Dict[str, Set[str]] = {}
         self.source_stats: Dict[str, DataSourceStats] = {}
+        self.optimizer = optimizer or FederatedQueryOptimizer()
     
     def update_source_info(self,
                           source_id: str,
@@ -27,6 +32,7 @@ class QuerySplitter:
         """Update information about a data source."""
         self.source_capabilities[source_id] = capabilities
         self.source_stats[source_id] = stats
+        self.optimizer.add_source_stats(source_id, stats)
     
     def split_query(self, query: QueryPlan) -> List[SubQuery]:
         """Split a query plan into subqueries for different sources."""
@@ -39,6 +45,15 @@ class QuerySplitter:
         # Split based on table locations and operations
         subqueries = self._create_subqueries(query, dependencies, pushdown_ops)
         
+        # Use observed costs where the sources have been calibrated
+        subqueries = self._apply_calibrated_costs(subqueries)
+        
+        # Turn cross-source joins into bind joins where cheaper
+        subqueries = self._plan_bind_joins(query, subqueries)
+        
+        # Read large single-table scans as parallel ranges
+        subqueries = self._plan_partitioned_scans(subqueries)
+        
         # Optimize splits
         optimized = self._optimize_splits(subqueries)
         
@@ -91,8 +106,13 @@ class QuerySplitter:
                 if source_id:
                     capabilities = self.source_capabilities.get(source_id, set())
                     
-                    # Check if operation can be pushed down
-                    if node.operation_type.lower() in capabilities:
+                    # Check if operation can be pushed down, and has not
+                    # been failing at this source. Failures are recorded
+                    # under the key describe_query gives the sub-query.
+                    operation = node.operation_type.lower()
+                    recorded, _ = describe_query(node)
+                    if operation in capabilities and \
+                       self.optimizer.should_push_down(source_id, recorded):
                         if source_id in pushdown_ops:
                             pushdown_ops[source_id].append(node.operation_type)
                         else:
@@ -147,6 +167,108 @@ class QuerySplitter:
         split_node(query.root)
         return subqueries
     
+    def _apply_calibrated_costs(self, subqueries: List[SubQuery]) -> List[SubQuery]:
+        """Replace static cost estimates with calibrated predictions.
+        
+        Load balancing and merging add and compare costs across sources,
+        so predictions in milliseconds are used only when every sub-query
+        has one; otherwise all keep the optimizer's unitless estimates.
+        """
+        calibrator = self.optimizer.calibrator
+        if not calibrator:
+            return subqueries
+        
+        predictions = []
+        for subq in subqueries:
+            operation, shape = describe_query(subq.query_plan)
+            predicted = calibrator.predict_ms(subq.source_id, operation,
+                                              subq.estimated_rows,
+                                              predicate_shape=shape)
+            if predicted is None:
+                return subqueries
+            predictions.append(predicted)
+        
+        for subq, predicted in zip(subqueries, predictions):
+            subq.estimated_cost = predicted
+        return subqueries
+    
+    def _plan_bind_joins(self,
+                         query: QueryPlan,
+                         subqueries: List[SubQuery]) -> List[SubQuery]:
+        """Choose a join strategy for each join spanning two sources."""
+        by_source = {subq.source_id: subq for subq in subqueries}
+        
+        def visit(node: QueryNode) -> None:
+            """Visit join nodes whose sides live on different sources."""
+            if node.operation_type.lower() == 'join' and node.left and node.right:
+                left = by_source.get(self._source_for_subtree(node.left))
+                right = by_source.get(self._source_for_subtree(node.right))
+                if left and right and left is not right:
+                    self._choose_bind_join(node, left, right)
+            
+            for child in [node.left, node.right] + list(node.children):
+                if child:
+                    visit(child)
+        
+        visit(query.root)
+        return subqueries
+    
+    def _choose_bind_join(self, node: QueryNode,
+                          left: SubQuery, right: SubQuery) -> None:
+        """Bind the smaller side's keys into the other side if cheaper."""
+        condition = getattr(node, 'join_condition', None) or {}
+        left_key, right_key = condition.get('left'), condition.get('right')
+        if not left_key or not right_key:
+            return
+        
+        # The smaller side supplies the keys
+        if left.estimated_rows <= right.estimated_rows:
+            outer, inner, outer_key, inner_key = left, right, left_key, right_key
+        else:
+            outer, inner, outer_key, inner_key = right, left, right_key, left_key
+        
+        spec = BindJoinSpec(outer.source_id, outer_key, inner_key)
+        choice = self.optimizer.choose_join_strategy(
+            inner.source_id,
+            outer_keys=outer.estimated_rows,
+            inner_rows=inner.estimated_rows or None,
+            batch_size=spec.batch_size,
+            max_in_flight=spec.max_in_flight
+        )
+        if choice.strategy == 'bind':
+            inner.bind_join = spec
+            inner.dependencies.add(outer.query_plan.id)
+            # Scale rather than replace, so the cost stays in the unit
+            # the other sub-queries use
+            inner.estimated_cost *= choice.bind_cost_ms / choice.ship_cost_ms
+    
+    def _plan_partitioned_scans(self, subqueries: List[SubQuery]) -> List[SubQuery]:
+        """Mark large single-table scans so they can be read in ranges."""
+        for subq in subqueries:
+            node = subq.query_plan.root
+            if subq.bind_join or node.left or node.right or node.children:
+                continue
+            if not node.table_name:
+                continue
+            scan = ScanPartitioning(table=node.table_name,
+                                    columns=getattr(node, 'columns', None) or None,
+                                    where=getattr(node, 'condition', None) or None)
+            # Worth splitting only with room for at least two ranges
+            if subq.estimated_rows >= 2 * scan.min_rows_per_partition:
+                subq.partitioning = scan
+        return subqueries
+    
+    def _source_for_subtree(self, node: QueryNode) -> Optional[str]:
+        """Find the source of the first table under a node."""
+        if node.table_name:
+            return self._get_source_for_table(node.table_name)
+        for child in [node.left, node.right] + list(node.children):
+            if child:
+                source = self._source_for_subtree(child)
+                if source:
+                    return source
+        return None
+    
     def _optimize_splits(self, subqueries: List[SubQuery]) -> List[SubQuery]:
         """Optimize subquery splits for better performance."""
         # Merge small subqueries if beneficial
@@ -1,6 +1,8 @@
-from typing import Any, Dict, List, Optional, Set, Union
-from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from dataclasses import dataclass, asdict
 from datetime import datetime
+import os
+import re
 import time
 import cProfile
 import pstats
@@ -10,6 +12,7 @@ import logging
 import json
 import tracemalloc
 from contextlib import contextmanager
+import numpy as np
 
 @dataclass
 class OperationProfile:
@@ -314,4 +317,302 @@ class PerformancePredictor:
                     h['metrics'].get('memory_usage_mb', 0)
                     for h in similar
                 ) / len(similar)
-            } 
\ No newline at end of file
+            } 
+
+# Wildcard for cost models not specific to an operation or predicate shape
+ANY_SHAPE = '*'
+
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|:\w+|\?")
+_SQL_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+def describe_query(query: Any) -> Tuple[str, str]:
+    """Reduce a source query to its operation type and predicate shape.
+    
+    Shapes drop literal values so that queries differing only in their
+    constants share a cost model.
+    """
+    sql = getattr(query, 'sql', query)
+    if isinstance(sql, str):
+        words = sql.split()
+        operation = words[0].lower() if words else 'query'
+        where = re.split(r'\bwhere\b', sql, maxsplit=1, flags=re.IGNORECASE)
+        if len(where) < 2:
+            return operation, ANY_SHAPE
+        shape = _SQL_LIST.sub('(?)', _SQL_LITERAL.sub('?', where[1]))
+        return operation, ' '.join(shape.split()).lower()
+        
+    if isinstance(query, dict):
+        operation = str(query.get('type') or query.get('operation') or 'query')
+        fields = sorted(query.get('conditions') or query.get('filter') or {})
+        return operation, ','.join(fields) or ANY_SHAPE
+        
+    node = getattr(query, 'root', query)
+    operation = (getattr(node, 'operation', None) or
+                 getattr(node, 'operation_type', None) or 'query')
+    operation = str(operation).lower()
+    predicate = getattr(node, 'predicate', None)
+    if isinstance(predicate, dict) and 'column' in predicate:
+        return operation, f"{predicate['column']} {predicate.get('op', '=')} ?"
+    condition = getattr(node, 'condition', None)
+    if isinstance(condition, str) and condition:
+        return operation, ' '.join(_SQL_LITERAL.sub('?', condition).split()).lower()
+    return operation, ANY_SHAPE
+
+@dataclass
+class CostParameters:
+    """Fitted cost model for one source, operation and predicate shape."""
+    intercept_ms: float
+    ms_per_row: float
+    ms_per_mb: float
+    error_rate: float
+    samples: int
+    weight: float  # Effective sample count after decay
+    successes: int = 0
+    
+    def predict_ms(self, rows: float, bytes_read: float = 0.0) -> float:
+        """Predict latency for a result of the given size."""
+        return (self.intercept_ms + self.ms_per_row * rows +
+                self.ms_per_mb * bytes_read / (1024 * 1024))
+        
+    def expected_ms(self, rows: float, bytes_read: float = 0.0) -> float:
+        """Predict latency including retries of failed calls."""
+        return self.predict_ms(rows, bytes_read) / max(1.0 - self.error_rate, 0.05)
+
+class DecayedRegression:
+    """Least squares of latency on rows and bytes with exponential forgetting.
+    
+    Sufficient statistics are decayed by ``decay`` on every observation, so
+    the fit tracks sources whose performance drifts.
+    """
+    
+    def __init__(self, decay: float = 0.98, ridge: float = 1e-3):
+        self.decay = decay
+        self.ridge = ridge
+        self.xtx = np.zeros((3, 3))
+        self.xty = np.zeros(3)
+        self.weight = 0.0
+        self.samples = 0
+        self.successes = 0
+        self.error_rate = 0.0
+        self.errors_seen = 0.0
+        
+    @staticmethod
+    def _features(rows: float, bytes_read: float) -> np.ndarray:
+        # Scale so the normal equations stay well conditioned
+        return np.array([1.0, rows / 1000.0, bytes_read / (1024 * 1024)])
+        
+    def update(self, latency_ms: float, rows: float, bytes_read: float,
+               error: bool = False) -> None:
+        """Fold one execution into the fit."""
+        self.errors_seen = self.decay * self.errors_seen + (1.0 if error else 0.0)
+        self.weight = self.decay * self.weight + 1.0
+        self.error_rate = self.errors_seen / self.weight
+        self.samples += 1
+        if error:
+            # Failed calls do not describe the cost of successful ones
+            return
+        self.successes += 1
+        x = self._features(rows, bytes_read)
+        self.xtx = self.decay * self.xtx + np.outer(x, x)
+        self.xty = self.decay * self.xty + x * latency_ms
+        
+    def parameters(self) -> CostParameters:
+        """Solve for the current cost parameters."""
+        ridge = self.ridge * np.eye(3)
+        ridge[0, 0] = 0.0  # Leave the intercept unpenalised
+        try:
+            coef = np.linalg.solve(self.xtx + ridge, self.xty)
+        except np.linalg.LinAlgError:
+            coef = np.linalg.lstsq(self.xtx + ridge, self.xty, rcond=None)[0]
+        if coef[1] < 0 or coef[2] < 0:
+            # Costs cannot fall with size; refit the remaining terms
+            keep = [0] + [i for i in (1, 2) if coef[i] >= 0]
+            sub = np.linalg.lstsq((self.xtx + ridge)[np.ix_(keep, keep)],
+                                  self.xty[keep], rcond=None)[0]
+            coef = np.zeros(3)
+            coef[keep] = sub
+        return CostParameters(
+            intercept_ms=max(float(coef[0]), 0.0),
+            ms_per_row=max(float(coef[1]), 0.0) / 1000.0,
+            ms_per_mb=max(float(coef[2]), 0.0),
+            error_rate=self.error_rate,
+            samples=self.samples,
+            weight=self.weight,
+            successes=self.successes
+        )
+        
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'xtx': self.xtx.tolist(),
+            'xty': self.xty.tolist(),
+            'weight': self.weight,
+            'samples': self.samples,
+            'successes': self.successes,
+            'errors_seen': self.errors_seen
+        }
+        
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], decay: float, ridge: float) -> 'DecayedRegression':
+        model = cls(decay, ridge)
+        model.xtx = np.array(data['xtx'])
+        model.xty = np.array(data['xty'])
+        model.weight = data['weight']
+        model.samples = data['samples']
+        model.successes = data.get('successes', data['samples'])
+        model.errors_seen = data['errors_seen']
+        model.error_rate = model.errors_seen / model.weight if model.weight else 0.0
+        return model
+
+class CostCalibrator:
+    """Fits per-source cost parameters online from observed executions.
+    
+    Each observation updates models at three levels: the source as a
+    whole, the source and operation type, and the source, operation and
+    predicate shape. Cost lookups use the most specific model with enough
+    successful samples; error rates count failures too. Models are
+    persisted as JSON when a path is given.
+    """
+    
+    def __init__(self,
+                 path: Optional[str] = None,
+                 decay: float = 0.98,
+                 ridge: float = 1e-3,
+                 min_samples: int = 5,
+                 autosave_every: int = 50):
+        self.path = path
+        self.decay = decay
+        self.ridge = ridge
+        self.min_samples = min_samples
+        self.autosave_every = autosave_every
+        self.models: Dict[Tuple[str, str, str], DecayedRegression] = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self._unsaved = 0
+        self._save_pending = False
+        # Serializes writers of the calibration file
+        self._save_lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+            
+    def observe(self,
+                source: str,
+                operation: str,
+                predicate_shape: str,
+                latency_ms: float,
+                rows: int = 0,
+                bytes_read: int = 0,
+                error: bool = False,
+                autosave: bool = True) -> bool:
+        """Record one execution against a source.
+        
+        Returns whether an autosave fell due. With ``autosave`` the file is
+        written here; async callers pass False and run ``save`` off the
+        event loop themselves.
+        """
+        keys = {(source, ANY_SHAPE, ANY_SHAPE),
+                (source, operation, ANY_SHAPE),
+                (source, operation, predicate_shape)}
+        with self.lock:
+            for key in keys:
+                model = self.models.get(key)
+                if model is None:
+                    model = self.models[key] = DecayedRegression(self.decay, self.ridge)
+                model.update(latency_ms, rows, bytes_read, error)
+            self._unsaved += 1
+            should_save = bool(self.path) and not self._save_pending \
+                and self._unsaved >= self.autosave_every
+            if should_save:
+                self._save_pending = True
+        if should_save and autosave:
+            self.save()
+        return should_save
+            
+    def parameters(self,
+                   source: str,
+                   operation: str = ANY_SHAPE,
+                   predicate_shape: str = ANY_SHAPE,
+                   fallback: bool = True) -> Optional[CostParameters]:
+        """Get the most specific calibrated parameters, if any."""
+        keys = [(source, operation, predicate_shape),
+                (source, operation, ANY_SHAPE),
+                (source, ANY_SHAPE, ANY_SHAPE)]
+        with self.lock:
+            for key in keys if fallback else keys[:1]:
+                model = self.models.get(key)
+                if model and model.successes >= self.min_samples:
+                    return model.parameters()
+        return None
+        
+    def error_rate(self,
+                   source: str,
+                   operation: str = ANY_SHAPE,
+                   predicate_shape: str = ANY_SHAPE,
+                   fallback: bool = True) -> Optional[float]:
+        """Get the most specific observed error rate, if any."""
+        keys = [(source, operation, predicate_shape),
+                (source, operation, ANY_SHAPE),
+                (source, ANY_SHAPE, ANY_SHAPE)]
+        with self.lock:
+            for key in keys if fallback else keys[:1]:
+                model = self.models.get(key)
+                if model and model.samples >= self.min_samples:
+                    return model.error_rate
+        return None
+        
+    def predict_ms(self,
+                   source: str,
+                   operation: str,
+                   rows: float,
+                   bytes_read: float = 0.0,
+                   predicate_shape: str = ANY_SHAPE) -> Optional[float]:
+        """Predict latency, including retries, from calibrated parameters."""
+        params = self.parameters(source, operation, predicate_shape)
+        return params.expected_ms(rows, bytes_read) if params else None
+        
+    def describe(self, source: str) -> Dict[str, Dict[str, Any]]:
+        """Calibrated parameters for a source, keyed by operation and shape."""
+        with self.lock:
+            models = [(key, model) for key, model in self.models.items()
+                      if key[0] == source and model.successes >= self.min_samples]
+        return {
+            f"{operation}|{shape}": asdict(model.parameters())
+            for (_, operation, shape), model in sorted(models)
+        }
+        
+    def save(self) -> None:
+        """Write models to the calibration file atomically."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self.lock:
+                data = {
+                    'decay': self.decay,
+                    'models': [
+                        {'key': list(key), 'model': model.to_dict()}
+                        for key, model in self.models.items()
+                    ]
+                }
+                self._unsaved = 0
+                self._save_pending = False
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        
+    def load(self) -> None:
+        """Read models from the calibration file."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            models = {
+                tuple(entry['key']): DecayedRegression.from_dict(
+                    entry['model'], self.decay, self.ridge)
+                for entry in data.get('models', [])
+            }
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.error(f"Ignoring unreadable cost calibration {self.path}: {e}")
+            return
+        with self.lock:
+            self.models = models
@@ -1,4 +1,5 @@
 from typing import Dict, List, Optional, Any, Set
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import numpy as np
@@ -7,6 +8,7 @@ from sklearn.preprocessing import StandardScaler
 import asyncio
 import logging
 from .query_fed_core import QueryPlan
+from ...storage.index.hnsw import HNSWIndex
 
 @dataclass
 class CacheEntry:
@@ -112,20 +114,29 @@ class MLBasedStrategy:
         return complexity
 
 class SemanticStrategy:
-    """Semantic-based caching strategy."""
+    """Semantic-based caching strategy.
+    
+    Embeddings of cached queries are held in an HNSW index, so finding a
+    similar cached query costs roughly log(n) distance computations
+    rather than one per cached entry.
+    """
     
     def __init__(self,
                  similarity_threshold: float = 0.8,
-                 max_semantic_cache_entries: int = 1000):
+                 max_semantic_cache_entries: int = 1000,
+                 ef_search: int = 64):
         self.similarity_threshold = similarity_threshold
         self.max_entries = max_semantic_cache_entries
-        self.semantic_cache: Dict[str, CacheEntry] = {}
-        self.query_embeddings: Dict[str, np.ndarray] = {}
+        self.ef_search = ef_search
+        # Embeddings of indexed queries, least recently used first
+        self.query_embeddings: OrderedDict[int, np.ndarray] = OrderedDict()
+        self.index: Optional[HNSWIndex] = None
     
     async def should_cache(self, query: QueryPlan, metadata: Dict[str, Any]) -> bool:
         """Determine if query should be cached based on semantics."""
         try:
             # Get query embedding
+            query_hash = hash(self._query_to_string(query))
             embedding = await self._get_query_embedding(query)
             if embedding is None:
                 return False
@@ -134,11 +145,23 @@ class SemanticStrategy:
             similar_queries = self._find_similar_queries(embedding)
             
             # Cache if no similar queries exist
-            return len(similar_queries) == 0
+            if similar_queries:
+                return False
+            self._remember(query_hash, embedding)
+            return True
         except Exception as e:
             logging.error(f"Error in semantic cache check: {e}")
             return False
     
+    def forget(self, query_hash: int) -> None:
+        """Drop an evicted query from the similarity index."""
+        if self.query_embeddings.pop(query_hash, None) is not None:
+            self.index.delete(query_hash)
+    
+    def on_evict(self, query: QueryPlan) -> None:
+        """Forget a query whose result the cache has evicted."""
+        self.forget(hash(self._query_to_string(query)))
+    
     async def _get_query_embedding(self, query: QueryPlan) -> Optional[np.ndarray]:
         """Get semantic embedding for query."""
         try:
@@ -150,29 +173,37 @@ class SemanticStrategy:
             
             # Return cached embedding if available
             if query_hash in self.query_embeddings:
+                self.query_embeddings.move_to_end(query_hash)
                 return self.query_embeddings[query_hash]
             
-            # Generate new embedding
-            embedding = await self._generate_embedding(query_str)
-            
-            # Cache embedding
-            self.query_embeddings[query_hash] = embedding
-            
-            return embedding
+            # Generate new embedding; it is kept only if the query is cached
+            return await self._generate_embedding(query_str)
         except Exception as e:
             logging.error(f"Error generating query embedding: {e}")
             return None
     
-    def _find_similar_queries(self, embedding: np.ndarray) -> List[str]:
+    def _remember(self, query_hash: int, embedding: np.ndarray) -> None:
+        """Index a cached query's embedding, evicting the least recently used."""
+        if self.index is None:
+            # Headroom for evicted entries awaiting a batched vacuum
+            self.index = HNSWIndex("semantic_cache", "federation_cache", ["embedding"],
+                                   dim=len(embedding),
+                                   capacity=self.max_entries + max(16, self.max_entries // 10),
+                                   ef_search=self.ef_search)
+        while len(self.query_embeddings) >= self.max_entries:
+            oldest, _ = self.query_embeddings.popitem(last=False)
+            self.index.delete(oldest)
+        self.index.insert(query_hash, embedding)
+        self.query_embeddings[query_hash] = embedding
+    
+    def _find_similar_queries(self, embedding: np.ndarray) -> List[int]:
         """Find semantically similar queries in cache."""
-        similar_queries = []
-        
-        for query_hash, cached_embedding in self.query_embeddings.items():
-            similarity = self._calculate_similarity(embedding, cached_embedding)
-            if similarity >= self.similarity_threshold:
-                similar_queries.append(query_hash)
+        if self.index is None or not len(self.index):
+            return []
         
-        return similar_queries
+        matches = self.index.search(embedding, k=10,
+                                    max_distance=1.0 - self.similarity_threshold)
+        return [query_hash for query_hash, _ in matches]
     
     def _calculate_similarity(self,
                             embedding1: np.ndarray,
@@ -223,6 +254,10 @@ class HybridStrategy:
             logging.error(f"Error in hybrid cache decision: {e}")
             return False
     
+    def on_evict(self, query: QueryPlan) -> None:
+        """Forget a query whose result the cache has evicted."""
+        self.semantic_strategy.on_evict(query)
+    
     def _apply_heuristics(self,
                          query: QueryPlan,
                          metadata: Dict[str, Any]) -> bool:
@@ -334,6 +369,10 @@ class AdaptiveStrategy:
             logging.error(f"Error in adaptive cache decision: {e}")
             return False
     
+    def on_evict(self, query: QueryPlan) -> None:
+        """Forget a query whose result the cache has evicted."""
+        self.hybrid_strategy.on_evict(query)
+    
     async def record_performance(self,
                                query: QueryPlan,
                                cache_decision: bool,
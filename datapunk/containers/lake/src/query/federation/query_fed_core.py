@@ -1,11 +1,30 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Set, Union
 from ..parser.query_parser_core import QueryPlan, QueryNode
 from ..optimizer.optimizer_core import QueryOptimizer, OptimizationRule
+from .querry_fed_profiling import CostCalibrator, describe_query
+from ..executor.runtime_filters import build_runtime_filter
 from datetime import datetime
 import asyncio
 import logging
+import math
+import pyarrow as pa
+
+def to_arrow_table(data: Any) -> pa.Table:
+    """Coerce an adapter result to an Arrow table, without copying when possible."""
+    if isinstance(data, pa.Table):
+        return data
+    if isinstance(data, pa.RecordBatch):
+        return pa.Table.from_batches([data])
+    if isinstance(data, list) and data and isinstance(data[0], pa.RecordBatch):
+        return pa.Table.from_batches(data)
+    if hasattr(data, 'to_dict') and hasattr(data, 'columns'):
+        # pandas DataFrame: numeric columns are converted without copying
+        return pa.Table.from_pandas(data, preserve_index=False)
+    if isinstance(data, dict):
+        data = [data]
+    return pa.Table.from_pylist(list(data or []))
 
 @dataclass
 class DataSourceInfo:
@@ -16,12 +35,21 @@ class DataSourceInfo:
     cost_factors: Dict[str, float]  # operation costs
     statistics: Dict[str, Any]  # source statistics
 
+@dataclass
+class FederatedJoin:
+    """Join between two sources whose build side filters the probe side."""
+    build_source: str
+    build_key: str
+    probe_source: str
+    probe_key: str
+
 @dataclass
 class FederatedQueryPlan:
     """Represents a distributed query plan across multiple sources."""
     subplans: Dict[str, QueryPlan]  # source -> plan mapping
     dependencies: Dict[str, List[str]]  # source -> dependencies
     merge_plan: Optional[QueryPlan] = None  # plan to merge results
+    joins: List[FederatedJoin] = field(default_factory=list)  # runtime filter edges
 
 @dataclass
 class DataSourceStats:
@@ -42,6 +70,27 @@ class FederationCost:
     memory_cost: float
     parallelism_benefit: float
     total_cost: float
+    calibrated: bool = False  # total_cost is predicted milliseconds
+
+@dataclass
+class JoinStrategyCost:
+    """Cost of pulling a join's inner side versus binding outer keys into it."""
+    strategy: str  # 'ship' or 'bind'
+    ship_cost_ms: float
+    bind_cost_ms: float
+    batch_size: int
+    batches: int
+    calibrated: bool = False
+
+def _join_keys(result: Any, column: str) -> List[Any]:
+    """Read a join column from an adapter result of rows or columns."""
+    if isinstance(result, (pa.Table, pa.RecordBatch)):
+        return result.column(column).to_pylist()
+    if hasattr(result, 'columns') and hasattr(result, 'to_dict'):
+        return list(result[column])
+    if isinstance(result, dict):
+        result = [result]
+    return [row.get(column) for row in result or []]
 
 class DataSourceAdapter(ABC):
     """Base adapter for connecting to different data sources."""
@@ -65,14 +114,36 @@ class DataSourceAdapter(ABC):
     def execute_plan(self, plan: QueryPlan) -> Any:
         """Execute a query plan on this source."""
         pass
+        
+    def execute_plan_arrow(self, plan: QueryPlan) -> pa.Table:
+        """Execute a plan and return its result as Arrow record batches.
+        
+        Adapters that can read columnar data natively override this to
+        skip building per-row Python dicts.
+        """
+        return to_arrow_table(self.execute_plan(plan))
+        
+    def apply_runtime_filters(self, plan: QueryPlan, filters: List[Any]) -> QueryPlan:
+        """Push join runtime filters into a plan as source-side predicates.
+        
+        Sources that cannot evaluate pushed predicates return the plan
+        unchanged; the join still filters the rows it receives.
+        """
+        return plan
 
 class FederatedQueryOptimizer(QueryOptimizer):
     """Query optimizer for federated queries."""
     
-    def __init__(self, rules: Optional[List[OptimizationRule]] = None):
+    def __init__(self, rules: Optional[List[OptimizationRule]] = None,
+                 transfer_ms_per_mb: float = 8.0,
+                 calibrator: Optional[CostCalibrator] = None,
+                 max_pushdown_error_rate: float = 0.2):
         super().__init__(rules)
         self.source_stats: Dict[str, DataSourceStats] = {}
         self.network_latency: Dict[str, float] = {}
+        self.transfer_ms_per_mb = transfer_ms_per_mb
+        self.calibrator = calibrator
+        self.max_pushdown_error_rate = max_pushdown_error_rate
     
     def add_source_stats(self, source_id: str, stats: DataSourceStats) -> None:
         """Add or update statistics for a data source."""
@@ -119,15 +190,99 @@ class FederatedQueryOptimizer(QueryOptimizer):
             0.1 * parallelism_benefit
         )
         
+        # Observed behaviour overrides the static weights once calibrated
+        calibrated_cost = self._calibrated_cost(plan, stats, source_id)
+        if calibrated_cost is not None:
+            total_cost = calibrated_cost
+        
         return FederationCost(
             cpu_cost=cpu_cost,
             io_cost=io_cost,
             network_cost=network_cost,
             memory_cost=memory_cost,
             parallelism_benefit=parallelism_benefit,
-            total_cost=total_cost
+            total_cost=total_cost,
+            calibrated=calibrated_cost is not None
         )
     
+    def should_push_down(self, source_id: str, operation: str) -> bool:
+        """Check whether observed errors argue against pushing an operation down.
+        
+        ``operation`` is the key ``describe_query`` gives the sub-query, which
+        is what the executor records.
+        """
+        if not self.calibrator:
+            return True
+        error_rate = self.calibrator.error_rate(source_id, operation, fallback=False)
+        return error_rate is None or error_rate <= self.max_pushdown_error_rate
+    
+    def describe_calibration(self, source_id: str) -> Dict[str, Dict[str, Any]]:
+        """Calibrated cost parameters for a source, for plan explanations."""
+        if not self.calibrator:
+            return {}
+        return self.calibrator.describe(source_id)
+    
+    def choose_join_strategy(self,
+                             inner_source_id: str,
+                             outer_keys: int,
+                             inner_rows: Optional[int] = None,
+                             inner_distinct_keys: Optional[int] = None,
+                             batch_size: int = 256,
+                             max_in_flight: int = 4) -> JoinStrategyCost:
+        """Choose between pulling a join's inner side and a batched bind join.
+        
+        Shipping pays one round trip plus the transfer of the whole inner
+        side. A bind join pays one round trip per wave of concurrent key
+        batches plus the transfer of matching rows only.
+        """
+        batches = max(1, math.ceil(outer_keys / max(batch_size, 1)))
+        stats = self.source_stats.get(inner_source_id)
+        if not stats:
+            # Without statistics keep the existing behaviour
+            return JoinStrategyCost('ship', 0.0, float('inf'), batch_size, batches)
+            
+        inner_rows = stats.total_rows if inner_rows is None else inner_rows
+        row_mb = stats.total_size_bytes / max(stats.total_rows, 1) / (1024 * 1024)
+        params = self.calibrator.parameters(inner_source_id) if self.calibrator else None
+        if params:
+            round_trip = params.intercept_ms
+            row_ms = params.ms_per_row + params.ms_per_mb * row_mb
+        else:
+            round_trip = (self.network_latency.get(inner_source_id, 100.0) +
+                          stats.avg_query_time_ms)
+            row_ms = row_mb * self.transfer_ms_per_mb
+        
+        ship_cost = round_trip + inner_rows * row_ms
+        
+        # Rows per key on the inner side; unique keys unless told otherwise
+        fanout = inner_rows / max(inner_distinct_keys or inner_rows, 1)
+        waves = math.ceil(batches / max(max_in_flight, 1))
+        bind_cost = waves * round_trip + outer_keys * fanout * row_ms
+        
+        return JoinStrategyCost(
+            strategy='bind' if bind_cost < ship_cost else 'ship',
+            ship_cost_ms=ship_cost,
+            bind_cost_ms=bind_cost,
+            batch_size=batch_size,
+            batches=batches,
+            calibrated=params is not None
+        )
+    
+    def _calibrated_cost(self, plan: QueryPlan, stats: DataSourceStats,
+                         source_id: str) -> Optional[float]:
+        """Predict latency from calibrated parameters, if available."""
+        if not self.calibrator:
+            return None
+        operation, shape = describe_query(plan)
+        params = self.calibrator.parameters(source_id, operation, shape)
+        if not params:
+            return None
+        result_bytes = self._estimate_result_size(plan, stats)
+        row_bytes = stats.total_size_bytes / max(stats.total_rows, 1)
+        rows = result_bytes / max(row_bytes, 1.0)
+        # Failed calls are retried, so expected cost grows with the error rate
+        return params.expected_ms(rows, result_bytes)
+    
     def _estimate_cpu_cost(self, plan: QueryPlan, stats: DataSourceStats) -> float:
         """Estimate CPU cost based on operations and data size."""
         base_cost = stats.avg_query_time_ms * 0.5  # 50% of avg query time
@@ -406,26 +561,60 @@ class FederationManager:
             merge_plan=merge_plan
         )
         
-    def execute_federated_query(self, fed_plan: FederatedQueryPlan) -> Any:
-        """Execute a federated query plan."""
+    def execute_federated_query(
+        self,
+        fed_plan: FederatedQueryPlan,
+        runtime_filters: Optional[Dict[str, List[Any]]] = None
+    ) -> Any:
+        """Execute a federated query plan.
+        
+        The build side of each join in ``fed_plan.joins`` runs first; its
+        join keys become a runtime filter on the probe side's subplan.
+        Filters passed in ``runtime_filters`` are applied as well.
+        """
+        runtime_filters = {
+            source: list(filters) for source, filters in (runtime_filters or {}).items()
+        }
+        # Build sides must finish before the probes they filter
+        dependencies = {
+            source: list(deps) for source, deps in fed_plan.dependencies.items()
+        }
+        for join in fed_plan.joins:
+            dependencies.setdefault(join.probe_source, []).append(join.build_source)
+        
         # Execute subplans in dependency order
         results = {}
         executed = set()
         
         while len(executed) < len(fed_plan.subplans):
+            progressed = False
             for source, plan in fed_plan.subplans.items():
                 if source in executed:
                     continue
                     
                 # Check if dependencies are satisfied
-                deps = fed_plan.dependencies.get(source, [])
+                deps = dependencies.get(source, [])
                 if not all(dep in executed for dep in deps):
                     continue
                     
                 # Execute subplan
                 adapter = self.sources[source]
+                if runtime_filters.get(source):
+                    plan = adapter.apply_runtime_filters(plan, runtime_filters[source])
                 results[source] = adapter.execute_plan(plan)
                 executed.add(source)
+                progressed = True
+                
+                for join in fed_plan.joins:
+                    if join.build_source != source:
+                        continue
+                    runtime_filter = build_runtime_filter(
+                        join.probe_key, _join_keys(results[source], join.build_key))
+                    if runtime_filter is not None:
+                        runtime_filters.setdefault(join.probe_source, []).append(runtime_filter)
+                        
+            if not progressed:
+                raise ValueError("Federated plan has circular dependencies")
                 
         # Execute merge plan if present
         if fed_plan.merge_plan:
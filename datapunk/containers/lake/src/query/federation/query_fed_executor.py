@@ -1,8 +1,16 @@
-from typing import Dict, List, Optional, Any, Iterator
+from typing import Dict, List, Optional, Any, AsyncIterator, Iterator, Set
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import asyncio
+import inspect
+import logging
+import uuid
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from .fed_planner import SubQuery, DataSource
+import pyarrow as pa
+from .fed_planner import BindJoinSpec, ScanPartitioning, SubQuery, DataSource
+from .query_fed_core import to_arrow_table
+from .query_fed_monitoring import FederationMonitor
+from .querry_fed_profiling import describe_query
 from ..executor.query_exec_core import QueryExecutor
 from ...storage.cache import CacheManager
 
@@ -10,40 +18,515 @@ from ...storage.cache import CacheManager
 class QueryResult:
     """Represents results from a sub-query execution."""
     source: DataSource
-    data: List[Dict[str, Any]]
+    data: List[Dict[str, Any]]  # Empty when the source returned columnar batches
     metadata: Dict[str, Any]
     error: Optional[str] = None
+    table: Optional[pa.Table] = None
+    
+    def to_arrow(self) -> pa.Table:
+        """Columnar view of the result, converting row data only if needed."""
+        if self.table is None:
+            self.table = to_arrow_table(self.data)
+        return self.table
+
+# Marks the end of a channel's batch stream
+_END = object()
+
+class BatchChannel:
+    """Fans the batches of one subquery out to its consumers.
+    
+    Each consumer gets its own bounded queue, so a slow consumer applies
+    backpressure to the producer instead of buffering without limit.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.first_batch = asyncio.Event()
+        self.error: Optional[str] = None
+        self._queues: List[asyncio.Queue] = []
+        
+    def subscribe(self, maxsize: int = 0) -> asyncio.Queue:
+        """Register a consumer; must happen before the producer starts."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._queues.append(queue)
+        return queue
+        
+    async def publish(self, batch: Any) -> None:
+        self.first_batch.set()
+        for queue in self._queues:
+            await queue.put(batch)
+            
+    async def close(self, error: Optional[str] = None) -> None:
+        self.error = error
+        self.first_batch.set()
+        for queue in self._queues:
+            await queue.put(_END)
+
+async def iterate_batches(queue: asyncio.Queue) -> AsyncIterator[Any]:
+    """Yield batches from a channel subscription until it closes."""
+    while True:
+        batch = await queue.get()
+        if batch is _END:
+            # Leave the marker so later readers also see the end
+            queue.put_nowait(_END)
+            return
+        yield batch
+
+class AdaptiveBatchSizer:
+    """Sizes bind-join key batches toward a target per-batch latency."""
+    
+    def __init__(self, spec: BindJoinSpec, smoothing: float = 0.3):
+        self.batch_size = spec.batch_size
+        self.min_batch_size = spec.min_batch_size
+        self.max_batch_size = spec.max_batch_size
+        self.target_seconds = spec.target_batch_seconds
+        self.smoothing = smoothing
+        self.seconds_per_key: Optional[float] = None
+        
+    def observe(self, keys: int, seconds: float) -> None:
+        """Fold one batch's latency into the next batch size."""
+        per_key = seconds / max(keys, 1)
+        if self.seconds_per_key is None:
+            self.seconds_per_key = per_key
+        else:
+            self.seconds_per_key += self.smoothing * (per_key - self.seconds_per_key)
+            
+        ideal = self.target_seconds / max(self.seconds_per_key, 1e-9)
+        # Change by at most 2x per batch so one outlier cannot swing it far
+        ideal = min(max(ideal, self.batch_size / 2), self.batch_size * 2)
+        self.batch_size = int(min(max(ideal, self.min_batch_size), self.max_batch_size))
 
 class FederatedQueryExecutor:
-    """Executes distributed queries across multiple data sources."""
+    """Executes distributed queries across multiple data sources.
+    
+    Subqueries are scheduled as a DAG on the running event loop. A
+    subquery starts as soon as each of its dependencies has produced a
+    first batch (or finished), and batches stream between subqueries
+    through bounded channels. Concurrency is capped per source, and
+    blocking executors run on one long-lived thread pool.
+    
+    Executors may implement any of:
+    
+    - ``execute(query)``: returns the full result (called on the pool)
+    - ``execute_batches(query)``: a generator of batches (pulled on the pool)
+    - ``stream_query(query)``: an async generator of batches read from a
+      server-side cursor; preferred over ``execute_batches``
+    - ``execute_stream(query, inputs)``: an async generator of batches that
+      consumes dependency batches from ``inputs``, keyed by stream name
+    
+    A sub-query's stream name is its source name, suffixed with ``#n``
+    when the plan holds several sub-queries on the same source.
+    
+    Executors without ``execute_stream`` receive dependency results in
+    full via ``_update_query_with_results`` before they run, except for
+    bind joins: those run once per batch of outer keys, bound into the
+    query through the executor's ``bind_join_keys``.
+    
+    Sub-queries carrying ``partitioning`` are read as concurrent range
+    scans when the executor offers ``plan_partitions`` and
+    ``execute_partition``; each range holds its own source slot.
+    """
     
-    def __init__(self, max_workers: int = 10):
+    def __init__(self, max_workers: int = 10,
+                 source_concurrency: Optional[Dict[str, int]] = None,
+                 default_source_concurrency: int = 4,
+                 channel_capacity: int = 8,
+                 monitor: Optional[FederationMonitor] = None):
         self.max_workers = max_workers
         self.executors: Dict[str, QueryExecutor] = {}
         self.cache_manager = CacheManager()
+        self.source_concurrency = dict(source_concurrency or {})
+        self.default_source_concurrency = default_source_concurrency
+        self.channel_capacity = channel_capacity
+        self.monitor = monitor
+        self.logger = logging.getLogger(__name__)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix="federation")
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._active: Dict[str, int] = {}
         
     def register_executor(self, source_name: str, executor: QueryExecutor) -> None:
         """Register an executor for a data source."""
         self.executors[source_name] = executor
         
-    async def execute_plan(self, plan: List[SubQuery]) -> Iterator[QueryResult]:
+    def set_source_concurrency(self, source_name: str, limit: int) -> None:
+        """Cap concurrent subqueries against one source."""
+        self.source_concurrency[source_name] = limit
+        self._semaphores.pop(source_name, None)
+        
+    def shutdown(self) -> None:
+        """Release the worker pool."""
+        self._pool.shutdown(wait=True)
+        
+    async def execute_plan(self, plan: List[SubQuery],
+                           query_id: Optional[str] = None) -> Iterator[QueryResult]:
         """Execute a distributed query plan."""
-        # Group queries by execution level (based on dependencies)
-        levels = self._group_by_level(plan)
+        results = [result async for result in self.stream_plan(plan, query_id)]
+        
+        # Merge and process results
+        return self._process_results(results)
+        
+    async def stream_plan(self, plan: List[SubQuery],
+                          query_id: Optional[str] = None) -> AsyncIterator[QueryResult]:
+        """Execute a plan, yielding each subquery's result as it completes."""
+        # Reject cyclic plans before scheduling anything
+        self._group_by_level(plan)
         
-        results = []
-        for level in levels:
-            # Execute queries at this level in parallel
-            level_results = await self._execute_level(level)
-            results.extend(level_results)
+        query_id = query_id or str(uuid.uuid4())
+        if self.monitor:
+            await self.monitor.start_query(query_id, None)
             
-            # Update dependent queries with intermediate results
-            self._update_dependencies(plan, level_results)
+        names = _stream_names(plan)
+        channels = {id(query): BatchChannel(names[id(query)]) for query in plan}
+        # Result collectors subscribe first so every batch is retained
+        collectors = {id(query): channels[id(query)].subscribe() for query in plan}
+        inputs = {
+            id(query): {
+                names[id(dep)]: channels[id(dep)].subscribe(
+                    # Same-source edges are unbounded to avoid holding a slot
+                    # while waiting on a consumer that needs the same slot
+                    0 if dep.source.name == query.source.name else self.channel_capacity)
+                for dep in query.dependencies
+            }
+            for query in plan
+        }
+        
+        tasks = [
+            asyncio.create_task(self._run_subquery(
+                query, channels, inputs[id(query)], query_id))
+            for query in plan
+        ]
+        gathers = [
+            asyncio.create_task(self._gather_result(query, channels[id(query)],
+                                                    collectors[id(query)]))
+            for query in plan
+        ]
+        try:
+            for finished in asyncio.as_completed(gathers):
+                yield await finished
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks + gathers:
+                task.cancel()
+            if self.monitor:
+                await self.monitor.end_query(query_id)
+                
+    async def _run_subquery(self, query: SubQuery,
+                            channels: Dict[int, BatchChannel],
+                            inputs: Dict[str, asyncio.Queue],
+                            query_id: str) -> None:
+        """Run one subquery once its inputs are flowing."""
+        loop = asyncio.get_running_loop()
+        channel = channels[id(query)]
+        executor = self.executors.get(query.source.name)
+        queued_at = loop.time()
+        started_at = None
+        rows = 0
+        bytes_read = 0
+        
+        try:
+            # Start as soon as every dependency has produced something
+            deps = [channels[id(dep)] for dep in query.dependencies]
+            await asyncio.gather(*(dep.first_batch.wait() for dep in deps))
+            failed = [dep.name for dep in deps if dep.error]
+            if failed:
+                raise RuntimeError(f"Dependency failed: {', '.join(failed)}")
+            if not executor:
+                raise ValueError(f"No executor found for source {query.source.name}")
+                
+            streaming = hasattr(executor, 'execute_stream')
+            if (query.partitioning and not streaming and not inputs
+                    and hasattr(executor, 'plan_partitions')):
+                # Each range takes its own source slot
+                started_at = loop.time()
+                async for batch in self._partitioned_scan(executor, query):
+                    rows += _batch_rows(batch)
+                    bytes_read += _batch_bytes(batch)
+                    await channel.publish(batch)
+            elif query.bind_join and not streaming:
+                # Each key batch takes its own source slot
+                started_at = loop.time()
+                async for batch in self._bind_join(executor, query, inputs):
+                    rows += _batch_rows(batch)
+                    bytes_read += _batch_bytes(batch)
+                    await channel.publish(batch)
+            else:
+                if not streaming and inputs:
+                    # Materialize inputs before taking a source slot
+                    completed = {}
+                    for name, queue in inputs.items():
+                        completed[name] = [b async for b in iterate_batches(queue)]
+                    self._update_query_with_results(query, completed)
+                    failed = [dep.name for dep in deps if dep.error]
+                    if failed:
+                        raise RuntimeError(f"Dependency failed: {', '.join(failed)}")
+                        
+                async with self._source_slot(query.source.name):
+                    started_at = loop.time()
+                    async for batch in self._produce(executor, query, inputs, streaming):
+                        rows += _batch_rows(batch)
+                        bytes_read += _batch_bytes(batch)
+                        await channel.publish(batch)
+            # A dependency may fail after its first batch was consumed
+            failed = [dep.name for dep in deps if dep.error]
+            if failed:
+                raise RuntimeError(f"Dependency failed: {', '.join(failed)}")
+            await channel.close()
+        except Exception as e:
+            self.logger.error(f"Subquery on {query.source.name} failed: {e}")
+            await channel.close(str(e))
+        finally:
+            # Unread input would block upstream producers on a full queue
+            for queue in inputs.values():
+                async for _ in iterate_batches(queue):
+                    pass
+            finished_at = loop.time()
+            await self._report(query_id, query, queued_at, started_at,
+                               finished_at, rows, bytes_read, channel.error)
             
-        # Merge and process results
-        final_results = self._process_results(results)
+    async def _produce(self, executor: QueryExecutor, query: SubQuery,
+                       inputs: Dict[str, asyncio.Queue],
+                       streaming: bool) -> AsyncIterator[Any]:
+        """Yield result batches from whichever interface the executor offers."""
+        loop = asyncio.get_running_loop()
+        if streaming:
+            streams = {name: iterate_batches(queue) for name, queue in inputs.items()}
+            async for batch in executor.execute_stream(query.query, streams):
+                yield batch
+        elif hasattr(executor, 'stream_query'):
+            # Server-side cursors keep memory flat however large the result
+            async for batch in executor.stream_query(query.query):
+                yield batch
+        elif hasattr(executor, 'execute_batches'):
+            batches = executor.execute_batches(query.query)
+            while True:
+                batch = await loop.run_in_executor(self._pool, next, batches, _END)
+                if batch is _END:
+                    return
+                yield batch
+        else:
+            cache_key = self._generate_cache_key(query)
+            cached = await self._cache_call('get', cache_key)
+            if cached:
+                yield cached
+                return
+            result = await loop.run_in_executor(self._pool, executor.execute, query.query)
+            if self._should_cache(query, result):
+                await self._cache_call('set', cache_key, result)
+            yield result
+            
+    async def _bind_join(self, executor: QueryExecutor, query: SubQuery,
+                         inputs: Dict[str, asyncio.Queue]) -> AsyncIterator[Any]:
+        """Run a subquery once per batch of distinct keys from its outer input.
         
-        return final_results
+        Key batches are dispatched while the outer side is still streaming,
+        with up to ``max_in_flight`` batches outstanding at once.
+        """
+        spec = query.bind_join
+        outer = inputs.get(spec.outer_source)
+        if outer is None:
+            # Fall back to the one dependency stream reading from that source
+            matches = [queue for name, queue in inputs.items()
+                       if name.startswith(f"{spec.outer_source}#")]
+            if len(matches) > 1:
+                raise ValueError(f"Bind join input {spec.outer_source} is ambiguous")
+            if not matches:
+                raise ValueError(f"Bind join input {spec.outer_source} is not a dependency")
+            outer = matches[0]
+            
+        loop = asyncio.get_running_loop()
+        sizer = AdaptiveBatchSizer(spec)
+        seen: Set[Any] = set()
+        pending: List[Any] = []
+        in_flight: Set[asyncio.Task] = set()
+        
+        async def run_batch(keys: List[Any]) -> Any:
+            async with self._source_slot(query.source.name):
+                started = loop.time()
+                result = await loop.run_in_executor(
+                    self._pool, self._execute_bound, executor, query, keys)
+                sizer.observe(len(keys), loop.time() - started)
+                return result
+                
+        try:
+            async for batch in iterate_batches(outer):
+                for row in _batch_records(batch):
+                    key = row.get(spec.outer_key)
+                    if key is not None and key not in seen:
+                        seen.add(key)
+                        pending.append(key)
+                        
+                while len(pending) >= sizer.batch_size:
+                    keys, pending = pending[:sizer.batch_size], pending[sizer.batch_size:]
+                    in_flight.add(asyncio.create_task(run_batch(keys)))
+                    if len(in_flight) >= spec.max_in_flight:
+                        done, in_flight = await asyncio.wait(
+                            in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            yield task.result()
+                            
+                # Hand on anything that finished while reading the outer side
+                done = {task for task in in_flight if task.done()}
+                in_flight -= done
+                for task in done:
+                    yield task.result()
+                    
+            if pending:
+                in_flight.add(asyncio.create_task(run_batch(pending)))
+            while in_flight:
+                done, in_flight = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
+                
+    async def _partitioned_scan(self, executor: QueryExecutor,
+                                query: SubQuery) -> AsyncIterator[Any]:
+        """Read a single-table scan as concurrent ranges, merging their batches.
+        
+        Batches are yielded in arrival order, so the result is unordered.
+        """
+        loop = asyncio.get_running_loop()
+        scan = query.partitioning
+        stats = await loop.run_in_executor(self._pool, executor.table_statistics,
+                                           scan.table)
+        degree = self._scan_degree(query.source.name, scan, stats or {})
+        partitions = await loop.run_in_executor(self._pool, executor.plan_partitions,
+                                                scan, degree)
+        
+        merged: asyncio.Queue = asyncio.Queue(maxsize=self.channel_capacity)
+        
+        async def read(partition: Any) -> None:
+            async with self._source_slot(query.source.name):
+                batches = executor.execute_partition(scan, partition)
+                try:
+                    while True:
+                        batch = await loop.run_in_executor(self._pool, next, batches, _END)
+                        if batch is _END:
+                            return
+                        await merged.put(batch)
+                finally:
+                    # A generator still running on the pool is left for collection
+                    if (inspect.isgenerator(batches)
+                            and inspect.getgeneratorstate(batches) != inspect.GEN_RUNNING):
+                        batches.close()
+                    
+        readers = [asyncio.create_task(read(p)) for p in partitions]
+        
+        async def finish() -> None:
+            try:
+                await asyncio.gather(*readers)
+            except Exception as e:
+                await merged.put(e)
+            else:
+                await merged.put(_END)
+                
+        finisher = asyncio.create_task(finish())
+        try:
+            while True:
+                batch = await merged.get()
+                if batch is _END:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            for task in readers + [finisher]:
+                task.cancel()
+            await asyncio.gather(*readers, finisher, return_exceptions=True)
+            
+    def _scan_degree(self, source_name: str, scan: ScanPartitioning,
+                     stats: Dict[str, Any]) -> int:
+        """Choose how many ranges to read from table size and source load."""
+        rows = stats.get('rows') or 0
+        by_size = int(rows // max(1, scan.min_rows_per_partition))
+        limit = self.source_concurrency.get(source_name,
+                                            self.default_source_concurrency)
+        # Leave slots other sub-queries are already using
+        free = limit - self._active.get(source_name, 0)
+        return max(1, min(scan.max_degree, by_size, free))
+        
+    def _execute_bound(self, executor: QueryExecutor, query: SubQuery,
+                       keys: List[Any]) -> Any:
+        """Execute one bind-join batch on a worker thread."""
+        spec = query.bind_join
+        bind = getattr(executor, 'bind_join_keys', None)
+        if bind is None:
+            raise ValueError(f"Executor for {query.source.name} cannot bind join keys")
+        bound = bind(query.query, spec.inner_key, keys, spec.style)
+        for method in ('execute', 'execute_query', 'execute_plan'):
+            run = getattr(executor, method, None)
+            if run:
+                return run(bound)
+        raise ValueError(f"Executor for {query.source.name} cannot execute queries")
+        
+    async def _gather_result(self, query: SubQuery, channel: BatchChannel,
+                             queue: asyncio.Queue) -> QueryResult:
+        """Assemble a subquery's batches into a QueryResult."""
+        batches = [batch async for batch in iterate_batches(queue)]
+        if channel.error:
+            return QueryResult(source=query.source, data=[], metadata={},
+                               error=channel.error)
+            
+        metadata = {"batches": len(batches), "cached": False}
+        if batches and all(isinstance(b, (pa.Table, pa.RecordBatch)) for b in batches):
+            table = pa.concat_tables([to_arrow_table(b) for b in batches],
+                                     promote_options="default")
+            return QueryResult(source=query.source, data=[], table=table,
+                               metadata=metadata)
+            
+        data: List[Dict[str, Any]] = []
+        for batch in batches:
+            data.extend(_batch_records(batch))
+        return QueryResult(source=query.source, data=data, metadata=metadata)
+        
+    async def _report(self, query_id: str, query: SubQuery, queued_at: float,
+                      started_at: Optional[float], finished_at: float,
+                      rows: int, bytes_read: int, error: Optional[str]) -> None:
+        """Report queue and execution time for one subquery."""
+        if not self.monitor:
+            return
+        queue_ms = ((started_at or finished_at) - queued_at) * 1000
+        exec_ms = (finished_at - started_at) * 1000 if started_at else 0.0
+        operation, shape = describe_query(query.query)
+        await self.monitor.record_subquery(query_id, query.source.name, {
+            'queue_time_ms': queue_ms,
+            'exec_time_ms': exec_ms,
+            'rows': rows,
+            'bytes': bytes_read,
+            'operation': operation,
+            'predicate_shape': shape,
+            # Subqueries that never reached their source say nothing about its cost
+            'started': started_at is not None,
+            'error': error
+        })
+        
+    @asynccontextmanager
+    async def _source_slot(self, source_name: str) -> AsyncIterator[None]:
+        """Hold one of a source's concurrency slots, tracking current load."""
+        async with self._semaphore(source_name):
+            self._active[source_name] = self._active.get(source_name, 0) + 1
+            try:
+                yield
+            finally:
+                self._active[source_name] -= 1
+                
+    def _semaphore(self, source_name: str) -> asyncio.Semaphore:
+        if source_name not in self._semaphores:
+            limit = self.source_concurrency.get(source_name,
+                                                self.default_source_concurrency)
+            self._semaphores[source_name] = asyncio.Semaphore(limit)
+        return self._semaphores[source_name]
+        
+    async def _cache_call(self, method: str, *args: Any) -> Any:
+        """Call a cache method, awaiting it when the cache is async."""
+        func = getattr(self.cache_manager, method, None)
+        if func is None:
+            return None
+        result = func(*args)
+        return await result if inspect.isawaitable(result) else result
         
     def _group_by_level(self, plan: List[SubQuery]) -> List[List[SubQuery]]:
         """Group queries by their dependency level."""
@@ -51,10 +534,13 @@ class FederatedQueryExecutor:
         remaining = plan.copy()
         
         while remaining:
+            # Compare by identity; equality on cyclic plans never terminates
+            pending = {id(query) for query in remaining}
+            
             # Find queries with no remaining dependencies
             current_level = [
                 query for query in remaining
-                if not any(dep in remaining for dep in query.dependencies)
+                if not any(id(dep) in pending for dep in query.dependencies)
             ]
             
             if not current_level:
@@ -62,33 +548,11 @@ class FederatedQueryExecutor:
                 raise ValueError("Invalid query plan: circular dependencies detected")
                 
             levels.append(current_level)
-            for query in current_level:
-                remaining.remove(query)
+            done = {id(query) for query in current_level}
+            remaining = [query for query in remaining if id(query) not in done]
                 
         return levels
         
-    async def _execute_level(self, queries: List[SubQuery]) -> List[QueryResult]:
-        """Execute a group of independent queries in parallel."""
-        loop = asyncio.get_event_loop()
-        results = []
-        
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Create futures for each query
-            futures = [
-                loop.run_in_executor(
-                    executor,
-                    self._execute_single_query,
-                    query
-                )
-                for query in queries
-            ]
-            
-            # Wait for all queries to complete
-            completed_results = await asyncio.gather(*futures)
-            results.extend(completed_results)
-            
-        return results
-        
     def _execute_single_query(self, query: SubQuery) -> QueryResult:
         """Execute a single sub-query."""
         try:
@@ -116,6 +580,18 @@ class FederatedQueryExecutor:
             if self._should_cache(query, result_data):
                 self.cache_manager.set(cache_key, result_data)
                 
+            if isinstance(result_data, (pa.Table, pa.RecordBatch)):
+                # Keep columnar results columnar all the way to the merger
+                return QueryResult(
+                    source=query.source,
+                    data=[],
+                    table=to_arrow_table(result_data),
+                    metadata={
+                        "execution_time": end_time - start_time,
+                        "cached": False
+                    }
+                )
+                
             return QueryResult(
                 source=query.source,
                 data=result_data,
@@ -133,20 +609,6 @@ class FederatedQueryExecutor:
                 error=str(e)
             )
             
-    def _update_dependencies(self, plan: List[SubQuery],
-                           results: List[QueryResult]) -> None:
-        """Update dependent queries with intermediate results."""
-        # Create mapping of completed queries
-        completed = {
-            str(result.source.name): result.data
-            for result in results
-            if not result.error
-        }
-        
-        # Update dependent queries
-        for query in plan:
-            self._update_query_with_results(query, completed)
-            
     def _update_query_with_results(self, query: SubQuery,
                                  completed_results: Dict[str, List[Dict[str, Any]]]) -> None:
         """Update a query with results from its dependencies."""
@@ -191,4 +653,39 @@ class FederatedQueryExecutor:
         # - Result size
         # - Data source type
         # - Update frequency
-        return len(results) > 0  # Simple policy for now 
\ No newline at end of file
+        return len(results) > 0  # Simple policy for now 
+
+def _stream_names(plan: List[SubQuery]) -> Dict[int, str]:
+    """Name each sub-query's stream uniquely within a plan."""
+    counts: Dict[str, int] = {}
+    for query in plan:
+        counts[query.source.name] = counts.get(query.source.name, 0) + 1
+    names: Dict[int, str] = {}
+    seen: Dict[str, int] = {}
+    for query in plan:
+        source = query.source.name
+        if counts[source] == 1:
+            names[id(query)] = source
+        else:
+            names[id(query)] = f"{source}#{seen.get(source, 0)}"
+            seen[source] = seen.get(source, 0) + 1
+    return names
+
+def _batch_records(batch: Any) -> List[Dict[str, Any]]:
+    if isinstance(batch, (pa.Table, pa.RecordBatch)):
+        return batch.to_pylist()
+    if isinstance(batch, dict):
+        return [batch]
+    return list(batch)
+
+def _batch_bytes(batch: Any) -> int:
+    if isinstance(batch, (pa.Table, pa.RecordBatch)):
+        return batch.nbytes
+    return 0
+
+def _batch_rows(batch: Any) -> int:
+    if isinstance(batch, (pa.Table, pa.RecordBatch)):
+        return batch.num_rows
+    if isinstance(batch, dict):
+        return 1
+    return len(batch) if hasattr(batch, '__len__') else 0
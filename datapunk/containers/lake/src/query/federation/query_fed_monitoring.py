@@ -5,6 +5,7 @@ import asyncio
 import logging
 import numpy as np
 from .query_fed_core import QueryPlan
+from .querry_fed_profiling import ANY_SHAPE, CostCalibrator
 
 @dataclass
 class QueryMetrics:
@@ -23,6 +24,7 @@ class QueryMetrics:
     cache_misses: int = 0
     error_count: int = 0
     source_metrics: Dict[str, Dict[str, float]] = None
+    subquery_timings: List[Dict[str, Any]] = None
 
 @dataclass
 class SourceMetrics:
@@ -38,7 +40,8 @@ class SourceMetrics:
 class FederationMonitor:
     """Monitors federated query execution."""
     
-    def __init__(self):
+    def __init__(self, calibrator: Optional[CostCalibrator] = None):
+        self.calibrator = calibrator
         self.active_queries: Dict[str, QueryMetrics] = {}
         self.source_metrics: Dict[str, SourceMetrics] = {}
         self.history: List[QueryMetrics] = []
@@ -52,7 +55,8 @@ class FederationMonitor:
                 self.active_queries[query_id] = QueryMetrics(
                     query_id=query_id,
                     start_time=datetime.utcnow(),
-                    source_metrics={}
+                    source_metrics={},
+                    subquery_timings=[]
                 )
                 self.logger.info(f"Started monitoring query {query_id}")
         except Exception as e:
@@ -124,6 +128,46 @@ class FederationMonitor:
         except Exception as e:
             self.logger.error(f"Error updating query metrics: {e}")
     
+    async def record_subquery(self,
+                            query_id: str,
+                            source_id: str,
+                            timing: Dict[str, Any]) -> None:
+        """Record queue and execution time for one subquery of a query."""
+        try:
+            async with self._lock:
+                if query_id in self.active_queries:
+                    query_metrics = self.active_queries[query_id]
+                    query_metrics.subquery_timings.append(
+                        dict(timing, source_id=source_id)
+                    )
+                    
+                    # Roll timings up per source
+                    totals = query_metrics.source_metrics.setdefault(source_id, {})
+                    totals['subqueries'] = totals.get('subqueries', 0) + 1
+                    for key in ('queue_time_ms', 'exec_time_ms', 'rows', 'bytes'):
+                        totals[key] = totals.get(key, 0) + timing.get(key, 0)
+                    if timing.get('error'):
+                        query_metrics.error_count += 1
+                        
+            # Calibrate even when the query itself is not being tracked
+            if self.calibrator and timing.get('started', True):
+                save_due = self.calibrator.observe(
+                    source_id,
+                    timing.get('operation', ANY_SHAPE),
+                    timing.get('predicate_shape', ANY_SHAPE),
+                    timing['exec_time_ms'],
+                    rows=timing.get('rows', 0),
+                    bytes_read=timing.get('bytes', 0),
+                    error=bool(timing.get('error')),
+                    autosave=False
+                )
+                if save_due:
+                    # Write the calibration file without blocking the loop
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(None, self.calibrator.save)
+        except Exception as e:
+            self.logger.error(f"Error recording subquery metrics: {e}")
+    
     async def update_source_metrics(self,
                                   source_id: str,
                                   metrics: Dict[str, Any]) -> None:
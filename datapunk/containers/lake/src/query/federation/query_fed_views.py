@@ -0,0 +1,323 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .adapters.fed_adapter_base import BoundQuery
+from .fed_merger import MergeConfig, MergeStrategy, ResultMerger
+from .fed_planner import DataSource, DataSourceType
+from .query_fed_core import to_arrow_table
+from .query_fed_executor import QueryResult
+
+VIEW_SOURCE = "lake_views"
+
+def query_fingerprint(query: Any) -> str:
+    """Fingerprint a query so equivalent spellings of it match.
+    
+    Unlike predicate shapes, literals are kept: a view answers only the
+    exact query it was defined for.
+    """
+    if isinstance(query, str):
+        text = re.sub(r"\s+", " ", query.strip().rstrip(";")).lower()
+    elif isinstance(query, dict):
+        text = json.dumps(query, sort_keys=True, default=str)
+    else:
+        text = repr(query)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+@dataclass
+class ChangeBatch:
+    """Rows changed at a source since a change token."""
+    upserts: List[Dict[str, Any]]
+    deletes: List[Dict[str, Any]]  # Only key columns are needed
+    token: Any  # Passed back on the next poll
+
+class ChangeFeed:
+    """Reads changes from a source since a previously returned token.
+    
+    A ``None`` token asks for the full current contents.
+    """
+    
+    def changes(self, since: Any) -> ChangeBatch:
+        raise NotImplementedError
+
+class WatermarkFeed(ChangeFeed):
+    """Change feed over a monotonically increasing column such as updated_at.
+    
+    Rows at the watermark are re-read each poll, so writes sharing the
+    last seen timestamp are not missed. Hard deletes are not visible.
+    """
+    
+    def __init__(self, adapter: Any, table: str, column: str,
+                 columns: Optional[List[str]] = None, where: Optional[str] = None):
+        self.adapter = adapter
+        self.table = table
+        self.column = column
+        self.columns = columns
+        self.where = where
+    
+    def changes(self, since: Any) -> ChangeBatch:
+        columns = ', '.join(self.columns) if self.columns else '*'
+        clauses = [f"({self.where})"] if self.where else []
+        params: Dict[str, Any] = {}
+        if since is not None:
+            clauses.append(f"{self.column} >= :since")
+            params["since"] = since
+        sql = f"SELECT {columns} FROM {self.table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        
+        rows = to_arrow_table(self.adapter.execute_query(BoundQuery(sql, params))).to_pylist()
+        marks = [row[self.column] for row in rows if row.get(self.column) is not None]
+        token = max(marks) if marks else since
+        return ChangeBatch(rows, [], token)
+
+class ContinuousAggregateFeed(WatermarkFeed):
+    """Change feed over a Timescale continuous aggregate.
+    
+    The aggregate is maintained by Timescale; recent buckets can still
+    change, so everything from ``refresh_lag`` before the newest bucket
+    seen is re-read each poll.
+    """
+    
+    def __init__(self, adapter: Any, view_name: str, bucket_column: str,
+                 refresh_lag: Any, columns: Optional[List[str]] = None):
+        super().__init__(adapter, view_name, bucket_column, columns)
+        self.refresh_lag = refresh_lag
+    
+    def changes(self, since: Any) -> ChangeBatch:
+        batch = super().changes(since)
+        if batch.token is not None and batch.token != since:
+            batch.token = batch.token - self.refresh_lag
+        return batch
+
+class MongoChangeStreamFeed(ChangeFeed):
+    """Change feed over a MongoDB change stream, resumed by token."""
+    
+    def __init__(self, collection: Any, max_changes: int = 10000):
+        self.collection = collection
+        self.max_changes = max_changes
+    
+    def changes(self, since: Any) -> ChangeBatch:
+        upserts: List[Dict[str, Any]] = []
+        deletes: List[Dict[str, Any]] = []
+        with self.collection.watch(full_document="updateLookup",
+                                   resume_after=since) as stream:
+            if since is None:
+                # Open the stream first so writes during the load are replayed
+                upserts = list(self.collection.find())
+            else:
+                for _ in range(self.max_changes):
+                    change = stream.try_next()
+                    if change is None:
+                        break
+                    if change["operationType"] == "delete":
+                        deletes.append(change["documentKey"])
+                    elif change.get("fullDocument") is not None:
+                        upserts.append(change["fullDocument"])
+            return ChangeBatch(upserts, deletes, stream.resume_token)
+
+class PollingFeed(ChangeFeed):
+    """Change feed backed by a callable returning a ChangeBatch."""
+    
+    def __init__(self, poll: Callable[[Any], ChangeBatch]):
+        self.poll = poll
+    
+    def changes(self, since: Any) -> ChangeBatch:
+        return self.poll(since)
+
+@dataclass
+class ViewSource:
+    """One source feeding a materialized view."""
+    source_id: str
+    feed: ChangeFeed
+    key_columns: List[str]
+    source_type: DataSourceType = DataSourceType.RELATIONAL
+
+@dataclass
+class MaterializedViewDefinition:
+    """A federated query whose result is kept in the lake."""
+    name: str
+    query: Any  # The federated query this view answers
+    sources: List[ViewSource]
+    merge: MergeConfig = field(default_factory=lambda: MergeConfig(MergeStrategy.UNION))
+    refresh_interval: float = 60.0  # Seconds between background refreshes
+
+class MaterializedView:
+    """A materialized view's stored partial results and freshness.
+    
+    Each source's rows are kept keyed and patched from its change feed;
+    the combined result is rebuilt locally only when a source changed.
+    """
+    
+    def __init__(self, definition: MaterializedViewDefinition,
+                 merger: Optional[ResultMerger] = None):
+        self.definition = definition
+        self.fingerprint = query_fingerprint(definition.query)
+        self.merger = merger or ResultMerger()
+        self.rows: Dict[str, Dict[Tuple, Dict[str, Any]]] = {
+            s.source_id: {} for s in definition.sources}
+        self.tokens: Dict[str, Any] = {}
+        self.refreshed_at: Dict[str, float] = {}
+        self.table: Optional[pa.Table] = None
+        self.refreshes = 0
+        self.hits = 0
+        self.lock = threading.Lock()
+    
+    @property
+    def name(self) -> str:
+        return self.definition.name
+    
+    def staleness(self, now: Optional[float] = None) -> float:
+        """Seconds since the least recently refreshed source was read."""
+        if self.table is None or len(self.refreshed_at) < len(self.definition.sources):
+            return float('inf')
+        return (now or time.time()) - min(self.refreshed_at.values())
+    
+    def refresh(self) -> int:
+        """Apply each source's changes, returning the number of rows changed."""
+        with self.lock:
+            changed = 0
+            for source in self.definition.sources:
+                checked_at = time.time()
+                batch = source.feed.changes(self.tokens.get(source.source_id))
+                changed += self._apply(source, batch)
+                self.tokens[source.source_id] = batch.token
+                # Data is as fresh as the moment the feed was read
+                self.refreshed_at[source.source_id] = checked_at
+            if changed or self.table is None:
+                self.table = self._combine()
+            self.refreshes += 1
+            return changed
+    
+    def _apply(self, source: ViewSource, batch: ChangeBatch) -> int:
+        rows = self.rows[source.source_id]
+        keys = source.key_columns
+        changed = 0
+        for row in batch.upserts:
+            key = tuple(row.get(k) for k in keys)
+            # Feeds re-read rows at their watermark; those are not changes
+            if rows.get(key) != row:
+                rows[key] = row
+                changed += 1
+        for row in batch.deletes:
+            if rows.pop(tuple(row.get(k) for k in keys), None) is not None:
+                changed += 1
+        return changed
+    
+    def _combine(self) -> pa.Table:
+        results = [
+            QueryResult(source=DataSource(s.source_id, s.source_type, set(), {}, {}),
+                        data=list(self.rows[s.source_id].values()), metadata={})
+            for s in self.definition.sources
+        ]
+        return self.merger.merge_arrow(results, self.definition.merge)
+    
+    def save(self, directory: str) -> None:
+        """Persist partial results and change tokens under a directory."""
+        os.makedirs(directory, exist_ok=True)
+        for source_id, rows in self.rows.items():
+            pq.write_table(to_arrow_table(list(rows.values())),
+                           os.path.join(directory, f"{source_id}.parquet"))
+        state = {"tokens": self.tokens, "refreshed_at": self.refreshed_at}
+        tmp = os.path.join(directory, "state.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f, default=str)
+        os.replace(tmp, os.path.join(directory, "state.json"))
+    
+    def load(self, directory: str) -> bool:
+        """Restore a saved view, returning False if nothing was saved."""
+        state_path = os.path.join(directory, "state.json")
+        if not os.path.exists(state_path):
+            return False
+        with open(state_path) as f:
+            state = json.load(f)
+        for source in self.definition.sources:
+            path = os.path.join(directory, f"{source.source_id}.parquet")
+            if os.path.exists(path):
+                self._apply(source, ChangeBatch(pq.read_table(path).to_pylist(), [], None))
+        # Tokens come back as strings; feeds compare them as source literals
+        self.tokens = state["tokens"]
+        self.refreshed_at = state["refreshed_at"]
+        self.table = self._combine()
+        return True
+
+class MaterializedViewManager:
+    """Registry of federated materialized views stored in the lake.
+    
+    Registered with a FederatedQueryExecutor under ``VIEW_SOURCE``, it
+    serves view reads; the planner asks ``match`` whether a query can
+    be answered from a view within its staleness bound.
+    """
+    
+    def __init__(self, storage_path: Optional[str] = None):
+        self.storage_path = storage_path
+        self.views: Dict[str, MaterializedView] = {}
+        self.by_fingerprint: Dict[str, MaterializedView] = {}
+        self.source = DataSource(VIEW_SOURCE, DataSourceType.OBJECT_STORE,
+                                 {"select"}, {}, {})
+        self.logger = logging.getLogger(__name__)
+    
+    def define(self, definition: MaterializedViewDefinition) -> MaterializedView:
+        """Register a view, restoring its stored contents if present."""
+        view = MaterializedView(definition)
+        if self.storage_path:
+            view.load(os.path.join(self.storage_path, definition.name))
+        self.views[definition.name] = view
+        self.by_fingerprint[view.fingerprint] = view
+        return view
+    
+    def drop(self, name: str) -> None:
+        """Unregister a view."""
+        view = self.views.pop(name, None)
+        if view:
+            self.by_fingerprint.pop(view.fingerprint, None)
+    
+    def refresh(self, name: str) -> int:
+        """Refresh one view from its sources' change feeds."""
+        view = self.views[name]
+        changed = view.refresh()
+        if self.storage_path:
+            view.save(os.path.join(self.storage_path, name))
+        return changed
+    
+    def refresh_due(self) -> List[str]:
+        """Refresh views older than their refresh interval."""
+        refreshed = []
+        for name, view in list(self.views.items()):
+            if view.staleness() >= view.definition.refresh_interval:
+                try:
+                    self.refresh(name)
+                    refreshed.append(name)
+                except Exception as e:
+                    self.logger.error(f"Refreshing view {name} failed: {e}")
+        return refreshed
+    
+    async def maintain(self, poll_interval: float = 1.0) -> None:
+        """Keep views fresh until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.refresh_due)
+            await asyncio.sleep(poll_interval)
+    
+    def match(self, query: Any, max_staleness: float) -> Optional[MaterializedView]:
+        """Find a view answering a query that is fresh enough."""
+        view = self.by_fingerprint.get(query_fingerprint(query))
+        if view and view.staleness() <= max_staleness:
+            return view
+        return None
+    
+    def execute(self, name: str) -> pa.Table:
+        """Read a view's current contents."""
+        view = self.views[name]
+        if view.table is None:
+            raise ValueError(f"View {name} has not been refreshed")
+        view.hits += 1
+        return view.table
@@ -1,9 +1,19 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, AsyncIterator, Awaitable, Callable, Iterator
 from dataclasses import dataclass
 from enum import Enum
+import asyncio
+import csv
+import io
 import logging
 import json
 
+# Content types for the wire formats supported by StreamingResultFormatter.stream
+STREAM_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
 class FormatStyle(Enum):
     """Query formatting styles."""
     COMPACT = "compact"
@@ -212,6 +222,213 @@ class StreamingResultFormatter(ResultFormatter):
             self.logger.error(f"Error ending batch: {e}")
             return str(e)
 
+    async def stream(self,
+                     rows: Iterator[Dict[str, Any]],
+                     format_type: str = "ndjson",
+                     is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                     schema: Optional[Any] = None
+                     ) -> AsyncIterator[bytes]:
+        """Encode an operator iterator as a chunked byte stream.
+
+        Rows are pulled one batch at a time on a worker thread, so the
+        operator tree only advances when the consumer asks for the next
+        chunk. The iterator is closed when the stream ends, fails, is
+        cancelled, or ``is_disconnected`` reports that the client left.
+        ``schema`` declares the Arrow schema instead of inferring it.
+        """
+        if format_type not in STREAM_MEDIA_TYPES:
+            raise ValueError(f"Unsupported stream format: {format_type}")
+
+        encoder = _BatchEncoder.create(format_type, self._headers, schema)
+        loop = asyncio.get_running_loop()
+        pending: Optional[asyncio.Future] = None
+        self.rows_streamed = 0
+        self.bytes_streamed = 0
+
+        def next_batch() -> List[Dict[str, Any]]:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    break
+            return batch
+
+        try:
+            while True:
+                if is_disconnected is not None and await is_disconnected():
+                    self.logger.info("Client disconnected, cancelling stream")
+                    break
+
+                pending = loop.run_in_executor(None, next_batch)
+                batch = await pending
+                pending = None
+                if not batch:
+                    break
+
+                chunk = encoder.encode(batch)
+                self.rows_streamed += len(batch)
+                if chunk:
+                    self.bytes_streamed += len(chunk)
+                    yield chunk
+
+            tail = encoder.finish()
+            if tail:
+                self.bytes_streamed += len(tail)
+                yield tail
+        finally:
+            _close_rows(rows, pending)
+
+def _close_rows(rows: Iterator[Dict[str, Any]],
+                pending: Optional[asyncio.Future]) -> None:
+    """Close an operator iterator, waiting for an in-flight batch pull."""
+    close = getattr(rows, 'close', None)
+    if close is None:
+        return
+    if pending is not None and not pending.done():
+        # The worker thread still owns the generator; close it afterwards
+        pending.add_done_callback(lambda _: close())
+    else:
+        close()
+
+class _BatchEncoder:
+    """Incrementally encodes row batches into one wire format."""
+
+    def __init__(self, headers: Optional[List[str]] = None):
+        self.headers = headers
+
+    @staticmethod
+    def create(format_type: str, headers: Optional[List[str]] = None,
+               schema: Optional[Any] = None) -> '_BatchEncoder':
+        if format_type == 'ndjson':
+            return _NDJSONEncoder(headers)
+        elif format_type == 'csv':
+            return _CSVEncoder(headers)
+        return _ArrowStreamEncoder(headers, schema=schema)
+
+    def encode(self, batch: List[Dict[str, Any]]) -> bytes:
+        raise NotImplementedError
+
+    def finish(self) -> bytes:
+        return b''
+
+class _NDJSONEncoder(_BatchEncoder):
+    """One JSON document per line."""
+
+    def encode(self, batch: List[Dict[str, Any]]) -> bytes:
+        return ''.join(json.dumps(row, default=str) + '\n' for row in batch).encode('utf-8')
+
+class _CSVEncoder(_BatchEncoder):
+    """RFC 4180 CSV with a header row taken from the first batch."""
+
+    def __init__(self, headers: Optional[List[str]] = None):
+        super().__init__(headers)
+        self._header_written = False
+
+    def encode(self, batch: List[Dict[str, Any]]) -> bytes:
+        if self.headers is None:
+            self.headers = list(batch[0].keys())
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=self.headers, extrasaction='ignore')
+        if not self._header_written:
+            writer.writeheader()
+            self._header_written = True
+        writer.writerows(batch)
+        return out.getvalue().encode('utf-8')
+
+class _ArrowStreamEncoder(_BatchEncoder):
+    """Arrow IPC stream with one schema for every batch.
+
+    The schema is either declared up front or inferred: batches are held
+    back while any column has only nulls (up to ``infer_rows`` rows) and
+    their schemas are unified. Later batches are cast to that schema;
+    columns it lacks are ignored, as with CSV. An empty result still
+    produces a schema message and end-of-stream marker.
+    """
+
+    def __init__(self, headers: Optional[List[str]] = None,
+                 schema: Optional[Any] = None, infer_rows: int = 10000):
+        super().__init__(headers)
+        import pyarrow as pa
+        self._pa = pa
+        self._sink = io.BytesIO()
+        self._writer = None
+        self._schema = schema
+        self._infer_rows = infer_rows
+        self._pending: List[Any] = []
+        self._pending_rows = 0
+
+    def encode(self, batch: List[Dict[str, Any]]) -> bytes:
+        pa = self._pa
+        table = pa.Table.from_pylist(batch)
+        if self._writer is not None or self._schema is not None:
+            self._write(table)
+            return self._drain()
+
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        schema = self._unified_schema()
+        untyped = any(pa.types.is_null(field.type) for field in schema)
+        if not untyped or self._pending_rows >= self._infer_rows:
+            self._schema = schema
+            self._flush_pending()
+        return self._drain()
+
+    def finish(self) -> bytes:
+        pa = self._pa
+        if self._writer is None:
+            if self._schema is None:
+                if self._pending:
+                    self._schema = self._unified_schema()
+                else:
+                    self._schema = pa.schema(
+                        [(name, pa.null()) for name in self.headers or []])
+            self._flush_pending()
+        self._writer.close()
+        return self._drain()
+
+    def _unified_schema(self) -> Any:
+        pa = self._pa
+        schema = pa.unify_schemas([table.schema for table in self._pending],
+                                  promote_options='permissive')
+        if self.headers:
+            schema = pa.schema([schema.field(name) for name in self.headers
+                                if name in schema.names])
+        return schema
+
+    def _flush_pending(self) -> None:
+        self._writer = self._pa.ipc.new_stream(self._sink, self._schema)
+        for table in self._pending:
+            self._write(table)
+        self._pending = []
+
+    def _write(self, table: Any) -> None:
+        """Cast a batch to the stream schema and write it."""
+        pa = self._pa
+        if self._writer is None:
+            self._writer = pa.ipc.new_stream(self._sink, self._schema)
+        columns = []
+        for field in self._schema:
+            if field.name not in table.column_names:
+                columns.append(pa.nulls(table.num_rows, field.type))
+                continue
+            column = table.column(field.name)
+            if column.type != field.type:
+                try:
+                    column = column.cast(field.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    raise ValueError(
+                        f"Column {field.name!r} changed type from {field.type} "
+                        f"to {column.type} mid-stream; declare the stream schema"
+                    ) from e
+            columns.append(column)
+        self._writer.write_table(pa.Table.from_arrays(columns, schema=self._schema))
+
+    def _drain(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
 class ProgressFormatter:
     """Formats query execution progress."""
     
@@ -3,6 +3,9 @@ import json
 import numpy as np
 from datetime import datetime, date
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from .formatter_core import ResultFormatter
 
 class TimeSeriesFormatter(ResultFormatter):
@@ -611,4 +614,74 @@ class GraphFormatter(ResultFormatter):
                 count += 1
                 dfs(node)
         
-        return count 
\ No newline at end of file
+        return count 
+
+class ArrowFormatter(ResultFormatter):
+    """Writes columnar results straight from Arrow record batches."""
+    
+    def format_table(self,
+                    data: Any,
+                    headers: Optional[List[str]] = None,
+                    format_type: str = "text") -> str:
+        """Format results; CSV is written from the columns directly."""
+        try:
+            table = self._as_table(data, headers)
+            if format_type == "csv":
+                return self.to_csv(table).decode("utf-8")
+            return super().format_table(table.to_pylist(), headers, format_type)
+        except Exception as e:
+            self.logger.error(f"Error formatting Arrow table: {e}")
+            return str(e)
+    
+    def to_ipc(self, data: Any, headers: Optional[List[str]] = None) -> bytes:
+        """Serialize results as an Arrow IPC stream."""
+        table = self._as_table(data, headers)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    
+    def to_parquet(self, data: Any, headers: Optional[List[str]] = None,
+                   compression: str = "zstd") -> bytes:
+        """Serialize results as a Parquet file."""
+        table = self._as_table(data, headers)
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, compression=compression)
+        return sink.getvalue().to_pybytes()
+    
+    def to_csv(self, data: Any, headers: Optional[List[str]] = None) -> bytes:
+        """Serialize results as CSV with a header row."""
+        table = self._as_table(data, headers)
+        sink = pa.BufferOutputStream()
+        pa_csv.write_csv(table, sink)
+        return sink.getvalue().to_pybytes()
+    
+    def write(self, data: Any, sink: Any, format_type: str = "parquet",
+              headers: Optional[List[str]] = None) -> None:
+        """Write results to a path or file-like sink."""
+        table = self._as_table(data, headers)
+        if format_type == "parquet":
+            pq.write_table(table, sink, compression="zstd")
+        elif format_type == "arrow":
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+        elif format_type == "csv":
+            pa_csv.write_csv(table, sink)
+        else:
+            raise ValueError(f"Unsupported format type: {format_type}")
+    
+    def _as_table(self, data: Any, headers: Optional[List[str]] = None) -> pa.Table:
+        """Accept tables, record batches, DataFrames or row dicts."""
+        if isinstance(data, pa.RecordBatch):
+            table = pa.Table.from_batches([data])
+        elif isinstance(data, list) and data and isinstance(data[0], pa.RecordBatch):
+            table = pa.Table.from_batches(data)
+        elif isinstance(data, pd.DataFrame):
+            table = pa.Table.from_pandas(data, preserve_index=False)
+        elif isinstance(data, pa.Table):
+            table = data
+        else:
+            table = pa.Table.from_pylist(list(data or []))
+        if headers:
+            table = table.select(headers)
+        return table
@@ -1,4 +1,4 @@
-from typing import List, Optional, Set
+from typing import Dict, List, Optional, Set
 from .optimizer_core import OptimizationRule
 from ..parser.query_parser_core import QueryPlan, QueryNode
 
@@ -106,11 +106,26 @@ class JoinReordering(OptimizationRule):
         return root
 
 class ColumnPruning(OptimizationRule):
-    """Optimization rule that removes unused columns early in the query plan."""
+    """Optimization rule that removes unused columns early in the query plan.
+    
+    With late materialization enabled, columns only needed by the final
+    projection are deferred: scans emit row ids plus the columns that
+    predicates and join keys reference, and a materialize node below the
+    final projection fetches the rest by row id.
+    """
+    
+    # Operators that keep row identity and can carry row ids upwards
+    ROW_PRESERVING_OPERATIONS = {'table_scan', 'filter', 'join', 'project', 'sort', 'limit'}
+    
+    def __init__(self, late_materialization: bool = True):
+        self.late_materialization = late_materialization
     
     def apply(self, query_plan: QueryPlan) -> QueryPlan:
         """Remove unused columns from the query plan."""
         new_plan = query_plan.clone()
+        # Without a final projection or aggregate every scanned column is output
+        if new_plan.root.operation not in ('project', 'aggregate'):
+            return new_plan
         required_columns = self._find_required_columns(new_plan.root)
         
         def prune_columns(node: QueryNode) -> QueryNode:
@@ -125,8 +140,91 @@ class ColumnPruning(OptimizationRule):
             return node
             
         new_plan.root = prune_columns(new_plan.root)
+        if self.late_materialization:
+            new_plan.root = self._defer_columns(new_plan.root)
         return new_plan
     
+    def _defer_columns(self, root: QueryNode) -> QueryNode:
+        """Move columns only the final projection needs behind a materialize node."""
+        if root.operation != 'project' or not root.children:
+            return root
+            
+        nodes = self._collect_nodes(root.children[0])
+        if any(node.operation not in self.ROW_PRESERVING_OPERATIONS for node in nodes):
+            return root
+            
+        scans = [node for node in nodes if node.operation == 'table_scan']
+        table_counts: Dict[str, int] = {}
+        for scan in scans:
+            table_counts[scan.table_name] = table_counts.get(scan.table_name, 0) + 1
+            
+        # Columns operators below the final projection need eagerly
+        eager = set()
+        for node in nodes:
+            eager.update(self._operator_columns(node))
+            
+        final_columns = set(root.columns)
+        late_columns: Dict[str, List[str]] = {}
+        for scan in scans:
+            # Self-joins would emit clashing row ids
+            if table_counts[scan.table_name] > 1:
+                continue
+            deferred = [col for col in scan.columns
+                        if col in final_columns and col not in eager]
+            if not deferred:
+                continue
+            scan.columns = [col for col in scan.columns if col not in deferred]
+            scan.late_columns = deferred
+            late_columns[scan.table_name] = deferred
+            
+        if not late_columns:
+            return root
+            
+        # Intermediate projections must carry the row ids through
+        for node in nodes:
+            if node.operation == 'project':
+                node.row_id_tables = [
+                    scan.table_name for scan in self._collect_nodes(node)
+                    if scan.operation == 'table_scan'
+                    and scan.table_name in late_columns
+                ]
+                
+        root.children = [QueryNode(operation='materialize',
+                                   children=root.children,
+                                   late_columns=late_columns)]
+        return root
+    
+    def _collect_nodes(self, node: QueryNode) -> List[QueryNode]:
+        """Flatten a plan subtree in pre-order."""
+        nodes = [node]
+        for child in node.children:
+            nodes.extend(self._collect_nodes(child))
+        return nodes
+    
+    def _operator_columns(self, node: QueryNode) -> Set[str]:
+        """Columns a non-scan operator reads or must output."""
+        if node.operation == 'filter':
+            return self._extract_columns_from_predicate(node.predicate)
+        elif node.operation == 'join':
+            condition = getattr(node, 'join_condition', None) or {}
+            return {condition[side] for side in ('left', 'right') if side in condition}
+        elif node.operation == 'project':
+            return set(node.columns)
+        elif node.operation == 'aggregate':
+            columns = set(getattr(node, 'group_by', None) or [])
+            columns.update(agg['column'] for agg in getattr(node, 'aggregates', None) or []
+                           if agg.get('column'))
+            return columns
+        elif node.operation == 'sort':
+            columns = set()
+            for key in getattr(node, 'order_by', None) or []:
+                if isinstance(key, dict):
+                    columns.add(key.get('column'))
+                else:
+                    columns.add(key if isinstance(key, str) else key[0])
+            return columns
+        return set()
+    
     def estimate_cost(self, query_plan: QueryPlan) -> float:
         """Estimate the cost after column pruning."""
         def count_columns(node: QueryNode) -> int:
@@ -141,10 +239,8 @@ class ColumnPruning(OptimizationRule):
         """Find all columns required by the query."""
         required = set()
         
-        if node.operation == 'project':
-            required.update(node.columns)
-        elif node.operation == 'filter':
-            required.update(self._extract_columns_from_predicate(node.predicate))
+        if node.operation != 'table_scan':
+            required.update(self._operator_columns(node))
             
         for child in node.children:
             required.update(self._find_required_columns(child))
@@ -153,5 +249,15 @@ class ColumnPruning(OptimizationRule):
     
     def _extract_columns_from_predicate(self, predicate: dict) -> Set[str]:
         """Extract column names from a predicate."""
-        # Implementation depends on predicate format
-        return set()  # Simplified for now 
\ No newline at end of file
+        if not predicate:
+            return set()
+        if 'column' in predicate:
+            return {predicate['column']}
+        # Compound predicates: {'and': [...]} / {'or': [...]}
+        columns = set()
+        for value in predicate.values():
+            if isinstance(value, list):
+                for sub in value:
+                    if isinstance(sub, dict):
+                        columns.update(self._extract_columns_from_predicate(sub))
+        return columns 
\ No newline at end of file
@@ -12,6 +12,7 @@ from core.monitoring import MetricsCollector
 from asyncpg import create_pool, Pool
 import redis.asyncio as redis
 from ..config.storage_config import StorageConfig
+from ..storage.batch_writer import BatchWriter
 from ..storage.stores import VectorStore, TimeSeriesStore, SpatialStore
 from ..mesh.mesh_integrator import MeshIntegrator
 from datapunk_shared.utils.retry import with_retry, RetryConfig
@@ -47,6 +48,7 @@ class ServiceManager:
         self.vector_store: Optional[VectorStore] = None
         self.timeseries_store: Optional[TimeSeriesStore] = None
         self.spatial_store: Optional[SpatialStore] = None
+        self.batch_writer: Optional[BatchWriter] = None
         
         # Initialize PostgreSQL connection pool
         self.db_pool = await create_pool(
@@ -70,12 +72,20 @@ class ServiceManager:
         self.timeseries_store = TimeSeriesStore(self.db_pool)
         self.spatial_store = SpatialStore(self.db_pool)
         
+        # One COPY writer shared by every store batches ingestion per table
+        self.batch_writer = BatchWriter(self.db_pool)
+        await self.batch_writer.start()
+        for store in (self.vector_store, self.timeseries_store, self.spatial_store):
+            store.writer = self.batch_writer
+        
         # Initialize mesh integration
         self.mesh_integrator = MeshIntegrator(self.config)
         await self.mesh_integrator.initialize()
     
     async def cleanup(self):
         """Cleanup service connections"""
+        if self.batch_writer:
+            await self.batch_writer.close()
         if self.db_pool:
             await self.db_pool.close()
         if self.redis_client:
@@ -0,0 +1,294 @@
+
+# datapunk/containers/lake/src/storage/batch_writer.py
+
+# Batched COPY ingestion for the Lake Service stores
+# Rows are buffered per table and written with asyncpg's binary COPY
+# protocol instead of one INSERT per row:
+# - Flushes on batch size or age, whichever comes first
+# - Bounded buffers push back on producers instead of growing
+# - A batch ledger makes retried batches idempotent
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+import asyncio
+import logging
+import time
+import uuid
+
+LEDGER_TABLE = "lake_copy_batches"
+
+@dataclass
+class CopyTarget:
+    """How buffered rows reach a table.
+    
+    Rows are tuples matching ``columns``. When a column's type has no
+    binary COPY codec in asyncpg (geometry, vector), give ``staging_types``
+    and ``expressions``: rows are copied into a temporary staging table
+    and inserted with the expressions applied, e.g.
+    ``ST_GeomFromGeoJSON(geom)``.
+    """
+    table: str
+    columns: List[str]
+    staging_types: Optional[List[str]] = None
+    expressions: Optional[List[str]] = None
+    
+    @property
+    def staged(self) -> bool:
+        return self.staging_types is not None
+
+@dataclass
+class WriterStats:
+    """Counters describing batched writes."""
+    rows_written: int = 0
+    batches_written: int = 0
+    batches_skipped: int = 0  # Retries of batches that had already committed
+    retries: int = 0
+    failed_batches: int = 0
+    backpressure_waits: int = 0
+    flush_seconds: float = 0.0
+
+@dataclass
+class _Batch:
+    batch_id: uuid.UUID
+    rows: List[tuple]
+    waiters: List[Tuple[asyncio.Future, int]]  # (future, rows of that write here)
+
+@dataclass
+class _Buffer:
+    target: CopyTarget
+    rows: List[tuple] = field(default_factory=list)
+    waiters: List[Tuple[asyncio.Future, int]] = field(default_factory=list)
+    pending: int = 0  # Buffered plus in-flight rows, bounded for backpressure
+    oldest: float = 0.0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)  # One flush at a time keeps order
+
+class BatchWriter:
+    """Shared buffered writer that flushes rows to tables with COPY.
+    
+    Each batch is written in one transaction that also records its id in
+    a ledger table, so a retry after an ambiguous failure (such as a lost
+    commit acknowledgement) is skipped instead of duplicating rows.
+    Buffered rows are lost if the process dies before they are flushed;
+    callers needing durability pass ``wait=True``.
+    """
+    
+    def __init__(self, pool: Any, max_batch_rows: int = 5000,
+                 flush_interval: float = 0.5, max_buffered_rows: int = 50000,
+                 max_retries: int = 3, retry_delay: float = 0.2,
+                 ledger_retention: str = "1 day"):
+        self.pool = pool
+        self.max_batch_rows = max_batch_rows
+        self.flush_interval = flush_interval
+        self.max_buffered_rows = max(max_buffered_rows, max_batch_rows)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.ledger_retention = ledger_retention
+        self.buffers: Dict[str, _Buffer] = {}
+        self.failed: List[Tuple[str, List[tuple]]] = []  # Batches that exhausted retries
+        # Rows of one waited write may span batches; its future resolves when all commit
+        self._remaining: Dict[asyncio.Future, int] = {}
+        self.stats = WriterStats()
+        self._space = asyncio.Condition()
+        self._flushes: set = set()
+        self._ticker: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+    
+    def register(self, target: CopyTarget) -> None:
+        """Declare a table rows may be written to; repeat calls are ignored."""
+        if target.table not in self.buffers:
+            self.buffers[target.table] = _Buffer(target)
+    
+    async def start(self) -> None:
+        """Create the batch ledger and start the periodic flush."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+                batch_id uuid PRIMARY KEY,
+                table_name text NOT NULL,
+                row_count integer NOT NULL,
+                written_at timestamptz NOT NULL DEFAULT now()
+            )""")
+            await conn.execute(
+                f"DELETE FROM {LEDGER_TABLE} WHERE written_at < now() - $1::interval",
+                self.ledger_retention)
+        if self._ticker is None:
+            self._ticker = asyncio.create_task(self._tick())
+    
+    async def close(self) -> None:
+        """Flush everything buffered and stop the periodic flush."""
+        if self._ticker:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+            self._ticker = None
+        await self.flush()
+    
+    async def write(self, table: str, row: Sequence[Any], wait: bool = False) -> None:
+        """Buffer one row; see ``write_many``."""
+        await self.write_many(table, [row], wait=wait)
+    
+    async def write_many(self, table: str, rows: Iterable[Sequence[Any]],
+                         wait: bool = False) -> None:
+        """Buffer rows for a registered table.
+        
+        Blocks while the table's buffer is full. With ``wait`` it returns
+        only once every row is committed, raising if a batch failed.
+        """
+        buffer = self.buffers.get(table)
+        if buffer is None:
+            raise KeyError(f"No copy target registered for {table}")
+        rows = [tuple(row) for row in rows]
+        future = asyncio.get_running_loop().create_future() if wait else None
+        
+        start = 0
+        try:
+            while start < len(rows):
+                async with self._space:
+                    while buffer.pending >= self.max_buffered_rows:
+                        self.stats.backpressure_waits += 1
+                        await self._space.wait()
+                    room = self.max_buffered_rows - buffer.pending
+                    chunk = rows[start:start + room]
+                    if not buffer.rows:
+                        buffer.oldest = time.monotonic()
+                    buffer.rows.extend(chunk)
+                    buffer.pending += len(chunk)
+                    if future is not None:
+                        buffer.waiters.append((future, len(chunk)))
+                        self._remaining[future] = self._remaining.get(future, 0) + len(chunk)
+                    start += len(chunk)
+                if len(buffer.rows) >= self.max_batch_rows:
+                    self._spawn(self._flush_table(buffer))
+            if future is not None and rows:
+                await future
+        finally:
+            if future is not None:
+                # A cancelled caller leaves its rows buffered but stops waiting
+                future.cancel()
+                self._remaining.pop(future, None)
+    
+    async def flush(self, table: Optional[str] = None) -> None:
+        """Write out buffered rows now, for one table or all of them."""
+        buffers = [self.buffers[table]] if table else list(self.buffers.values())
+        await asyncio.gather(*(self._flush_table(b) for b in buffers))
+        # Size-triggered flushes may still hold rows taken before this call
+        while self._flushes:
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+    
+    def get_stats(self) -> WriterStats:
+        """Current writer counters."""
+        return self.stats
+    
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+    
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval / 2)
+            now = time.monotonic()
+            for buffer in list(self.buffers.values()):
+                if buffer.rows and now - buffer.oldest >= self.flush_interval:
+                    self._spawn(self._flush_table(buffer))
+    
+    async def _flush_table(self, buffer: _Buffer) -> None:
+        async with buffer.lock:
+            while buffer.rows:
+                rows = buffer.rows[:self.max_batch_rows]
+                del buffer.rows[:len(rows)]
+                waiters = self._take_waiters(buffer, len(rows))
+                if buffer.rows:
+                    buffer.oldest = time.monotonic()
+                batch = _Batch(uuid.uuid4(), rows, waiters)
+                try:
+                    await self._write_batch(buffer.target, batch)
+                finally:
+                    async with self._space:
+                        buffer.pending -= len(rows)
+                        self._space.notify_all()
+    
+    def _take_waiters(self, buffer: _Buffer, count: int) -> List[Tuple[asyncio.Future, int]]:
+        taken = []
+        while count and buffer.waiters:
+            future, rows = buffer.waiters[0]
+            used = min(rows, count)
+            taken.append((future, used))
+            count -= used
+            if used == rows:
+                buffer.waiters.pop(0)
+            else:
+                buffer.waiters[0] = (future, rows - used)
+        return taken
+    
+    async def _write_batch(self, target: CopyTarget, batch: _Batch) -> None:
+        """Write one batch, retrying with the same id until it commits."""
+        error: Optional[BaseException] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats.retries += 1
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            started = time.perf_counter()
+            try:
+                async with self.pool.acquire() as conn:
+                    written = await self._copy(conn, target, batch)
+            except Exception as e:
+                error = e
+                self.logger.warning(f"Writing batch {batch.batch_id} to {target.table} "
+                                    f"failed (attempt {attempt + 1}): {e}")
+                continue
+            self.stats.flush_seconds += time.perf_counter() - started
+            if written:
+                self.stats.rows_written += len(batch.rows)
+                self.stats.batches_written += 1
+            else:
+                self.stats.batches_skipped += 1
+            self._resolve(batch, None)
+            return
+        
+        self.stats.failed_batches += 1
+        self.failed.append((target.table, batch.rows))
+        self.logger.error(f"Dropping batch {batch.batch_id} of {len(batch.rows)} rows "
+                          f"for {target.table}: {error}")
+        self._resolve(batch, error)
+    
+    async def _copy(self, conn: Any, target: CopyTarget, batch: _Batch) -> bool:
+        """COPY a batch in one transaction; False if it was already written."""
+        async with conn.transaction():
+            status = await conn.execute(
+                f"INSERT INTO {LEDGER_TABLE} (batch_id, table_name, row_count) "
+                f"VALUES ($1, $2, $3) ON CONFLICT (batch_id) DO NOTHING",
+                batch.batch_id, target.table, len(batch.rows))
+            if status.endswith(" 0"):
+                return False
+            if not target.staged:
+                await conn.copy_records_to_table(target.table, records=batch.rows,
+                                                 columns=target.columns)
+                return True
+            
+            staging = f"{target.table}_staging"
+            definitions = ", ".join(f"{c} {t}" for c, t in zip(target.columns, target.staging_types))
+            await conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+                               f"({definitions}) ON COMMIT DELETE ROWS")
+            await conn.copy_records_to_table(staging, records=batch.rows,
+                                             columns=target.columns)
+            expressions = target.expressions or target.columns
+            await conn.execute(f"INSERT INTO {target.table} ({', '.join(target.columns)}) "
+                               f"SELECT {', '.join(expressions)} FROM {staging}")
+            return True
+    
+    def _resolve(self, batch: _Batch, error: Optional[BaseException]) -> None:
+        for future, rows in batch.waiters:
+            if future.done():
+                self._remaining.pop(future, None)
+                continue
+            if error is not None:
+                self._remaining.pop(future, None)
+                future.set_exception(error)
+                continue
+            self._remaining[future] -= rows
+            if self._remaining[future] == 0:
+                del self._remaining[future]
+                future.set_result(None)
@@ -1,4 +1,3 @@
-"""
 # datapunk/containers/lake/src/storage/cache.py
 
 # Advanced distributed caching system for the Lake Service
@@ -9,16 +8,21 @@
 # - Quorum-based replication
 # - Advanced monitoring and metrics
 
-from typing import Any, Dict, Optional, Union, List
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Union, List
 import asyncio
 import logging
+import math
 from datetime import datetime, timedelta
 import aioredis
 from enum import Enum
 import hashlib
-import pickle
 from dataclasses import dataclass
 from ..ingestion.monitoring import HandlerMetrics, MetricType
+from .cache_batching import GetCoalescer, fetch_many, store_many
+from .cache_maintenance import KeyspaceScanner, SampledEvictor
+from .near_cache import CacheMetrics, InvalidationBus, NearCache
+from .serialization import Serializer
+from datapunk_shared.cache.stampede import RedisLock, Stamped, StampedeGuard
 from .cache_strategies import (
     EvictionStrategy,
     CacheWarmer,
@@ -31,12 +35,15 @@ from .cache_strategies import (
     ReplicationManager,
     EnhancedMetrics,
     MLBasedWarming,
-    SeasonalWarming,
-    QuorumReplication
+    SeasonalWarming
 )
+from .quorum import QuorumReplication
 
 logger = logging.getLogger(__name__)
 
+# Marks values written by get_or_load, which carry their freshness
+STAMP_TAG = "__stamped__"
+
 class CacheStrategy(Enum):
     """Cache eviction strategies for optimizing memory usage and hit rates.
     
@@ -69,7 +76,7 @@ class CacheConfig:
     Why these settings matter:
     - Strategy selection affects hit rates
     - TTL controls data freshness
-    - Compression trades CPU for memory
+    - Compression trades CPU for memory; small values skip it
     - Distributed settings enable scaling
     - Warming improves hit rates
     
@@ -82,6 +89,8 @@ class CacheConfig:
     - Higher replication factor increases consistency but reduces write performance
     - Larger access pattern window improves prediction but increases memory usage
     - ML updates consume CPU resources
+    - A longer coalesce window merges more gets per round-trip but
+      adds that much latency to each
     
     TODO: Add dynamic configuration updates
     TODO: Implement configuration validation
@@ -91,7 +100,29 @@ class CacheConfig:
     ttl: int = 3600  # Default 1 hour TTL
     max_size: int = 1000  # Maximum number of items
     compression: bool = True
-    serializer: str = "json"  # or "pickle" for complex objects
+    compression_algorithm: str = "lz4"  # or "zlib" for a better ratio
+    compression_threshold: int = 1024  # Bytes; smaller values are stored as-is
+    serializer: str = "msgpack"  # "json", "pickle" or a registered format
+    legacy_serializer: str = "json"  # Format of values written before framing
+    coalesce_window: float = 0.002  # Seconds concurrent gets wait to share an MGET
+    batch_size: int = 500  # Keys per MGET or pipeline
+    maintenance_interval: float = 1.0  # Seconds between maintenance ticks
+    maintenance_budget: float = 0.05  # Seconds of Redis work per tick and task
+    scan_count: int = 1000  # SCAN COUNT hint per step
+    key_prefix: str = ""  # Maintenance scans and evicts only keys starting with this
+    eviction_samples: int = 16  # Keys scored per eviction round
+    max_evictions_per_tick: int = 1000
+    near_cache: bool = False  # In-process L1 in front of Redis for hot keys
+    near_cache_entries: int = 10000
+    near_cache_bytes: int = 64 * 1024 * 1024
+    near_cache_ttl: float = 5.0  # Seconds; bounds staleness if invalidations are lost
+    invalidation_channel: str = "lake:cache:invalidate"
+    max_invalidation_lag: float = 1.0  # Seconds without heartbeats before L1 is bypassed
+    stale_ttl: int = 60  # Seconds get_or_load serves stale values while refreshing
+    xfetch_beta: float = 1.0  # >1 refreshes hot keys earlier ahead of expiry
+    stampede_lock: bool = True  # One loader per key across nodes, not just per process
+    stampede_lock_ttl: float = 10.0  # Seconds; frees the lock if its holder dies
+    stampede_lock_wait: float = 5.0  # Seconds a miss waits on another node's load
     distributed: bool = False
     nodes: Optional[List[Dict[str, Any]]] = None
     replication_factor: int = 2
@@ -100,6 +131,7 @@ class CacheConfig:
     access_pattern_window: int = 3600
     read_quorum: int = 2
     write_quorum: int = 2
+    hedge_percentile: float = 0.95  # Latency percentile after which reads ask another replica
     ml_update_interval: int = 3600
     seasonal_threshold: float = 0.7
     probability_threshold: float = 0.7
@@ -158,6 +190,53 @@ class Cache:
         self.config = config
         self.enhanced_metrics = EnhancedMetrics(metrics)
         self._cleanup_task: Optional[asyncio.Task] = None
+        self.serializers: Dict[str, Serializer] = {}
+        
+        # Concurrent single-key gets share one MGET per connection
+        self.coalescer = GetCoalescer(
+            self._fetch_raw_many,
+            config.coalesce_window,
+            config.batch_size
+        )
+        
+        # Optional L1 tier; writes invalidate every node's copy over pub/sub
+        self.metrics = CacheMetrics()
+        self.near: Optional[NearCache] = None
+        self.invalidation: Optional[InvalidationBus] = None
+        if config.near_cache:
+            self.near = NearCache(
+                config.near_cache_entries,
+                config.near_cache_bytes,
+                config.near_cache_ttl,
+                self.metrics
+            )
+            self.invalidation = InvalidationBus(
+                redis,
+                self.near,
+                config.invalidation_channel,
+                config.max_invalidation_lag
+            )
+        
+        # Misses through get_or_load are loaded once, not once per caller
+        self.stampede = StampedeGuard(
+            self._read_stamped,
+            self._write_stamped,
+            self._stampede_lock if config.stampede_lock else None,
+            config.xfetch_beta,
+            config.stale_ttl,
+            config.stampede_lock_wait
+        )
+        
+        # Incremental maintenance; eviction samples from its own cursor
+        # so expiry sweeps and eviction progress independently
+        match = f"{config.key_prefix}*"
+        self.sweeper = KeyspaceScanner(redis, match, config.scan_count)
+        self.evictor = SampledEvictor(
+            redis,
+            KeyspaceScanner(redis, match, config.scan_count),
+            config.strategy.value,
+            config.eviction_samples
+        )
         
         # Initialize access pattern tracking for ML-based optimization
         self.access_pattern = AccessPattern(config.access_pattern_window)
@@ -184,7 +263,8 @@ class Cache:
             self.quorum = QuorumReplication(
                 config.nodes,
                 config.read_quorum,
-                config.write_quorum
+                config.write_quorum,
+                config.hedge_percentile
             )
         
         # Initialize ML-based cache warming strategies
@@ -243,6 +323,9 @@ class Cache:
         """
         self._cleanup_task = asyncio.create_task(self._periodic_cleanup())
         
+        if self.invalidation:
+            await self.invalidation.start()
+        
         if self.warmer:
             await self.warmer.start()
             for pattern, config in self.config.warm_patterns.items():
@@ -278,6 +361,12 @@ class Cache:
                 await self._cleanup_task
             except asyncio.CancelledError:
                 pass
+        
+        await self.coalescer.close()
+        await self.stampede.close()
+        
+        if self.invalidation:
+            await self.invalidation.stop()
                 
         if self.warmer:
             await self.warmer.stop()
@@ -316,6 +405,14 @@ class Cache:
         success = False
         
         try:
+            if self.near is not None:
+                found, result = self.near.get(key)
+                if found:
+                    self.access_pattern.record_access(key)
+                    success = True
+                    return result
+            token = self.near.token() if self.near is not None else None
+            
             if self.quorum:
                 # Read with quorum consensus for consistency
                 value, nodes, consistent = await self.quorum.read(key)
@@ -341,12 +438,27 @@ class Cache:
                     value,
                     format or self.config.serializer
                 )
+                self._fill_near(key, result, len(value), token)
                 
                 success = True
                 return result
             else:
-                # Single node get operation
-                return await super().get(key, default, format)
+                # Single node get, batched with concurrent gets
+                value = await self.coalescer.get(key)
+                if value is None:
+                    return default
+                    
+                self.access_pattern.record_access(key)
+                await self.strategy.record_access(key)
+                
+                result = await self._deserialize(
+                    value,
+                    format or self.config.serializer
+                )
+                self._fill_near(key, result, len(value), token)
+                
+                success = True
+                return result
                 
         except Exception as e:
             logger.error(f"Cache get error: {str(e)}")
@@ -363,6 +475,27 @@ class Cache:
                 }
             )
     
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None
+    ) -> Any:
+        """Read-through get that keeps misses on hot keys from stampeding.
+        
+        Why this matters:
+        - An expiring hot key otherwise sends every reader to the backend
+        - Concurrent misses share one load, cluster-wide with stampede_lock
+        - Hot keys refresh early in the background (XFetch), and expired
+          ones are served stale for stale_ttl while one refresh runs
+        
+        Implementation Notes:
+        - Entries hold the value with its load time and freshness, so keys
+          filled here should be read back through get_or_load
+        - Loader exceptions reach every caller sharing the load
+        """
+        return await self.stampede.get_or_load(key, loader, ttl or self.config.ttl)
+    
     async def set(
         self,
         key: str,
@@ -384,7 +517,7 @@ class Cache:
         - Format for serialization
         - Access pattern updates
         
-        TODO: Add write batching
+        NOTE: Use set_many to write several keys in one round-trip
         TODO: Implement write-ahead logging
         FIXME: Add proper conflict resolution
         """
@@ -400,17 +533,24 @@ class Cache:
             
             if self.quorum:
                 # Write with quorum consensus
-                success, nodes = await self.quorum.write(key, data, ttl)
+                success, nodes = await self.quorum.write(key, data, ttl or self.config.ttl)
                 
                 # Update strategy metadata
                 if success:
+                    await self._invalidate_near([key])
                     self.access_pattern.record_access(key)
                     await self.strategy.record_access(key)
                     
                 return success
             else:
                 # Single node set operation
-                return await super().set(key, value, ttl, format)
+                redis = await self._get_connection(key)
+                await redis.set(key, data, ex=ttl or self.config.ttl)
+                await self._invalidate_near([key])
+                self.access_pattern.record_access(key)
+                await self.strategy.record_access(key)
+                success = True
+                return success
                 
         except Exception as e:
             logger.error(f"Cache set error: {str(e)}")
@@ -455,12 +595,19 @@ class Cache:
                 success, nodes = await self.quorum.write(key, b"", 1)  # TTL=1 for immediate deletion
                 
                 if success:
+                    await self._invalidate_near([key])
                     await self.strategy.remove_key(key)
                     
                 return success
             else:
                 # Single node delete operation
-                return await super().delete(key)
+                redis = await self._get_connection(key)
+                success = bool(await redis.delete(key))
+                await self._invalidate_near([key])
+                if success:
+                    await self.strategy.remove_key(key)
+                    
+                return success
                 
         except Exception as e:
             logger.error(f"Cache delete error: {str(e)}")
@@ -477,6 +624,130 @@ class Cache:
                 }
             )
     
+    async def get_many(
+        self,
+        keys: Iterable[str],
+        default: Any = None,
+        format: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get several items, with one MGET per connection and batch.
+        
+        Missing keys map to ``default``. Quorum reads of the keys run
+        concurrently rather than one after another.
+        """
+        keys = list(dict.fromkeys(keys))
+        await self.enhanced_metrics.record_operation_start("get_many", f"{len(keys)} keys")
+        found = 0
+        success = False
+        
+        try:
+            results = {}
+            if self.near is not None:
+                for key in keys:
+                    hit, value = self.near.get(key)
+                    if hit:
+                        results[key] = value
+                        self.access_pattern.record_access(key)
+                        found += 1
+            missing = [key for key in keys if key not in results]
+            token = self.near.token() if self.near is not None else None
+            
+            if self.quorum:
+                reads = await asyncio.gather(*(self.quorum.read(key) for key in missing))
+                values = [value or None for value, _, _ in reads]
+            else:
+                values = await self._fetch_raw_many(missing)
+            
+            for key, value in zip(missing, values):
+                if value is None:
+                    results[key] = default
+                    continue
+                results[key] = await self._deserialize(
+                    value,
+                    format or self.config.serializer
+                )
+                self._fill_near(key, results[key], len(value), token)
+                self.access_pattern.record_access(key)
+                await self.strategy.record_access(key)
+                found += 1
+                
+            success = True
+            return {key: results[key] for key in keys}
+            
+        except Exception as e:
+            logger.error(f"Cache get_many error: {str(e)}")
+            return {key: default for key in keys}
+            
+        finally:
+            await self.enhanced_metrics.record_operation_end(
+                "get_many",
+                f"{len(keys)} keys",
+                success,
+                {
+                    "quorum": bool(self.quorum),
+                    "hits": found,
+                    "misses": len(keys) - found
+                }
+            )
+    
+    async def set_many(
+        self,
+        items: Dict[str, Any],
+        ttl: Optional[int] = None,
+        format: Optional[str] = None
+    ) -> bool:
+        """Store several items through pipelined SETs per connection.
+        
+        Returns False if any write, or any quorum write, failed.
+        """
+        await self.enhanced_metrics.record_operation_start("set_many", f"{len(items)} keys")
+        success = False
+        
+        try:
+            encoded = {}
+            for key, value in items.items():
+                encoded[key] = await self._serialize(
+                    value,
+                    format or self.config.serializer
+                )
+            
+            if self.quorum:
+                writes = await asyncio.gather(
+                    *(self.quorum.write(key, data, ttl or self.config.ttl)
+                      for key, data in encoded.items())
+                )
+                success = all(ok for ok, _ in writes)
+            else:
+                groups = await self._group_by_connection(list(encoded))
+                await asyncio.gather(*(
+                    store_many(
+                        redis,
+                        {key: encoded[key] for key in group},
+                        ttl or self.config.ttl,
+                        self.config.batch_size
+                    )
+                    for redis, group in groups
+                ))
+                success = True
+            
+            await self._invalidate_near(list(encoded))
+            for key in encoded:
+                self.access_pattern.record_access(key)
+                await self.strategy.record_access(key)
+            return success
+            
+        except Exception as e:
+            logger.error(f"Cache set_many error: {str(e)}")
+            return False
+            
+        finally:
+            await self.enhanced_metrics.record_operation_end(
+                "set_many",
+                f"{len(items)} keys",
+                success,
+                {"quorum": bool(self.quorum)}
+            )
+    
     async def clear(self, namespace: Optional[str] = None) -> int:
         """Clear cache entries.
         
@@ -512,13 +783,12 @@ class Cache:
                     redis = await aioredis.from_url(
                         f"redis://{node['host']}:{node['port']}"
                     )
-                    keys = await redis.keys(pattern)
-                    if keys:
-                        cleared += await redis.delete(*keys)
+                    cleared += await self._unlink_matching(redis, pattern)
             else:
-                keys = await self.redis.keys(pattern)
-                if keys:
-                    cleared = await self.redis.delete(*keys)
+                cleared = await self._unlink_matching(self.redis, pattern)
+            
+            if self.invalidation:
+                await self.invalidation.publish_clear()
                     
             success = True
             return cleared
@@ -538,6 +808,58 @@ class Cache:
                 }
             )
     
+    async def _read_stamped(self, key: str) -> Optional[Stamped]:
+        stamped = await self.get(key)
+        # Values set directly are not stamped, whatever their shape
+        if not isinstance(stamped, dict) or stamped.get(STAMP_TAG) != 1:
+            return None
+        return stamped["value"], stamped["load_seconds"], stamped["fresh_until"]
+    
+    async def _write_stamped(self, key: str, value: Any, load_seconds: float,
+                             fresh_until: float, ttl: float) -> None:
+        # Expiry in Redis covers the stale window; freshness travels with the value
+        stamped = {STAMP_TAG: 1, "value": value, "load_seconds": load_seconds,
+                   "fresh_until": fresh_until}
+        await self.set(key, stamped, ttl=math.ceil(ttl))
+    
+    async def _stampede_lock(self, key: str) -> RedisLock:
+        # The lock lives on the node that owns the key
+        redis = await self._get_connection(key)
+        return RedisLock(redis, f"{key}:lock", self.config.stampede_lock_ttl)
+    
+    def get_metrics(self) -> CacheMetrics:
+        """Near-cache hit rate, staleness and invalidation lag."""
+        return self.metrics
+    
+    def _fill_near(self, key: str, value: Any, size: int, token: Optional[int]) -> None:
+        """Keep a value fetched from Redis in L1, unless invalidated meanwhile."""
+        if self.near is not None:
+            self.near.put(key, value, size, token)
+    
+    async def _invalidate_near(self, keys: List[str]) -> None:
+        """Drop written keys from L1 on every node.
+        
+        Runs after the write, so nodes refetching see the new value. If
+        publishing fails, other nodes serve their copy until its TTL.
+        """
+        if not self.invalidation:
+            return
+        try:
+            await self.invalidation.publish(keys)
+        except Exception as e:
+            logger.warning(f"Publishing invalidation of {len(keys)} keys failed: {e}")
+    
+    async def _unlink_matching(self, redis: aioredis.Redis, pattern: str) -> int:
+        """Remove keys matching a pattern page by page, without KEYS."""
+        scanner = KeyspaceScanner(redis, pattern, self.config.scan_count)
+        removed = 0
+        while True:
+            keys = await scanner.next_page()
+            if keys:
+                removed += await redis.unlink(*keys)
+            if scanner.cursor == 0:
+                return removed
+    
     async def _get_connection(self, key: str) -> aioredis.Redis:
         """Get Redis connection for key.
         
@@ -561,6 +883,38 @@ class Cache:
             return await self.distributed.get_connection(key)
         return self.redis
     
+    async def _group_by_connection(self, keys: List[str]) -> List[tuple]:
+        """Split keys into ``(connection, keys)`` groups, one per node."""
+        groups: Dict[int, tuple] = {}
+        for key in keys:
+            redis = await self._get_connection(key)
+            groups.setdefault(id(redis), (redis, []))[1].append(key)
+        return list(groups.values())
+    
+    async def _fetch_raw_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Raw values of keys, in order, with one MGET per node and batch."""
+        groups = await self._group_by_connection(keys)
+        fetched = await asyncio.gather(*(
+            fetch_many(redis, group, self.config.batch_size)
+            for redis, group in groups
+        ))
+        values = {}
+        for (_, group), group_values in zip(groups, fetched):
+            values.update(zip(group, group_values))
+        return [values[key] for key in keys]
+    
+    def _serializer(self, format: str) -> Serializer:
+        """Serializer for a format, created on first use."""
+        serializer = self.serializers.get(format)
+        if serializer is None:
+            serializer = self.serializers[format] = Serializer(
+                format,
+                self.config.compression_algorithm if self.config.compression else None,
+                self.config.compression_threshold,
+                self.config.legacy_serializer
+            )
+        return serializer
+    
     async def _serialize(self, data: Any, format: str) -> bytes:
         """Serialize data with compression if enabled.
         
@@ -581,18 +935,7 @@ class Cache:
         FIXME: Add proper timeout handling
         """
         try:
-            if format == "json":
-                import json
-                serialized = json.dumps(data).encode()
-            elif format == "pickle":
-                serialized = pickle.dumps(data)
-            else:
-                raise ValueError(f"Unsupported format: {format}")
-                
-            if self.config.compression:
-                import zlib
-                return zlib.compress(serialized)
-            return serialized
+            return self._serializer(format).dumps(data)
         except Exception as e:
             logger.error(f"Serialization error: {str(e)}")
             raise
@@ -617,17 +960,7 @@ class Cache:
         FIXME: Add proper timeout handling
         """
         try:
-            if self.config.compression:
-                import zlib
-                data = zlib.decompress(data)
-                
-            if format == "json":
-                import json
-                return json.loads(data.decode())
-            elif format == "pickle":
-                return pickle.loads(data)
-            else:
-                raise ValueError(f"Unsupported format: {format}")
+            return self._serializer(format).loads(data)
         except Exception as e:
             logger.error(f"Deserialization error: {str(e)}")
             raise
@@ -636,24 +969,19 @@ class Cache:
         """Periodic cache maintenance.
         
         Why this matters:
-        - Ensures data consistency
-        - Handles node failures
-        - Provides read guarantees
-        - Detects inconsistencies
+        - Keeps the cache within max_size
+        - Reclaims expired keys before Redis samples them
         
         Performance Considerations:
-        - Quorum reads are slower
-        - Network latency impact
-        - Serialization overhead
-        - Access pattern tracking
+        - Frequent short ticks instead of an hourly full pass
+        - Each task is bounded by maintenance_budget
+        - No O(N) commands, so Redis is never blocked
         
         TODO: Add circuit breaker
-        TODO: Implement read-repair
-        FIXME: Add proper timeout handling
         """
         while True:
             try:
-                await asyncio.sleep(3600)  # Run every hour
+                await asyncio.sleep(self.config.maintenance_interval)
                 await self._enforce_max_size()
                 await self._cleanup_expired()
             except asyncio.CancelledError:
@@ -662,32 +990,34 @@ class Cache:
                 logger.error(f"Cache cleanup error: {str(e)}")
     
     async def _enforce_max_size(self):
-        """Enforce maximum cache size.
+        """Enforce maximum cache size by sampled eviction.
         
-        Why this matters:
-        - Ensures data consistency
-        - Handles node failures
-        - Provides read guarantees
-        - Detects inconsistencies
-        
-        Performance Considerations:
-        - Quorum reads are slower
-        - Network latency impact
-        - Serialization overhead
-        - Access pattern tracking
+        Why sampling:
+        - Ranking every key is O(N); scoring small samples against a
+          pool of candidates approximates the strategy, as Redis does
         
-        TODO: Add circuit breaker
-        TODO: Implement read-repair
-        FIXME: Add proper timeout handling
+        Implementation Notes:
+        - DBSIZE is O(1), kept by Redis as keys come and go
+        - With a key_prefix, DBSIZE would count other keys, so the size is
+          the count from the expiry sweep's last full pass instead
+        - Large overshoots are worked off over several ticks
+        - Keys are removed with UNLINK, freeing memory off the main thread
         """
-        total_keys = await self.redis.dbsize()
+        if self.config.key_prefix:
+            total_keys = self.sweeper.last_pass_keys or 0
+        else:
+            total_keys = await self.redis.dbsize()
         
         if total_keys > self.config.max_size:
-            to_remove = total_keys - self.config.max_size
-            keys = await self.strategy.get_eviction_candidates(to_remove)
+            to_remove = min(
+                total_keys - self.config.max_size,
+                self.config.max_evictions_per_tick
+            )
+            keys = await self.evictor.evict(to_remove, self.config.maintenance_budget)
             
             if keys:
-                await self.redis.delete(*keys)
+                for key in keys:
+                    await self.strategy.remove_key(key)
                 await self.enhanced_metrics.record_metric(
                     "cache_eviction",
                     len(keys),
@@ -696,30 +1026,23 @@ class Cache:
                 )
     
     async def _cleanup_expired(self):
-        """Clean up expired entries and strategy metadata.
+        """Advance the expiry sweep by one time-boxed step.
         
         Why this matters:
-        - Ensures data consistency
-        - Handles node failures
-        - Provides read guarantees
-        - Detects inconsistencies
+        - Redis expires keys lazily or by random sampling, so expired
+          keys can hold memory for a while; SCAN reclaims those it reaches
         
-        Performance Considerations:
-        - Quorum reads are slower
-        - Network latency impact
-        - Serialization overhead
-        - Access pattern tracking
-        
-        TODO: Add circuit breaker
-        TODO: Implement read-repair
-        FIXME: Add proper timeout handling
+        Implementation Notes:
+        - The cursor resumes where the last tick stopped
+        - A full pass over N keys takes about N / scan_count steps
         """
-        # Redis handles TTL expiration automatically
-        # Clean up strategy metadata
-        keys = await self.redis.keys("*")
-        for key in keys:
-            if not await self.redis.exists(key):
-                await self.strategy.remove_key(key)
+        seen = await self.sweeper.walk(self.config.maintenance_budget)
+        await self.enhanced_metrics.record_metric(
+            "cache_keys_swept",
+            seen,
+            MetricType.COUNTER,
+            {"passes": self.sweeper.passes}
+        )
                 
     async def _fetch_missing(self, key: str) -> Optional[Any]:
         """Fetch missing data for cache warming.
@@ -0,0 +1,100 @@
+
+# datapunk/containers/lake/src/storage/cache_batching.py
+
+# Round-trip reduction for the Lake Service cache
+# Keys are read and written in batches instead of one command each:
+# - MGET and pipelined SETs, chunked to bound command size
+# - Concurrent single-key gets inside a short window share one MGET
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from dataclasses import dataclass
+import asyncio
+import logging
+
+async def fetch_many(redis: Any, keys: Sequence[str], batch_size: int = 500) -> List[Optional[bytes]]:
+    """Read keys with one MGET per ``batch_size`` keys, in key order."""
+    values: List[Optional[bytes]] = []
+    for start in range(0, len(keys), batch_size):
+        values.extend(await redis.mget(keys[start:start + batch_size]))
+    return values
+
+async def store_many(redis: Any, items: Dict[str, bytes], ttl: Optional[int] = None,
+                     batch_size: int = 500) -> None:
+    """Write keys through non-transactional pipelines of ``batch_size`` SETs."""
+    pairs = list(items.items())
+    for start in range(0, len(pairs), batch_size):
+        pipe = redis.pipeline(transaction=False)
+        for key, value in pairs[start:start + batch_size]:
+            pipe.set(key, value, ex=ttl)
+        await pipe.execute()
+
+@dataclass
+class CoalescerStats:
+    """Counters describing coalesced gets."""
+    requests: int = 0
+    batches: int = 0
+    keys_fetched: int = 0
+
+class GetCoalescer:
+    """Merges single-key gets issued within ``window`` seconds into one fetch.
+    
+    Callers asking for the same key in a window share its result. A batch
+    is sent early once it holds ``max_batch`` keys.
+    """
+    
+    def __init__(self, fetch: Callable[[List[str]], Awaitable[List[Optional[bytes]]]],
+                 window: float = 0.002, max_batch: int = 500):
+        self.fetch = fetch
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = CoalescerStats()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: set = set()
+        self.logger = logging.getLogger(__name__)
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        """Value of ``key``, fetched together with other pending keys."""
+        self.stats.requests += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._dispatch)
+        # A cancelled caller must not cancel the result others are awaiting
+        return await asyncio.shield(future)
+    
+    async def close(self) -> None:
+        """Send pending keys and wait for outstanding fetches."""
+        self._dispatch()
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight), return_exceptions=True)
+    
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+    
+    async def _run(self, batch: Dict[str, asyncio.Future]) -> None:
+        keys = list(batch)
+        self.stats.batches += 1
+        self.stats.keys_fetched += len(keys)
+        try:
+            values = await self.fetch(keys)
+        except Exception as e:
+            self.logger.error(f"Coalesced fetch of {len(keys)} keys failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, value in zip(keys, values):
+            if not batch[key].done():
+                batch[key].set_result(value)
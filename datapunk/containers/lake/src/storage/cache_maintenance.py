@@ -0,0 +1,191 @@
+
+# datapunk/containers/lake/src/storage/cache_maintenance.py
+
+# Incremental keyspace maintenance for the Lake Service cache
+# Maintenance never issues O(N) commands such as KEYS:
+# - SCAN cursors persist between ticks, each tick bounded by a time budget
+# - Size is enforced by sampled eviction, approximating LRU/LFU/TTL the
+#   way Redis' own maxmemory policies do
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+import logging
+import random
+import time
+
+Scorer = Callable[[Any, List[str]], Awaitable[List[Optional[float]]]]
+
+logger = logging.getLogger(__name__)
+
+class KeyspaceScanner:
+    """Walks keys matching ``match`` with SCAN, resuming where it stopped.
+    
+    Keys added or removed during a pass may be missed or seen twice,
+    as SCAN guarantees only that keys present throughout are returned.
+    """
+    
+    def __init__(self, redis: Any, match: str = "*", count: int = 1000):
+        self.redis = redis
+        self.match = match
+        self.count = count
+        self.cursor = 0
+        self.passes = 0
+        self.last_pass_keys: Optional[int] = None  # Keys seen by the last full pass
+        self._pass_keys = 0
+    
+    async def next_page(self) -> List[str]:
+        """One SCAN step; an empty page does not mean the pass is over."""
+        self.cursor, keys = await self.redis.scan(self.cursor, match=self.match, count=self.count)
+        self._pass_keys += len(keys)
+        if self.cursor == 0:
+            self.passes += 1
+            self.last_pass_keys, self._pass_keys = self._pass_keys, 0
+        return keys
+    
+    async def walk(self, budget: float,
+                   visit: Optional[Callable[[List[str]], Awaitable[None]]] = None) -> int:
+        """Scan until ``budget`` seconds pass or a pass completes.
+        
+        Returns the number of keys seen. On Redis, keys whose TTL has
+        passed are reclaimed as the scan reaches them.
+        """
+        deadline = time.monotonic() + budget
+        seen = 0
+        while True:
+            keys = await self.next_page()
+            seen += len(keys)
+            if keys and visit:
+                await visit(keys)
+            if self.cursor == 0 or time.monotonic() >= deadline:
+                return seen
+
+async def _object_scores(redis: Any, subcommand: str, keys: List[str]) -> List[Optional[float]]:
+    pipe = redis.pipeline(transaction=False)
+    for key in keys:
+        pipe.object(subcommand, key)
+    results = await pipe.execute(raise_on_error=False)
+    # Every key failing means the server refuses the subcommand, e.g.
+    # FREQ without an LFU maxmemory-policy or IDLETIME with one
+    if results and all(isinstance(r, Exception) for r in results):
+        raise results[0]
+    return [None if r is None or isinstance(r, Exception) else float(r) for r in results]
+
+async def idle_scores(redis: Any, keys: List[str]) -> List[Optional[float]]:
+    """Seconds since last access; the idlest keys go first (LRU)."""
+    return await _object_scores(redis, "idletime", keys)
+
+async def frequency_scores(redis: Any, keys: List[str]) -> List[Optional[float]]:
+    """Negated access frequency (LFU); needs an LFU maxmemory-policy."""
+    scores = await _object_scores(redis, "freq", keys)
+    return [None if s is None else -s for s in scores]
+
+async def expiry_scores(redis: Any, keys: List[str]) -> List[Optional[float]]:
+    """Negated remaining TTL; keys closest to expiry go first."""
+    pipe = redis.pipeline(transaction=False)
+    for key in keys:
+        pipe.pttl(key)
+    results = await pipe.execute(raise_on_error=False)
+    scores: List[Optional[float]] = []
+    for r in results:
+        if isinstance(r, Exception) or r == -2:  # -2: key is gone
+            scores.append(None)
+        else:
+            scores.append(-float("inf") if r == -1 else -float(r))  # -1: no TTL
+    return scores
+
+async def random_scores(redis: Any, keys: List[str]) -> List[Optional[float]]:
+    """Uniform eviction."""
+    return [random.random() for _ in keys]
+
+# FIFO has no Redis counterpart; with one TTL for every key the
+# entries closest to expiry are the oldest
+SCORERS: Dict[str, Scorer] = {
+    "lru": idle_scores,
+    "lfu": frequency_scores,
+    "ttl": expiry_scores,
+    "fifo": expiry_scores,
+    "random": random_scores,
+}
+
+# Policies to try, in order, when the server rejects a policy's scorer
+FALLBACKS: Dict[str, List[str]] = {
+    "lru": ["lfu", "random"],
+    "lfu": ["lru", "random"],
+}
+
+@dataclass
+class EvictionStats:
+    """Counters describing sampled eviction."""
+    sampled: int = 0
+    evicted: int = 0
+    rounds: int = 0
+
+class SampledEvictor:
+    """Evicts approximately the worst keys without ranking the whole keyspace.
+    
+    Each round scores ``sample_size`` keys and merges them into a small
+    pool of the best candidates seen so far, which carries over between
+    rounds and calls, as in Redis' eviction pool. Higher scores are
+    evicted first. If the server rejects the policy's OBJECT subcommand,
+    scoring moves to the next policy in ``FALLBACKS``.
+    """
+    
+    def __init__(self, redis: Any, scanner: KeyspaceScanner, policy: str = "lru",
+                 sample_size: int = 16, pool_size: int = 16,
+                 scorer: Optional[Scorer] = None):
+        if scorer is None and policy not in SCORERS:
+            raise ValueError(f"Unsupported eviction policy: {policy}")
+        self.redis = redis
+        self.scanner = scanner
+        self.policy = policy
+        self.scorer = scorer or SCORERS[policy]
+        self.fallbacks = [] if scorer else list(FALLBACKS.get(policy, []))
+        self.sample_size = sample_size
+        self.pool_size = pool_size
+        self.pool: List[Tuple[float, str]] = []  # Highest score first
+        self.stats = EvictionStats()
+    
+    async def evict(self, count: int, budget: float) -> List[str]:
+        """Remove up to ``count`` keys within ``budget`` seconds."""
+        deadline = time.monotonic() + budget
+        evicted: List[str] = []
+        while len(evicted) < count and time.monotonic() < deadline:
+            await self._refill()
+            if not self.pool:
+                # SCAN pages can be empty mid-pass; stop once a pass found nothing
+                if self.scanner.cursor == 0:
+                    break
+                continue
+            # Take at most half the pool so later rounds still compare candidates
+            take = min(count - len(evicted), max(1, len(self.pool) // 2))
+            victims = [key for _, key in self.pool[:take]]
+            del self.pool[:take]
+            self.stats.evicted += await self.redis.unlink(*victims)
+            self.stats.rounds += 1
+            evicted.extend(victims)
+        return evicted
+    
+    async def _refill(self) -> None:
+        page = await self.scanner.next_page()
+        if len(page) > self.sample_size:
+            page = random.sample(page, self.sample_size)
+        if not page:
+            return
+        self.stats.sampled += len(page)
+        while True:
+            try:
+                scores = await self.scorer(self.redis, page)
+                break
+            except Exception as e:
+                if not self.fallbacks:
+                    raise
+                fallback = self.fallbacks.pop(0)
+                logger.warning(f"Eviction policy {self.policy} unavailable ({e}); "
+                               f"using {fallback}")
+                self.policy, self.scorer = fallback, SCORERS[fallback]
+        candidates = {key: score for score, key in self.pool}
+        for key, score in zip(page, scores):
+            if score is not None:
+                candidates[key] = score
+        ranked = sorted(((score, key) for key, score in candidates.items()), reverse=True)
+        self.pool = ranked[:self.pool_size]
@@ -3,361 +3,347 @@
 
 # Advanced cache optimization strategies for the Lake Service
 # This module implements sophisticated caching algorithms including:
-# - ML-based access prediction
+# - Sketch-based access tracking in fixed memory
 # - Pattern-based warming
 # - Distributed consensus
 # - Multiple eviction policies
 # - Performance monitoring
 
-from typing import Any, Dict, List, Optional, Set, Union, Tuple
+from typing import Any, Deque, Dict, Hashable, List, Optional, Set, Union, Tuple
 import asyncio
+import fnmatch
+import heapq
+import itertools
 import random
 import logging
+import threading
 import time
 from datetime import datetime, timedelta
 from abc import ABC, abstractmethod
 import aioredis
-from collections import defaultdict
-import numpy as np
+from collections import OrderedDict, deque
 from ..ingestion.monitoring import HandlerMetrics, MetricType
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+class CountMinSketch:
+    """Approximate per-key counts in fixed memory.
+    
+    Why a sketch:
+    - Memory is depth x width counters whatever the keyspace size
+    - Estimates never undercount; with conservative update, overcounts
+      stay small for all but the rarest keys
+    
+    Implementation Notes:
+    - Rows are indexed by double hashing one 64-bit hash; str hashes
+      are salted per process, so sketches are not shared between processes
+    - Counters are floats so decay keeps fractional counts; plain lists
+      beat numpy at the handful of counters each update touches
+    """
+    
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0.0] * width for _ in range(depth)]
+        self.total = 0.0
+        
+    def add(self, key: Hashable, count: float = 1.0) -> float:
+        """Count key and return its new estimate."""
+        cells = list(zip(self.rows, self._columns(key)))
+        estimate = min([row[c] for row, c in cells]) + count
+        # Conservative update: raise only counters below the new estimate
+        for row, c in cells:
+            if row[c] < estimate:
+                row[c] = estimate
+        self.total += count
+        return estimate
+        
+    def estimate(self, key: Hashable) -> float:
+        """Upper bound on key's (decayed) count."""
+        return min([row[c] for row, c in zip(self.rows, self._columns(key))])
+        
+    def decay(self, factor: float = 0.5):
+        """Age every count, so old popularity fades."""
+        self.rows = [[value * factor for value in row] for row in self.rows]
+        self.total *= factor
+        
+    def _columns(self, key: Hashable) -> List[int]:
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+class SpaceSaving:
+    """Top keys by count in fixed memory (Metwally et al.).
+    
+    Tracks at most capacity keys. An untracked key replaces the one
+    with the lowest count and inherits that count as its error, so
+    any key counted more than total / capacity times is tracked.
+    
+    Implementation Notes:
+    - The minimum is found through a heap with lazy deletion; stale
+      heap entries are skipped and the heap is rebuilt when it grows
+    """
+    
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, float] = {}
+        self.errors: Dict[Hashable, float] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._order = itertools.count()
+        
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.counts
+        
+    def offer(self, key: Hashable, count: float = 1.0):
+        """Count one or more occurrences of key."""
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0.0
+        else:
+            floor, victim = self._pop_min()
+            del self.counts[victim], self.errors[victim]
+            self.counts[key] = floor + count
+            self.errors[key] = floor
+        heapq.heappush(self._heap, (self.counts[key], next(self._order), key))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild()
+            
+    def top(self, n: Optional[int] = None) -> List[Tuple[Hashable, float, float]]:
+        """(key, count, error) for the n most counted keys."""
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return [(key, count, self.errors[key]) for key, count in ranked[:n]]
+        
+    def decay(self, factor: float = 0.5):
+        """Age every count along with the sketch it accompanies."""
+        for key in self.counts:
+            self.counts[key] *= factor
+            self.errors[key] *= factor
+        self._rebuild()
+        
+    def _pop_min(self) -> Tuple[float, Hashable]:
+        while True:
+            count, _, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                return count, key
+                
+    def _rebuild(self):
+        self._heap = [(count, next(self._order), key) for key, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+class _Arrivals:
+    """Inter-arrival statistics for one key."""
+    __slots__ = ("last", "interval", "deviation", "intervals", "recent")
+    
+    def __init__(self, timestamp: float, history: int):
+        self.last = timestamp
+        self.interval: Optional[float] = None  # EWMA of seconds between accesses
+        self.deviation = 0.0  # EWMA of absolute deviation from interval
+        self.intervals = 0
+        self.recent: Deque[float] = deque([timestamp], maxlen=history)
+
 class AccessPattern:
-    """Advanced cache access pattern analyzer with ML capabilities.
+    """Cache access pattern tracking in fixed memory.
     
-    This class provides sophisticated analysis of cache access patterns:
-    - Temporal pattern detection
-    - Access frequency analysis
-    - Correlation discovery
-    - Predictive modeling
+    This class provides:
+    - Decayed access counts for every key (count-min sketch)
+    - The most accessed keys with their counts (Space-Saving)
+    - Inter-arrival EWMAs for periodicity and next-access prediction
+    - Co-access counts for finding related keys
     
     Why this matters:
-    - Optimizes cache warming strategies
-    - Reduces cache misses
-    - Improves hit ratios
-    - Enables predictive prefetching
+    - Warming and prefetching need popularity and timing, not full
+      access histories; memory no longer grows with the keyspace
+    - Recording is on the cache hot path and must stay cheap
     
     Implementation Notes:
-    - Uses sliding window for pattern detection
-    - Implements autocorrelation for periodicity
-    - Maintains efficient data structures
-    - Provides ML-ready features
+    - record_access only appends to a bounded buffer, which is atomic
+      and needs no lock; the buffer is folded into the summaries in
+      batches, by whichever caller fills it or by the next reader
+    - Under extreme load a full buffer drops its oldest accesses, as
+      the summaries are approximate anyway
+    - Counts halve every window_size seconds of recorded time
+    - Inter-arrival statistics are kept for the max_keys most recently
+      accessed keys, each with its last history timestamps
     
     Performance Considerations:
-    - Window size affects memory usage
-    - Pattern detection is CPU-intensive
-    - Cleanup frequency impacts accuracy
-    - Feature computation overhead
+    - Sketch width bounds count error at about 2.7 * total / width
+    - Summaries are read after draining the buffer
     
     TODO: Add support for multi-dimensional patterns
-    TODO: Implement adaptive window sizing
-    FIXME: Add memory usage optimization
     """
     
-    def __init__(self, window_size: int = 3600):
-        """Initialize the access pattern analyzer.
-        
-        Why window_size matters:
-        - Controls pattern detection scope
-        - Affects memory consumption
-        - Influences prediction accuracy
-        - Balances precision vs overhead
-        
-        Implementation Notes:
-        - Uses defaultdict for efficient storage
-        - Maintains separate count tracking
-        - Implements pattern caching
-        - Supports custom timestamps
-        
-        TODO: Add window size validation
-        TODO: Implement adaptive sizing
-        FIXME: Add proper cleanup scheduling
+    def __init__(
+        self,
+        window_size: int = 3600,
+        sketch_width: int = 4096,
+        sketch_depth: int = 4,
+        heavy_hitters: int = 1000,
+        max_keys: int = 10000,
+        history: int = 32,
+        alpha: float = 0.2,
+        co_access_window: float = 1.0,
+        buffer_size: int = 4096
+    ):
+        """Initialize the access pattern tracker.
+        
+        Why these parameters matter:
+        - window_size: Half-life of counts, in seconds
+        - sketch_width/depth: Count accuracy vs memory
+        - heavy_hitters: How many top keys are tracked exactly
+        - max_keys/history: Keys with timing statistics and the
+          timestamps kept for each
+        - alpha: Weight of the newest interval in the EWMAs
+        - co_access_window: Seconds within which accesses count as related
         """
         self.window_size = window_size
-        self.access_times: Dict[str, List[float]] = defaultdict(list)
-        self.access_counts: Dict[str, int] = defaultdict(int)
-        self.pattern_cache: Dict[str, List[Tuple[float, float]]] = {}
+        self.max_keys = max_keys
+        self.history = history
+        self.alpha = alpha
+        self.co_access_window = co_access_window
+        self.counts = CountMinSketch(sketch_width, sketch_depth)
+        self.co_access = CountMinSketch(sketch_width, sketch_depth)
+        self.top = SpaceSaving(heavy_hitters)
+        self.arrivals: 'OrderedDict[str, _Arrivals]' = OrderedDict()
+        self._recent: Deque[Tuple[str, float]] = deque(maxlen=2)  # Co-access partners per access
+        self._pending: Deque[Tuple[str, float]] = deque(maxlen=buffer_size)
+        self._drain_at = buffer_size // 2
+        self._drain_lock = threading.Lock()
+        self._last_decay: Optional[float] = None
         
     def record_access(self, key: str, timestamp: Optional[float] = None):
         """Record a cache key access with optional timestamp.
         
-        Why accurate recording matters:
-        - Enables pattern detection
-        - Supports prediction models
-        - Facilitates correlation analysis
-        - Maintains access statistics
-        
-        Implementation Notes:
-        - Handles custom timestamps
-        - Maintains access ordering
-        - Triggers cleanup when needed
-        - Updates pattern cache
-        
-        TODO: Add batch recording support
-        TODO: Implement access categorization
-        FIXME: Add proper error handling
+        Safe to call from any thread without locking.
         """
-        ts = timestamp or time.time()
-        self.access_times[key].append(ts)
-        self.access_counts[key] += 1
-        self._cleanup_old_data(ts)
+        self._pending.append((key, time.time() if timestamp is None else timestamp))
+        if len(self._pending) >= self._drain_at:
+            self._drain(block=False)
+            
+    def estimate_count(self, key: str) -> float:
+        """Decayed access count of key; may overestimate."""
+        self._drain()
+        return self.counts.estimate(key)
+        
+    def heavy_hitters(self, n: Optional[int] = None) -> List[Tuple[str, float]]:
+        """The n most accessed keys with their decayed counts."""
+        self._drain()
+        return [(key, count) for key, count, _ in self.top.top(n)]
+        
+    def tracked_keys(self) -> List[str]:
+        """Keys with timing statistics, least recently accessed first."""
+        self._drain()
+        return list(self.arrivals)
+        
+    def recent_accesses(self, key: str) -> List[float]:
+        """Last access timestamps of key, oldest first."""
+        self._drain()
+        arrivals = self.arrivals.get(key)
+        return list(arrivals.recent) if arrivals else []
         
     def get_periodic_patterns(self, key: str) -> List[Tuple[float, float]]:
-        """Detect and analyze periodic access patterns for a key.
+        """(period, confidence) of a regularly accessed key.
         
-        Why pattern detection matters:
-        - Enables predictive warming
-        - Optimizes cache management
-        - Improves hit ratios
-        - Supports intelligent prefetching
-        
-        Implementation Details:
-        - Uses autocorrelation for detection
-        - Implements confidence scoring
-        - Caches pattern results
-        - Handles sparse data
-        
-        Performance Considerations:
-        - Computationally intensive
-        - Results are cached
-        - Requires sufficient data points
-        - Pattern stability affects accuracy
-        
-        TODO: Add more sophisticated detection methods
-        TODO: Implement pattern classification
-        FIXME: Add proper error bounds
+        The period is the EWMA inter-arrival time; confidence falls as
+        intervals deviate from it. Keys with fewer than two intervals
+        or confidence at most 0.7 have no pattern.
         """
-        if key in self.pattern_cache:
-            return self.pattern_cache[key]
-            
-        times = self.access_times.get(key, [])
-        if len(times) < 3:
+        self._drain()
+        arrivals = self.arrivals.get(key)
+        if not arrivals or arrivals.intervals < 2 or not arrivals.interval:
             return []
-            
-        # Convert to numpy array for analysis
-        intervals = np.diff(times)
-        
-        # Find periodic patterns using autocorrelation
-        autocorr = np.correlate(intervals, intervals, mode='full')
-        peaks = self._find_peaks(autocorr[len(autocorr)//2:])
-        
-        patterns = []
-        for period in peaks:
-            confidence = self._calculate_confidence(intervals, period)
-            if confidence > 0.7:  # High confidence threshold
-                patterns.append((period, confidence))
-                
-        self.pattern_cache[key] = patterns
-        return patterns
+        confidence = max(0.0, 1.0 - arrivals.deviation / arrivals.interval)
+        if confidence <= 0.7:  # High confidence threshold
+            return []
+        return [(arrivals.interval, confidence)]
         
     def predict_next_access(self, key: str) -> Optional[float]:
-        """Predict the next likely access time for a key.
-        
-        Why prediction matters:
-        - Enables proactive warming
-        - Reduces cache misses
-        - Optimizes resource usage
-        - Improves response times
-        
-        Implementation Details:
-        - Uses detected patterns
-        - Weights by confidence
-        - Handles multiple patterns
-        - Returns weighted prediction
-        
-        Performance Considerations:
-        - Requires pattern detection
-        - Prediction accuracy varies
-        - Confidence weighting important
-        - Pattern stability affects results
-        
-        TODO: Add confidence intervals
-        TODO: Implement multiple prediction modes
-        FIXME: Add proper validation
-        """
+        """Predict the next likely access time for a key."""
         patterns = self.get_periodic_patterns(key)
         if not patterns:
             return None
-            
-        last_access = self.access_times[key][-1]
-        predictions = []
-        
-        for period, confidence in patterns:
-            next_time = last_access + period
-            predictions.append((next_time, confidence))
-            
-        if predictions:
-            # Weight predictions by confidence
-            weighted_sum = sum(t * c for t, c in predictions)
-            total_confidence = sum(c for _, c in predictions)
-            return weighted_sum / total_confidence
-            
-        return None
+        return self.arrivals[key].last + patterns[0][0]
         
     def get_related_keys(self, key: str, threshold: float = 0.8) -> List[str]:
         """Find keys that are frequently accessed together.
         
-        Why related keys matter:
-        - Enables group warming
-        - Improves cache efficiency
-        - Reduces overall misses
-        - Supports prefetching
-        
-        Implementation Details:
-        - Uses temporal correlation
-        - Implements flexible threshold
-        - Handles time windows
-        - Supports custom correlation
-        
-        Performance Considerations:
-        - O(n) complexity per key
-        - Memory usage scales with keys
-        - Threshold affects results
-        - Window size important
-        
-        TODO: Add more correlation methods
-        TODO: Implement relationship types
-        FIXME: Add proper scaling
+        Correlation is the co-access count over the larger of the two
+        keys' counts; candidates are the keys with timing statistics.
         """
-        related = []
-        key_times = set(self.access_times.get(key, []))
-        
-        if not key_times:
+        self._drain()
+        count = self.counts.estimate(key)
+        if not count:
             return []
             
-        for other_key, times in self.access_times.items():
+        related = []
+        for other_key in self.arrivals:
             if other_key == key:
                 continue
-                
-            other_times = set(times)
-            if not other_times:
-                continue
-                
-            # Calculate temporal correlation
-            intersection = key_times.intersection(
-                {t - 1 <= x <= t + 1 for t in other_times}
-            )
-            correlation = len(intersection) / max(
-                len(key_times),
-                len(other_times)
-            )
-            
+            together = self.co_access.estimate(self._pair(key, other_key))
+            correlation = together / max(count, self.counts.estimate(other_key))
             if correlation >= threshold:
                 related.append(other_key)
-                
         return related
         
-    def _cleanup_old_data(self, current_time: float):
-        """Remove data outside the current window.
-        
-        Why cleanup matters:
-        - Maintains memory efficiency
-        - Ensures data relevance
-        - Supports sliding window
-        - Prevents data staleness
-        
-        Implementation Details:
-        - Uses window size
-        - Cleans multiple structures
-        - Maintains consistency
-        - Resets pattern cache
-        
-        Performance Considerations:
-        - O(n) cleanup operation
-        - Memory usage important
-        - Cleanup frequency matters
-        - Pattern cache reset
-        
-        TODO: Add incremental cleanup
-        TODO: Implement cleanup strategies
-        FIXME: Add proper error handling
-        """
-        cutoff = current_time - self.window_size
-        
-        for key in list(self.access_times.keys()):
-            times = self.access_times[key]
-            valid_times = [t for t in times if t > cutoff]
+    def _drain(self, block: bool = True):
+        # One thread folds the buffer at a time; others keep appending
+        if not self._drain_lock.acquire(blocking=block):
+            return
+        try:
+            while True:
+                try:
+                    key, timestamp = self._pending.popleft()
+                except IndexError:
+                    return
+                self._apply(key, timestamp)
+        finally:
+            self._drain_lock.release()
             
-            if valid_times:
-                self.access_times[key] = valid_times
-            else:
-                del self.access_times[key]
-                del self.access_counts[key]
-                
-        self.pattern_cache.clear()
-        
-    def _find_peaks(self, data: np.ndarray) -> List[float]:
-        """Find significant peaks in autocorrelation data.
-        
-        Why peak detection matters:
-        - Identifies periodic patterns
-        - Supports prediction
-        - Enables pattern scoring
-        - Improves accuracy
-        
-        Implementation Details:
-        - Uses basic peak detection
-        - Implements significance test
-        - Handles noise
-        - Returns peak positions
-        
-        Performance Considerations:
-        - O(n) complexity
-        - Memory efficient
-        - Accuracy vs speed
-        - Noise sensitivity
-        
-        TODO: Add advanced peak detection
-        TODO: Implement peak classification
-        FIXME: Add proper validation
-        """
-        peaks = []
-        for i in range(1, len(data) - 1):
-            if data[i] > data[i-1] and data[i] > data[i+1]:
-                if data[i] > np.mean(data) + np.std(data):
-                    peaks.append(float(i))
-        return peaks
-        
-    def _calculate_confidence(
-        self,
-        intervals: np.ndarray,
-        period: float
-    ) -> float:
-        """Calculate confidence in detected periodic pattern.
-        
-        Why confidence matters:
-        - Validates pattern quality
-        - Supports prediction weighting
-        - Enables threshold filtering
-        - Improves accuracy
-        
-        Implementation Details:
-        - Uses interval matching
-        - Implements tolerance
-        - Normalizes results
-        - Handles edge cases
-        
-        Performance Considerations:
-        - O(n) complexity
-        - Memory efficient
-        - Accuracy important
-        - Tolerance affects results
+    def _apply(self, key: str, timestamp: float):
+        if self._last_decay is None:
+            self._last_decay = timestamp
+        elif timestamp - self._last_decay >= self.window_size:
+            self.counts.decay()
+            self.co_access.decay()
+            self.top.decay()
+            self._last_decay = timestamp
+            
+        self.counts.add(key)
+        self.top.offer(key)
+        self._record_arrival(key, timestamp)
+        
+        for other_key, other_time in self._recent:
+            if other_key != key and abs(timestamp - other_time) <= self.co_access_window:
+                self.co_access.add(self._pair(key, other_key))
+        self._recent.append((key, timestamp))
+        
+    def _record_arrival(self, key: str, timestamp: float):
+        arrivals = self.arrivals.get(key)
+        if arrivals is None:
+            self.arrivals[key] = _Arrivals(timestamp, self.history)
+            if len(self.arrivals) > self.max_keys:
+                self.arrivals.popitem(last=False)
+            return
+        self.arrivals.move_to_end(key)
+        interval = timestamp - arrivals.last
+        if interval <= 0:  # Out of order or simultaneous
+            return
+        arrivals.last = timestamp
+        arrivals.recent.append(timestamp)
+        arrivals.intervals += 1
+        if arrivals.interval is None:
+            arrivals.interval = interval
+        else:
+            arrivals.deviation += self.alpha * (
+                abs(interval - arrivals.interval) - arrivals.deviation
+            )
+            arrivals.interval += self.alpha * (interval - arrivals.interval)
+            
+    @staticmethod
+    def _pair(a: str, b: str) -> Tuple[str, str]:
+        return (a, b) if a < b else (b, a)
         
-        TODO: Add more confidence metrics
-        TODO: Implement confidence types
-        FIXME: Add proper validation
-        """
-        # Count intervals matching the period
-        matches = sum(
-            1 for interval in intervals
-            if abs(interval - period) < period * 0.1
-        )
-        return matches / len(intervals)
-
 class WarmingStrategy(ABC):
     """Base class for cache warming strategies.
     
@@ -475,15 +461,19 @@ class TimeBasedWarming(WarmingStrategy):
         TODO: Implement adaptive windows
         FIXME: Add proper validation
         """
+        # Only keys with timing statistics can have a predicted access,
+        # so the keyspace itself is never listed
+        window = config.get("warm_window", 300)  # 5 minutes default
+        now = time.time()
         candidates = []
-        keys = await self.redis.keys(pattern)
-        
-        for key in keys:
+        for key in self.access_pattern.tracked_keys():
+            if not fnmatch.fnmatchcase(key, pattern):
+                continue
             next_access = self.access_pattern.predict_next_access(key)
-            if next_access:
-                # Warm if predicted access is within warming window
-                window = config.get("warm_window", 300)  # 5 minutes default
-                if 0 <= next_access - time.time() <= window:
-                    candidates.append(key)
-                    
-        return candidates[:config.get("batch_size", 100)]
\ No newline at end of file
+            # Warm if predicted access is within warming window
+            if next_access and 0 <= next_access - now <= window:
+                candidates.append((self.access_pattern.estimate_count(key), key))
+                
+        # Most accessed keys first when the batch is limited
+        candidates.sort(reverse=True)
+        return [key for _, key in candidates[:config.get("batch_size", 100)]]
\ No newline at end of file
@@ -54,6 +54,25 @@ class IndexAdvisor:
         """Add statistics for a column."""
         self._column_stats[table_name][column_name] = stats
         
+    def record_adaptation(self, decision) -> None:
+        """Learn from an adaptive executor re-planning decision.
+        
+        A re-planned join exposes its probe-side key as an equality access
+        pattern, which an index could serve as an index nested loop join.
+        """
+        details = getattr(decision, 'details', {}) or {}
+        table_name = details.get('probe_table')
+        column = details.get('probe_column')
+        if not table_name or not column:
+            return
+            
+        pattern = QueryPattern(table_name, [column], is_equality=True)
+        for existing in self._query_patterns[table_name]:
+            if existing == pattern:
+                existing.frequency += 1
+                return
+        self._query_patterns[table_name].append(pattern)
+        
     def register_existing_index(self, index: Index) -> None:
         """Register an existing index."""
         self._existing_indexes[index.table_name].append(index)
@@ -16,6 +16,7 @@ class IndexType(Enum):
     BITMAP = auto()
     RTREE = auto()  # For spatial data
     GIST = auto()   # For extensible indexing
+    HNSW = auto()   # For approximate nearest-neighbour vector search
 
 @dataclass
 class IndexStats:
@@ -102,7 +103,8 @@ class Index(ABC, Generic[K, V]):
             "HashIndex": IndexType.HASH,
             "BitmapIndex": IndexType.BITMAP,
             "RTreeIndex": IndexType.RTREE,
-            "GiSTIndex": IndexType.GIST
+            "GiSTIndex": IndexType.GIST,
+            "HNSWIndex": IndexType.HNSW
         }
         return type_map.get(type(self).__name__, IndexType.BTREE)
         
@@ -0,0 +1,555 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+from datetime import datetime
+import heapq
+import json
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+import numpy as np
+
+from .core import Index, IndexStats
+
+class IndexFullError(Exception):
+    """Raised when an insert would exceed a fixed-capacity index."""
+    pass
+
+def encode_label(label: Hashable) -> str:
+    """Encode a label as a tagged string that ``decode_label`` reverses."""
+    if isinstance(label, bool):
+        return f"b:{int(label)}"
+    if isinstance(label, int):
+        return f"i:{label}"
+    if isinstance(label, str):
+        return f"s:{label}"
+    if isinstance(label, uuid.UUID):
+        return f"u:{label}"
+    if isinstance(label, tuple):
+        return "t:" + json.dumps([encode_label(part) for part in label])
+    raise TypeError(f"Unsupported label type: {type(label).__name__}")
+
+def decode_label(value: str) -> Hashable:
+    """Decode a label written by ``encode_label``."""
+    tag, body = value[:2], value[2:]
+    if tag == "b:":
+        return bool(int(body))
+    if tag == "i:":
+        return int(body)
+    if tag == "s:":
+        return body
+    if tag == "u:":
+        return uuid.UUID(body)
+    if tag == "t:":
+        return tuple(decode_label(part) for part in json.loads(body))
+    raise ValueError(f"Unknown label encoding: {value!r}")
+
+class HNSWIndex(Index):
+    """Hierarchical navigable small world graph for approximate kNN search.
+    
+    Vectors live in one preallocated matrix, so memory is fixed by
+    ``capacity``. Deletes leave tombstones that are still traversed but
+    never returned; once enough accumulate, ``vacuum`` relinks their
+    neighbours and frees the slots for reuse.
+    
+    With ``dtype='int8'`` each vector is stored as int8 codes plus one
+    float32 scale, cutting vector memory about fourfold. ``save`` writes
+    a snapshot whose arrays ``load`` memory-maps instead of reading.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        table_name: str,
+        columns: List[str],
+        dim: int,
+        capacity: int,
+        m: int = 16,
+        ef_construction: int = 100,
+        ef_search: int = 50,
+        metric: str = 'cosine',
+        dtype: str = 'float32',
+        vacuum_fraction: float = 0.05,
+        seed: Optional[int] = None,
+        **kwargs
+    ):
+        super().__init__(name, table_name, columns, **kwargs)
+        if metric not in ('cosine', 'l2'):
+            raise ValueError(f"Unsupported metric: {metric}")
+        if dtype not in ('float32', 'int8'):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        self.dim = dim
+        self.capacity = capacity
+        self.m = m
+        self.max_links0 = 2 * m
+        self.ef_construction = max(ef_construction, m)
+        self.ef_search = ef_search
+        self.metric = metric
+        self.dtype = dtype
+        self.vacuum_fraction = vacuum_fraction
+        self.vacuum_threshold = max(16, int(capacity * vacuum_fraction))
+        self._level_mult = 1.0 / math.log(max(m, 2))
+        self._rng = np.random.default_rng(seed)
+        
+        self.vectors = np.zeros((capacity, dim), dtype=np.dtype(dtype))
+        # Per-vector dequantization scales; unused for float32 storage
+        self.scales = np.ones(capacity if dtype == 'int8' else 0, dtype=np.float32)
+        self.levels = np.full(capacity, -1, dtype=np.int8)  # -1 marks a free slot
+        self.links0 = np.full((capacity, self.max_links0), -1, dtype=np.int32)
+        self.link_counts0 = np.zeros(capacity, dtype=np.int32)
+        self.upper_links: List[Dict[int, List[int]]] = []  # Per level above 0
+        
+        self.labels: List[Optional[Hashable]] = [None] * capacity
+        self.live = np.zeros(capacity, dtype=bool)
+        self._visited = np.zeros(capacity, dtype=bool)  # Reused by searches
+        self.slots: Dict[Hashable, int] = {}
+        self.deleted: Set[int] = set()
+        self._free: List[int] = []
+        self._next_slot = 0
+        self.entry_point = -1
+        self.max_level = -1
+        
+        self._lock = threading.RLock()
+        self.stats = IndexStats(
+            total_entries=0, depth=0, size_bytes=self.memory_bytes(),
+            last_updated=datetime.now(), read_count=0, write_count=0,
+            avg_lookup_time_ms=0.0, avg_insert_time_ms=0.0
+        )
+    
+    def __len__(self) -> int:
+        return len(self.slots)
+    
+    def __contains__(self, label: Hashable) -> bool:
+        return label in self.slots
+    
+    def insert(self, key: Hashable, value: Sequence[float]) -> None:
+        """Insert or replace the vector stored under a label."""
+        start = time.perf_counter()
+        with self._lock:
+            if key in self.slots:
+                self.delete(key)
+            slot = self._allocate()
+            self._store(slot, self._prepare(value))
+            self.labels[slot] = key
+            self.slots[key] = slot
+            self._link(slot)
+            self.live[slot] = True
+        self.update_stats('write', (time.perf_counter() - start) * 1000)
+    
+    def delete(self, key: Hashable) -> bool:
+        """Remove a label from search results, returning False if absent."""
+        with self._lock:
+            slot = self.slots.pop(key, None)
+            if slot is None:
+                return False
+            self.labels[slot] = None
+            self.live[slot] = False
+            self.deleted.add(slot)
+            if len(self.deleted) >= self.vacuum_threshold:
+                self.vacuum()
+            return True
+    
+    def search(self, query: Sequence[float], k: int = 10,
+               ef: Optional[int] = None,
+               max_distance: Optional[float] = None,
+               filter: Optional[Callable[[Hashable], bool]] = None
+               ) -> List[Tuple[Hashable, float]]:
+        """Find up to k nearest labels as ``(label, distance)`` pairs.
+        
+        Cosine distance is ``1 - similarity``; l2 distance is squared.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            if self.entry_point < 0 or not self.slots:
+                return []
+            q = self._prepare(query)
+            allowed = self._allowed(filter)
+            node = self._descend(q, self.max_level, 0)
+            found = self._search_layer(q, [node], max(ef or self.ef_search, k), 0,
+                                       allowed)
+            results = []
+            for distance, slot in found[:k]:
+                if max_distance is not None and distance > max_distance:
+                    break
+                results.append((self.labels[slot], distance))
+        self.update_stats('read', (time.perf_counter() - start) * 1000)
+        return results
+    
+    def vacuum(self) -> int:
+        """Unlink tombstoned nodes, repair their neighbours and free the slots."""
+        with self._lock:
+            if not self.deleted:
+                return 0
+            dead = np.zeros(self.capacity, dtype=bool)
+            dead[list(self.deleted)] = True
+            
+            # Level 0: find every live node with an edge into a dead one
+            links = self.links0[:self._next_slot]
+            touching = ((links >= 0) & dead[np.maximum(links, 0)]).any(axis=1)
+            touching &= ~dead[:self._next_slot]
+            for node in np.nonzero(touching)[0].tolist():
+                self._repair(node, 0, dead)
+            for level in range(1, self.max_level + 1):
+                layer = self.upper_links[level - 1]
+                for node in [n for n in layer if not dead[n]]:
+                    if any(dead[n] for n in layer[node]):
+                        self._repair(node, level, dead)
+                for node in [n for n in layer if dead[n]]:
+                    del layer[node]
+            
+            for slot in self.deleted:
+                self.levels[slot] = -1
+                self.link_counts0[slot] = 0
+                self._free.append(slot)
+            freed = len(self.deleted)
+            self.deleted.clear()
+            
+            if self.entry_point >= 0 and dead[self.entry_point]:
+                self._choose_entry_point()
+            return freed
+    
+    def memory_bytes(self) -> int:
+        """Bytes held by the fixed-size vector and link arrays."""
+        return (self.vectors.nbytes + self.scales.nbytes + self.levels.nbytes +
+                self.links0.nbytes + self.link_counts0.nbytes)
+    
+    def get_statistics(self) -> IndexStats:
+        """Get index statistics."""
+        with self._lock:
+            self.stats.total_entries = len(self.slots)
+            self.stats.depth = self.max_level + 1
+            self.stats.size_bytes = self.memory_bytes()
+            return self.stats
+    
+    def save(self, directory: str) -> None:
+        """Write a snapshot, replacing any previous one in ``directory``."""
+        with self._lock:
+            tmp = directory.rstrip(os.sep) + '.tmp'
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            for name in self._ARRAYS:
+                np.save(os.path.join(tmp, f"{name}.npy"), getattr(self, name))
+            state = {
+                'name': self.name, 'table_name': self.table_name, 'columns': self.columns,
+                'dim': self.dim, 'capacity': self.capacity, 'm': self.m,
+                'ef_construction': self.ef_construction, 'ef_search': self.ef_search,
+                'metric': self.metric, 'dtype': self.dtype,
+                'vacuum_fraction': self.vacuum_fraction,
+                'label_format': 'tagged',
+                'slots': [[encode_label(label), slot] for label, slot in self.slots.items()],
+                'upper_links': [[[node, links] for node, links in layer.items()]
+                                for layer in self.upper_links],
+                'deleted': sorted(self.deleted), 'free': self._free,
+                'next_slot': self._next_slot, 'entry_point': self.entry_point,
+                'max_level': self.max_level,
+            }
+            with open(os.path.join(tmp, 'graph.json'), 'w') as f:
+                json.dump(state, f)
+                
+        # Swap directories so readers never see a half-written snapshot
+        old = directory.rstrip(os.sep) + '.old'
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(directory):
+            os.rename(directory, old)
+        os.rename(tmp, directory)
+        shutil.rmtree(old, ignore_errors=True)
+    
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'HNSWIndex':
+        """Open a snapshot written by ``save``.
+        
+        With ``mmap`` the arrays are mapped copy-on-write, so opening is
+        immediate, pages load on first use and the snapshot file itself
+        is never modified.
+        """
+        with open(os.path.join(directory, 'graph.json')) as f:
+            state = json.load(f)
+        index = cls(state['name'], state['table_name'], state['columns'],
+                    dim=state['dim'], capacity=0, m=state['m'],
+                    ef_construction=state['ef_construction'],
+                    ef_search=state['ef_search'], metric=state['metric'],
+                    dtype=state['dtype'], vacuum_fraction=state['vacuum_fraction'])
+        for name in cls._ARRAYS:
+            setattr(index, name, np.load(os.path.join(directory, f"{name}.npy"),
+                                         mmap_mode='c' if mmap else None))
+        capacity = index.capacity = len(index.levels)
+        index.vacuum_threshold = max(16, int(capacity * index.vacuum_fraction))
+        index._visited = np.zeros(capacity, dtype=bool)
+        index.labels = [None] * capacity
+        tagged = state.get('label_format') == 'tagged'
+        for label, slot in state['slots']:
+            if tagged:
+                label = decode_label(label)
+            elif isinstance(label, list):
+                # Snapshots from before tagging stored raw JSON labels
+                label = tuple(label)
+            index.slots[label] = slot
+            index.labels[slot] = label
+        index.upper_links = [{node: links for node, links in layer}
+                             for layer in state['upper_links']]
+        index.deleted = set(state['deleted'])
+        index._free = state['free']
+        index._next_slot = state['next_slot']
+        index.entry_point = state['entry_point']
+        index.max_level = state['max_level']
+        return index
+    
+    def cleanup(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self.levels.fill(-1)
+            self.link_counts0.fill(0)
+            self.upper_links = []
+            self.labels = [None] * self.capacity
+            self.live.fill(False)
+            self.slots.clear()
+            self.deleted.clear()
+            self._free = []
+            self._next_slot = 0
+            self.entry_point = -1
+            self.max_level = -1
+    
+    _ARRAYS = ('vectors', 'scales', 'levels', 'links0', 'link_counts0', 'live')
+    
+    def _store(self, slot: int, v: np.ndarray) -> None:
+        if self.dtype == 'int8':
+            # Symmetric per-vector quantization keeps each vector's direction
+            peak = float(np.abs(v).max())
+            scale = peak / 127.0 if peak > 0 else 1.0
+            self.vectors[slot] = np.round(v / scale).astype(np.int8)
+            self.scales[slot] = scale
+        else:
+            self.vectors[slot] = v
+    
+    def _gather(self, slots: Any) -> np.ndarray:
+        """Stored vectors as float32, dequantized if needed."""
+        if self.dtype == 'int8':
+            return self.vectors[slots].astype(np.float32) * self.scales[slots, None]
+        return self.vectors[slots]
+    
+    def _prepare(self, vector: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if v.shape[0] != self.dim:
+            raise ValueError(f"Expected {self.dim} dimensions, got {v.shape[0]}")
+        if self.metric == 'cosine':
+            norm = np.linalg.norm(v)
+            if norm > 0:
+                v = v / norm
+        return v
+    
+    def _allowed(self, filter: Optional[Callable[[Hashable], bool]]
+                 ) -> Optional[Callable[[int], bool]]:
+        """Slots that may appear in results: live and passing the filter."""
+        live, labels = self.live, self.labels
+        if filter is not None:
+            return lambda slot: live[slot] and filter(labels[slot])
+        if self.deleted:
+            return lambda slot: live[slot]
+        return None
+        
+    def _allocate(self) -> int:
+        if not self._free and self._next_slot >= self.capacity and self.deleted:
+            self.vacuum()
+        if self._free:
+            return self._free.pop()
+        if self._next_slot >= self.capacity:
+            raise IndexFullError(f"Index {self.name} is full ({self.capacity} vectors)")
+        self._next_slot += 1
+        return self._next_slot - 1
+    
+    def _distances(self, q: np.ndarray, slots: Sequence[int]) -> np.ndarray:
+        vectors = self._gather(slots)
+        if self.metric == 'cosine':
+            return 1.0 - vectors @ q
+        diff = vectors - q
+        return np.einsum('ij,ij->i', diff, diff)
+    
+    def _neighbors(self, slot: int, level: int) -> Sequence[int]:
+        if level == 0:
+            return self.links0[slot, :self.link_counts0[slot]]
+        return self.upper_links[level - 1].get(slot, [])
+        
+    def _set_neighbors(self, slot: int, level: int, neighbors: List[int]) -> None:
+        if level == 0:
+            self.links0[slot, :len(neighbors)] = neighbors
+            self.link_counts0[slot] = len(neighbors)
+        else:
+            self.upper_links[level - 1][slot] = list(neighbors)
+    
+    def _descend(self, q: np.ndarray, from_level: int, to_level: int) -> int:
+        """Greedy search from the entry point down to ``to_level``."""
+        node = self.entry_point
+        distance = float(self._distances(q, [node])[0])
+        for level in range(from_level, to_level, -1):
+            improved = True
+            while improved:
+                improved = False
+                neighbors = self._neighbors(node, level)
+                if not neighbors:
+                    break
+                dists = self._distances(q, neighbors)
+                best = int(np.argmin(dists))
+                if dists[best] < distance:
+                    distance = float(dists[best])
+                    node = neighbors[best]
+                    improved = True
+        return node
+    
+    def _search_layer(self, q: np.ndarray, entry_points: List[int], ef: int,
+                      level: int, allowed: Optional[Callable[[int], bool]] = None
+                      ) -> List[Tuple[float, int]]:
+        """Beam search of one layer, returning ``(distance, slot)`` nearest first.
+        
+        Nodes rejected by ``allowed`` are traversed but not returned.
+        """
+        visited = self._visited
+        touched = [np.asarray(entry_points, dtype=np.int64)]
+        visited[touched[0]] = True
+        candidates: List[Tuple[float, int]] = []
+        results: List[Tuple[float, int]] = []  # Max-heap by negated distance
+        for distance, node in zip(self._distances(q, entry_points).tolist(), entry_points):
+            heapq.heappush(candidates, (distance, node))
+            if allowed is None or allowed(node):
+                heapq.heappush(results, (-distance, node))
+        bound = -results[0][0] if len(results) >= ef else float('inf')
+        
+        try:
+            while candidates:
+                distance, node = heapq.heappop(candidates)
+                if distance > bound:
+                    break
+                neighbors = np.asarray(self._neighbors(node, level), dtype=np.int64)
+                neighbors = neighbors[~visited[neighbors]]
+                if not neighbors.size:
+                    continue
+                visited[neighbors] = True
+                touched.append(neighbors)
+                dists = self._distances(q, neighbors)
+                closer = dists < bound
+                for nd, n in zip(dists[closer].tolist(), neighbors[closer].tolist()):
+                    if nd >= bound:
+                        continue
+                    heapq.heappush(candidates, (nd, n))
+                    if allowed is None or allowed(n):
+                        heapq.heappush(results, (-nd, n))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+                        if len(results) >= ef:
+                            bound = -results[0][0]
+        finally:
+            for slots in touched:
+                visited[slots] = False
+        return sorted((-d, n) for d, n in results)
+        
+    def _select(self, base: int, candidates: List[Tuple[float, int]],
+                limit: int) -> List[int]:
+        """Keep diverse neighbours: closer to ``base`` than to any already kept."""
+        if len(candidates) <= limit:
+            return [node for _, node in candidates]
+        nodes = [node for _, node in candidates]
+        to_base = np.array([distance for distance, _ in candidates])
+        vectors = self._gather(nodes)
+        if self.metric == 'cosine':
+            pairwise = 1.0 - vectors @ vectors.T
+        else:
+            sq = np.einsum('ij,ij->i', vectors, vectors)
+            pairwise = sq[:, None] + sq[None, :] - 2.0 * (vectors @ vectors.T)
+            
+        # A candidate closer to a kept neighbour than to base is redundant
+        kept: List[int] = []
+        blocked = np.zeros(len(nodes), dtype=bool)
+        for i in range(len(nodes)):
+            if blocked[i]:
+                continue
+            kept.append(i)
+            if len(kept) >= limit:
+                break
+            blocked |= pairwise[i] < to_base
+        # Fill up with the nearest pruned candidates to keep the graph connected
+        if len(kept) < limit:
+            chosen = set(kept)
+            kept.extend([i for i in range(len(nodes)) if i not in chosen][:limit - len(kept)])
+        return [nodes[i] for i in kept]
+        
+    def _link(self, slot: int) -> None:
+        """Insert a slot into the graph."""
+        level = min(int(-math.log(1.0 - self._rng.random()) * self._level_mult), 127)
+        self.levels[slot] = level
+        while len(self.upper_links) < level:
+            self.upper_links.append({})
+        
+        if self.entry_point < 0:
+            for upper in range(1, level + 1):
+                self.upper_links[upper - 1][slot] = []
+            self.link_counts0[slot] = 0
+            self.entry_point, self.max_level = slot, level
+            return
+        
+        q = self._gather(slot)
+        node = self._descend(q, self.max_level, level)
+        entry_points = [node]
+        for current in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(q, entry_points, self.ef_construction, current)
+            found = [(d, n) for d, n in found if n != slot]
+            limit = self.max_links0 if current == 0 else self.m
+            neighbors = self._select(slot, found, self.m)
+            self._set_neighbors(slot, current, neighbors)
+            for neighbor in neighbors:
+                self._add_link(neighbor, slot, current, limit)
+            entry_points = [n for _, n in found] or entry_points
+        for upper in range(self.max_level + 1, level + 1):
+            self.upper_links[upper - 1][slot] = []
+        
+        if level > self.max_level:
+            self.entry_point, self.max_level = slot, level
+    
+    def _add_link(self, node: int, new: int, level: int, limit: int) -> None:
+        neighbors = list(self._neighbors(node, level))
+        if len(neighbors) < limit and level == 0:
+            if new not in neighbors:
+                self.links0[node, len(neighbors)] = new
+                self.link_counts0[node] = len(neighbors) + 1
+            return
+        if new in neighbors:
+            return
+        neighbors.append(new)
+        if len(neighbors) > limit:
+            dists = self._distances(self._gather(node), neighbors).tolist()
+            neighbors = self._select(node, sorted(zip(dists, neighbors)), limit)
+        self._set_neighbors(node, level, neighbors)
+    
+    def _repair(self, node: int, level: int, dead: np.ndarray) -> None:
+        """Replace a node's dead neighbours with live neighbours of theirs."""
+        neighbors = list(self._neighbors(node, level))
+        live = [n for n in neighbors if not dead[n]]
+        candidates = set(live)
+        for n in neighbors:
+            if dead[n]:
+                candidates.update(m for m in self._neighbors(n, level)
+                                  if not dead[m] and m != node)
+        limit = self.max_links0 if level == 0 else self.m
+        if len(candidates) < self.m:
+            # Too few local replacements: search the layer as an insert would.
+            # Dead nodes keep their links until the vacuum finishes.
+            q = self._gather(node)
+            entry = self._descend(q, self.max_level, level)
+            found = self._search_layer(q, [entry], self.ef_construction, level,
+                                       lambda slot: not dead[slot] and slot != node)
+            candidates.update(n for _, n in found)
+        if not candidates:
+            self._set_neighbors(node, level, [])
+            return
+        pool = list(candidates)
+        dists = self._distances(self._gather(node), pool).tolist()
+        self._set_neighbors(node, level, self._select(node, sorted(zip(dists, pool)), limit))
+    
+    def _choose_entry_point(self) -> None:
+        live = np.nonzero(self.levels[:self._next_slot] >= 0)[0]
+        if not len(live):
+            self.entry_point, self.max_level = -1, -1
+            self.upper_links = []
+            return
+        best = int(live[np.argmax(self.levels[live])])
+        self.entry_point, self.max_level = best, int(self.levels[best])
+        del self.upper_links[self.max_level:]
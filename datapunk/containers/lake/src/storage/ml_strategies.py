@@ -297,7 +297,8 @@ class SequenceWarming(WarmingStrategy):
         sequences = []
         labels = []
         
-        for key, times in self.access_pattern.access_times.items():
+        for key in self.access_pattern.tracked_keys():
+            times = self.access_pattern.recent_accesses(key)
             if len(times) < self.sequence_length + 1:
                 continue
                 
@@ -342,7 +343,7 @@ class SequenceWarming(WarmingStrategy):
         TODO: Implement feature selection
         FIXME: Add proper validation
         """
-        times = self.access_pattern.access_times.get(key, [])
+        times = self.access_pattern.recent_accesses(key)
         if len(times) < self.sequence_length:
             return []
             
@@ -0,0 +1,260 @@
+
+# datapunk/containers/lake/src/storage/near_cache.py
+
+# In-process L1 tier in front of the Redis cache
+# Hot keys are served from local memory instead of crossing the network:
+# - Bounded by entry count and bytes, evicting least recently used
+# - Per-key TTL caps how stale an entry can get
+# - Writes on any node invalidate every node's copy over Redis pub/sub
+
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+@dataclass
+class CacheMetrics:
+    """Counters describing the near-cache and its invalidation."""
+    l1_hits: int = 0
+    l1_misses: int = 0
+    l1_evictions: int = 0
+    l1_expirations: int = 0
+    l1_fills_rejected: int = 0  # Fills raced by an invalidation
+    hit_age_total: float = 0.0  # Seconds since each served entry was fetched
+    hit_age_max: float = 0.0
+    invalidations_sent: int = 0  # Messages, each naming one or more keys
+    invalidations_received: int = 0
+    invalidation_lag_total: float = 0.0
+    invalidation_lag_max: float = 0.0
+    channel_outages: int = 0  # Times L1 was dropped for lack of heartbeats
+    
+    @property
+    def l1_hit_rate(self) -> float:
+        total = self.l1_hits + self.l1_misses
+        return self.l1_hits / total if total else 0.0
+    
+    @property
+    def mean_hit_age(self) -> float:
+        return self.hit_age_total / self.l1_hits if self.l1_hits else 0.0
+    
+    @property
+    def mean_invalidation_lag(self) -> float:
+        if not self.invalidations_received:
+            return 0.0
+        return self.invalidation_lag_total / self.invalidations_received
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    stored: float
+    expires: float
+
+class NearCache:
+    """Bounded LRU of decoded values with a TTL per entry.
+    
+    A read that misses takes a ``token`` before going to Redis and
+    passes it to ``put``; if the key was invalidated in between, the
+    fill is dropped so an old value cannot outlive the invalidation.
+    """
+    
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 5.0, metrics: Optional[CacheMetrics] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.metrics = metrics or CacheMetrics()
+        self.entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self.bytes = 0
+        self.enabled = True
+        self._generation = 0
+        self._invalidated: Dict[Hashable, int] = {}  # Generation of each key's last invalidation
+        self._floor = 0  # Tokens older than this are rejected for every key
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """``(found, value)`` for a key."""
+        entry = self.entries.get(key) if self.enabled else None
+        now = time.monotonic()
+        if entry is not None and entry.expires <= now:
+            self._drop(key)
+            self.metrics.l1_expirations += 1
+            entry = None
+        if entry is None:
+            self.metrics.l1_misses += 1
+            return False, None
+        self.entries.move_to_end(key)
+        age = now - entry.stored
+        self.metrics.l1_hits += 1
+        self.metrics.hit_age_total += age
+        self.metrics.hit_age_max = max(self.metrics.hit_age_max, age)
+        return True, entry.value
+    
+    def token(self) -> int:
+        """Marker to take before fetching a value that will be ``put``."""
+        return self._generation
+    
+    def put(self, key: Hashable, value: Any, size: int,
+            token: Optional[int] = None, ttl: Optional[float] = None) -> bool:
+        """Store a value, unless it was invalidated since ``token`` was taken."""
+        if not self.enabled or size > self.max_bytes:
+            return False
+        if token is not None and (token < self._floor or
+                                  self._invalidated.get(key, -1) > token):
+            self.metrics.l1_fills_rejected += 1
+            return False
+        self._drop(key)
+        now = time.monotonic()
+        self.entries[key] = _Entry(value, size, now, now + (self.ttl if ttl is None else ttl))
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+            self.metrics.l1_evictions += 1
+        return True
+    
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        """Drop keys and reject fills that started before now."""
+        self._generation += 1
+        for key in keys:
+            self._drop(key)
+            self._invalidated[key] = self._generation
+        self._forget_old_invalidations()
+    
+    def clear(self) -> None:
+        """Drop every entry and reject all fills in flight."""
+        self._generation += 1
+        self.entries.clear()
+        self.bytes = 0
+        self._invalidated = {}
+        self._floor = self._generation
+    
+    def _drop(self, key: Hashable) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+    
+    def _forget_old_invalidations(self) -> None:
+        # Bound the record; fills holding tokens older than what was
+        # forgotten are rejected outright
+        if len(self._invalidated) > 2 * self.max_entries:
+            self._floor = self._generation - self.max_entries
+            self._invalidated = {k: g for k, g in self._invalidated.items() if g > self._floor}
+
+class InvalidationBus:
+    """Broadcasts key invalidations between nodes over a pub/sub channel.
+    
+    Every node also publishes a heartbeat. A node that hears nothing,
+    not even its own heartbeat, for ``max_lag`` seconds assumes it may
+    have missed invalidations and bypasses its near-cache until the
+    channel recovers, so staleness stays bounded by ``max_lag`` on top
+    of delivery time.
+    """
+    
+    def __init__(self, redis: Any, near: NearCache, channel: str = "lake:cache:invalidate",
+                 max_lag: float = 1.0, heartbeat: Optional[float] = None,
+                 node_id: Optional[str] = None):
+        self.redis = redis
+        self.near = near
+        self.channel = channel
+        self.max_lag = max_lag
+        self.heartbeat = heartbeat or max_lag / 3
+        self.node_id = node_id or uuid.uuid4().hex
+        self.metrics = near.metrics
+        self._pubsub = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+        self._last_heard = 0.0
+        self.logger = logging.getLogger(__name__)
+    
+    async def start(self) -> None:
+        """Subscribe and start listening and sending heartbeats."""
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._last_heard = time.monotonic()
+        self._running = True
+        self._tasks = [asyncio.create_task(self._listen()),
+                       asyncio.create_task(self._beat())]
+    
+    async def stop(self) -> None:
+        """Stop listening and unsubscribe."""
+        # Clients may absorb a cancellation that lands mid-command
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pubsub is not None:
+            await self._pubsub.reset()
+            self._pubsub = None
+    
+    async def publish(self, keys: Iterable[str]) -> None:
+        """Invalidate keys here and on every other node."""
+        keys = list(keys)
+        self.near.invalidate(keys)
+        await self._send(keys)
+        self.metrics.invalidations_sent += 1
+    
+    async def publish_clear(self) -> None:
+        """Empty the near-cache here and on every other node."""
+        self.near.clear()
+        await self._send([], clear=True)
+        self.metrics.invalidations_sent += 1
+    
+    async def _send(self, keys: List[str], clear: bool = False) -> None:
+        message = {"node": self.node_id, "keys": keys, "clear": clear, "ts": time.time()}
+        await self.redis.publish(self.channel, json.dumps(message))
+    
+    async def _beat(self) -> None:
+        while self._running:
+            try:
+                await self._send([])
+            except Exception as e:
+                self.logger.warning(f"Invalidation heartbeat failed: {e}")
+            await asyncio.sleep(self.heartbeat)
+    
+    async def _listen(self) -> None:
+        while self._running:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=self.heartbeat)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"Invalidation channel error: {e}")
+                message = None
+                await asyncio.sleep(self.heartbeat)
+            if message is not None and message.get("type") == "message":
+                self._receive(message["data"])
+            self._check_outage()
+    
+    def _receive(self, data: Any) -> None:
+        payload = json.loads(data)
+        self._last_heard = time.monotonic()
+        if not self.near.enabled:
+            self.logger.info("Invalidation channel recovered; near-cache re-enabled")
+            self.near.enabled = True
+        if payload["node"] == self.node_id or not (payload["keys"] or payload.get("clear")):
+            return
+        if payload.get("clear"):
+            self.near.clear()
+        else:
+            self.near.invalidate(payload["keys"])
+        lag = max(time.time() - payload["ts"], 0.0)
+        self.metrics.invalidations_received += 1
+        self.metrics.invalidation_lag_total += lag
+        self.metrics.invalidation_lag_max = max(self.metrics.invalidation_lag_max, lag)
+    
+    def _check_outage(self) -> None:
+        if self.near.enabled and time.monotonic() - self._last_heard > self.max_lag:
+            self.logger.warning(f"No invalidations heard for {self.max_lag}s; "
+                                f"bypassing near-cache")
+            self.near.clear()
+            self.near.enabled = False
+            self.metrics.channel_outages += 1
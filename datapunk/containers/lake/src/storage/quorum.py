@@ -8,13 +8,17 @@
 # - Load balancing
 # - Health monitoring
 # - Data rebalancing
+# - Hedged quorum reads with read-repair
 
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 import asyncio
 import logging
+import math
+import random
 import time
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, deque
+from dataclasses import dataclass
 import aioredis
 from datetime import datetime, timedelta
 from sklearn.linear_model import LinearRegression
@@ -79,6 +83,78 @@ class NodeStats:
         self.error_count = 0
         self.last_update = 0
 
+class LatencyEstimate:
+    """Exponentially decayed latency statistics for one node.
+    
+    Recent operations outweigh old ones, so estimates follow a node
+    that slows down or recovers within tens of operations:
+    - mean: EWMA of latency, used for ranking
+    - error_rate: EWMA of failures
+    - percentile(): from a decayed histogram of log-spaced buckets,
+      with a slower decay so tail estimates have enough samples
+    
+    Implementation Notes:
+    - O(1) memory and O(1) recording; instead of decaying every
+      bucket, each new sample is weighted up and all weights are
+      rescaled once they grow large
+    """
+    
+    BASE = 50e-6  # Upper bound of the first bucket, in seconds
+    GROWTH = 1.25  # Bucket bounds grow 25% each; the last is about a minute
+    BUCKETS = 64
+    
+    def __init__(self, alpha: float = 0.1, histogram_decay: float = 0.01):
+        self.alpha = alpha
+        self.histogram_decay = histogram_decay
+        self.mean: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self._counts = [0.0] * self.BUCKETS
+        self._total = 0.0
+        self._weight = 1.0
+    
+    def record(self, seconds: float):
+        """Add a successful operation's latency."""
+        self.samples += 1
+        self.mean = seconds if self.mean is None else (
+            self.mean + self.alpha * (seconds - self.mean)
+        )
+        self.error_rate -= self.alpha * self.error_rate
+        
+        bucket = 0
+        if seconds > self.BASE:
+            bucket = min(
+                math.ceil(math.log(seconds / self.BASE, self.GROWTH)),
+                self.BUCKETS - 1
+            )
+        self._counts[bucket] += self._weight
+        self._total += self._weight
+        self._weight /= 1.0 - self.histogram_decay
+        if self._weight > 1e12:
+            self._counts = [c / self._weight for c in self._counts]
+            self._total /= self._weight
+            self._weight = 1.0
+    
+    def record_failure(self):
+        """Count a failed operation."""
+        self.error_rate += self.alpha * (1.0 - self.error_rate)
+    
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound of the bucket holding the p-th quantile (0 < p <= 1)."""
+        if not self._total:
+            return None
+        target = p * self._total
+        seen = 0.0
+        for bucket, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return self.BASE * self.GROWTH ** bucket
+        return self.BASE * self.GROWTH ** (self.BUCKETS - 1)
+    
+    def cost(self, failure_penalty: float = 1.0) -> float:
+        """Expected seconds per operation; unmeasured nodes cost nothing."""
+        return (self.mean or 0.0) + self.error_rate * failure_penalty
+
 class LoadBalancer:
     """Advanced load balancer for distributed Redis nodes.
     
@@ -126,7 +202,8 @@ class LoadBalancer:
         """
         self.window_size = window_size
         self.node_stats: Dict[str, NodeStats] = {}
-        self.operation_times: Dict[str, List[float]] = defaultdict(list)
+        self.operation_times: Dict[str, Deque[Tuple[float, str, float]]] = defaultdict(deque)
+        self.latency: Dict[str, LatencyEstimate] = defaultdict(LatencyEstimate)
         
     def record_operation(
         self,
@@ -154,7 +231,30 @@ class LoadBalancer:
         """
         now = time.time()
         self.operation_times[node_id].append((now, operation, duration))
+        self.latency[node_id].record(duration)
         self._cleanup_old_data(now)
+    
+    def record_failure(self, node_id: str, operation: str):
+        """Record a failed operation; failures push a node down the ranking."""
+        self.latency[node_id].record_failure()
+    
+    def rank(self, node_ids: List[str]) -> List[str]:
+        """Nodes ordered by decayed expected latency, fastest first.
+        
+        Nodes without measurements rank first so they get probed.
+        """
+        return sorted(node_ids, key=lambda node_id: self.latency[node_id].cost())
+    
+    def hedge_delay(
+        self,
+        node_id: str,
+        percentile: float = 0.95,
+        default: float = 0.01,
+        floor: float = 0.001
+    ) -> float:
+        """Seconds to wait on node_id before asking another replica."""
+        estimate = self.latency[node_id].percentile(percentile)
+        return max(default if estimate is None else estimate, floor)
         
     def get_node_score(self, node_id: str) -> float:
         """Calculate comprehensive node health score.
@@ -186,8 +286,11 @@ class LoadBalancer:
             
         stats = self.node_stats[node_id]
         
+        # Prefer measured, decayed latency over the last reported value
+        latency = self.latency[node_id].mean if node_id in self.latency else None
+        
         # Calculate score components
-        latency_score = 1.0 / (1.0 + stats.latency)
+        latency_score = 1.0 / (1.0 + (stats.latency if latency is None else latency))
         error_score = 1.0 / (1.0 + stats.error_count)
         load_score = 1.0 - (stats.cpu_usage / 100.0)
         
@@ -245,17 +348,15 @@ class LoadBalancer:
         - Memory efficient
         - Time-based filtering
         
-        TODO: Add incremental cleanup
         TODO: Implement cleanup strategies
         FIXME: Add proper validation
         """
         cutoff = current_time - self.window_size
         
-        for node_id in self.operation_times:
-            self.operation_times[node_id] = [
-                (t, op, d) for t, op, d in self.operation_times[node_id]
-                if t > cutoff
-            ]
+        # Entries are appended in time order, so expired ones are at the front
+        for times in self.operation_times.values():
+            while times and times[0][0] <= cutoff:
+                times.popleft()
 
 class ScalingPredictor:
     """ML-based predictor for node scaling requirements.
@@ -478,4 +579,263 @@ class AutoScaler:
         self.scale_down_factor = scale_down_factor
         self.cooldown_period = cooldown_period
         self.last_scale = 0
-        self.predictor = ScalingPredictor()
\ No newline at end of file
+        self.predictor = ScalingPredictor()
+
+class QuorumError(Exception):
+    """Raised when too few replicas answer to form a quorum."""
+
+@dataclass
+class QuorumStats:
+    """Counters describing quorum reads and writes."""
+    reads: int = 0
+    hedged: int = 0  # Requests sent beyond the initial read quorum
+    inconsistent: int = 0  # Reads whose replicas disagreed on the version
+    repairs: int = 0  # Stale replicas overwritten by read-repair
+    failures: int = 0  # Replica operations that raised
+
+class QuorumReplication:
+    """Quorum reads and writes across replicated Redis nodes.
+    
+    Why hedged reads matter:
+    - Waiting on fixed replicas lets the slowest one set tail latency
+    - Reads go to the read_quorum fastest replicas, ranked by the
+      LoadBalancer's decayed latency estimates; another replica is
+      asked only once a request outlives its node's latency percentile
+    - A read returns as soon as read_quorum replicas agree on a version
+    - Replicas that answered with older versions, including ones that
+      answer after the read returned, are fixed by background read-repair
+    
+    Implementation Notes:
+    - Stored values carry a 9-byte header: a marker byte and a
+      big-endian version from a microsecond clock, so headers order
+      bytewise both here and in Redis
+    - Read-repair only overwrites values with older headers, checked
+      atomically in a Lua script
+    - Writes go to every replica and succeed with write_quorum acks
+    """
+    
+    MARKER = b"\xfe"
+    HEADER_SIZE = 9
+    ABSENT = b""  # Version of a missing key
+    UNVERSIONED = b"\x00"  # Version of a value written without a header
+    
+    _REPAIR = """
+    if redis.call('getrange', KEYS[1], 0, 8) < ARGV[1] then
+        if tonumber(ARGV[3]) > 0 then
+            redis.call('set', KEYS[1], ARGV[2], 'px', ARGV[3])
+        else
+            redis.call('set', KEYS[1], ARGV[2])
+        end
+        return 1
+    end
+    return 0
+    """
+    
+    def __init__(
+        self,
+        nodes: List[Dict[str, Any]],
+        read_quorum: int = 2,
+        write_quorum: int = 2,
+        hedge_percentile: float = 0.95,
+        balancer: Optional[LoadBalancer] = None,
+        connect: Optional[Callable[[Dict[str, Any]], Any]] = None
+    ):
+        if not 0 < read_quorum <= len(nodes) or not 0 < write_quorum <= len(nodes):
+            raise ValueError(
+                f"Quorums must be between 1 and {len(nodes)} nodes, got "
+                f"read={read_quorum} write={write_quorum}"
+            )
+        self.nodes = {f"{node['host']}:{node['port']}": node for node in nodes}
+        self.read_quorum = read_quorum
+        self.write_quorum = write_quorum
+        self.hedge_percentile = hedge_percentile
+        self.balancer = balancer or LoadBalancer()
+        self.connect = connect or (
+            lambda node: aioredis.from_url(f"redis://{node['host']}:{node['port']}")
+        )
+        self.connections: Dict[str, Any] = {}
+        self.stats = QuorumStats()
+        self._repairs: Set[asyncio.Task] = set()
+        self._last_version = 0
+        self._writer_tag = random.getrandbits(12)  # Separates writers within a microsecond
+        
+    async def start(self):
+        """Connect to every replica."""
+        for node_id, node in self.nodes.items():
+            self.connections[node_id] = self.connect(node)
+            
+    async def stop(self):
+        """Finish pending read-repairs and close connections."""
+        if self._repairs:
+            await asyncio.gather(*list(self._repairs), return_exceptions=True)
+        for redis in self.connections.values():
+            close = getattr(redis, "aclose", None) or getattr(redis, "close", None)
+            if close is not None:
+                await close()
+        self.connections = {}
+        
+    async def read(self, key: str) -> Tuple[Optional[bytes], List[str], bool]:
+        """Read key from a quorum, hedging slow replicas.
+        
+        Returns the newest value seen, the nodes that returned it and
+        whether every answering replica agreed. Raises QuorumError if
+        fewer than read_quorum replicas answer.
+        """
+        self.stats.reads += 1
+        order = self.balancer.rank(list(self.connections))
+        pending: Dict[asyncio.Task, str] = {}
+        replies: Dict[str, Tuple[bytes, Optional[bytes], int]] = {}
+        votes: Dict[bytes, int] = defaultdict(int)
+        asked = 0
+        hedge_at = 0.0
+        
+        def launch():
+            nonlocal asked, hedge_at
+            node_id = order[asked]
+            asked += 1
+            pending[asyncio.ensure_future(self._read_replica(node_id, key))] = node_id
+            # The next replica is asked once every request in flight is slow
+            hedge_at = time.monotonic() + max(
+                self.balancer.hedge_delay(n, self.hedge_percentile)
+                for n in pending.values()
+            )
+        
+        for _ in range(self.read_quorum):
+            launch()
+        
+        while pending and max(votes.values(), default=0) < self.read_quorum:
+            timeout = max(hedge_at - time.monotonic(), 0.0) if asked < len(order) else None
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                self.stats.hedged += 1
+                launch()
+                continue
+            
+            for task in done:
+                node_id = pending.pop(task)
+                try:
+                    replies[node_id] = task.result()
+                    votes[replies[node_id][0]] += 1
+                except Exception as e:
+                    self.stats.failures += 1
+                    logger.warning(f"Quorum read of {key} from {node_id} failed: {e}")
+                    
+            # Replace failures and break disagreements with another replica
+            needed = self.read_quorum - max(votes.values(), default=0)
+            while asked < len(order) and needed > len(pending):
+                self.stats.hedged += 1
+                launch()
+            
+        if len(replies) < self.read_quorum:
+            for task in pending:
+                task.cancel()
+            raise QuorumError(
+                f"Only {len(replies)} of {self.read_quorum} replicas answered for {key}"
+            )
+        
+        version = max(version for version, _, _ in replies.values())
+        _, value, ttl = next(r for r in replies.values() if r[0] == version)
+        consistent = len(votes) == 1
+        if not consistent:
+            self.stats.inconsistent += 1
+        
+        stale = [node_id for node_id, reply in replies.items() if reply[0] < version]
+        if value is not None and version[:1] == self.MARKER and (stale or pending):
+            task = asyncio.ensure_future(
+                self._repair(key, version + value, ttl, stale, dict(pending))
+            )
+            self._repairs.add(task)
+            task.add_done_callback(self._repairs.discard)
+        else:
+            for task in pending:
+                task.cancel()
+            
+        nodes = [node_id for node_id, reply in replies.items() if reply[0] == version]
+        return value, nodes, consistent
+        
+    async def write(
+        self,
+        key: str,
+        data: bytes,
+        ttl: Optional[int] = None
+    ) -> Tuple[bool, List[str]]:
+        """Write a new version of key to every replica.
+        
+        Returns whether write_quorum replicas acknowledged, and which.
+        """
+        value = self._next_version() + data
+        node_ids = list(self.connections)
+        results = await asyncio.gather(
+            *(self._write_replica(node_id, key, value, ttl) for node_id in node_ids),
+            return_exceptions=True
+        )
+        nodes = []
+        for node_id, result in zip(node_ids, results):
+            if isinstance(result, Exception):
+                self.stats.failures += 1
+                logger.warning(f"Quorum write of {key} to {node_id} failed: {result}")
+            else:
+                nodes.append(node_id)
+        return len(nodes) >= self.write_quorum, nodes
+        
+    def _next_version(self) -> bytes:
+        micros = time.time_ns() // 1000
+        self._last_version = max((micros << 12) | self._writer_tag, self._last_version + 1)
+        return self.MARKER + self._last_version.to_bytes(8, "big")
+        
+    def _split(self, raw: Optional[bytes]) -> Tuple[bytes, Optional[bytes]]:
+        if raw is None:
+            return self.ABSENT, None
+        if raw[:1] == self.MARKER and len(raw) >= self.HEADER_SIZE:
+            return raw[:self.HEADER_SIZE], raw[self.HEADER_SIZE:]
+        return self.UNVERSIONED, raw
+        
+    async def _read_replica(self, node_id: str, key: str) -> Tuple[bytes, Optional[bytes], int]:
+        started = time.monotonic()
+        try:
+            pipe = self.connections[node_id].pipeline(transaction=False)
+            pipe.get(key)
+            pipe.pttl(key)
+            raw, ttl = await pipe.execute()
+        except Exception:
+            self.balancer.record_failure(node_id, "read")
+            raise
+        self.balancer.record_operation(node_id, "read", time.monotonic() - started)
+        return (*self._split(raw), ttl)
+        
+    async def _write_replica(self, node_id: str, key: str, value: bytes, ttl: Optional[int]):
+        started = time.monotonic()
+        try:
+            await self.connections[node_id].set(key, value, ex=ttl)
+        except Exception:
+            self.balancer.record_failure(node_id, "write")
+            raise
+        self.balancer.record_operation(node_id, "write", time.monotonic() - started)
+        
+    async def _repair(
+        self,
+        key: str,
+        value: bytes,
+        ttl: int,
+        stale: List[str],
+        late: Dict[asyncio.Task, str]
+    ):
+        # Replicas still answering when the read returned are checked too
+        if late:
+            await asyncio.wait(late)
+            version = value[:self.HEADER_SIZE]
+            for task, node_id in late.items():
+                if not task.exception() and task.result()[0] < version:
+                    stale.append(node_id)
+        for node_id in stale:
+            try:
+                repaired = await self.connections[node_id].eval(
+                    self._REPAIR, 1, key, value[:self.HEADER_SIZE], value, max(ttl, 0)
+                )
+                self.stats.repairs += int(repaired)
+            except Exception as e:
+                logger.warning(f"Read-repair of {key} on {node_id} failed: {e}")
@@ -0,0 +1,88 @@
+
+# datapunk/containers/lake/src/storage/serialization.py
+
+# Compact value encoding for the Lake Service cache
+# Values are encoded with a pluggable format (msgpack by default) and
+# compressed only when large enough to benefit:
+# - One flag byte records how the payload was compressed
+# - LZ4 favours speed over ratio on the hot path; zlib remains available
+# - Formats can be registered by name, e.g. orjson where it is installed
+
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+import pickle
+import zlib
+import lz4.frame
+import msgpack
+
+Dumps = Callable[[Any], bytes]
+Loads = Callable[[bytes], Any]
+
+_RAW = 0
+_LZ4 = 1
+_ZLIB = 2
+_ZLIB_MAGIC = 0x78  # First byte of a zlib stream, as written before framing
+
+_COMPRESSORS: Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    _LZ4: (lz4.frame.compress, lz4.frame.decompress),
+    _ZLIB: (zlib.compress, zlib.decompress),
+}
+_ALGORITHMS = {"lz4": _LZ4, "zlib": _ZLIB}
+
+FORMATS: Dict[str, Tuple[Dumps, Loads]] = {
+    "json": (lambda value: json.dumps(value, separators=(",", ":")).encode(),
+             lambda data: json.loads(data.decode())),
+    "pickle": (lambda value: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+               pickle.loads),
+    "msgpack": (lambda value: msgpack.packb(value, use_bin_type=True),
+                lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False)),
+}
+
+def register_format(name: str, dumps: Dumps, loads: Loads) -> None:
+    """Make a value format available to ``Serializer`` by name."""
+    FORMATS[name] = (dumps, loads)
+
+class Serializer:
+    """Encodes cache values, compressing payloads of ``threshold`` bytes or more.
+    
+    Encoded values start with a flag byte naming the compression used.
+    Values written before the flag existed (plain or zlib-compressed)
+    are still read, decoded with ``legacy_format``, the format they were
+    written in.
+    """
+    
+    def __init__(self, format: str = "msgpack", compression: Optional[str] = "lz4",
+                 threshold: int = 1024, legacy_format: str = "json"):
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported format: {format}")
+        if legacy_format not in FORMATS:
+            raise ValueError(f"Unsupported format: {legacy_format}")
+        if compression is not None and compression not in _ALGORITHMS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.format = format
+        self.compression = compression
+        self.threshold = threshold
+        self._dumps, self._loads = FORMATS[format]
+        self._legacy_loads = FORMATS[legacy_format][1]
+    
+    def dumps(self, value: Any) -> bytes:
+        """Encode a value."""
+        body = self._dumps(value)
+        if self.compression and len(body) >= self.threshold:
+            flag = _ALGORITHMS[self.compression]
+            compressed = _COMPRESSORS[flag][0](body)
+            # Incompressible payloads are kept as they are
+            if len(compressed) < len(body):
+                return bytes((flag,)) + compressed
+        return bytes((_RAW,)) + body
+    
+    def loads(self, data: bytes) -> Any:
+        """Decode a value written by ``dumps``."""
+        flag = data[0]
+        if flag == _RAW:
+            return self._loads(data[1:])
+        if flag in _COMPRESSORS:
+            return self._loads(_COMPRESSORS[flag][1](data[1:]))
+        if flag == _ZLIB_MAGIC:
+            return self._legacy_loads(zlib.decompress(data))
+        return self._legacy_loads(data)
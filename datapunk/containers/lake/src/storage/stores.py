@@ -6,14 +6,50 @@
 # - Time series data (for metrics and temporal analysis)
 # - Spatial data (for geographic and geometric operations)
 
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import json
+import logging
 import asyncpg
 from asyncpg import Pool
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timezone
 from .base import BaseStore
+from .batch_writer import BatchWriter, CopyTarget
+from .timeseries_tier import Timestamp, TimeSeriesTier, to_millis
+from .index.hnsw import IndexFullError
+from .vector_index import MetadataFilter, VectorIndexTier
 
-class VectorStore(BaseStore):
+logger = logging.getLogger(__name__)
+
+# COPY targets for batched writes; geometry and vector have no binary COPY
+# codec in asyncpg, so those rows are staged as text/real[] and converted
+METRICS_TARGET = CopyTarget("metrics", ["timestamp", "data"])
+LOCATIONS_TARGET = CopyTarget(
+    "locations", ["geom", "properties"],
+    staging_types=["text", "jsonb"],
+    expressions=["ST_GeomFromGeoJSON(geom)", "properties"])
+VECTORS_TARGET = CopyTarget(
+    "vectors", ["id", "embedding", "metadata"],
+    staging_types=["bigint", "real[]", "jsonb"],
+    expressions=["id", "embedding::vector", "metadata"])
+
+class BatchedWrites:
+    """Gives a store access to a shared COPY-based BatchWriter.
+    
+    Assign ``writer`` to share one writer between stores; otherwise one
+    is started on first use.
+    """
+    
+    writer: Optional[BatchWriter] = None
+    
+    async def _writer(self, target: CopyTarget) -> BatchWriter:
+        if self.writer is None:
+            self.writer = BatchWriter(self.pool)
+            await self.writer.start()
+        self.writer.register(target)
+        return self.writer
+
+class VectorStore(BatchedWrites, BaseStore):
     """Specialized storage engine for high-dimensional vector data using PostgreSQL with pgvector extension.
     
     This store is a critical component for AI/ML operations, handling:
@@ -29,13 +65,39 @@ class VectorStore(BaseStore):
     Performance Considerations:
     - Vector dimensions should be consistent within collections
     - Index creation recommended for datasets > 10k vectors
-    - Consider batch operations for bulk inserts
+    - Use insert_vectors for bulk inserts; it writes with COPY
+    
+    In-process Tier:
+    - ``enable_index`` mirrors the table into a local HNSW graph that
+      serves searches without a database round-trip
+    - Writes through the store keep the graph in sync; pgvector remains
+      the source of truth and the graph is rebuilt from it when needed
     
     NOTE: Requires PostgreSQL with pgvector extension installed and configured
-    TODO: Implement vector index management for large-scale deployments
     FIXME: Add dimension validation and error handling
     """
     
+    index: Optional[VectorIndexTier] = None
+    
+    async def enable_index(self, dim: int, capacity: int,
+                           snapshot_path: Optional[str] = None,
+                           **options) -> VectorIndexTier:
+        """Serve similarity search from an in-process HNSW tier.
+        
+        The tier reopens ``snapshot_path`` and catches up with the table
+        if a snapshot exists, otherwise it is built from the table.
+        Options are passed to ``VectorIndexTier.create`` (metric, dtype, m...).
+        """
+        tier = VectorIndexTier.create(dim, capacity, snapshot_path=snapshot_path, **options)
+        await tier.open(self.pool)
+        self.index = tier
+        return tier
+    
+    def disable_index(self) -> None:
+        """Send searches back to pgvector."""
+        self.index = None
+    
+    
     async def insert_vector(self, vector: np.ndarray, metadata: Dict[str, Any]) -> str:
         """Store a vector embedding with associated metadata.
         
@@ -50,7 +112,6 @@ class VectorStore(BaseStore):
         - Returns a unique identifier for future reference
         
         FIXME: Add validation for vector dimensions
-        TODO: Implement batch insert for better performance
         NOTE: Metadata should include source, timestamp, and context
         """
         query = """
@@ -59,9 +120,55 @@ class VectorStore(BaseStore):
         RETURNING id;
         """
         async with self.pool.acquire() as conn:
-            return await conn.fetchval(query, vector.tolist(), metadata)
+            vector_id = await conn.fetchval(query, vector.tolist(), metadata)
+        self._mirror(vector_id, vector, metadata)
+        return vector_id
+    
+    async def insert_vectors(self, vectors: Sequence[np.ndarray],
+                             metadata: Sequence[Dict[str, Any]]) -> List[int]:
+        """Store many vectors with one COPY per batch, returning their ids.
+        
+        Ids are reserved from the table's sequence up front so the rows
+        can be copied and mirrored into the in-process tier; the call
+        returns once the rows are committed.
+        """
+        if len(vectors) != len(metadata):
+            raise ValueError("vectors and metadata must have same length")
+        async with self.pool.acquire() as conn:
+            ids = [r["id"] for r in await conn.fetch(
+                "SELECT nextval(pg_get_serial_sequence('vectors', 'id')) AS id "
+                "FROM generate_series(1, $1);", len(vectors))]
+        rows = [(vector_id, np.asarray(vector, dtype=np.float32).tolist(),
+                 json.dumps(meta, default=str))
+                for vector_id, vector, meta in zip(ids, vectors, metadata)]
+        writer = await self._writer(VECTORS_TARGET)
+        await writer.write_many("vectors", rows, wait=True)
+        for vector_id, vector, meta in zip(ids, vectors, metadata):
+            self._mirror(vector_id, vector, meta)
+        return ids
     
-    async def search_similar(self, vector: np.ndarray, limit: int = 10) -> List[Dict[str, Any]]:
+    async def delete_vector(self, vector_id: Any) -> bool:
+        """Delete a vector and drop it from the in-process tier."""
+        async with self.pool.acquire() as conn:
+            deleted = await conn.fetchval(
+                "DELETE FROM vectors WHERE id = $1 RETURNING id;", vector_id)
+        if self.index:
+            self.index.remove(vector_id)
+        return deleted is not None
+    
+    def _mirror(self, vector_id: Any, vector: np.ndarray, metadata: Dict[str, Any]) -> None:
+        """Copy a committed write into the in-process tier."""
+        if not self.index:
+            return
+        try:
+            self.index.add(vector_id, vector, metadata)
+        except IndexFullError as e:
+            # A tier missing rows would return wrong neighbours
+            logger.warning(f"Disabling in-process vector index: {e}")
+            self.index = None
+    
+    async def search_similar(self, vector: np.ndarray, limit: int = 10,
+                             filter: Optional[MetadataFilter] = None) -> List[Dict[str, Any]]:
         """Perform similarity search using cosine distance.
         
         Why cosine similarity:
@@ -74,20 +181,31 @@ class VectorStore(BaseStore):
         - Benefits from HNSW indexing for large datasets
         - Limit parameter controls result set size
         
+        With the in-process tier enabled, results come from local memory.
+        ``filter`` restricts results to rows whose metadata contains the
+        given values; callables are only supported by the tier.
+        
         TODO: Add support for different distance metrics (Euclidean, dot product)
-        TODO: Implement metadata-based filtering
         NOTE: Consider index usage for datasets > 10k vectors
         """
-        query = """
+        if self.index:
+            return self.index.search(vector, k=limit, filter=filter)
+        if callable(filter):
+            raise ValueError("Callable filters require the in-process index")
+        
+        where = "WHERE metadata @> $3::jsonb" if filter else ""
+        query = f"""
         SELECT id, metadata, embedding <-> $1 as distance
         FROM vectors
+        {where}
         ORDER BY distance
         LIMIT $2;
         """
+        args = [vector.tolist(), limit] + ([json.dumps(filter)] if filter else [])
         async with self.pool.acquire() as conn:
-            return await conn.fetch(query, vector.tolist(), limit)
+            return await conn.fetch(query, *args)
 
-class TimeSeriesStore(BaseStore):
+class TimeSeriesStore(BatchedWrites, BaseStore):
     """Specialized storage engine for time series data using TimescaleDB.
     
     This store is designed for:
@@ -105,11 +223,90 @@ class TimeSeriesStore(BaseStore):
     - Retention policies manage data lifecycle
     - Indexes optimize common query patterns
     
+    Local Tier:
+    - ``enable_local_tier`` keeps recent series in Gorilla-compressed
+      memory blocks; ``record`` writes there first and the tier flushes
+      to the metrics table in the background
+    - ``query_series`` serves ranges the tier covers without a query
+    
     NOTE: Requires PostgreSQL with TimescaleDB extension
     TODO: Implement automated retention policies
     FIXME: Add proper error handling for constraint violations
     """
     
+    local_tier: Optional[TimeSeriesTier] = None
+    
+    def enable_local_tier(self, **options) -> TimeSeriesTier:
+        """Keep recent series in memory, flushing them to the metrics table.
+        
+        Options are passed to TimeSeriesTier (block_points, retention_ms...).
+        Run ``tier.run()`` as a background task to flush periodically.
+        """
+        self.local_tier = TimeSeriesTier(sink=self._flush_series, **options)
+        return self.local_tier
+    
+    async def record(self, series: str, timestamp: Timestamp, value: float) -> None:
+        """Record one point of a numeric series.
+        
+        With the local tier enabled the point is held in memory and
+        flushed later; otherwise it is buffered for batched COPY.
+        """
+        if self.local_tier:
+            self.local_tier.append(series, timestamp, value)
+        else:
+            await self._flush_series(series, [(to_millis(timestamp), value)])
+    
+    async def query_series(self, series: str, start: Timestamp, end: Timestamp,
+                           bucket_ms: Optional[int] = None,
+                           fn: str = 'avg') -> List[Tuple[datetime, float]]:
+        """Read a series over ``[start, end)``, raw or downsampled.
+        
+        Ranges the local tier covers are answered from memory; others
+        query the metrics table with time_bucket.
+        """
+        if self.local_tier and self.local_tier.covers(series, start):
+            if bucket_ms:
+                timestamps, values = self.local_tier.downsample(series, start, end, bucket_ms, fn)
+            else:
+                timestamps, values = self.local_tier.scan(series, start, end)
+            return [(_from_millis(ts), value)
+                    for ts, value in zip(timestamps.tolist(), values.tolist())]
+        
+        start_time, end_time = _from_millis(to_millis(start)), _from_millis(to_millis(end))
+        value = "(data->>$1)::float8"
+        if bucket_ms:
+            sql_fn = {'avg': 'avg', 'min': 'min', 'max': 'max', 'sum': 'sum', 'count': 'count'}[fn]
+            query = f"""
+            SELECT time_bucket($4 * interval '1 millisecond', timestamp, $2::timestamptz) AS bucket,
+                   {sql_fn}({value}) AS value
+            FROM metrics
+            WHERE timestamp >= $2 AND timestamp < $3 AND data ? $1
+            GROUP BY bucket
+            ORDER BY bucket;
+            """
+            args = [series, start_time, end_time, bucket_ms]
+        else:
+            query = f"""
+            SELECT timestamp AS bucket, {value} AS value
+            FROM metrics
+            WHERE timestamp >= $2 AND timestamp < $3 AND data ? $1
+            ORDER BY timestamp;
+            """
+            args = [series, start_time, end_time]
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, *args)
+        return [(row['bucket'], row['value']) for row in rows]
+    
+    async def _flush_series(self, series: str, points: List[Tuple[int, float]]) -> None:
+        """Write a series' points to the metrics table as ``{series: value}`` rows.
+        
+        Waits for the commit, so the local tier keeps the points (and
+        retries them) if the batch fails instead of evicting them.
+        """
+        await self.insert_points([(_from_millis(ts), {series: value}) for ts, value in points],
+                                 wait=True)
+    
+    
     async def insert_metrics(self, metrics: Dict[str, Any], timestamp: datetime) -> str:
         """Store time series metrics with associated timestamp.
         
@@ -123,7 +320,7 @@ class TimeSeriesStore(BaseStore):
         - Stores metrics as JSONB for flexibility
         - Automatically manages temporal partitioning
         
-        TODO: Implement batch insert for higher throughput
+        NOTE: Use insert_points for high-throughput ingestion
         NOTE: Follow metric schema standards for consistency
         FIXME: Add validation for required metric fields
         """
@@ -135,6 +332,18 @@ class TimeSeriesStore(BaseStore):
         async with self.pool.acquire() as conn:
             return await conn.fetchval(query, timestamp, metrics)
     
+    async def insert_points(self, points: Iterable[Tuple[datetime, Dict[str, Any]]],
+                            wait: bool = False) -> int:
+        """Buffer ``(timestamp, metrics)`` points for batched COPY ingestion.
+        
+        Returns once the points are buffered (or committed, with ``wait``);
+        blocks while the writer's buffer for metrics is full.
+        """
+        rows = [(timestamp, json.dumps(metrics, default=str)) for timestamp, metrics in points]
+        writer = await self._writer(METRICS_TARGET)
+        await writer.write_many("metrics", rows, wait=wait)
+        return len(rows)
+    
     async def get_metrics(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
         """Retrieve metrics for a specified time range.
         
@@ -160,7 +369,10 @@ class TimeSeriesStore(BaseStore):
         async with self.pool.acquire() as conn:
             return await conn.fetch(query, start_time, end_time)
 
-class SpatialStore(BaseStore):
+def _from_millis(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts / 1000, tz=timezone.utc)
+
+class SpatialStore(BatchedWrites, BaseStore):
     """Specialized storage engine for spatial data using PostGIS.
     
     This store handles:
@@ -208,6 +420,19 @@ class SpatialStore(BaseStore):
         async with self.pool.acquire() as conn:
             return await conn.fetchval(query, json.dumps(geom), properties)
     
+    async def insert_features(self, features: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]],
+                              wait: bool = False) -> int:
+        """Buffer ``(geojson, properties)`` features for batched COPY ingestion.
+        
+        Returns once the features are buffered (or committed, with
+        ``wait``); blocks while the writer's buffer for locations is full.
+        """
+        rows = [(json.dumps(geom), json.dumps(properties, default=str))
+                for geom, properties in features]
+        writer = await self._writer(LOCATIONS_TARGET)
+        await writer.write_many("locations", rows, wait=wait)
+        return len(rows)
+    
     async def find_nearby(self, lat: float, lon: float, radius: float) -> List[Dict[str, Any]]:
         """Find locations within a specified radius.
         
@@ -0,0 +1,540 @@
+
+# datapunk/containers/lake/src/storage/timeseries_tier.py
+
+# Embedded hot tier for recent time series
+# Recent points are kept in memory as Gorilla-compressed blocks
+# (delta-of-delta timestamps, XOR-encoded floats) so dashboard reads over
+# the last hours skip TimescaleDB entirely:
+# - Block headers carry min/max/sum/count, so aggregates over whole
+#   blocks never decompress them
+# - Points are flushed to Timescale in the background and blocks past
+#   the retention window are dropped once flushed
+
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import asyncio
+import bisect
+import logging
+import math
+import struct
+import threading
+import time
+import numpy as np
+
+Timestamp = Union[int, datetime]  # Integer milliseconds since the epoch, or a datetime
+Sink = Callable[[str, List[Tuple[int, float]]], Awaitable[None]]
+
+_MASK64 = (1 << 64) - 1
+# (prefix, prefix bits, value bits, lower bound) for delta-of-delta buckets
+_DOD_BUCKETS = ((0b10, 2, 7, -63), (0b110, 3, 9, -255), (0b1110, 4, 12, -2047))
+
+def to_millis(ts: Timestamp) -> int:
+    """Normalize a timestamp to integer epoch milliseconds."""
+    if isinstance(ts, datetime):
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return int(ts.timestamp() * 1000)
+    return int(ts)
+
+def _float_bits(value: float) -> int:
+    return struct.unpack('>Q', struct.pack('>d', value))[0]
+
+def _bits_float(bits: int) -> float:
+    return struct.unpack('>d', struct.pack('>Q', bits))[0]
+
+class BitWriter:
+    """Append-only bit stream."""
+    
+    def __init__(self):
+        self.buffer = bytearray()
+        self._acc = 0
+        self._pending = 0  # Bits in _acc not yet written to buffer
+    
+    def write(self, value: int, bits: int) -> None:
+        self._acc = (self._acc << bits) | (value & ((1 << bits) - 1))
+        self._pending += bits
+        while self._pending >= 8:
+            self._pending -= 8
+            self.buffer.append((self._acc >> self._pending) & 0xFF)
+        self._acc &= (1 << self._pending) - 1
+    
+    def getvalue(self) -> bytes:
+        """Bytes written so far, the last one zero-padded."""
+        if self._pending:
+            return bytes(self.buffer) + bytes([(self._acc << (8 - self._pending)) & 0xFF])
+        return bytes(self.buffer)
+    
+    def __len__(self) -> int:
+        return len(self.buffer) * 8 + self._pending
+
+class BitReader:
+    """Sequential reader over a BitWriter's bytes."""
+    
+    def __init__(self, data: bytes):
+        self.data = data
+        self._pos = 0
+        self._acc = 0
+        self._available = 0
+    
+    def read(self, bits: int) -> int:
+        while self._available < bits:
+            self._acc = (self._acc << 8) | self.data[self._pos]
+            self._pos += 1
+            self._available += 8
+        self._available -= bits
+        value = self._acc >> self._available
+        self._acc &= (1 << self._available) - 1
+        return value
+
+@dataclass
+class BlockHeader:
+    """Summary of a block, enough to answer aggregates without decoding it."""
+    start: int
+    end: int
+    count: int = 0
+    min: float = math.inf
+    max: float = -math.inf
+    sum: float = 0.0
+    
+    def add(self, ts: int, value: float) -> None:
+        if not self.count:
+            self.start = ts
+        self.end = ts
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+
+class GorillaEncoder:
+    """Compresses one block of ordered points, after Facebook's Gorilla.
+    
+    Timestamps store the delta of consecutive deltas in variable-width
+    buckets, so regular intervals cost one bit. Values store the XOR with
+    the previous value, reusing the previous leading/trailing zero window
+    when it fits, so slowly changing values cost a few bits.
+    """
+    
+    def __init__(self):
+        self.bits = BitWriter()
+        self.header = BlockHeader(0, 0)
+        self._ts = 0
+        self._delta = 0
+        self._value = 0
+        self._leading = -1
+        self._trailing = 0
+    
+    def append(self, ts: int, value: float) -> None:
+        bits = _float_bits(value)
+        if not self.header.count:
+            self.bits.write(ts & _MASK64, 64)
+            self.bits.write(bits, 64)
+        else:
+            delta = ts - self._ts
+            self._write_dod(delta - self._delta)
+            self._delta = delta
+            self._write_xor(bits ^ self._value)
+        self._ts, self._value = ts, bits
+        self.header.add(ts, value)
+    
+    def _write_dod(self, dod: int) -> None:
+        if dod == 0:
+            self.bits.write(0, 1)
+            return
+        for prefix, prefix_bits, value_bits, low in _DOD_BUCKETS:
+            if low <= dod <= low + (1 << value_bits) - 1:
+                self.bits.write(prefix, prefix_bits)
+                self.bits.write(dod - low, value_bits)
+                return
+        self.bits.write(0b1111, 4)
+        self.bits.write(dod & _MASK64, 64)
+    
+    def _write_xor(self, xor: int) -> None:
+        if xor == 0:
+            self.bits.write(0, 1)
+            return
+        leading = min(64 - xor.bit_length(), 31)  # Stored in 5 bits
+        trailing = (xor & -xor).bit_length() - 1
+        if self._leading >= 0 and leading >= self._leading and trailing >= self._trailing:
+            # Meaningful bits fit the previous window
+            self.bits.write(0b10, 2)
+            self.bits.write(xor >> self._trailing, 64 - self._leading - self._trailing)
+            return
+        significant = 64 - leading - trailing
+        self.bits.write(0b11, 2)
+        self.bits.write(leading, 5)
+        self.bits.write(significant - 1, 6)  # 1..64 stored as 0..63
+        self.bits.write(xor >> trailing, significant)
+        self._leading, self._trailing = leading, trailing
+    
+    def seal(self) -> 'GorillaBlock':
+        return GorillaBlock(self.header, self.bits.getvalue())
+
+@dataclass
+class GorillaBlock:
+    """An immutable compressed block and its header."""
+    header: BlockHeader
+    data: bytes
+    
+    def decode(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Decompress to ``(timestamps, values)`` arrays."""
+        return decode_block(self.data, self.header.count)
+
+def decode_block(data: bytes, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Decompress ``count`` points written by a GorillaEncoder."""
+    timestamps = np.empty(count, dtype=np.int64)
+    values = np.empty(count, dtype=np.float64)
+    if not count:
+        return timestamps, values
+    reader = BitReader(data)
+    read = reader.read
+    ts = read(64)
+    ts = ts - (1 << 64) if ts >> 63 else ts
+    bits = read(64)
+    timestamps[0], values[0] = ts, _bits_float(bits)
+    delta, leading, trailing = 0, 0, 0
+    for i in range(1, count):
+        if read(1):
+            if not read(1):
+                dod = read(7) - 63
+            elif not read(1):
+                dod = read(9) - 255
+            elif not read(1):
+                dod = read(12) - 2047
+            else:
+                dod = read(64)
+                dod = dod - (1 << 64) if dod >> 63 else dod
+            delta += dod
+        ts += delta
+        if read(1):
+            if read(1):
+                leading = read(5)
+                significant = read(6) + 1
+                trailing = 64 - leading - significant
+            bits ^= read(64 - leading - trailing) << trailing
+        timestamps[i], values[i] = ts, _bits_float(bits)
+    return timestamps, values
+
+@dataclass
+class _Series:
+    blocks: List[GorillaBlock] = field(default_factory=list)
+    open: GorillaEncoder = field(default_factory=GorillaEncoder)
+    late: List[Tuple[int, float]] = field(default_factory=list)  # Out-of-order points, sorted
+    late_blocks: List[GorillaBlock] = field(default_factory=list)  # Compacted late points
+    unflushed: List[Tuple[int, float]] = field(default_factory=list)
+    
+    @property
+    def last(self) -> Optional[int]:
+        if self.open.header.count:
+            return self.open.header.end
+        return self.blocks[-1].header.end if self.blocks else None
+    
+    def parts(self) -> Iterator[Tuple[BlockHeader, Callable[[], Tuple[np.ndarray, np.ndarray]]]]:
+        """Each block's header with a function decoding it.
+        
+        In-order blocks come oldest first; compacted late blocks follow and
+        may overlap them.
+        """
+        for block in self.blocks:
+            yield block.header, block.decode
+        for block in self.late_blocks:
+            yield block.header, block.decode
+        if self.open.header.count:
+            header = self.open.header
+            data = self.open.bits.getvalue()
+            yield header, lambda: decode_block(data, header.count)
+
+@dataclass
+class TierStats:
+    """Counters describing the local tier."""
+    points: int = 0
+    blocks: int = 0
+    compressed_bytes: int = 0
+    blocks_decoded: int = 0
+    blocks_skipped: int = 0  # Answered from headers alone
+    points_flushed: int = 0
+    late_points: int = 0
+
+_AGGREGATES = ('count', 'sum', 'avg', 'min', 'max')
+
+class TimeSeriesTier:
+    """In-memory store of recent points per series, compressed in blocks.
+    
+    Reads within ``horizon`` are complete for series written through the
+    tier. Points arriving out of order are kept aside and merged into
+    reads rather than rejected; every ``block_points`` of them are
+    compacted into a block of their own.
+    """
+    
+    def __init__(self, sink: Optional[Sink] = None, block_points: int = 1024,
+                 block_span_ms: int = 2 * 3600 * 1000,
+                 retention_ms: int = 6 * 3600 * 1000):
+        self.sink = sink
+        self.block_points = block_points
+        self.block_span_ms = block_span_ms
+        self.retention_ms = retention_ms
+        self.series: Dict[str, _Series] = {}
+        self.stats = TierStats()
+        self._lock = threading.RLock()
+        self._flush_lock = asyncio.Lock()
+        self.logger = logging.getLogger(__name__)
+    
+    def append(self, series: str, ts: Timestamp, value: float) -> None:
+        """Record one point."""
+        ts, value = to_millis(ts), float(value)
+        with self._lock:
+            s = self.series.get(series)
+            if s is None:
+                s = self.series[series] = _Series()
+            last = s.last
+            if last is not None and ts < last:
+                bisect.insort(s.late, (ts, value))
+                self.stats.late_points += 1
+                if len(s.late) >= self.block_points:
+                    self._compact_late(s)
+            else:
+                header = s.open.header
+                if header.count and (header.count >= self.block_points or
+                                     ts - header.start >= self.block_span_ms):
+                    self._seal(s)
+                s.open.append(ts, value)
+            s.unflushed.append((ts, value))
+            self.stats.points += 1
+    
+    def append_many(self, series: str, points: List[Tuple[Timestamp, float]]) -> None:
+        """Record points for one series."""
+        for ts, value in points:
+            self.append(series, ts, value)
+    
+    def horizon(self, series: str) -> Optional[int]:
+        """Earliest timestamp from which the tier holds every point of a series.
+        
+        This is the start of the oldest in-order block. Late points older
+        than it do not extend the horizon, since the points around them
+        may only exist downstream.
+        """
+        with self._lock:
+            s = self.series.get(series)
+            if s is None:
+                return None
+            if s.blocks:
+                return s.blocks[0].header.start
+            return s.open.header.start if s.open.header.count else None
+    
+    def covers(self, series: str, start: Timestamp) -> bool:
+        """Whether a read starting at ``start`` can be served locally."""
+        horizon = self.horizon(series)
+        return horizon is not None and to_millis(start) >= horizon
+    
+    def scan(self, series: str, start: Timestamp, end: Timestamp) -> Tuple[np.ndarray, np.ndarray]:
+        """Points with ``start <= ts < end`` as ``(timestamps, values)``, in time order."""
+        start, end = to_millis(start), to_millis(end)
+        ts_parts, value_parts = [], []
+        with self._lock:
+            s = self.series.get(series)
+            if s is None:
+                return np.empty(0, dtype=np.int64), np.empty(0)
+            for header, decode in s.parts():
+                if header.end < start or header.start >= end:
+                    continue
+                timestamps, values = decode()
+                self.stats.blocks_decoded += 1
+                keep = (timestamps >= start) & (timestamps < end)
+                ts_parts.append(timestamps[keep])
+                value_parts.append(values[keep])
+            late = [(t, v) for t, v in s.late if start <= t < end]
+        if late:
+            ts_parts.append(np.array([t for t, _ in late], dtype=np.int64))
+            value_parts.append(np.array([v for _, v in late]))
+        if not ts_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        timestamps, values = np.concatenate(ts_parts), np.concatenate(value_parts)
+        if late or s.late_blocks:
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, values = timestamps[order], values[order]
+        return timestamps, values
+    
+    def aggregate(self, series: str, start: Timestamp, end: Timestamp,
+                  fn: str = 'avg') -> Optional[float]:
+        """Aggregate values with ``start <= ts < end``.
+        
+        Blocks lying wholly inside the range are answered from headers.
+        """
+        _check_aggregate(fn)
+        buckets = self._reduce(series, to_millis(start), to_millis(end), None)
+        acc = buckets.get(0)
+        return _finish(acc, fn) if acc else None
+    
+    def downsample(self, series: str, start: Timestamp, end: Timestamp,
+                   bucket_ms: int, fn: str = 'avg') -> Tuple[np.ndarray, np.ndarray]:
+        """Aggregate into ``bucket_ms`` buckets aligned to ``start``.
+        
+        Returns bucket start timestamps and values for non-empty buckets.
+        Blocks lying wholly inside one bucket are answered from headers.
+        """
+        _check_aggregate(fn)
+        start, end = to_millis(start), to_millis(end)
+        buckets = self._reduce(series, start, end, bucket_ms)
+        keys = sorted(buckets)
+        return (np.array([start + k * bucket_ms for k in keys], dtype=np.int64),
+                np.array([_finish(buckets[k], fn) for k in keys]))
+    
+    async def flush(self) -> int:
+        """Send unflushed points to the sink, returning how many were sent.
+        
+        Points are handed back if the sink fails, to be retried.
+        """
+        if self.sink is None:
+            return 0
+        async with self._flush_lock:
+            with self._lock:
+                pending = {name: s.unflushed for name, s in self.series.items() if s.unflushed}
+                for name in pending:
+                    self.series[name].unflushed = []
+            sent = 0
+            for name, points in pending.items():
+                try:
+                    await self.sink(name, points)
+                    sent += len(points)
+                except Exception as e:
+                    self.logger.error(f"Flushing {len(points)} points of {name} failed: {e}")
+                    with self._lock:
+                        s = self.series[name]
+                        s.unflushed = points + s.unflushed
+            self.stats.points_flushed += sent
+            self.evict()
+            return sent
+    
+    async def run(self, interval: float = 5.0) -> None:
+        """Flush and evict periodically until cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.flush()
+        finally:
+            await self.flush()
+    
+    def evict(self, now_ms: Optional[int] = None) -> int:
+        """Drop flushed blocks older than the retention window."""
+        cutoff = (now_ms if now_ms is not None else int(time.time() * 1000)) - self.retention_ms
+        dropped = 0
+        with self._lock:
+            for s in self.series.values():
+                oldest_unflushed = min((ts for ts, _ in s.unflushed), default=None)
+                while s.blocks and s.blocks[0].header.end < cutoff and (
+                        oldest_unflushed is None or s.blocks[0].header.end < oldest_unflushed):
+                    block = s.blocks.pop(0)
+                    self.stats.blocks -= 1
+                    self.stats.compressed_bytes -= len(block.data)
+                    dropped += 1
+                kept = []
+                for block in s.late_blocks:
+                    if block.header.end < cutoff and (
+                            oldest_unflushed is None or block.header.end < oldest_unflushed):
+                        self.stats.blocks -= 1
+                        self.stats.compressed_bytes -= len(block.data)
+                        dropped += 1
+                    else:
+                        kept.append(block)
+                s.late_blocks = kept
+                s.late = [(t, v) for t, v in s.late if t >= cutoff or
+                          (oldest_unflushed is not None and t >= oldest_unflushed)]
+        return dropped
+    
+    def get_stats(self) -> TierStats:
+        """Current tier counters."""
+        return self.stats
+    
+    def _seal(self, s: _Series) -> None:
+        block = s.open.seal()
+        s.blocks.append(block)
+        s.open = GorillaEncoder()
+        self.stats.blocks += 1
+        self.stats.compressed_bytes += len(block.data)
+    
+    def _compact_late(self, s: _Series) -> None:
+        encoder = GorillaEncoder()
+        for ts, value in s.late:
+            encoder.append(ts, value)
+        block = encoder.seal()
+        s.late_blocks.append(block)
+        s.late = []
+        self.stats.blocks += 1
+        self.stats.compressed_bytes += len(block.data)
+    
+    def _reduce(self, series: str, start: int, end: int,
+                bucket_ms: Optional[int]) -> Dict[int, List[float]]:
+        """Per-bucket ``[count, sum, min, max]``; one bucket when ``bucket_ms`` is None."""
+        buckets: Dict[int, List[float]] = {}
+        
+        def bucket_of(ts: int) -> int:
+            return 0 if bucket_ms is None else (ts - start) // bucket_ms
+        
+        def combine(key: int, count: int, total: float, low: float, high: float) -> None:
+            acc = buckets.get(key)
+            if acc is None:
+                buckets[key] = [count, total, low, high]
+            else:
+                acc[0] += count
+                acc[1] += total
+                acc[2] = min(acc[2], low)
+                acc[3] = max(acc[3], high)
+        
+        with self._lock:
+            s = self.series.get(series)
+            if s is None:
+                return buckets
+            for header, decode in s.parts():
+                if header.end < start or header.start >= end:
+                    continue
+                if header.start >= start and header.end < end and \
+                        bucket_of(header.start) == bucket_of(header.end):
+                    combine(bucket_of(header.start), header.count, header.sum,
+                            header.min, header.max)
+                    self.stats.blocks_skipped += 1
+                    continue
+                timestamps, values = decode()
+                self.stats.blocks_decoded += 1
+                keep = (timestamps >= start) & (timestamps < end)
+                self._combine_points(timestamps[keep], values[keep], start, bucket_ms, combine)
+            late = [(t, v) for t, v in s.late if start <= t < end]
+        if late:
+            self._combine_points(np.array([t for t, _ in late], dtype=np.int64),
+                                 np.array([v for _, v in late]), start, bucket_ms, combine)
+        return buckets
+    
+    @staticmethod
+    def _combine_points(timestamps: np.ndarray, values: np.ndarray, start: int,
+                        bucket_ms: Optional[int], combine: Callable) -> None:
+        if not len(timestamps):
+            return
+        if bucket_ms is None:
+            keys = np.zeros(len(timestamps), dtype=np.int64)
+        else:
+            keys = (timestamps - start) // bucket_ms
+        order = np.argsort(keys, kind='stable')
+        keys, values = keys[order], values[order]
+        unique, first = np.unique(keys, return_index=True)
+        counts = np.diff(np.append(first, len(keys)))
+        sums = np.add.reduceat(values, first)
+        mins = np.minimum.reduceat(values, first)
+        maxs = np.maximum.reduceat(values, first)
+        for key, count, total, low, high in zip(unique.tolist(), counts.tolist(), sums.tolist(),
+                                                mins.tolist(), maxs.tolist()):
+            combine(key, count, total, low, high)
+
+def _check_aggregate(fn: str) -> None:
+    if fn not in _AGGREGATES:
+        raise ValueError(f"Unsupported aggregate: {fn}; expected one of {_AGGREGATES}")
+
+def _finish(acc: List[float], fn: str) -> float:
+    count, total, low, high = acc
+    if fn == 'count':
+        return count
+    if fn == 'sum':
+        return total
+    if fn == 'avg':
+        return total / count
+    if fn == 'min':
+        return low
+    return high
@@ -0,0 +1,198 @@
+
+# datapunk/containers/lake/src/storage/vector_index.py
+
+# In-process HNSW tier for pgvector tables
+# Hot embedding collections are mirrored into a local HNSW graph so
+# similarity search avoids a database round-trip. pgvector stays the
+# source of truth: the tier is rebuilt from it, or reopened from a
+# snapshot and caught up, and is updated on every write through the store.
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple, Union
+import asyncio
+import json
+import logging
+import math
+import os
+from .index.hnsw import HNSWIndex, decode_label, encode_label
+
+MetadataFilter = Union[Dict[str, Any], Callable[[Dict[str, Any]], bool]]
+
+class VectorIndexTier:
+    """Local HNSW copy of a vector table, with per-row metadata for filtering.
+    
+    Writes made while a rebuild is streaming are replayed onto the new
+    graph before it replaces the old one, so none are lost.
+    """
+    
+    def __init__(self, index: HNSWIndex, table: str = "vectors",
+                 snapshot_path: Optional[str] = None):
+        self.index = index
+        self.table = table
+        self.snapshot_path = snapshot_path
+        self.metadata: Dict[Hashable, Dict[str, Any]] = {}
+        self._pending: Optional[List[Tuple[str, Hashable, Any, Any]]] = None
+        self.logger = logging.getLogger(__name__)
+    
+    @classmethod
+    def create(cls, dim: int, capacity: int, table: str = "vectors",
+               metric: str = "l2", dtype: str = "float32",
+               snapshot_path: Optional[str] = None, **options) -> 'VectorIndexTier':
+        """Create an empty tier; ``open`` fills it."""
+        index = HNSWIndex(f"{table}_hnsw", table, ["embedding"], dim=dim,
+                          capacity=capacity, metric=metric, dtype=dtype, **options)
+        return cls(index, table, snapshot_path)
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    async def open(self, pool: Any) -> int:
+        """Load the snapshot and catch up, or rebuild from the table.
+        
+        Returns the number of rows loaded or changed.
+        """
+        if self.snapshot_path and self._load_snapshot():
+            return await self.catch_up(pool)
+        return await self.rebuild(pool)
+    
+    async def rebuild(self, pool: Any, fetch_size: int = 10000) -> int:
+        """Stream every row from the table into a fresh graph, then swap it in.
+        
+        Graph inserts run on the default executor one fetch at a time, so
+        the event loop keeps serving while the graph is built.
+        """
+        loop = asyncio.get_running_loop()
+        self._pending = []
+        try:
+            async with pool.acquire() as conn:
+                rows = await conn.fetchval(f"SELECT count(*) FROM {self.table}")
+                index = self._empty(max(self.index.capacity, math.ceil(rows * 1.25)))
+                metadata: Dict[Hashable, Dict[str, Any]] = {}
+                batch: List[Tuple[Hashable, Any]] = []
+                async with conn.transaction():
+                    sql = f"SELECT id, embedding::real[] AS embedding, metadata FROM {self.table}"
+                    async for record in conn.cursor(sql, prefetch=fetch_size):
+                        batch.append((record["id"], record["embedding"]))
+                        metadata[record["id"]] = _decode(record["metadata"])
+                        if len(batch) >= fetch_size:
+                            await loop.run_in_executor(None, _insert_all, index, batch)
+                            batch = []
+                if batch:
+                    await loop.run_in_executor(None, _insert_all, index, batch)
+            pending, self._pending = self._pending, None
+            self.index, self.metadata = index, metadata
+            for op, label, vector, meta in pending:
+                self._apply(op, label, vector, meta)
+        finally:
+            self._pending = None
+        self.logger.info(f"Rebuilt {self.table} vector index with {len(self.index)} rows")
+        return len(self.index)
+    
+    async def catch_up(self, pool: Any, batch_size: int = 1000) -> int:
+        """Apply inserts and deletes made to the table since the snapshot.
+        
+        Rows are matched by id; rows updated in place need a rebuild.
+        """
+        async with pool.acquire() as conn:
+            ids = {r["id"] for r in await conn.fetch(f"SELECT id FROM {self.table}")}
+            stale = [label for label in self.index.slots if label not in ids]
+            for label in stale:
+                self.remove(label)
+            missing = [i for i in ids if i not in self.index]
+            for start in range(0, len(missing), batch_size):
+                records = await conn.fetch(
+                    f"SELECT id, embedding::real[] AS embedding, metadata "
+                    f"FROM {self.table} WHERE id = ANY($1)",
+                    missing[start:start + batch_size])
+                for record in records:
+                    self.add(record["id"], record["embedding"], _decode(record["metadata"]))
+        return len(stale) + len(missing)
+    
+    def add(self, label: Hashable, vector: Sequence[float],
+            metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Mirror an inserted or replaced row."""
+        if self._pending is not None:
+            self._pending.append(("add", label, vector, metadata))
+        self._apply("add", label, vector, metadata)
+    
+    def remove(self, label: Hashable) -> bool:
+        """Mirror a deleted row."""
+        if self._pending is not None:
+            self._pending.append(("remove", label, None, None))
+        return self._apply("remove", label, None, None)
+    
+    def search(self, vector: Sequence[float], k: int = 10,
+               filter: Optional[MetadataFilter] = None,
+               ef: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Find the k nearest rows, optionally restricted by metadata.
+        
+        A dict filter matches rows whose metadata has those values, as
+        pgvector's ``metadata @> filter`` would. Distances follow
+        pgvector's operators: Euclidean for l2, ``1 - cosine`` for cosine.
+        """
+        allowed = None
+        if isinstance(filter, dict):
+            allowed = lambda label: _contains(self.metadata.get(label, {}), filter)
+        elif filter is not None:
+            allowed = lambda label: filter(self.metadata.get(label, {}))
+        found = self.index.search(vector, k=k, ef=ef, filter=allowed)
+        l2 = self.index.metric == "l2"
+        return [{"id": label, "metadata": self.metadata.get(label),
+                 "distance": math.sqrt(max(distance, 0.0)) if l2 else distance}
+                for label, distance in found]
+    
+    def save(self) -> None:
+        """Write the graph and metadata to ``snapshot_path``."""
+        if not self.snapshot_path:
+            raise ValueError("No snapshot path configured")
+        self.index.save(self.snapshot_path)
+        tmp = os.path.join(self.snapshot_path, "metadata.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump([[encode_label(label), meta] for label, meta in self.metadata.items()],
+                      f, default=str)
+        os.replace(tmp, os.path.join(self.snapshot_path, "metadata.json"))
+    
+    def _load_snapshot(self) -> bool:
+        metadata_path = os.path.join(self.snapshot_path, "metadata.json")
+        # A graph saved without its metadata is incomplete
+        if not os.path.exists(metadata_path):
+            return False
+        index = HNSWIndex.load(self.snapshot_path)
+        if index.dim != self.index.dim or index.metric != self.index.metric:
+            self.logger.warning(f"Ignoring snapshot {self.snapshot_path} built with other settings")
+            return False
+        with open(metadata_path) as f:
+            try:
+                metadata = {decode_label(label): meta for label, meta in json.load(f)}
+            except (TypeError, ValueError):
+                self.logger.warning(f"Ignoring snapshot {self.snapshot_path} with untagged labels")
+                return False
+        self.index, self.metadata = index, metadata
+        return True
+    
+    def _apply(self, op: str, label: Hashable, vector: Any, metadata: Any) -> bool:
+        if op == "add":
+            self.index.insert(label, vector)
+            self.metadata[label] = metadata or {}
+            return True
+        self.metadata.pop(label, None)
+        return self.index.delete(label)
+    
+    def _empty(self, capacity: int) -> HNSWIndex:
+        old = self.index
+        return HNSWIndex(old.name, old.table_name, old.columns, dim=old.dim,
+                         capacity=capacity, m=old.m, ef_construction=old.ef_construction,
+                         ef_search=old.ef_search, metric=old.metric, dtype=old.dtype,
+                         vacuum_fraction=old.vacuum_fraction)
+
+def _insert_all(index: HNSWIndex, rows: List[Tuple[Hashable, Any]]) -> None:
+    for label, vector in rows:
+        index.insert(label, vector)
+
+def _decode(metadata: Any) -> Dict[str, Any]:
+    """asyncpg returns jsonb as text unless a codec is registered."""
+    if isinstance(metadata, str):
+        return json.loads(metadata)
+    return dict(metadata or {})
+
+def _contains(metadata: Dict[str, Any], expected: Dict[str, Any]) -> bool:
+    return all(metadata.get(key) == value for key, value in expected.items())
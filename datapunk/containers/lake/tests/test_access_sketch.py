@@ -0,0 +1,132 @@
+import random
+import threading
+import unittest
+from ..src.storage.cache_strategies import (
+    AccessPattern, CountMinSketch, SpaceSaving, TimeBasedWarming
+)
+
+class TestCountMinSketch(unittest.TestCase):
+    def test_estimates_bound_true_counts(self):
+        """Test estimates never undercount and stay close for frequent keys."""
+        sketch = CountMinSketch(width=256, depth=4)
+        rng = random.Random(7)
+        truth = {}
+        for _ in range(20000):
+            key = f'k{int(rng.paretovariate(1.2))}'
+            truth[key] = truth.get(key, 0) + 1
+            sketch.add(key)
+        
+        for key, count in truth.items():
+            self.assertGreaterEqual(sketch.estimate(key), count)
+        for key, count in truth.items():
+            if count > 500:
+                self.assertLess(sketch.estimate(key), count * 1.05)
+        self.assertEqual(sketch.total, 20000)
+    
+    def test_decay_ages_counts(self):
+        """Test decay scales every estimate."""
+        sketch = CountMinSketch(width=64)
+        sketch.add('a', 8)
+        sketch.decay(0.5)
+        self.assertEqual(sketch.estimate('a'), 4)
+        self.assertEqual(sketch.estimate('missing'), 0)
+
+class TestSpaceSaving(unittest.TestCase):
+    def test_finds_heavy_hitters_in_fixed_memory(self):
+        """Test frequent keys survive a long tail of one-off keys."""
+        top = SpaceSaving(capacity=20)
+        rng = random.Random(3)
+        for i in range(10000):
+            if rng.random() < 0.5:
+                top.offer(f'hot{i % 5}')
+            else:
+                top.offer(f'tail{i}')
+        
+        self.assertEqual(len(top.counts), 20)
+        self.assertLessEqual(len(top._heap), 4 * 20)
+        hot = {key for key, _, _ in top.top(5)}
+        self.assertEqual(hot, {f'hot{i}' for i in range(5)})
+        for key, count, error in top.top(5):
+            self.assertGreaterEqual(count - error, 900)
+
+class TestAccessPattern(unittest.TestCase):
+    def test_periodic_key_is_predicted(self):
+        """Test inter-arrival EWMAs find a period and the next access."""
+        pattern = AccessPattern()
+        for i in range(5):
+            pattern.record_access('periodic', 1000 + i * 300)
+            pattern.record_access('noisy', 1000 + i * 300 + (i % 2) * 250)
+        
+        periods = pattern.get_periodic_patterns('periodic')
+        self.assertEqual(len(periods), 1)
+        self.assertAlmostEqual(periods[0][0], 300)
+        self.assertGreater(periods[0][1], 0.7)
+        self.assertEqual(pattern.predict_next_access('periodic'), 1000 + 5 * 300)
+        self.assertEqual(pattern.get_periodic_patterns('noisy'), [])
+        self.assertIsNone(pattern.predict_next_access('unknown'))
+    
+    def test_memory_is_bounded(self):
+        """Test per-key state stays within its limits as keys grow."""
+        pattern = AccessPattern(window_size=10**9, max_keys=100, heavy_hitters=10, history=4)
+        for i in range(5000):
+            pattern.record_access('hot', i)
+            pattern.record_access(f'cold{i}', i + 0.5)
+        
+        self.assertEqual(len(pattern.tracked_keys()), 100)
+        self.assertEqual(pattern.heavy_hitters(1)[0][0], 'hot')
+        self.assertEqual(pattern.recent_accesses('hot'), [4996, 4997, 4998, 4999])
+        self.assertGreaterEqual(pattern.estimate_count('hot'), 5000)
+    
+    def test_counts_decay_each_window(self):
+        """Test old popularity fades once a window of time passes."""
+        pattern = AccessPattern(window_size=60)
+        for i in range(100):
+            pattern.record_access('old', i * 0.1)
+        pattern.record_access('new', 61)
+        self.assertEqual(pattern.estimate_count('old'), 50)
+        self.assertEqual(pattern.heavy_hitters(1), [('old', 50)])
+    
+    def test_related_keys_from_co_access(self):
+        """Test keys accessed together are related and others are not."""
+        pattern = AccessPattern(co_access_window=1.0)
+        for i in range(20):
+            pattern.record_access('orders', i * 10)
+            pattern.record_access('order_items', i * 10 + 0.1)
+            pattern.record_access('audit', i * 10 + 5)
+        
+        self.assertEqual(pattern.get_related_keys('orders'), ['order_items'])
+        self.assertEqual(pattern.get_related_keys('unknown'), [])
+    
+    def test_concurrent_recording(self):
+        """Test threads record without locks and nothing is lost below capacity."""
+        pattern = AccessPattern(buffer_size=100000)
+        
+        def record(thread):
+            for i in range(2000):
+                pattern.record_access(f'k{i % 10}', thread + i * 0.001)
+        threads = [threading.Thread(target=record, args=(t,)) for t in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(pattern.counts.total + len(pattern._pending), 8000)
+        self.assertEqual(sum(count for _, count in pattern.heavy_hitters()), 8000)
+
+class TestTimeBasedWarming(unittest.IsolatedAsyncioTestCase):
+    async def test_candidates_come_from_summaries(self):
+        """Test warming picks keys predicted soon, without listing the keyspace."""
+        import time
+        pattern = AccessPattern()
+        now = time.time()
+        for i in range(5):
+            pattern.record_access('test:soon', now - 400 + i * 100)
+            pattern.record_access('test:later', now - 4000 + i * 1000)
+            pattern.record_access('other:soon', now - 400 + i * 100)
+        
+        warming = TimeBasedWarming(redis=None, access_pattern=pattern)
+        candidates = await warming.get_warming_candidates('test:*', {'warm_window': 300})
+        self.assertEqual(candidates, ['test:soon'])
+
+if __name__ == '__main__':
+    unittest.main()
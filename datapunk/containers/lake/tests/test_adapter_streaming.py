@@ -0,0 +1,164 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from ..src.query.federation.adapters.connection_pool import (
+    AsyncConnectionPool, shared_pool, to_positional
+)
+from ..src.query.federation.fed_adapters import PandasAdapter, SQLiteAdapter
+from ..src.query.federation.fed_planner import DataSource, DataSourceType, SubQuery
+from ..src.query.federation.query_fed_executor import FederatedQueryExecutor
+from ..src.query.parser.query_parser_core import QueryNode, QueryPlan
+
+class FakeConnection:
+    """Connection whose health can be switched off."""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.alive = True
+        self.closed = False
+
+class FakeDriver:
+    """Counts connections opened and closed by a pool."""
+
+    def __init__(self):
+        self.opened = []
+
+    async def connect(self) -> FakeConnection:
+        conn = FakeConnection(len(self.opened))
+        self.opened.append(conn)
+        return conn
+
+    async def close(self, conn: FakeConnection) -> None:
+        conn.closed = True
+
+    async def check(self, conn: FakeConnection) -> None:
+        if not conn.alive:
+            raise OSError("connection reset")
+
+    def pool(self, **kwargs) -> AsyncConnectionPool:
+        return AsyncConnectionPool(self.connect, self.close, self.check, **kwargs)
+
+class TestConnectionPool(unittest.IsolatedAsyncioTestCase):
+    async def test_connections_are_reused(self):
+        """Test sequential queries share one connection."""
+        driver = FakeDriver()
+        pool = driver.pool()
+        for _ in range(3):
+            async with pool.acquire() as conn:
+                self.assertEqual(conn.number, 0)
+        self.assertEqual(len(driver.opened), 1)
+
+    async def test_size_is_bounded(self):
+        """Test borrowers wait rather than opening more than max_size."""
+        driver = FakeDriver()
+        pool = driver.pool(max_size=2)
+        peak = active = 0
+
+        async def borrow():
+            nonlocal peak, active
+            async with pool.acquire():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(borrow() for _ in range(6)))
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(len(driver.opened), 2)
+        self.assertGreater(pool.get_stats().waits, 0)
+
+    async def test_unhealthy_connections_are_replaced(self):
+        """Test idle connections failing a check are closed and replaced."""
+        driver = FakeDriver()
+        pool = driver.pool(health_check_interval=0)
+        async with pool.acquire() as conn:
+            pass
+        conn.alive = False
+
+        async with pool.acquire() as replacement:
+            self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.get_stats().size, 1)
+
+    async def test_broken_connection_is_dropped_after_error(self):
+        """Test a connection that failed mid-query is not handed out again."""
+        driver = FakeDriver()
+        pool = driver.pool()
+        with self.assertRaises(OSError):
+            async with pool.acquire() as conn:
+                conn.alive = False
+                raise OSError("server closed the connection")
+
+        async with pool.acquire() as replacement:
+            self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+
+    async def test_shared_pool_is_per_key(self):
+        """Test adapters on the same source get the same pool."""
+        driver = FakeDriver()
+        first = shared_pool('db-a', driver.pool)
+        self.assertIs(shared_pool('db-a', driver.pool), first)
+        self.assertIsNot(shared_pool('db-b', driver.pool), first)
+
+class TestPositionalParameters(unittest.TestCase):
+    def test_named_parameters_become_positional(self):
+        """Test names map to $n once each and casts are untouched."""
+        sql, args = to_positional(
+            "SELECT x::int FROM t WHERE a = :a AND b > :b AND c = :a",
+            {'a': 1, 'b': 2})
+        self.assertEqual(sql, "SELECT x::int FROM t WHERE a = $1 AND b > $2 AND c = $1")
+        self.assertEqual(args, [1, 2])
+
+class TestSQLiteStreaming(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        path = os.path.join(self.tmp, 'events.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE events (id INTEGER, kind INTEGER)")
+            conn.executemany("INSERT INTO events VALUES (?, ?)",
+                             [(i, i % 3) for i in range(2500)])
+        self.adapter = SQLiteAdapter(path, fetch_size=1000)
+        self.plan = QueryPlan(QueryNode(operation='select', columns=['id', 'kind'],
+                                        table='events'))
+
+    def tearDown(self):
+        self.adapter.connection.close()
+        shutil.rmtree(self.tmp)
+
+    async def test_batches_are_bounded_by_fetch_size(self):
+        """Test results arrive in fetch-size batches on one pooled connection."""
+        batches = [b async for b in self.adapter.stream_query(self.plan)]
+        again = [b async for b in self.adapter.stream_query(self.plan, fetch_size=500)]
+
+        self.assertEqual([b.num_rows for b in batches], [1000, 1000, 500])
+        self.assertEqual(len(again), 5)
+        self.assertEqual(sum(b.num_rows for b in batches), 2500)
+        self.assertEqual(self.adapter._pool().get_stats().created, 1)
+
+    async def test_executor_streams_from_cursor(self):
+        """Test the executor forwards cursor batches without collecting them."""
+        executor = FederatedQueryExecutor(max_workers=2)
+        executor.register_executor('sqlite', self.adapter)
+        source = DataSource(name='sqlite', type=DataSourceType.RELATIONAL,
+                            capabilities=set(), cost_factors={}, statistics={})
+        try:
+            result = [r async for r in executor.stream_plan(
+                [SubQuery(source, self.plan, 1.0, [], 2500)])][0]
+        finally:
+            executor.shutdown()
+
+        self.assertIsNone(result.error)
+        self.assertEqual(result.to_arrow().num_rows, 2500)
+
+class TestStreamingContract(unittest.TestCase):
+    def test_adapters_without_cursors_do_not_stream(self):
+        """Test adapters without cursors keep the executor's cached execute path."""
+        self.assertFalse(hasattr(PandasAdapter({}), 'stream_query'))
+        self.assertTrue(hasattr(SQLiteAdapter, 'stream_query'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from typing import Dict, List, Any
+from ..src.query.executor.adaptive import (
+    AdaptiveContext, AdaptiveExecutionEngine, AdaptiveJoin, MaterializedOperator
+)
+from ..src.query.parser.query_parser_core import QueryNode, QueryPlan
+from ..src.storage.cache import CacheManager
+
+class MockCacheManager(CacheManager):
+    """Mock cache manager for testing."""
+
+    def __init__(self, data: Dict[str, List[Dict[str, Any]]]):
+        self.data = data
+
+    def get(self, key: str) -> List[Dict[str, Any]]:
+        return self.data.get(key, [])
+
+class RecordingAdvisor:
+    """Stand-in for IndexAdvisor collecting decisions."""
+
+    def __init__(self):
+        self.decisions = []
+
+    def record_adaptation(self, decision) -> None:
+        self.decisions.append(decision)
+
+class TestAdaptiveJoin(unittest.TestCase):
+    def setUp(self):
+        self.orders = [{'customer_id': i % 20, 'amount': i} for i in range(200)]
+        self.customers = [{'customer_id': i, 'name': f'c{i}'} for i in range(5)]
+
+    def _plan(self, build_estimate: int) -> QueryPlan:
+        probe = QueryNode(operation='table_scan', table_name='customers',
+                          columns=['customer_id', 'name'], estimated_rows=5)
+        build = QueryNode(operation='table_scan', table_name='orders',
+                          columns=['customer_id', 'amount'],
+                          estimated_rows=build_estimate)
+        join = QueryNode(operation='join', children=[probe, build],
+                         join_condition={'left': 'customer_id', 'right': 'customer_id'})
+        return QueryPlan(join)
+
+    def _engine(self, advisor=None) -> AdaptiveExecutionEngine:
+        engine = AdaptiveExecutionEngine(index_advisor=advisor)
+        engine.context.cache_manager = MockCacheManager({
+            'orders': self.orders,
+            'customers': self.customers
+        })
+        return engine
+
+    def test_misestimate_flips_build_side(self):
+        """Test a large misestimate re-plans and builds on the smaller input."""
+        advisor = RecordingAdvisor()
+        engine = self._engine(advisor)
+
+        results = list(engine.execute_plan(self._plan(build_estimate=10)))
+
+        self.assertEqual(len(results), 50)
+        self.assertTrue(all('name' in row and 'amount' in row for row in results))
+        decision = engine.context.decisions[0]
+        self.assertEqual(decision.action, 'replan_join')
+        self.assertTrue(decision.details['flipped_build_side'])
+        self.assertEqual(decision.details['probe_table'], 'customers')
+        self.assertEqual(advisor.decisions, engine.context.decisions)
+
+    def test_accurate_estimate_keeps_plan(self):
+        """Test no decision is recorded when estimates hold."""
+        engine = self._engine()
+        results = list(engine.execute_plan(self._plan(build_estimate=200)))
+
+        self.assertEqual(len(results), 50)
+        self.assertEqual(engine.context.decisions, [])
+
+    def test_parameters_accepted(self):
+        """Test parameterized runs share decisions but not variables."""
+        engine = self._engine()
+        results = list(engine.execute_plan(self._plan(build_estimate=10),
+                                           parameters={'region': 'eu'}))
+
+        self.assertEqual(len(results), 50)
+        self.assertEqual(len(engine.context.decisions), 1)
+        self.assertEqual(engine.context.variables, {})
+
+    def test_observations_feed_estimates(self):
+        """Test observed cardinalities replace bad estimates on later runs."""
+        engine = self._engine()
+        list(engine.execute_plan(self._plan(build_estimate=10)))
+        list(engine.execute_plan(self._plan(build_estimate=10)))
+
+        self.assertEqual(len(engine.context.decisions), 1)
+
+    def test_partitioned_join_for_large_build(self):
+        """Test large build sides switch to partitioned hash join."""
+        context = AdaptiveContext()
+        context.rows_per_partition = 50
+        node = QueryNode(operation='join', estimated_rows=1,
+                         join_condition={'left': 'customer_id', 'right': 'customer_id'})
+        probe = [{'customer_id': i % 20} for i in range(1000)]
+
+        join = AdaptiveJoin(node, context)
+        join.add_child(MaterializedOperator(node, context, probe))
+        join.add_child(MaterializedOperator(node, context, self.orders))
+        results = list(join.execute())
+
+        self.assertEqual(len(results), 1000 * 10)
+        details = context.decisions[0].details
+        self.assertEqual(details['join_type'], 'partitioned_hash')
+        self.assertEqual(details['num_partitions'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
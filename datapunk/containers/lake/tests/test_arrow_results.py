@@ -0,0 +1,133 @@
+import io
+import unittest
+import pyarrow as pa
+import pyarrow.parquet as pq
+from ..src.query.federation.fed_merger import ResultMerger, MergeConfig, MergeStrategy
+from ..src.query.federation.fed_planner import DataSource, DataSourceType
+from ..src.query.federation.query_fed_executor import QueryResult
+from ..src.query.federation.fed_adapters import SQLiteAdapter
+from ..src.query.formatter.specialized import ArrowFormatter
+from ..src.query.parser.query_parser_core import QueryNode, QueryPlan
+
+def _source(name: str, source_type: DataSourceType = DataSourceType.RELATIONAL) -> DataSource:
+    return DataSource(name=name, type=source_type, capabilities=set(),
+                      cost_factors={}, statistics={})
+
+class TestArrowMerge(unittest.TestCase):
+    def setUp(self):
+        self.merger = ResultMerger()
+        self.pg = QueryResult(source=_source('pg'), data=[], metadata={},
+                              table=pa.table({'id': [3, 1, 2], 'name': ['c', 'a', 'b']}))
+        self.sqlite = QueryResult(source=_source('sqlite'), metadata={},
+                                  data=[{'id': 2, 'name': 'b', 'score': 0.5},
+                                        {'id': 4, 'name': 'd', 'score': 0.9}])
+
+    def test_union_sort_dedup(self):
+        """Test columnar and row results concatenate, sort and deduplicate."""
+        config = MergeConfig(strategy=MergeStrategy.UNION, sort_columns=['id'],
+                             dedup_columns=['id'])
+        table = self.merger.merge_arrow([self.pg, self.sqlite], config)
+
+        self.assertEqual(table.column('id').to_pylist(), [1, 2, 3, 4])
+        self.assertEqual(table.column('score').to_pylist(), [None, None, None, 0.9])
+
+    def test_key_join(self):
+        """Test key-based strategies join in Arrow."""
+        config = MergeConfig(strategy=MergeStrategy.INTERSECTION, key_columns=['id'])
+        right = QueryResult(source=_source('scores'), metadata={},
+                            data=[{'id': 1, 'score': 10}, {'id': 3, 'score': 30}])
+        table = self.merger.merge_arrow([self.pg, right], config)
+
+        rows = sorted(table.to_pylist(), key=lambda r: r['id'])
+        self.assertEqual(rows, [{'id': 1, 'name': 'a', 'score': 10},
+                                {'id': 3, 'name': 'c', 'score': 30}])
+
+    def test_join_suffixes_clashing_columns(self):
+        """Test non-key columns present on both sides get pandas-style suffixes."""
+        config = MergeConfig(strategy=MergeStrategy.LEFT_JOIN, key_columns=['id'])
+        right = QueryResult(source=_source('names'), metadata={},
+                            data=[{'id': 1, 'name': 'A'}])
+        table = self.merger.merge_arrow([self.pg, right], config)
+
+        rows = sorted(table.to_pylist(), key=lambda r: r['id'])
+        self.assertEqual(rows[0], {'id': 1, 'name_x': 'a', 'name_y': 'A'})
+        self.assertEqual(len(rows), 3)
+
+    def test_type_conflicts_use_common_type(self):
+        """Test columns typed differently per source are cast before merging."""
+        strings = QueryResult(source=_source('csv'), metadata={},
+                              data=[{'id': '7', 'name': 'g'}])
+        table = self.merger.merge_arrow([self.pg, strings],
+                                        MergeConfig(strategy=MergeStrategy.UNION))
+        self.assertEqual(table.column('id').to_pylist(), ['3', '1', '2', '7'])
+
+        config = MergeConfig(strategy=MergeStrategy.INTERSECTION, key_columns=['id'])
+        scores = QueryResult(source=_source('scores'), metadata={},
+                             data=[{'id': '1', 'score': 10}])
+        table = self.merger.merge_arrow([self.pg, scores], config)
+        self.assertEqual(table.to_pylist(), [{'id': '1', 'name': 'a', 'score': 10}])
+
+    def test_joins_apply_to_relational_sources_only(self):
+        """Test document results are concatenated, not joined, as before."""
+        config = MergeConfig(strategy=MergeStrategy.INTERSECTION, key_columns=['id'])
+        docs = [QueryResult(source=_source(f'mongo{i}', DataSourceType.DOCUMENT),
+                            metadata={}, data=[{'id': i}]) for i in range(2)]
+        table = self.merger.merge_arrow(docs, config)
+
+        self.assertEqual(table.column('id').to_pylist(), [0, 1])
+
+    def test_merge_results_returns_rows(self):
+        """Test the row API is served from the Arrow path."""
+        config = MergeConfig(strategy=MergeStrategy.UNION,
+                             filters={'id': lambda v: v > 1})
+        rows = self.merger.merge_results([self.pg, self.sqlite], config)
+
+        self.assertEqual(sorted(r['id'] for r in rows), [2, 2, 3, 4])
+
+    def test_documents_are_flattened(self):
+        """Test document results are flattened before conversion."""
+        docs = QueryResult(source=_source('mongo', DataSourceType.DOCUMENT), metadata={},
+                           data=[{'id': 9, 'profile': {'city': 'Oslo'}, 'tags': ['x']}])
+        table = self.merger.merge_arrow([docs], MergeConfig(strategy=MergeStrategy.UNION))
+
+        self.assertEqual(table.to_pylist(),
+                         [{'id': 9, 'profile.city': 'Oslo', 'tags': "['x']"}])
+
+class TestSQLiteArrow(unittest.TestCase):
+    def test_execute_plan_arrow(self):
+        """Test SQLite results are built as Arrow columns in batches."""
+        adapter = SQLiteAdapter(':memory:')
+        adapter.connection.execute("CREATE TABLE t (id INTEGER, name TEXT)")
+        adapter.connection.executemany("INSERT INTO t VALUES (?, ?)",
+                                       [(i, f'n{i}') for i in range(10)])
+        plan = QueryPlan(QueryNode(operation='select', columns=['id', 'name'],
+                                   table='t', condition='id >= 5'))
+
+        table = adapter.execute_plan_arrow(plan, batch_size=3)
+
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.schema.field('id').type, pa.int64())
+        self.assertEqual(table.column('name').to_pylist()[0], 'n5')
+
+class TestArrowFormatter(unittest.TestCase):
+    def setUp(self):
+        self.formatter = ArrowFormatter()
+        self.table = pa.table({'id': [1, 2], 'name': ['a', 'b,c']})
+
+    def test_parquet_round_trip(self):
+        """Test Parquet output reads back to the same table."""
+        data = self.formatter.to_parquet(self.table)
+        self.assertTrue(pq.read_table(io.BytesIO(data)).equals(self.table))
+
+    def test_ipc_round_trip(self):
+        """Test IPC output reads back to the same table."""
+        data = self.formatter.to_ipc(self.table.to_batches())
+        self.assertTrue(pa.ipc.open_stream(data).read_all().equals(self.table))
+
+    def test_csv_from_columns(self):
+        """Test CSV output quotes values and honours header selection."""
+        text = self.formatter.format_table(self.table, headers=['name'], format_type='csv')
+        self.assertEqual(text.splitlines(), ['"name"', '"a"', '"b,c"'])
+
+if __name__ == '__main__':
+    unittest.main()
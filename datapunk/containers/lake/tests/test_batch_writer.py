@@ -0,0 +1,147 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List
+from ..src.storage.batch_writer import BatchWriter, CopyTarget
+
+class FakeDatabase:
+    """Transactional tables and batch ledger behind a fake asyncpg pool."""
+
+    def __init__(self):
+        self.tables: Dict[str, List[tuple]] = {}
+        self.ledger: set = set()
+        self.copies: List[tuple] = []
+        self.statements: List[str] = []
+        self.fail_next = 0
+        self.lose_next_ack = 0
+        self.copy_delay = 0.0
+        self._txn = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        self._txn = {'tables': {}, 'ledger': set()}
+        try:
+            yield
+        except BaseException:
+            self._txn = None
+            raise
+        txn, self._txn = self._txn, None
+        for table, rows in txn['tables'].items():
+            self.tables.setdefault(table, []).extend(rows)
+        self.ledger |= txn['ledger']
+        if self.lose_next_ack:
+            self.lose_next_ack -= 1
+            raise ConnectionResetError("connection lost during commit")
+
+    async def execute(self, sql: str, *args: Any) -> str:
+        self.statements.append(sql)
+        if sql.startswith("INSERT INTO lake_copy_batches"):
+            if args[0] in self.ledger:
+                return "INSERT 0 0"
+            self._txn['ledger'].add(args[0])
+            return "INSERT 0 1"
+        if sql.startswith("INSERT INTO locations"):
+            staged = self._txn['tables'].pop('locations_staging', [])
+            self._txn['tables'].setdefault('locations', []).extend(staged)
+        return "OK"
+
+    async def copy_records_to_table(self, table: str, records: List[tuple],
+                                    columns: List[str]) -> None:
+        if self.fail_next:
+            self.fail_next -= 1
+            raise OSError("COPY failed")
+        await asyncio.sleep(self.copy_delay)
+        self.copies.append((table, len(records)))
+        self._txn['tables'].setdefault(table, []).extend(records)
+
+class TestBatchWriter(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = FakeDatabase()
+        self.writer = BatchWriter(self.db, max_batch_rows=100, flush_interval=0.05,
+                                  max_buffered_rows=200, retry_delay=0)
+        self.writer.register(CopyTarget('metrics', ['timestamp', 'data']))
+        await self.writer.start()
+
+    async def asyncTearDown(self):
+        await self.writer.close()
+
+    async def test_rows_are_copied_in_batches(self):
+        """Test rows are written with one COPY per full batch."""
+        await self.writer.write_many('metrics', [(i, '{}') for i in range(250)])
+        await self.writer.flush()
+
+        self.assertEqual(self.db.copies, [('metrics', 100), ('metrics', 100), ('metrics', 50)])
+        self.assertEqual(len(self.db.tables['metrics']), 250)
+
+    async def test_partial_batches_flush_on_age(self):
+        """Test a small batch is written once it is older than the interval."""
+        await self.writer.write('metrics', (1, '{}'))
+        await asyncio.sleep(0.15)
+        self.assertEqual(self.db.tables['metrics'], [(1, '{}')])
+
+    async def test_full_buffers_apply_backpressure(self):
+        """Test producers wait while the buffer is full of unwritten rows."""
+        self.db.copy_delay = 0.02
+        producers = [self.writer.write_many('metrics', [(i, '{}') for i in range(100)])
+                     for _ in range(5)]
+        await asyncio.gather(*producers)
+        await self.writer.flush()
+
+        self.assertGreater(self.writer.stats.backpressure_waits, 0)
+        self.assertEqual(len(self.db.tables['metrics']), 500)
+
+    async def test_failed_batches_are_retried(self):
+        """Test a batch that failed is retried and written once."""
+        self.db.fail_next = 2
+        await self.writer.write_many('metrics', [(i, '{}') for i in range(10)], wait=True)
+
+        self.assertEqual(len(self.db.tables['metrics']), 10)
+        self.assertEqual(self.writer.stats.retries, 2)
+
+    async def test_retry_after_lost_commit_is_idempotent(self):
+        """Test a batch that committed before its error is not written twice."""
+        self.db.lose_next_ack = 1
+        await self.writer.write_many('metrics', [(i, '{}') for i in range(10)], wait=True)
+
+        self.assertEqual(len(self.db.tables['metrics']), 10)
+        self.assertEqual(self.writer.stats.batches_skipped, 1)
+
+    async def test_waiting_writers_see_final_failure(self):
+        """Test a waited write raises once retries are exhausted."""
+        self.db.fail_next = 10
+        with self.assertRaises(OSError):
+            await self.writer.write_many('metrics', [(1, '{}')], wait=True)
+        self.assertEqual(self.writer.failed, [('metrics', [(1, '{}')])])
+
+    async def test_cancelled_waiter_is_forgotten(self):
+        """Test a cancelled waiting writer leaves no bookkeeping behind."""
+        self.db.copy_delay = 0.05
+        writer = asyncio.ensure_future(
+            self.writer.write_many('metrics', [(i, '{}') for i in range(10)], wait=True))
+        await asyncio.sleep(0)
+        writer.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await writer
+        await self.writer.flush()
+
+        self.assertEqual(self.writer._remaining, {})
+        self.assertEqual(len(self.db.tables['metrics']), 10)
+
+    async def test_staged_targets_convert_on_insert(self):
+        """Test rows without COPY codecs go through a staging table."""
+        self.writer.register(CopyTarget('locations', ['geom', 'properties'],
+                                        staging_types=['text', 'jsonb'],
+                                        expressions=['ST_GeomFromGeoJSON(geom)', 'properties']))
+        await self.writer.write('locations', ('{"type": "Point"}', '{}'), wait=True)
+
+        self.assertEqual(self.db.copies, [('locations_staging', 1)])
+        self.assertEqual(len(self.db.tables['locations']), 1)
+        self.assertTrue(any('SELECT ST_GeomFromGeoJSON(geom), properties FROM locations_staging' in s
+                            for s in self.db.statements))
+
+if __name__ == '__main__':
+    unittest.main()
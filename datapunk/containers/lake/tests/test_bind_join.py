@@ -0,0 +1,154 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from typing import Any, Dict, List
+from ..src.query.federation.adapters.fed_adapter_base import BoundQuery, DataSourceAdapter
+from ..src.query.federation.fed_planner import (
+    BindJoinSpec, DataSource, DataSourceType, DistributedQueryPlanner, SubQuery
+)
+from ..src.query.federation.query_fed_core import DataSourceStats, FederatedQueryOptimizer
+from ..src.query.federation.query_fed_executor import AdaptiveBatchSizer, FederatedQueryExecutor
+
+def _source(name: str) -> DataSource:
+    return DataSource(name=name, type=DataSourceType.RELATIONAL, capabilities=set(),
+                      cost_factors={}, statistics={})
+
+def _stats(rows: int, row_bytes: int = 200) -> DataSourceStats:
+    return DataSourceStats(total_rows=rows, total_size_bytes=rows * row_bytes,
+                           avg_query_time_ms=5.0, error_rate=0.0,
+                           last_updated=datetime.utcnow(), capabilities=[])
+
+class SQLStub(DataSourceAdapter):
+    """Adapter exposing only the base class's key binding."""
+
+    def connect(self): pass
+    def disconnect(self): pass
+    def execute_query(self, query): return []
+    def get_capabilities(self): return set()
+    def get_schema(self): return {}
+
+class OrdersExecutor:
+    def execute_batches(self, query: Any):
+        for start in range(0, 100, 10):
+            yield [{'order_id': i, 'customer_id': i % 25} for i in range(start, start + 10)]
+
+class CustomersExecutor:
+    """Inner side that records each key batch it is asked for."""
+
+    def __init__(self):
+        self.batches: List[List[int]] = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def bind_join_keys(self, query: Any, column: str, keys: List[Any], style: str = 'in'):
+        return {'query': query, 'column': column, 'keys': list(keys)}
+
+    def execute(self, bound: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.batches.append(bound['keys'])
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return [{'customer_id': key, 'name': f'c{key}'} for key in bound['keys']]
+
+class TestJoinStrategyCost(unittest.TestCase):
+    def setUp(self):
+        self.optimizer = FederatedQueryOptimizer()
+        self.optimizer.add_source_stats('warehouse', _stats(10_000_000))
+        self.optimizer.update_network_latency('warehouse', 20.0)
+
+    def test_small_outer_prefers_bind(self):
+        """Test a few keys against a large table are bound rather than shipped."""
+        choice = self.optimizer.choose_join_strategy('warehouse', outer_keys=500)
+        self.assertEqual(choice.strategy, 'bind')
+        self.assertEqual(choice.batches, 2)
+        self.assertLess(choice.bind_cost_ms, choice.ship_cost_ms)
+
+    def test_large_outer_prefers_ship(self):
+        """Test binding as many keys as the inner has rows loses to shipping."""
+        choice = self.optimizer.choose_join_strategy('warehouse', outer_keys=10_000_000)
+        self.assertEqual(choice.strategy, 'ship')
+
+    def test_unknown_source_ships(self):
+        """Test sources without statistics keep the ship strategy."""
+        choice = self.optimizer.choose_join_strategy('unknown', outer_keys=10)
+        self.assertEqual(choice.strategy, 'ship')
+
+    def test_planner_wires_bind_join(self):
+        """Test the planner makes the inner sub-query depend on the outer one."""
+        planner = DistributedQueryPlanner(self.optimizer)
+        outer = SubQuery(_source('orders'), 'orders', 1.0, [], result_size=200)
+        inner = SubQuery(_source('warehouse'), 'customers', 1.0, [], result_size=0)
+
+        choice = planner.plan_join(outer, inner, 'customer_id', 'id')
+
+        self.assertEqual(choice.strategy, 'bind')
+        self.assertEqual(inner.bind_join.outer_source, 'orders')
+        self.assertEqual(inner.bind_join.inner_key, 'id')
+        self.assertIs(inner.dependencies[0], outer)
+
+class TestKeyBinding(unittest.TestCase):
+    def setUp(self):
+        self.adapter = SQLStub('pg', DataSourceType.RELATIONAL)
+
+    def test_in_list_uses_bind_parameters(self):
+        """Test keys become named parameters rather than literals."""
+        bound = self.adapter.bind_join_keys("SELECT * FROM customers;", 'id', [3, "o'neil"])
+        self.assertIsInstance(bound, BoundQuery)
+        self.assertEqual(bound.sql, "SELECT * FROM (SELECT * FROM customers) AS bj_inner "
+                                    "WHERE id IN (:bk0, :bk1)")
+        self.assertEqual(bound.params, {'bk0': 3, 'bk1': "o'neil"})
+
+    def test_values_join(self):
+        """Test the VALUES style joins the keys as a derived table."""
+        bound = self.adapter.bind_join_keys("SELECT * FROM customers", 'id', [1, 2],
+                                            style='values')
+        self.assertIn("JOIN (VALUES (:bk0), (:bk1)) AS bj_keys(key)", bound.sql)
+        self.assertIn("ON bj_inner.id = bj_keys.key", bound.sql)
+
+    def test_json_query_gains_in_condition(self):
+        """Test JSON queries are restricted with an in condition."""
+        bound = self.adapter.bind_join_keys({'table': 'customers'}, 'id', [1, 2])
+        self.assertEqual(bound['conditions'], {'id': {'operator': 'in', 'value': [1, 2]}})
+
+class TestAdaptiveBatchSizer(unittest.TestCase):
+    def test_converges_toward_target_latency(self):
+        """Test batches grow when fast and shrink when slow, within bounds."""
+        sizer = AdaptiveBatchSizer(BindJoinSpec('o', 'k', 'k', batch_size=100,
+                                                target_batch_seconds=0.1))
+        sizer.observe(100, 0.01)
+        self.assertEqual(sizer.batch_size, 200)
+        for _ in range(10):
+            sizer.observe(sizer.batch_size, sizer.batch_size * 0.002)
+        self.assertLess(abs(sizer.batch_size - 50), 10)
+
+class TestBindJoinExecution(unittest.IsolatedAsyncioTestCase):
+    async def test_keys_are_batched_and_deduplicated(self):
+        """Test the inner source sees each distinct outer key once, in bounded batches."""
+        executor = FederatedQueryExecutor(max_workers=4)
+        customers = CustomersExecutor()
+        executor.register_executor('orders', OrdersExecutor())
+        executor.register_executor('crm', customers)
+        orders = SubQuery(_source('orders'), 'orders', 1.0, [], 100)
+        inner = SubQuery(_source('crm'), 'customers', 1.0, [orders], 25,
+                         bind_join=BindJoinSpec('orders', 'customer_id', 'customer_id',
+                                                batch_size=4, min_batch_size=4,
+                                                max_batch_size=4, max_in_flight=2))
+        try:
+            results = {r.source.name: r async for r in executor.stream_plan([orders, inner])}
+        finally:
+            executor.shutdown()
+
+        keys = sorted(k for batch in customers.batches for k in batch)
+        self.assertEqual(keys, list(range(25)))
+        self.assertTrue(all(len(batch) <= 4 for batch in customers.batches))
+        self.assertLessEqual(customers.peak, 2)
+        self.assertIsNone(results['crm'].error)
+        self.assertEqual(len(results['crm'].data), 25)
+
+if __name__ == '__main__':
+    unittest.main()
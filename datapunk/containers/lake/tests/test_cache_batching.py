@@ -0,0 +1,103 @@
+import asyncio
+import json
+import pickle
+import unittest
+import zlib
+from fakeredis import FakeAsyncRedis
+from ..src.storage.cache_batching import GetCoalescer, fetch_many, store_many
+from ..src.storage.serialization import Serializer, register_format
+
+class CountingRedis(FakeAsyncRedis):
+    """In-memory Redis that counts MGET round-trips."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mgets = 0
+    
+    async def mget(self, keys, *args):
+        self.mgets += 1
+        return await super().mget(keys, *args)
+
+class TestSerializer(unittest.TestCase):
+    def test_formats_roundtrip(self):
+        """Test values survive every built-in format."""
+        value = {'id': 7, 'tags': ['a', 'b'], 'score': 0.5, 'blob': None}
+        for format in ('json', 'pickle', 'msgpack'):
+            serializer = Serializer(format)
+            self.assertEqual(serializer.loads(serializer.dumps(value)), value)
+    
+    def test_only_large_values_are_compressed(self):
+        """Test small payloads skip compression and large ones shrink."""
+        serializer = Serializer('msgpack', 'lz4', threshold=256)
+        small = serializer.dumps({'a': 1})
+        large = serializer.dumps({'rows': ['same text'] * 500})
+        
+        self.assertEqual(small[0], 0)
+        self.assertEqual(large[0], 1)
+        self.assertLess(len(large), 500)
+        self.assertEqual(serializer.loads(large), {'rows': ['same text'] * 500})
+    
+    def test_reads_unframed_values(self):
+        """Test values written before framing are decoded in their old format."""
+        serializer = Serializer('msgpack', 'lz4')
+        value = {'legacy': True}
+        self.assertEqual(serializer.loads(zlib.compress(json.dumps(value).encode())), value)
+        self.assertEqual(serializer.loads(json.dumps(value).encode()), value)
+        self.assertEqual(serializer.loads(serializer.dumps(value)), value)
+        
+        pickled = Serializer('msgpack', legacy_format='pickle')
+        self.assertEqual(pickled.loads(pickle.dumps(value)), value)
+    
+    def test_registered_formats(self):
+        """Test formats can be plugged in by name."""
+        register_format('text', lambda v: v.encode(), lambda d: d.decode())
+        self.assertEqual(Serializer('text').loads(Serializer('text').dumps('hi')), 'hi')
+        with self.assertRaises(ValueError):
+            Serializer('yaml')
+
+class TestBatchedCommands(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = CountingRedis()
+    
+    async def test_store_and_fetch_many(self):
+        """Test keys are written by pipeline and read by chunked MGET."""
+        items = {f'k{i}': str(i).encode() for i in range(25)}
+        await store_many(self.redis, items, ttl=60, batch_size=10)
+        values = await fetch_many(self.redis, ['k3', 'missing', 'k24'] + list(items), batch_size=10)
+        
+        self.assertEqual(values[:3], [b'3', None, b'24'])
+        self.assertEqual(self.redis.mgets, 3)
+        self.assertGreater(await self.redis.ttl('k0'), 0)
+    
+    async def test_concurrent_gets_share_one_fetch(self):
+        """Test gets within the window become one MGET and share duplicates."""
+        await self.redis.set('a', b'1')
+        await self.redis.set('b', b'2')
+        coalescer = GetCoalescer(lambda keys: fetch_many(self.redis, keys), window=0.01)
+        
+        results = await asyncio.gather(*(coalescer.get(k) for k in ['a', 'b', 'a', 'c']))
+        
+        self.assertEqual(results, [b'1', b'2', b'1', None])
+        self.assertEqual(self.redis.mgets, 1)
+        self.assertEqual(coalescer.stats.keys_fetched, 3)
+    
+    async def test_full_batches_are_sent_early(self):
+        """Test a batch is dispatched as soon as it reaches max_batch keys."""
+        coalescer = GetCoalescer(lambda keys: fetch_many(self.redis, keys),
+                                 window=10, max_batch=4)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(coalescer.get(f'k{i}') for i in range(8))), timeout=1)
+        self.assertEqual(results, [None] * 8)
+        self.assertEqual(coalescer.stats.batches, 2)
+    
+    async def test_fetch_errors_reach_every_caller(self):
+        """Test a failed fetch raises in each waiting get."""
+        async def failing(keys):
+            raise ConnectionError("redis down")
+        coalescer = GetCoalescer(failing)
+        results = await asyncio.gather(coalescer.get('a'), coalescer.get('b'),
+                                       return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ConnectionError) for r in results))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from fakeredis import FakeAsyncRedis
+from ..src.storage.cache_maintenance import (
+    KeyspaceScanner, SampledEvictor, expiry_scores
+)
+
+class TestKeyspaceScanner(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = FakeAsyncRedis()
+        await self.redis.mset({f'k{i}': i for i in range(100)})
+    
+    async def test_walk_resumes_between_ticks(self):
+        """Test a zero budget advances one page and later ticks continue."""
+        scanner = KeyspaceScanner(self.redis, count=10)
+        seen = []
+        
+        async def visit(keys):
+            seen.extend(keys)
+        while scanner.passes == 0:
+            await scanner.walk(0, visit)
+        
+        self.assertEqual(len(set(seen)), 100)
+        self.assertGreater(scanner.passes, 0)
+    
+    async def test_walk_stops_at_end_of_pass(self):
+        """Test a generous budget stops once the keyspace has been covered."""
+        scanner = KeyspaceScanner(self.redis, match='k1*', count=10)
+        self.assertEqual(await scanner.walk(10), 11)
+        self.assertEqual(scanner.passes, 1)
+        self.assertEqual(scanner.last_pass_keys, 11)
+
+class TestSampledEvictor(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = FakeAsyncRedis()
+        await self.redis.mset({f'k{i}': i for i in range(200)})
+        # Idle time grows with the key number
+        self.idle = {f'k{i}'.encode(): float(i) for i in range(200)}
+    
+    async def _idle(self, redis, keys):
+        return [self.idle.get(key) for key in keys]
+    
+    def _evictor(self, **options) -> SampledEvictor:
+        return SampledEvictor(self.redis, KeyspaceScanner(self.redis, count=20),
+                              scorer=self._idle, **options)
+    
+    async def test_evicts_idle_keys_first(self):
+        """Test sampled eviction removes mostly the idlest keys."""
+        evicted = await self._evictor(sample_size=16).evict(50, budget=10)
+        
+        self.assertEqual(len(evicted), 50)
+        self.assertEqual(await self.redis.dbsize(), 150)
+        mean_idle = sum(self.idle[k] for k in evicted) / len(evicted)
+        self.assertGreater(mean_idle, 120)
+    
+    async def test_budget_bounds_work(self):
+        """Test a spent budget stops eviction short of the target."""
+        evictor = self._evictor()
+        self.assertEqual(await evictor.evict(50, budget=0), [])
+        self.assertEqual(evictor.stats.rounds, 0)
+    
+    async def test_stops_on_empty_keyspace(self):
+        """Test eviction ends when no keys remain."""
+        await self.redis.flushdb()
+        self.assertEqual(await self._evictor().evict(10, budget=10), [])
+    
+    async def test_falls_back_when_object_is_rejected(self):
+        """Test eviction still works when the server refuses OBJECT subcommands."""
+        evictor = SampledEvictor(self.redis, KeyspaceScanner(self.redis, count=20), 'lfu')
+        evicted = await evictor.evict(10, budget=10)
+        
+        self.assertEqual(len(evicted), 10)
+        self.assertEqual(evictor.policy, 'random')
+    
+    async def test_prefix_limits_eviction(self):
+        """Test only keys under the scanned prefix are evicted."""
+        await self.redis.mset({f'cache:{i}': i for i in range(20)})
+        evictor = SampledEvictor(self.redis, KeyspaceScanner(self.redis, 'cache:*', 20),
+                                 'random')
+        evicted = await evictor.evict(10, budget=10)
+        
+        self.assertEqual(len(evicted), 10)
+        self.assertTrue(all(key.startswith(b'cache:') for key in evicted))
+        self.assertEqual(await self.redis.dbsize(), 210)
+    
+    async def test_expiry_scores_prefer_nearest_expiry(self):
+        """Test TTL scoring ranks keys closest to expiry highest."""
+        await self.redis.set('soon', 1, ex=5)
+        await self.redis.set('later', 1, ex=500)
+        scores = await expiry_scores(self.redis, ['soon', 'later', 'k1', 'gone'])
+        
+        self.assertGreater(scores[0], scores[1])
+        self.assertEqual(scores[2], -float('inf'))
+        self.assertIsNone(scores[3])
+
+if __name__ == '__main__':
+    unittest.main()
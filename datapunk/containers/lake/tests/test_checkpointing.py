@@ -0,0 +1,267 @@
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+from unittest.mock import patch
+from ..src.query.executor.fault_tolerance import (
+    CheckpointManager, CheckpointPolicy, CheckpointCorruptError, CheckpointWriter,
+    FaultTolerantContext,
+    FaultTolerantExecutionEngine, FaultTolerantOperator, IncrementalState,
+    decode_checkpoint, encode_checkpoint, KIND_BASE, KIND_DELTA
+)
+from ..src.query.parser.query_parser_core import QueryNode, QueryPlan
+from ..src.storage.cache import CacheManager
+
+class RollupOperator(FaultTolerantOperator):
+    """Sums values per group, keeping one state entry per group."""
+
+    def __init__(self, node: QueryNode, context: FaultTolerantContext,
+                 rows: List[Dict[str, Any]], fail_at: int = -1):
+        super().__init__(node, context,
+                         policy=CheckpointPolicy(min_rows=1, initial_rows=100))
+        self.rows = rows
+        self.fail_at = fail_at
+        self.rows_consumed = 0
+
+    def _produce(self) -> Iterator[Dict[str, Any]]:
+        offset = self.state.get('offset', 0)
+        for i in range(offset, len(self.rows)):
+            if i == self.fail_at:
+                raise RuntimeError("worker lost")
+            row = self.rows[i]
+            self.state[row['group']] = self.state.get(row['group'], 0) + row['value']
+            self.state['offset'] = i + 1
+            self.rows_consumed += 1
+            self.tick()
+        for group in sorted(k for k in self.state if k != 'offset'):
+            yield {'group': group, 'total': self.state[group]}
+
+    def _execute_with_retries(self) -> Iterator[Dict[str, Any]]:
+        # No retries so failures surface immediately
+        return self._produce()
+
+class FlakyTable(list):
+    """Table whose reads fail at one position while ``failing`` is set."""
+
+    def __init__(self, rows: List[Dict[str, Any]], fail_at: int):
+        super().__init__(rows)
+        self.fail_at = fail_at
+        self.failing = True
+
+    def __getitem__(self, index):
+        if self.failing and index == self.fail_at:
+            raise RuntimeError("worker lost")
+        return super().__getitem__(index)
+
+class GatedWriter(CheckpointWriter):
+    """Writer that holds every record until ``gate`` is set."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        super().__init__()
+
+    def _write(self, *args):
+        self.gate.wait()
+        super()._write(*args)
+
+class MockCacheManager(CacheManager):
+    """Mock cache manager for testing."""
+
+    def __init__(self, data: Dict[str, List[Dict[str, Any]]]):
+        self.data = data
+
+    def get(self, key: str) -> List[Dict[str, Any]]:
+        return self.data.get(key, [])
+
+class TestCheckpointFormat(unittest.TestCase):
+    def test_round_trip(self):
+        """Test records decode to what was encoded."""
+        data = encode_checkpoint(KIND_DELTA, 7, 3, {'changed': {'a': 1}})
+        self.assertEqual(decode_checkpoint(data), (KIND_DELTA, 7, 3, {'changed': {'a': 1}}))
+
+    def test_checksum_detects_corruption(self):
+        """Test a flipped payload byte is rejected."""
+        data = bytearray(encode_checkpoint(KIND_BASE, 1, 1, {'state': {'a': 1}}))
+        data[-1] ^= 0xFF
+        with self.assertRaises(CheckpointCorruptError):
+            decode_checkpoint(bytes(data))
+
+class TestCheckpointManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.manager = CheckpointManager(self.tmp, compact_every=3)
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmp)
+
+    def test_deltas_hold_only_changes(self):
+        """Test deltas contain changed entries and deletions only."""
+        state = IncrementalState({f'p{i}': list(range(100)) for i in range(10)})
+        self.manager.save_checkpoint('op', state)
+        state['p1'].append(100)
+        state.touch('p1')
+        del state['p2']
+        self.manager.save_checkpoint('op', state)
+        self.manager.flush()
+
+        delta_path = Path(self.tmp) / 'op.000000000002.delta.ckpt'
+        kind, seq, base_seq, payload = decode_checkpoint(delta_path.read_bytes())
+        self.assertEqual((kind, seq, base_seq), (KIND_DELTA, 2, 1))
+        self.assertEqual(list(payload['changed']), ['p1'])
+        self.assertEqual(payload['deleted'], {'p2'})
+
+    def test_restore_base_plus_deltas(self):
+        """Test restore replays deltas over the latest base."""
+        state = IncrementalState({'a': 1, 'b': 2})
+        self.manager.save_checkpoint('op', state, {'row_count': 10})
+        state['a'] = 5
+        self.manager.save_checkpoint('op', state, {'row_count': 20})
+        state.pop('b')
+        state['c'] = 3
+        self.manager.save_checkpoint('op', state, {'row_count': 30})
+
+        restored = self.manager.load_checkpoint('op')
+        self.assertEqual(restored['state'], {'a': 5, 'c': 3})
+        self.assertEqual(restored['meta'], {'row_count': 30})
+        self.assertEqual(restored['sequence'], 3)
+
+    def test_replay_stops_at_corrupt_delta(self):
+        """Test a corrupt delta ends replay instead of failing restore."""
+        state = IncrementalState({'a': 1})
+        for value in (2, 3, 4):
+            self.manager.save_checkpoint('op', state)
+            state['a'] = value
+        self.manager.flush()
+        path = Path(self.tmp) / 'op.000000000003.delta.ckpt'
+        path.write_bytes(path.read_bytes()[:-1])
+
+        restored = self.manager.load_checkpoint('op')
+        self.assertEqual(restored['state'], {'a': 2})
+        self.assertEqual(restored['sequence'], 2)
+
+    def test_capture_ignores_later_mutation(self):
+        """Test in-place changes after a save do not leak into the pending record."""
+        writer = GatedWriter()
+        manager = CheckpointManager(self.tmp, writer=writer)
+        group = {'values': {'s': 10}, 'counts': {'s': 1}}
+        state = IncrementalState({'g': group, 'input_offset': 1})
+        manager.save_checkpoint('agg', state)
+        group['values']['s'] += 5
+        group['counts']['s'] += 1
+        state.touch('g')
+        state['input_offset'] = 2
+
+        writer.gate.set()
+        restored = manager.load_checkpoint('agg')
+        self.assertEqual(restored['state'], {'g': {'values': {'s': 10}, 'counts': {'s': 1}},
+                                             'input_offset': 1})
+        writer.close()
+
+    def test_compaction_removes_old_chain(self):
+        """Test a new base is written periodically and supersedes older records."""
+        state = IncrementalState({'a': 0})
+        for i in range(6):
+            state['a'] = i
+            self.manager.save_checkpoint('op', state)
+        self.manager.flush()
+
+        names = sorted(p.name for p in Path(self.tmp).glob('op.*.ckpt'))
+        self.assertEqual(names, ['op.000000000005.base.ckpt',
+                                 'op.000000000006.delta.ckpt'])
+        self.assertEqual(self.manager.load_checkpoint('op')['state'], {'a': 5})
+
+class TestCheckpointPolicy(unittest.TestCase):
+    def test_interval_tracks_operator_cost(self):
+        """Test expensive rows checkpoint after fewer rows than cheap ones."""
+        slow = CheckpointPolicy(target_interval_seconds=1.0, min_rows=1)
+        slow.record(rows=100, work_seconds=10.0, capture_seconds=0.001)
+        fast = CheckpointPolicy(target_interval_seconds=1.0, min_rows=1)
+        fast.record(rows=100, work_seconds=0.001, capture_seconds=0.001)
+
+        self.assertEqual(slow.interval_rows, 10)
+        self.assertEqual(fast.interval_rows, 100000)
+
+    def test_overhead_budget_limits_frequency(self):
+        """Test costly captures spread checkpoints out."""
+        policy = CheckpointPolicy(target_interval_seconds=1.0, max_overhead=0.01, min_rows=1)
+        policy.record(rows=100, work_seconds=10.0, capture_seconds=1.0)
+        self.assertEqual(policy.interval_rows, 1000)
+
+class TestFaultTolerantOperator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.node = QueryNode(operation='aggregate', operator_id='rollup')
+        self.rows = [{'group': f'g{i % 5}', 'value': i} for i in range(1000)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_resume_after_failure(self):
+        """Test a restarted rollup resumes from the checkpointed input offset."""
+        context = FaultTolerantContext(self.tmp)
+        failing = RollupOperator(self.node, context, self.rows, fail_at=750)
+        with self.assertRaises(RuntimeError):
+            list(failing.execute())
+        context.close()
+        self.assertGreater(failing.checkpoints_taken, 1)
+
+        context = FaultTolerantContext(self.tmp)
+        resumed = RollupOperator(self.node, context, self.rows)
+        results = list(resumed.execute())
+        context.close()
+
+        self.assertEqual(resumed.rows_consumed, 250)
+        expected = {f'g{g}': sum(i for i in range(1000) if i % 5 == g) for g in range(5)}
+        self.assertEqual({r['group']: r['total'] for r in results}, expected)
+
+class TestFaultTolerantEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.table = FlakyTable([{'group': f'g{i % 5}', 'value': i} for i in range(1000)],
+                                fail_at=600)
+        scan = QueryNode(operation='table_scan', table_name='facts',
+                         columns=['group', 'value'])
+        self.plan = QueryPlan(QueryNode(
+            operation='aggregate', children=[scan], group_by=['group'],
+            aggregates=[{'function': 'sum', 'column': 'value', 'alias': 'total'},
+                        {'function': 'count', 'column': 'value', 'alias': 'n'}]))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _engine(self) -> FaultTolerantExecutionEngine:
+        engine = FaultTolerantExecutionEngine(self.tmp)
+        engine.context.cache_manager = MockCacheManager({'facts': self.table})
+        return engine
+
+    @patch('time.sleep')
+    def test_restart_resumes_aggregate_groups(self, _sleep):
+        """Test a restarted query re-reads its input but folds each row once."""
+        with self._engine() as engine:
+            with self.assertRaises(RuntimeError):
+                list(engine.execute_plan(self.plan, query_id='q1'))
+        names = {p.name.split('.')[0] for p in Path(self.tmp).glob('*.ckpt')}
+        self.assertEqual(names, {'q1-0', 'q1-0_0'})
+
+        self.table.failing = False
+        with self._engine() as engine:
+            results = list(engine.execute_plan(self.plan, query_id='q1'))
+
+        expected = {f'g{g}': sum(i for i in range(1000) if i % 5 == g) for g in range(5)}
+        self.assertEqual({r['group']: r['total'] for r in results}, expected)
+        self.assertEqual({r['n'] for r in results}, {200})
+        self.assertEqual(list(Path(self.tmp).glob('*.ckpt')), [])
+
+    def test_close_stops_writer(self):
+        """Test closing the engine stops the checkpoint writer thread."""
+        engine = self._engine()
+        writer = engine.context.checkpoint_manager.writer
+        engine.close()
+        self.assertFalse(writer._thread.is_alive())
+        engine.close()
+
+if __name__ == '__main__':
+    unittest.main()
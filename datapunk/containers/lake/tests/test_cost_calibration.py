@@ -0,0 +1,228 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from ..src.query.federation.fed_planner import DataSource, DataSourceType, DistributedQueryPlanner, SubQuery
+from ..src.query.federation.fed_splitter import QuerySplitter, SubQuery as SplitSubQuery
+from ..src.query.federation.query_fed_core import DataSourceStats, FederatedQueryOptimizer
+from ..src.query.federation.query_fed_monitoring import FederationMonitor
+from ..src.query.federation.querry_fed_profiling import (
+    ANY_SHAPE, CostCalibrator, DecayedRegression, describe_query
+)
+
+def _train(calibrator: CostCalibrator, source: str, intercept: float, per_row: float,
+           samples: int = 50, operation: str = 'select', shape: str = ANY_SHAPE) -> None:
+    rng = random.Random(7)
+    for _ in range(samples):
+        rows = rng.randint(100, 100_000)
+        calibrator.observe(source, operation, shape, intercept + per_row * rows, rows=rows)
+
+class TestDecayedRegression(unittest.TestCase):
+    def test_recovers_linear_costs(self):
+        """Test the fit recovers a fixed overhead and a per-row cost."""
+        model = DecayedRegression(decay=1.0)
+        for rows in range(0, 50_000, 1000):
+            model.update(12.0 + 0.004 * rows, rows, 0)
+        params = model.parameters()
+
+        self.assertAlmostEqual(params.intercept_ms, 12.0, places=1)
+        self.assertAlmostEqual(params.ms_per_row, 0.004, places=4)
+
+    def test_tracks_drift(self):
+        """Test old observations fade so a slowed source is noticed."""
+        model = DecayedRegression(decay=0.9)
+        for rows in range(0, 20_000, 200):
+            model.update(5.0 + 0.001 * rows, rows, 0)
+        for rows in range(0, 20_000, 400):
+            model.update(50.0 + 0.001 * rows, rows, 0)
+
+        self.assertGreater(model.parameters().intercept_ms, 45.0)
+
+    def test_errors_raise_error_rate_only(self):
+        """Test failures feed the error rate without distorting latency."""
+        model = DecayedRegression(decay=1.0)
+        for i in range(10):
+            model.update(10.0, 100, 0, error=(i % 2 == 0))
+        params = model.parameters()
+
+        self.assertAlmostEqual(params.error_rate, 0.5)
+        self.assertAlmostEqual(params.intercept_ms + params.ms_per_row * 100, 10.0, places=3)
+
+class TestCostCalibrator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'calibration.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_specific_shapes_fall_back(self):
+        """Test lookups prefer the predicate shape and fall back to coarser models."""
+        calibrator = CostCalibrator(min_samples=5)
+        _train(calibrator, 'pg', 5.0, 0.001, shape='id = ?')
+        _train(calibrator, 'pg', 500.0, 0.001, samples=60, shape='name like ?')
+
+        fast = calibrator.predict_ms('pg', 'select', 1000, predicate_shape='id = ?')
+        slow = calibrator.predict_ms('pg', 'select', 1000, predicate_shape='name like ?')
+        fallback = calibrator.predict_ms('pg', 'select', 1000, predicate_shape='other')
+
+        self.assertAlmostEqual(fast, 6.0, places=1)
+        self.assertAlmostEqual(slow, 501.0, places=1)
+        self.assertTrue(fast < fallback < slow)
+        self.assertIsNone(calibrator.parameters('mongo'))
+
+    def test_failures_alone_do_not_calibrate(self):
+        """Test a source that only fails has an error rate but no cost model."""
+        calibrator = CostCalibrator(min_samples=5)
+        for _ in range(10):
+            calibrator.observe('pg', 'select', ANY_SHAPE, 1.0, error=True)
+
+        self.assertIsNone(calibrator.parameters('pg', 'select'))
+        self.assertIsNone(calibrator.predict_ms('pg', 'select', 1000))
+        self.assertEqual(calibrator.error_rate('pg', 'select'), 1.0)
+
+    def test_predictions_include_retries(self):
+        """Test predicted cost grows with the observed error rate."""
+        calibrator = CostCalibrator(min_samples=5)
+        for i in range(20):
+            calibrator.observe('pg', 'select', ANY_SHAPE, 10.0, rows=100, error=i % 2 == 0)
+
+        self.assertAlmostEqual(calibrator.predict_ms('pg', 'select', 100), 20.0, delta=1.0)
+
+    def test_persistence_round_trip(self):
+        """Test calibration survives a restart through the local file."""
+        calibrator = CostCalibrator(self.path, autosave_every=10)
+        _train(calibrator, 'pg', 20.0, 0.002)
+
+        restored = CostCalibrator(self.path)
+
+        self.assertTrue(os.path.exists(self.path))
+        self.assertAlmostEqual(restored.predict_ms('pg', 'select', 5000),
+                               calibrator.predict_ms('pg', 'select', 5000), places=6)
+
+    def test_describe_query_shapes(self):
+        """Test shapes ignore literal values."""
+        first = describe_query("SELECT * FROM t WHERE id = 5 AND name IN ('a', 'b')")
+        second = describe_query("select * from t where id = 9 and name in ('c')")
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, ('select', 'id = ? and name in (?)'))
+        self.assertEqual(describe_query({'type': 'vector', 'filter': {'b': 1, 'a': 2}}),
+                         ('vector', 'a,b'))
+
+class TestCalibratedPlanning(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.calibrator = CostCalibrator(min_samples=3)
+        self.optimizer = FederatedQueryOptimizer(calibrator=self.calibrator)
+        self.optimizer.add_source_stats('slow', DataSourceStats(
+            total_rows=1_000_000, total_size_bytes=100_000_000, avg_query_time_ms=1.0,
+            error_rate=0.0, last_updated=datetime.utcnow(), capabilities=[]))
+
+    async def test_monitor_feeds_calibrator(self):
+        """Test subquery timings reported to the monitor calibrate the source."""
+        monitor = FederationMonitor(calibrator=self.calibrator)
+        await monitor.start_query('q', None)
+        for rows in (100, 1000, 10_000, 20_000):
+            await monitor.record_subquery('q', 'slow', {
+                'queue_time_ms': 0.0, 'exec_time_ms': 300.0 + 0.01 * rows, 'rows': rows,
+                'operation': 'select', 'predicate_shape': ANY_SHAPE, 'started': True})
+        await monitor.record_subquery('q', 'slow', {
+            'queue_time_ms': 5.0, 'exec_time_ms': 0.0, 'rows': 0,
+            'started': False, 'error': 'Dependency failed: other'})
+
+        params = self.calibrator.parameters('slow', 'select')
+        self.assertEqual(params.samples, 4)
+        self.assertEqual(params.error_rate, 0.0)
+        self.assertAlmostEqual(params.intercept_ms, 300.0, places=0)
+
+    async def test_monitor_saves_off_the_loop(self):
+        """Test autosaves triggered by the monitor run in a worker thread."""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        calibrator = CostCalibrator(os.path.join(tmp, 'costs.json'), autosave_every=2)
+        saved_on = []
+        save = calibrator.save
+        calibrator.save = lambda: (saved_on.append(threading.current_thread()), save())
+        monitor = FederationMonitor(calibrator=calibrator)
+
+        for _ in range(4):
+            await monitor.record_subquery('q', 'slow', {
+                'exec_time_ms': 10.0, 'rows': 1, 'operation': 'select'})
+
+        self.assertEqual(len(saved_on), 2)
+        self.assertNotIn(threading.main_thread(), saved_on)
+        self.assertTrue(os.path.exists(calibrator.path))
+
+    def test_splitter_keeps_one_cost_unit(self):
+        """Test calibrated milliseconds replace static costs only for all sources at once."""
+        class Node:
+            operation_type = 'SELECT'
+
+        _train(self.calibrator, 'slow', 40.0, 0.003)
+        splitter = QuerySplitter(self.optimizer)
+
+        def subqueries():
+            return [SplitSubQuery(source, Node(), set(), 7.0, 1000, [])
+                    for source in ('slow', 'fresh')]
+
+        mixed = splitter._apply_calibrated_costs(subqueries())
+        self.assertEqual([q.estimated_cost for q in mixed], [7.0, 7.0])
+
+        _train(self.calibrator, 'fresh', 10.0, 0.001)
+        calibrated = splitter._apply_calibrated_costs(subqueries())
+        self.assertAlmostEqual(calibrated[0].estimated_cost, 43.0, places=0)
+        self.assertAlmostEqual(calibrated[1].estimated_cost, 11.0, places=0)
+
+    def test_calibration_drives_join_choice(self):
+        """Test a high observed round-trip cost makes binding many batches unattractive."""
+        static = FederatedQueryOptimizer()
+        static.add_source_stats('slow', self.optimizer.source_stats['slow'])
+        static.update_network_latency('slow', 1.0)
+        self.assertEqual(static.choose_join_strategy('slow', outer_keys=50_000).strategy, 'bind')
+
+        _train(self.calibrator, 'slow', 2000.0, 0.0001)
+        choice = self.optimizer.choose_join_strategy('slow', outer_keys=50_000)
+
+        self.assertTrue(choice.calibrated)
+        self.assertEqual(choice.strategy, 'ship')
+
+    def test_failing_operations_are_not_pushed_down(self):
+        """Test an operation that keeps failing at a source stays local."""
+        for i in range(10):
+            self.calibrator.observe('slow', 'aggregate', ANY_SHAPE, 10.0, error=i < 5)
+        self.assertFalse(self.optimizer.should_push_down('slow', 'aggregate'))
+        self.assertTrue(self.optimizer.should_push_down('slow', 'filter'))
+
+    def test_push_down_uses_recorded_keys(self):
+        """Test failures recorded for a sub-query block pushing its node down."""
+        class Node:
+            operation_type = 'AGGREGATE'
+
+        operation, shape = describe_query(Node())
+        for _ in range(5):
+            self.calibrator.observe('slow', operation, shape, 10.0, error=True)
+
+        self.assertEqual(operation, 'aggregate')
+        self.assertFalse(self.optimizer.should_push_down('slow', operation))
+
+    def test_explanation_shows_parameters(self):
+        """Test plan explanations carry the calibrated parameters."""
+        _train(self.calibrator, 'slow', 40.0, 0.003)
+        planner = DistributedQueryPlanner(self.optimizer)
+        source = DataSource('slow', DataSourceType.RELATIONAL, set(), {}, {})
+        sub_query = SubQuery(source, "SELECT * FROM t WHERE id = 3", 0.0, [], 1000)
+        sub_query.estimated_cost = planner._estimate_cost(sub_query)
+
+        entry = planner.explain([sub_query])[0]
+
+        self.assertAlmostEqual(entry['estimated_cost'], 43.0, places=1)
+        self.assertEqual(entry['predicate_shape'], 'id = ?')
+        model = entry['cost_model']['select|*']
+        self.assertAlmostEqual(model['intercept_ms'], 40.0, places=1)
+        self.assertEqual(model['samples'], 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import json
+import unittest
+from typing import Dict, List, Any
+from ..src.query.executor.query_exec_core import (
+    ExecutionContext, ExecutionEngine, ExecutionOperator
+)
+from ..src.query.executor.caching import CachingExecutionEngine
+from ..src.query.executor.explain import ExplainEngine
+from ..src.query.parser.query_parser_core import QueryNode, QueryPlan
+from ..src.storage.cache import CacheManager
+
+class MockCacheManager(CacheManager):
+    """Mock cache manager for testing."""
+
+    def __init__(self, data: Dict[str, List[Dict[str, Any]]]):
+        self.data = data
+
+    def get(self, key: str) -> List[Dict[str, Any]]:
+        return self.data.get(key, [])
+
+class BufferOperator(ExecutionOperator):
+    """Holds every input row before emitting any, like a sort."""
+
+    def execute(self):
+        rows = [dict(row, padding='x' * 100) for row in self.children[0].execute()]
+        yield from rows
+
+class TestExplain(unittest.TestCase):
+    def setUp(self):
+        self.context = ExecutionContext()
+        self.context.cache_manager = MockCacheManager({
+            'users': [{'id': i, 'age': 20 + i % 30} for i in range(1000)]
+        })
+        scan = QueryNode(operation='table_scan', table_name='users',
+                         columns=['id', 'age'], estimated_rows=1000)
+        filter_node = QueryNode(operation='filter', children=[scan],
+                                predicate={'column': 'age', 'op': '>', 'value': 40},
+                                estimated_rows=100)
+        self.plan = QueryPlan(QueryNode(operation='project', children=[filter_node],
+                                        columns=['id']))
+
+    def test_explain_without_execution(self):
+        """Test plain EXPLAIN reports estimates only."""
+        result = ExplainEngine(self.context).explain(self.plan)
+        plan = result.to_dict()['plan']
+
+        self.assertEqual(plan['operator'], 'ProjectOperator')
+        self.assertNotIn('actual_rows', plan)
+        self.assertEqual(plan['children'][0]['estimated_rows'], 100)
+
+    def test_explain_analyze_row_counts(self):
+        """Test EXPLAIN ANALYZE reports actual rows per operator."""
+        result = ExplainEngine(self.context, sample_rate=8).explain(
+            self.plan, analyze=True)
+        plan = result.to_dict()['plan']
+        filter_plan = plan['children'][0]
+        scan_plan = filter_plan['children'][0]
+
+        self.assertEqual(scan_plan['actual_rows'], 1000)
+        self.assertEqual(filter_plan['actual_rows'], 297)
+        self.assertEqual(plan['actual_rows'], 297)
+        self.assertGreaterEqual(plan['total_time_ms'], plan['self_time_ms'])
+        self.assertGreaterEqual(plan['total_time_ms'], filter_plan['total_time_ms'])
+        # Output must be JSON serializable
+        json.loads(result.to_json())
+
+    def test_text_format(self):
+        """Test text output renders the operator tree."""
+        result = ExplainEngine(self.context, track_memory=True).explain(
+            self.plan, analyze=True)
+        text = result.to_text()
+
+        self.assertIn('ProjectOperator [id]', text)
+        self.assertIn('->  FilterOperator (age > 40)', text)
+        self.assertIn('TableScanOperator on users', text)
+        self.assertIn('Execution Time:', text)
+
+    def test_uses_engine_operator_tree(self):
+        """Test the profiled tree is the one the executing engine builds."""
+        engine = CachingExecutionEngine()
+        engine.context.cache_manager = self.context.cache_manager
+        result = ExplainEngine().explain(self.plan, analyze=True,
+                                         build_tree=engine.build_operator_tree)
+        plan = result.to_dict()['plan']
+
+        self.assertEqual(plan['operator'], 'CachingOperator')
+        self.assertEqual(plan['children'][0]['operator'], 'FilterOperator')
+        self.assertEqual(plan['children'][0]['children'][0]['operator'], 'TableScanOperator')
+        self.assertEqual(plan['actual_rows'], 297)
+
+    def test_peak_memory_is_per_operator(self):
+        """Test memory held by an operator is not charged to its parent or child."""
+        def build_tree(plan):
+            root = ExecutionEngine(self.context.cache_manager).build_operator_tree(plan)
+            buffer = BufferOperator(root.children[0].node, root.context)
+            buffer.add_child(root.children[0])
+            root.children[0] = buffer
+            return root
+
+        result = ExplainEngine(track_memory=True).explain(
+            self.plan, analyze=True, build_tree=build_tree)
+        project = result.to_dict()['plan']
+        buffer = project['children'][0]
+        scan = buffer['children'][0]['children'][0]
+
+        self.assertEqual(buffer['operator'], 'BufferOperator')
+        self.assertGreater(buffer['peak_memory_bytes'], 297 * 100)
+        self.assertLess(project['peak_memory_bytes'], buffer['peak_memory_bytes'] / 4)
+        self.assertLess(scan['peak_memory_bytes'], buffer['peak_memory_bytes'])
+
+if __name__ == '__main__':
+    unittest.main()
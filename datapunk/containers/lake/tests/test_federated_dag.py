@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+import unittest
+from typing import Any, AsyncIterator, Dict, List
+from ..src.query.federation.fed_planner import DataSource, DataSourceType, SubQuery
+from ..src.query.federation.query_fed_executor import FederatedQueryExecutor
+from ..src.query.federation.query_fed_monitoring import FederationMonitor
+
+def _source(name: str) -> DataSource:
+    return DataSource(name=name, type=DataSourceType.RELATIONAL, capabilities=set(),
+                      cost_factors={}, statistics={})
+
+def _subquery(source: str, query: Any, dependencies: List[SubQuery] = None) -> SubQuery:
+    return SubQuery(source=_source(source), query=query, estimated_cost=1.0,
+                    dependencies=dependencies or [], result_size=0)
+
+class BatchExecutor:
+    """Produces batches slowly, recording when each one was emitted."""
+
+    def __init__(self, batches: int, delay: float = 0.02):
+        self.batches = batches
+        self.delay = delay
+        self.emitted: List[float] = []
+
+    def execute_batches(self, query: Any):
+        for i in range(self.batches):
+            time.sleep(self.delay)
+            self.emitted.append(time.monotonic())
+            yield [{'id': i, 'query': query}]
+
+class DoublingExecutor:
+    """Consumes upstream batches as they arrive."""
+
+    def __init__(self):
+        self.received: List[float] = []
+
+    async def execute_stream(self, query: Any,
+                             inputs: Dict[str, AsyncIterator]) -> AsyncIterator[Any]:
+        for stream in inputs.values():
+            async for batch in stream:
+                self.received.append(time.monotonic())
+                yield [dict(row, id=row['id'] * 2) for row in batch]
+
+class CountingExecutor:
+    """Tracks peak concurrency of blocking calls."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def execute(self, query: Any) -> List[Dict[str, Any]]:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return [{'query': query}]
+
+class FailingExecutor:
+    def execute(self, query: Any) -> List[Dict[str, Any]]:
+        raise RuntimeError("source down")
+
+class TestFederatedDAG(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.monitor = FederationMonitor()
+        self.executor = FederatedQueryExecutor(max_workers=4, channel_capacity=2,
+                                               monitor=self.monitor)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    async def _run(self, plan: List[SubQuery], query_id: str = 'q1') -> Dict[str, Any]:
+        results = [r async for r in self.executor.stream_plan(plan, query_id)]
+        return {r.source.name: r for r in results}
+
+    async def test_downstream_consumes_before_upstream_finishes(self):
+        """Test a dependent subquery streams batches while its input is still running."""
+        upstream = BatchExecutor(batches=5)
+        downstream = DoublingExecutor()
+        self.executor.register_executor('orders', upstream)
+        self.executor.register_executor('enrich', downstream)
+        orders = _subquery('orders', 'scan')
+        plan = [orders, _subquery('enrich', 'double', [orders])]
+
+        results = await self._run(plan)
+
+        self.assertLess(downstream.received[0], upstream.emitted[-1])
+        self.assertEqual([r['id'] for r in results['enrich'].data], [0, 2, 4, 6, 8])
+        self.assertEqual(len(results['orders'].data), 5)
+
+    async def test_per_source_concurrency(self):
+        """Test subqueries against one source respect its concurrency cap."""
+        counting = CountingExecutor()
+        self.executor.register_executor('pg', counting)
+        self.executor.set_source_concurrency('pg', 2)
+        plan = [_subquery('pg', i) for i in range(6)]
+
+        results = [r async for r in self.executor.stream_plan(plan)]
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual(counting.peak, 2)
+
+    async def test_failure_propagates_to_dependents(self):
+        """Test dependents of a failed subquery fail without running."""
+        downstream = DoublingExecutor()
+        self.executor.register_executor('broken', FailingExecutor())
+        self.executor.register_executor('enrich', downstream)
+        self.executor.register_executor('other', BatchExecutor(batches=1, delay=0))
+        broken = _subquery('broken', 'scan')
+        plan = [broken, _subquery('enrich', 'double', [broken]), _subquery('other', 'scan')]
+
+        results = await self._run(plan)
+
+        self.assertEqual(results['broken'].error, 'source down')
+        self.assertIn('Dependency failed: broken', results['enrich'].error)
+        self.assertEqual(downstream.received, [])
+        self.assertIsNone(results['other'].error)
+
+    async def test_monitor_records_queue_and_exec_time(self):
+        """Test queue and execution time are reported per subquery."""
+        self.executor.register_executor('pg', CountingExecutor())
+        self.executor.set_source_concurrency('pg', 1)
+        plan = [_subquery('pg', i) for i in range(3)]
+
+        await self._run(plan, 'timed')
+
+        metrics = self.monitor.history[-1]
+        self.assertEqual(len(metrics.subquery_timings), 3)
+        queue_times = sorted(t['queue_time_ms'] for t in metrics.subquery_timings)
+        # Later subqueries wait for the single slot
+        self.assertGreater(queue_times[-1], 80)
+        self.assertTrue(all(t['exec_time_ms'] >= 40 for t in metrics.subquery_timings))
+        self.assertEqual(metrics.source_metrics['pg']['subqueries'], 3)
+        self.assertEqual(metrics.source_metrics['pg']['rows'], 3)
+
+    async def test_same_source_dependencies_stream_separately(self):
+        """Test two inputs from one source each get their own stream."""
+        downstream = DoublingExecutor()
+        self.executor.register_executor('orders', BatchExecutor(batches=4, delay=0))
+        self.executor.register_executor('enrich', downstream)
+        first = _subquery('orders', 'a')
+        second = _subquery('orders', 'b')
+        plan = [first, second, _subquery('enrich', 'double', [first, second])]
+
+        results = await asyncio.wait_for(
+            self.executor.execute_plan(plan), timeout=5)
+
+        enriched = next(r for r in results if r.source.name == 'enrich')
+        self.assertEqual(sorted((r['query'], r['id']) for r in enriched.data),
+                         [(q, i * 2) for q in 'ab' for i in range(4)])
+
+    async def test_cyclic_plan_rejected(self):
+        """Test plans with dependency cycles are rejected before scheduling."""
+        first = _subquery('pg', 'a')
+        second = _subquery('pg', 'b', [first])
+        first.dependencies.append(second)
+
+        with self.assertRaises(ValueError):
+            await self.executor.execute_plan([first, second])
+
+if __name__ == '__main__':
+    unittest.main()
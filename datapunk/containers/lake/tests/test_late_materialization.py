@@ -0,0 +1,159 @@
+import unittest
+from typing import Dict, List, Any
+from ..src.query.executor.query_exec_core import (
+    ExecutionContext, ExecutionEngine, ExecutionOperator, MaterializeOperator, row_id_column
+)
+from ..src.query.optimizer.optimizer_rules import ColumnPruning
+from ..src.query.parser.query_parser_core import QueryNode, QueryPlan
+from ..src.storage.cache import CacheManager
+
+class MockCacheManager(CacheManager):
+    """Mock cache manager for testing."""
+
+    def __init__(self, data: Dict[str, List[Dict[str, Any]]]):
+        self.data = data
+
+    def get(self, key: str) -> List[Dict[str, Any]]:
+        return self.data.get(key, [])
+
+class RewritingCacheManager(CacheManager):
+    """Returns a new version of the table on every read."""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.version = 0
+
+    def get(self, key: str) -> List[Dict[str, Any]]:
+        self.version += 1
+        return [{'id': i, 'kind': 'click' if (i + self.version) % 50 == 0 else 'view',
+                 'payload': f'v{self.version}', 'url': f'/page/{i}'}
+                for i in range(self.rows)]
+
+class HeldRows(ExecutionOperator):
+    """Child that hands out rows it keeps a reference to."""
+
+    def __init__(self, rows: List[Dict[str, Any]], context: ExecutionContext):
+        super().__init__(None, context)
+        self.rows = rows
+
+    def execute(self):
+        yield from self.rows
+
+class TestLateMaterialization(unittest.TestCase):
+    def setUp(self):
+        self.events = [
+            {'id': i, 'user_id': i % 10, 'kind': 'click' if i % 50 == 0 else 'view',
+             'payload': 'x' * 200, 'url': f'/page/{i}'}
+            for i in range(1000)
+        ]
+        self.users = [{'user_id': i, 'name': f'user{i}', 'bio': 'y' * 100}
+                      for i in range(10)]
+        self.engine = ExecutionEngine(MockCacheManager({
+            'events': self.events,
+            'users': self.users
+        }))
+
+    def _filter_plan(self) -> QueryPlan:
+        scan = QueryNode(operation='table_scan', table_name='events',
+                         columns=['id', 'user_id', 'kind', 'payload', 'url'])
+        filter_node = QueryNode(operation='filter', children=[scan],
+                                predicate={'column': 'kind', 'op': '=', 'value': 'click'})
+        return QueryPlan(QueryNode(operation='project', children=[filter_node],
+                                   columns=['id', 'payload', 'url']))
+
+    def _join_plan(self) -> QueryPlan:
+        events = QueryNode(operation='table_scan', table_name='events',
+                           columns=['id', 'user_id', 'kind', 'payload'])
+        users = QueryNode(operation='table_scan', table_name='users',
+                          columns=['user_id', 'name', 'bio'])
+        filter_node = QueryNode(operation='filter', children=[events],
+                                predicate={'column': 'kind', 'op': '=', 'value': 'click'})
+        join = QueryNode(operation='join', children=[filter_node, users],
+                         join_condition={'left': 'user_id', 'right': 'user_id'})
+        return QueryPlan(QueryNode(operation='project', children=[join],
+                                   columns=['id', 'payload', 'name']))
+
+    def test_scan_defers_projected_columns(self):
+        """Test scans keep only predicate columns and a materialize node is added."""
+        plan = ColumnPruning().apply(self._filter_plan())
+
+        materialize = plan.root.children[0]
+        scan = materialize.children[0].children[0]
+        self.assertEqual(materialize.operation, 'materialize')
+        self.assertEqual(materialize.late_columns, {'events': ['id', 'payload', 'url']})
+        self.assertEqual(scan.columns, ['kind'])
+
+    def test_results_match_eager_plan(self):
+        """Test late materialization returns the same rows as the eager plan."""
+        eager = list(self.engine.execute_plan(
+            ColumnPruning(late_materialization=False).apply(self._filter_plan())))
+        late = list(self.engine.execute_plan(ColumnPruning().apply(self._filter_plan())))
+
+        self.assertEqual(len(late), 20)
+        self.assertEqual(late, eager)
+
+    def test_join_keys_stay_eager(self):
+        """Test join keys are scanned eagerly and both sides are materialized."""
+        plan = ColumnPruning().apply(self._join_plan())
+        materialize = plan.root.children[0]
+
+        self.assertEqual(materialize.late_columns,
+                         {'events': ['id', 'payload'], 'users': ['name']})
+        results = list(self.engine.execute_plan(plan))
+
+        self.assertEqual(len(results), 20)
+        for row in results:
+            self.assertEqual(set(row), {'id', 'payload', 'name'})
+            self.assertEqual(row['name'], f"user{row['id'] % 10}")
+
+    def test_inner_projection_carries_row_ids(self):
+        """Test projections below the materialize node keep row ids."""
+        plan = self._filter_plan()
+        filter_node = plan.root.children[0]
+        plan.root.children = [QueryNode(operation='project', children=[filter_node],
+                                        columns=['kind'])]
+        plan = ColumnPruning().apply(plan)
+
+        inner = plan.root.children[0].children[0]
+        self.assertEqual(inner.row_id_tables, ['events'])
+        results = list(self.engine.execute_plan(plan))
+        self.assertEqual(len(results), 20)
+        self.assertTrue(all(row_id_column('events') not in row for row in results))
+
+    def test_reads_scan_snapshot(self):
+        """Test deferred columns come from the table version the scan read."""
+        engine = ExecutionEngine(RewritingCacheManager(1000))
+        results = list(engine.execute_plan(ColumnPruning().apply(self._filter_plan())))
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual({row['payload'] for row in results}, {'v1'})
+        self.assertTrue(all((row['id'] + 1) % 50 == 0 for row in results))
+
+    def test_child_rows_not_mutated(self):
+        """Test materializing copies rows instead of editing the child's."""
+        context = ExecutionContext()
+        context.register_snapshot('events', self.events)
+        rid_col = row_id_column('events')
+        held = [{'kind': 'click', rid_col: 0}, {'kind': 'click', rid_col: 50}]
+        materialize = MaterializeOperator(
+            QueryNode(operation='materialize', late_columns={'events': ['url']}), context)
+        materialize.add_child(HeldRows(held, context))
+
+        results = list(materialize.execute())
+        self.assertEqual(results, [{'kind': 'click', 'url': '/page/0'},
+                                   {'kind': 'click', 'url': '/page/50'}])
+        self.assertEqual(held, [{'kind': 'click', rid_col: 0}, {'kind': 'click', rid_col: 50}])
+
+    def test_aggregates_disable_deferral(self):
+        """Test plans with aggregates are left unchanged."""
+        scan = QueryNode(operation='table_scan', table_name='events',
+                         columns=['user_id', 'payload'])
+        aggregate = QueryNode(operation='aggregate', children=[scan],
+                              group_by=['user_id'], aggregates=[])
+        plan = ColumnPruning().apply(QueryPlan(
+            QueryNode(operation='project', children=[aggregate], columns=['user_id'])))
+
+        self.assertEqual(plan.root.children[0].operation, 'aggregate')
+
+if __name__ == '__main__':
+    unittest.main()
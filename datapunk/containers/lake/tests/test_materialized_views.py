@@ -0,0 +1,158 @@
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from typing import Any, Dict, List
+from ..src.query.federation.adapters.fed_adapter_base import BoundQuery
+from ..src.query.federation.fed_merger import MergeConfig, MergeStrategy
+from ..src.query.federation.fed_planner import DistributedQueryPlanner
+from ..src.query.federation.query_fed_executor import FederatedQueryExecutor
+from ..src.query.federation.query_fed_views import (
+    VIEW_SOURCE, ChangeBatch, MaterializedViewDefinition, MaterializedViewManager,
+    PollingFeed, ViewSource, WatermarkFeed, query_fingerprint
+)
+
+DASHBOARD = "SELECT o.id, o.total, c.tier FROM orders o JOIN customers c ON o.customer_id = c.customer_id"
+
+class SQLiteSource:
+    """Relational source answering bound queries, counting rows returned."""
+
+    def __init__(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(
+            "CREATE TABLE orders (id INTEGER, customer_id INTEGER, total REAL, updated_at INTEGER)")
+        self.rows_read = 0
+
+    def execute_query(self, query: BoundQuery) -> List[Dict[str, Any]]:
+        rows = [dict(r) for r in self.connection.execute(query.sql, query.params)]
+        self.rows_read += len(rows)
+        return rows
+
+class ChangeLog:
+    """Emulates a document change stream by polling an append-only log."""
+
+    def __init__(self):
+        self.documents: Dict[int, Dict[str, Any]] = {}
+        self.log: List[tuple] = []
+
+    def write(self, doc: Dict[str, Any]) -> None:
+        self.documents[doc['customer_id']] = doc
+        self.log.append(('upsert', doc))
+
+    def delete(self, customer_id: int) -> None:
+        del self.documents[customer_id]
+        self.log.append(('delete', {'customer_id': customer_id}))
+
+    def poll(self, since: Any) -> ChangeBatch:
+        if since is None:
+            return ChangeBatch(list(self.documents.values()), [], len(self.log))
+        changes = self.log[since:]
+        return ChangeBatch([d for op, d in changes if op == 'upsert'],
+                           [d for op, d in changes if op == 'delete'], len(self.log))
+
+class TestMaterializedViews(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.orders = SQLiteSource()
+        self.orders.connection.executemany(
+            "INSERT INTO orders VALUES (?, ?, ?, ?)",
+            [(i, i % 3, 10.0 * i, 100 + i) for i in range(6)])
+        self.customers = ChangeLog()
+        for customer_id, tier in enumerate(['gold', 'silver', 'bronze']):
+            self.customers.write({'customer_id': customer_id, 'tier': tier})
+        self.manager = MaterializedViewManager(self.tmp)
+        self.definition = MaterializedViewDefinition(
+            name='dashboard', query=DASHBOARD,
+            sources=[ViewSource('pg', WatermarkFeed(self.orders, 'orders', 'updated_at'), ['id']),
+                     ViewSource('mongo', PollingFeed(self.customers.poll), ['customer_id'])],
+            merge=MergeConfig(MergeStrategy.LEFT_JOIN, key_columns=['customer_id']))
+        self.view = self.manager.define(self.definition)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _tiers(self) -> Dict[int, str]:
+        rows = self.manager.execute('dashboard').to_pylist()
+        return {row['id']: row['tier'] for row in rows}
+
+    def test_refresh_reads_only_changes(self):
+        """Test later refreshes fetch changed rows rather than whole sources."""
+        self.manager.refresh('dashboard')
+        self.assertEqual(self._tiers()[4], 'silver')
+        read_initially = self.orders.rows_read
+
+        self.orders.connection.execute("INSERT INTO orders VALUES (6, 0, 60.0, 200)")
+        self.customers.write({'customer_id': 1, 'tier': 'platinum'})
+        self.manager.refresh('dashboard')
+
+        # Only rows at or past the watermark are re-read
+        self.assertEqual(self.orders.rows_read - read_initially, 2)
+        tiers = self._tiers()
+        self.assertEqual(len(tiers), 7)
+        self.assertEqual(tiers[4], 'platinum')
+        self.assertEqual(tiers[6], 'gold')
+
+    def test_deletes_are_applied(self):
+        """Test deletions from a change stream remove view rows."""
+        self.manager.refresh('dashboard')
+        self.customers.delete(2)
+        self.manager.refresh('dashboard')
+
+        tiers = self._tiers()
+        self.assertIsNone(tiers[2])
+        self.assertEqual(tiers[0], 'gold')
+
+    def test_match_respects_staleness_bound(self):
+        """Test a view only answers queries it is fresh enough for."""
+        self.assertIsNone(self.manager.match(DASHBOARD, max_staleness=3600))
+        self.manager.refresh('dashboard')
+
+        self.assertIs(self.manager.match(DASHBOARD.lower() + ';', max_staleness=60), self.view)
+        self.view.refreshed_at['pg'] -= 120
+        self.assertIsNone(self.manager.match(DASHBOARD, max_staleness=60))
+        self.assertIsNone(self.manager.match(DASHBOARD + " WHERE o.id = 1", max_staleness=3600))
+
+    def test_views_survive_restart(self):
+        """Test stored views reload with their change tokens."""
+        self.manager.refresh('dashboard')
+        restored = MaterializedViewManager(self.tmp).define(self.definition)
+
+        self.assertEqual(restored.table.num_rows, 6)
+        self.assertEqual(restored.tokens['mongo'], 3)
+        self.customers.write({'customer_id': 0, 'tier': 'steel'})
+        self.assertEqual(restored.refresh(), 1)
+
+    def test_fingerprint_keeps_literals(self):
+        """Test fingerprints ignore spacing and case but not values."""
+        self.assertEqual(query_fingerprint("SELECT *  FROM t WHERE a = 1"),
+                         query_fingerprint("select * from t where a = 1;"))
+        self.assertNotEqual(query_fingerprint("SELECT * FROM t WHERE a = 1"),
+                            query_fingerprint("SELECT * FROM t WHERE a = 2"))
+
+class TestViewRewrite(unittest.IsolatedAsyncioTestCase):
+    async def test_planner_reads_fresh_view(self):
+        """Test the planner rewrites a matching query to a view read."""
+        log = ChangeLog()
+        log.write({'customer_id': 1, 'tier': 'gold'})
+        manager = MaterializedViewManager()
+        manager.define(MaterializedViewDefinition(
+            'tiers', 'customers', [ViewSource('mongo', PollingFeed(log.poll), ['customer_id'])]))
+        manager.refresh('tiers')
+        planner = DistributedQueryPlanner(views=manager)
+
+        plan = planner.plan_query('customers', max_staleness=5)
+
+        self.assertEqual(len(plan), 1)
+        self.assertEqual(plan[0].source.name, VIEW_SOURCE)
+        executor = FederatedQueryExecutor(max_workers=2)
+        executor.register_executor(VIEW_SOURCE, manager)
+        try:
+            result = list(await executor.execute_plan(plan))[0]
+        finally:
+            executor.shutdown()
+        self.assertEqual(result.to_arrow().to_pylist(), [{'customer_id': 1, 'tier': 'gold'}])
+        self.assertEqual(manager.views['tiers'].hits, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import time
+import unittest
+from fakeredis import FakeAsyncRedis, FakeServer
+from ..src.storage.near_cache import CacheMetrics, InvalidationBus, NearCache
+
+class TestNearCache(unittest.TestCase):
+    def test_lru_within_entry_and_byte_budgets(self):
+        """Test the least recently used entries go first under either limit."""
+        near = NearCache(max_entries=3, max_bytes=100)
+        for key in 'abc':
+            near.put(key, key.upper(), 10)
+        near.get('a')
+        near.put('d', 'D', 10)
+        self.assertEqual(list(near.entries), ['c', 'a', 'd'])
+        
+        near.put('big', 'x', 85)
+        self.assertEqual(list(near.entries), ['d', 'big'])
+        self.assertEqual(near.bytes, 95)
+        self.assertEqual(near.metrics.l1_evictions, 3)
+    
+    def test_entries_expire(self):
+        """Test an entry past its TTL is a miss."""
+        near = NearCache(ttl=60)
+        near.put('a', 1, 1, ttl=-1)
+        near.put('b', 2, 1)
+        self.assertEqual(near.get('a'), (False, None))
+        self.assertEqual(near.get('b'), (True, 2))
+        self.assertEqual(near.metrics.l1_expirations, 1)
+        self.assertEqual(near.metrics.l1_hit_rate, 0.5)
+    
+    def test_fills_raced_by_invalidation_are_dropped(self):
+        """Test a value fetched before an invalidation is not cached."""
+        near = NearCache()
+        near.invalidate(['a'])
+        token = near.token()
+        near.invalidate(['a'])
+        self.assertFalse(near.put('a', 'old', 1, token))
+        self.assertTrue(near.put('b', 'fine', 1, token))
+        
+        token = near.token()
+        near.clear()
+        self.assertFalse(near.put('b', 'old', 1, token))
+        self.assertTrue(near.put('b', 'new', 1, near.token()))
+        self.assertEqual(near.metrics.l1_fills_rejected, 2)
+
+class TestInvalidationBus(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        server = FakeServer()
+        self.metrics = CacheMetrics()
+        self.near_a, self.near_b = NearCache(), NearCache(metrics=self.metrics)
+        self.bus_a = InvalidationBus(FakeAsyncRedis(server=server), self.near_a, max_lag=0.3)
+        self.bus_b = InvalidationBus(FakeAsyncRedis(server=server), self.near_b, max_lag=0.3)
+        await self.bus_a.start()
+        await self.bus_b.start()
+    
+    async def asyncTearDown(self):
+        await self.bus_a.stop()
+        await self.bus_b.stop()
+    
+    async def _until(self, condition, timeout: float = 1.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+    
+    async def test_writes_invalidate_other_nodes(self):
+        """Test a publish on one node drops the key everywhere."""
+        for near in (self.near_a, self.near_b):
+            near.put('schema', 'v1', 10)
+            near.put('other', 'x', 10)
+        
+        await self.bus_a.publish(['schema'])
+        await self._until(lambda: 'schema' not in self.near_b.entries)
+        
+        self.assertNotIn('schema', self.near_a.entries)
+        self.assertNotIn('schema', self.near_b.entries)
+        self.assertIn('other', self.near_b.entries)
+        self.assertEqual(self.metrics.invalidations_received, 1)
+        self.assertLess(self.metrics.invalidation_lag_max, 0.3)
+    
+    async def test_clear_reaches_other_nodes(self):
+        """Test clearing one node's cache empties the others."""
+        self.near_b.put('a', 1, 1)
+        await self.bus_a.publish_clear()
+        await self._until(lambda: not self.near_b.entries)
+        self.assertEqual(len(self.near_b), 0)
+    
+    async def test_silent_channel_bypasses_cache(self):
+        """Test a node that stops hearing heartbeats stops serving L1."""
+        self.near_b.put('a', 1, 1)
+        await self.bus_b._pubsub.unsubscribe()
+        await self._until(lambda: not self.near_b.enabled)
+        
+        self.assertFalse(self.near_b.enabled)
+        self.assertEqual(self.near_b.get('a'), (False, None))
+        self.assertEqual(self.metrics.channel_outages, 1)
+        
+        await self.bus_b._pubsub.subscribe(self.bus_b.channel)
+        await self._until(lambda: self.near_b.enabled)
+        self.assertTrue(self.near_b.enabled)
+
+if __name__ == '__main__':
+    unittest.main()
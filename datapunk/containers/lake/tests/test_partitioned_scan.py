@@ -0,0 +1,127 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from ..src.query.federation.adapters.fed_adapter_base import (
+    range_partitions, scan_partition_sql, split_weighted
+)
+from ..src.query.federation.fed_adapters import SQLiteAdapter
+from ..src.query.federation.fed_planner import (
+    DataSource, DataSourceType, ScanPartitioning, SubQuery
+)
+from ..src.query.federation.query_fed_executor import FederatedQueryExecutor
+
+def _source(name: str) -> DataSource:
+    return DataSource(name=name, type=DataSourceType.RELATIONAL, capabilities=set(),
+                      cost_factors={}, statistics={})
+
+class TrackingSQLiteAdapter(SQLiteAdapter):
+    """Records peak concurrency of partition reads."""
+
+    def __init__(self, database_path: str):
+        super().__init__(database_path)
+        self.active = 0
+        self.peak = 0
+        self.partitions = 0
+        self.lock = threading.Lock()
+
+    def execute_partition(self, scan, partition, batch_size=100):
+        with self.lock:
+            self.active += 1
+            self.partitions += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            yield from super().execute_partition(scan, partition, batch_size)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+class TestRangePartitions(unittest.TestCase):
+    def test_ranges_are_open_ended(self):
+        """Test the outer ranges are unbounded and nulls land in the first."""
+        parts = range_partitions('id', [10, 20])
+
+        self.assertEqual([p.predicate for p in parts],
+                         ['(id < :p0_hi OR id IS NULL)',
+                          'id >= :p1_lo AND id < :p1_hi',
+                          'id >= :p2_lo'])
+        self.assertEqual(parts[1].params, {'p1_lo': 10, 'p1_hi': 20})
+
+    def test_cast_parameters(self):
+        """Test typed bounds are cast in the predicate."""
+        parts = range_partitions('ctid', ['(5,0)'], nullable=False, cast='tid')
+        self.assertEqual(parts[0].predicate, 'ctid < CAST(:p0_hi AS tid)')
+
+    def test_scan_sql_keeps_filter(self):
+        """Test the scan's own filter is applied within each range."""
+        scan = ScanPartitioning('events', columns=['id'], where='kind = 1')
+        sql = scan_partition_sql(scan, range_partitions('id', [5])[1])
+        self.assertEqual(sql, 'SELECT id FROM events WHERE (id >= :p1_lo) AND (kind = 1)')
+
+    def test_split_weighted_balances(self):
+        """Test weighted runs are contiguous, balanced and never empty."""
+        self.assertEqual(split_weighted([1, 1, 1, 1], 2), [(0, 2), (2, 4)])
+        self.assertEqual(split_weighted([10, 1, 1, 1, 1], 2), [(0, 1), (1, 5)])
+        self.assertEqual(split_weighted([1, 1], 5), [(0, 1), (1, 2)])
+
+class TestPartitionedScan(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        path = os.path.join(self.tmp, 'events.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE events (id INTEGER, kind INTEGER)")
+            conn.executemany("INSERT INTO events VALUES (?, ?)",
+                             [(i, i % 3) for i in range(10_000)])
+        self.adapter = TrackingSQLiteAdapter(path)
+        self.executor = FederatedQueryExecutor(max_workers=8, default_source_concurrency=4)
+        self.executor.register_executor('sqlite', self.adapter)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.adapter.connection.close()
+        shutil.rmtree(self.tmp)
+
+    async def _scan(self, scan: ScanPartitioning):
+        query = SubQuery(_source('sqlite'), 'events', 1.0, [], 10_000, partitioning=scan)
+        return [r async for r in self.executor.stream_plan([query])][0]
+
+    async def test_ranges_read_every_row_once(self):
+        """Test concurrent ranges together return each row exactly once."""
+        result = await self._scan(ScanPartitioning('events', where='kind = 1',
+                                                   min_rows_per_partition=1000))
+
+        self.assertIsNone(result.error)
+        ids = sorted(result.to_arrow().column('id').to_pylist())
+        self.assertEqual(ids, [i for i in range(10_000) if i % 3 == 1])
+        self.assertEqual(self.adapter.partitions, 4)
+        self.assertLessEqual(self.adapter.peak, 4)
+
+    async def test_degree_follows_table_size(self):
+        """Test small tables are not split beyond their row budget."""
+        await self._scan(ScanPartitioning('events', min_rows_per_partition=5000))
+        self.assertEqual(self.adapter.partitions, 2)
+
+    def test_degree_leaves_busy_slots(self):
+        """Test slots already in use reduce the degree."""
+        scan = ScanPartitioning('events', min_rows_per_partition=1)
+        self.executor._active['sqlite'] = 3
+        self.assertEqual(self.executor._scan_degree('sqlite', scan, {'rows': 10_000}), 1)
+        self.executor._active['sqlite'] = 0
+        self.assertEqual(self.executor._scan_degree('sqlite', scan, {'rows': 10_000}), 4)
+
+    async def test_partition_failure_fails_scan(self):
+        """Test an error in one range fails the whole sub-query."""
+        def broken(scan, partition, batch_size=100):
+            if partition.index == 2:
+                raise sqlite3.OperationalError("disk I/O error")
+            yield from SQLiteAdapter.execute_partition(self.adapter, scan, partition)
+        self.adapter.execute_partition = broken
+
+        result = await self._scan(ScanPartitioning('events', min_rows_per_partition=1000))
+
+        self.assertEqual(result.error, 'disk I/O error')
+
+if __name__ == '__main__':
+    unittest.main()
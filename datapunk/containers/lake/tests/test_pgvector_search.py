@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List
+import numpy as np
+from ..src.query.federation.adapters.connection_pool import AsyncConnectionPool
+from ..src.query.federation.adapters.pgvector import PgVectorAdapter, search_settings
+
+class SimulatedPgVector:
+    """Answers the LATERAL top-k query exactly, recording what was sent."""
+
+    def __init__(self, ids: List[Any], embeddings: np.ndarray, indexdef: str):
+        self.ids = ids
+        self.embeddings = embeddings
+        self.indexdef = indexdef
+        self.statements: List[str] = []
+        self.queries: List[str] = []
+        self.active = 0
+        self.peak = 0
+
+    @asynccontextmanager
+    async def transaction(self, readonly: bool = False):
+        yield
+
+    async def execute(self, sql: str) -> None:
+        self.statements.append(sql)
+
+    async def fetch(self, sql: str, *args: Any) -> List[Dict[str, Any]]:
+        if "pg_indexes" in sql:
+            return [{"indexdef": self.indexdef}]
+        self.queries.append(sql)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+
+        literals, k = args
+        rows = []
+        for ord_, literal in enumerate(literals, start=1):
+            query = np.array([float(x) for x in literal.strip("[]").split(",")])
+            distances = np.linalg.norm(self.embeddings - query, axis=1)
+            for i in np.argsort(distances, kind="stable")[:k]:
+                rows.append({"ord": ord_, "id": self.ids[i], "distance": float(distances[i])})
+        return rows
+
+class TestBulkVectorSearch(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.standard_normal((200, 8)).astype(np.float32)
+        self.ids = np.arange(1000, 1200)
+        self.adapter = PgVectorAdapter("vectors", "postgresql+psycopg2://localhost/lake")
+        self.db = SimulatedPgVector(self.ids.tolist(), self.embeddings,
+                                    "CREATE INDEX items_embedding_idx ON items USING hnsw (embedding vector_l2_ops)")
+
+        async def connect():
+            return self.db
+
+        async def close(conn):
+            pass
+
+        pool = AsyncConnectionPool(connect, close, lambda conn: conn.fetch("SELECT 1"), max_size=4)
+        self.adapter._pool = lambda: pool
+
+    async def test_every_query_gets_its_own_top_k(self):
+        """Test each query vector returns exactly its k nearest rows."""
+        queries = self.embeddings[:25] + 0.01
+
+        ids, distances = await self.adapter.bulk_vector_search("items", queries, k=5, batch_size=10)
+
+        self.assertEqual(ids.shape, (25, 5))
+        for i, query in enumerate(queries):
+            exact = np.argsort(np.linalg.norm(self.embeddings - query, axis=1), kind="stable")[:5]
+            self.assertEqual(ids[i].tolist(), self.ids[exact].tolist())
+        self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+
+    async def test_vectors_are_bound_and_batches_concurrent(self):
+        """Test no vector is inlined as SQL and batches share the pool."""
+        await self.adapter.bulk_vector_search("items", self.embeddings[:40], k=3, batch_size=5)
+
+        self.assertEqual(len(self.db.queries), 8)
+        self.assertTrue(all("ARRAY[" not in sql and "LATERAL" in sql for sql in self.db.queries))
+        self.assertGreater(self.db.peak, 1)
+        self.assertLessEqual(self.db.peak, 4)
+
+    async def test_short_results_are_padded(self):
+        """Test queries matching fewer than k rows are padded."""
+        self.db.embeddings = self.embeddings[:2]
+        self.db.ids = self.ids[:2].tolist()
+
+        ids, distances = await self.adapter.bulk_vector_search("items", self.embeddings[:3], k=4)
+
+        self.assertEqual(ids[:, 2:].tolist(), [[None, None]] * 3)
+        self.assertTrue(np.isinf(distances[:, 2:]).all())
+        self.assertEqual(self.adapter.metrics.rows_processed, 6)
+
+    async def test_non_integer_ids(self):
+        """Test UUID keys come back unchanged."""
+        self.db.ids = [uuid.UUID(int=i) for i in range(len(self.embeddings))]
+
+        ids, _ = await self.adapter.bulk_vector_search("items", self.embeddings[:2], k=1)
+
+        self.assertEqual(ids[:, 0].tolist(), [uuid.UUID(int=0), uuid.UUID(int=1)])
+
+    async def test_search_breadth_follows_recall_target(self):
+        """Test ef_search is set per batch transaction from the recall target."""
+        await self.adapter.bulk_vector_search("items", self.embeddings[:2], k=10,
+                                              recall_target=0.99)
+        ef = search_settings("hnsw", 0.99, 10)["hnsw.ef_search"]
+        self.assertEqual(self.db.statements, [f"SET LOCAL hnsw.ef_search = {ef}"])
+
+    def test_settings_grow_with_recall(self):
+        """Test higher recall targets search more of the index, within limits."""
+        self.assertLess(search_settings("hnsw", 0.9, 10)["hnsw.ef_search"],
+                        search_settings("hnsw", 0.99, 10)["hnsw.ef_search"])
+        self.assertEqual(search_settings("hnsw", 0.999999, 500)["hnsw.ef_search"], 1000)
+        self.assertLess(search_settings("ivfflat", 0.9, 10, lists=100)["ivfflat.probes"],
+                        search_settings("ivfflat", 0.99, 10, lists=100)["ivfflat.probes"])
+        self.assertEqual(search_settings(None, 0.9, 10), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import json
 import pytest
 from datetime import datetime
 from ..src.query.formatter.formatter_core import (
@@ -207,6 +208,128 @@ async def test_streaming_error_handling(streaming_formatter):
     result = await streaming_formatter.end_batch()
     assert not result  # Should handle gracefully
 
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+def _tracked_rows(count, pulled, closed):
+    try:
+        for i in range(count):
+            pulled.append(i)
+            yield {'id': i, 'name': f"User{i}", 'note': 'a,"b"'}
+    finally:
+        closed.append(True)
+
+@pytest.mark.asyncio
+async def test_stream_ndjson(streaming_formatter, sample_data):
+    """Test NDJSON streaming emits one chunk per batch."""
+    chunks = await _collect(streaming_formatter.stream(iter(sample_data)))
+
+    assert len(chunks) == 2
+    lines = b''.join(chunks).decode().splitlines()
+    assert [json.loads(line) for line in lines] == sample_data
+    assert streaming_formatter.rows_streamed == 3
+
+@pytest.mark.asyncio
+async def test_stream_csv_quotes_values(streaming_formatter):
+    """Test CSV streaming writes one header and quotes special values."""
+    pulled, closed = [], []
+    chunks = await _collect(streaming_formatter.stream(
+        _tracked_rows(3, pulled, closed), format_type="csv"))
+
+    lines = b''.join(chunks).decode().splitlines()
+    assert lines[0] == 'id,name,note'
+    assert lines[1] == '0,User0,"a,""b"""'
+    assert len(lines) == 4
+    assert closed == [True]
+
+@pytest.mark.asyncio
+async def test_stream_arrow_ipc(streaming_formatter, sample_data):
+    """Test Arrow IPC streaming round-trips through a stream reader."""
+    pa = pytest.importorskip("pyarrow")
+    chunks = await _collect(streaming_formatter.stream(
+        iter(sample_data), format_type="arrow"))
+
+    table = pa.ipc.open_stream(b''.join(chunks)).read_all()
+    assert table.num_rows == 3
+    assert table.column_names == ['id', 'name', 'age']
+
+@pytest.mark.asyncio
+async def test_stream_arrow_unifies_types(streaming_formatter):
+    """Test all-null and int columns in early batches settle on one schema."""
+    pa = pytest.importorskip("pyarrow")
+    rows = [{'id': 1, 'score': None}, {'id': 2, 'score': None},
+            {'id': 3, 'score': 1}, {'id': 4, 'score': 2.5},
+            {'id': 5, 'score': 7}]
+    chunks = await _collect(streaming_formatter.stream(iter(rows), format_type="arrow"))
+
+    table = pa.ipc.open_stream(b''.join(chunks)).read_all()
+    assert table.schema.field('score').type == pa.float64()
+    assert table.column('score').to_pylist() == [None, None, 1.0, 2.5, 7.0]
+
+@pytest.mark.asyncio
+async def test_stream_arrow_declared_schema(streaming_formatter, sample_data):
+    """Test a declared schema is used for every batch, even an empty result."""
+    pa = pytest.importorskip("pyarrow")
+    schema = pa.schema([('id', pa.int32()), ('name', pa.string()), ('age', pa.float64())])
+    chunks = await _collect(streaming_formatter.stream(
+        iter(sample_data), format_type="arrow", schema=schema))
+    table = pa.ipc.open_stream(b''.join(chunks)).read_all()
+    assert table.schema == schema
+    assert table.num_rows == 3
+
+    chunks = await _collect(streaming_formatter.stream(
+        iter([]), format_type="arrow", schema=schema))
+    table = pa.ipc.open_stream(b''.join(chunks)).read_all()
+    assert table.schema == schema
+    assert table.num_rows == 0
+
+@pytest.mark.asyncio
+async def test_stream_arrow_empty_result(streaming_formatter):
+    """Test an empty result is still a readable Arrow stream."""
+    pa = pytest.importorskip("pyarrow")
+    chunks = await _collect(streaming_formatter.stream(iter([]), format_type="arrow"))
+
+    table = pa.ipc.open_stream(b''.join(chunks)).read_all()
+    assert table.num_rows == 0
+
+@pytest.mark.asyncio
+async def test_stream_backpressure_and_disconnect():
+    """Test rows are only pulled on demand and disconnects close the plan."""
+    formatter = StreamingResultFormatter(batch_size=10)
+    pulled, closed = [], []
+    disconnected = False
+
+    async def is_disconnected():
+        return disconnected
+
+    stream = formatter.stream(_tracked_rows(1000, pulled, closed),
+                              is_disconnected=is_disconnected)
+    await stream.__anext__()
+    assert len(pulled) <= 11
+
+    disconnected = True
+    remaining = await _collect(stream)
+    assert remaining == []
+    assert closed == [True]
+    assert len(pulled) <= 21
+
+@pytest.mark.asyncio
+async def test_stream_cancellation_closes_plan():
+    """Test closing the response stream early closes the operator iterator."""
+    formatter = StreamingResultFormatter(batch_size=10)
+    pulled, closed = [], []
+    stream = formatter.stream(_tracked_rows(1000, pulled, closed))
+
+    await stream.__anext__()
+    await stream.aclose()
+    assert closed == [True]
+
+@pytest.mark.asyncio
+async def test_stream_invalid_format(streaming_formatter, sample_data):
+    """Test unknown stream formats are rejected."""
+    with pytest.raises(ValueError):
+        await _collect(streaming_formatter.stream(iter(sample_data), format_type="xml"))
+
 def test_large_data_handling(result_formatter):
     """Test handling of large datasets."""
     # Create large dataset
@@ -0,0 +1,164 @@
+import asyncio
+import time
+import unittest
+from fakeredis import FakeAsyncRedis
+from ..src.storage.quorum import (
+    LatencyEstimate, LoadBalancer, QuorumError, QuorumReplication
+)
+
+class SlowRedis(FakeAsyncRedis):
+    """In-memory Redis whose pipelines take ``delay`` seconds."""
+    
+    def __init__(self, *args, delay: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay = delay
+        self.reads = 0
+        self.down = False
+    
+    def pipeline(self, *args, **kwargs):
+        pipe = super().pipeline(*args, **kwargs)
+        execute = pipe.execute
+        
+        async def slow_execute(*args, **kwargs):
+            self.reads += 1
+            await asyncio.sleep(self.delay)
+            if self.down:
+                raise ConnectionError("replica down")
+            return await execute(*args, **kwargs)
+        pipe.execute = slow_execute
+        return pipe
+
+NODES = [{'host': 'replica', 'port': port} for port in (1, 2, 3)]
+
+class TestLatencyEstimate(unittest.TestCase):
+    def test_percentile_tracks_recent_latency(self):
+        """Test the tail estimate follows a node that slowed down."""
+        estimate = LatencyEstimate()
+        for i in range(1000):
+            estimate.record(0.010 if i % 20 else 0.050)
+        self.assertGreaterEqual(estimate.percentile(0.5), 0.010)
+        self.assertLess(estimate.percentile(0.5), 0.013)
+        self.assertLess(estimate.percentile(0.9), 0.013)
+        self.assertGreaterEqual(estimate.percentile(0.99), 0.050)
+        
+        for _ in range(500):
+            estimate.record(0.200)
+        self.assertGreaterEqual(estimate.percentile(0.5), 0.200)
+        self.assertAlmostEqual(estimate.mean, 0.200)
+    
+    def test_balancer_ranks_by_decayed_latency(self):
+        """Test slow and failing nodes rank last and unknown nodes first."""
+        balancer = LoadBalancer()
+        for _ in range(20):
+            balancer.record_operation('slow', 'read', 0.050)
+            balancer.record_operation('fast', 'read', 0.001)
+            balancer.record_operation('flaky', 'read', 0.001)
+        for _ in range(5):
+            balancer.record_failure('flaky', 'read')
+        self.assertEqual(balancer.rank(['slow', 'flaky', 'fast', 'new']),
+                         ['new', 'fast', 'slow', 'flaky'])
+        self.assertEqual(balancer.hedge_delay('new', default=0.02), 0.02)
+
+class TestQuorumReplication(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.replicas = {
+            'replica:1': SlowRedis(delay=0.001),
+            'replica:2': SlowRedis(delay=0.002),
+            'replica:3': SlowRedis(delay=0.5),
+        }
+        self.quorum = QuorumReplication(
+            NODES, read_quorum=2, write_quorum=2,
+            connect=lambda node: self.replicas[f"{node['host']}:{node['port']}"]
+        )
+        await self.quorum.start()
+        # Teach the balancer which replicas are fast
+        for node_id, redis in self.replicas.items():
+            for _ in range(10):
+                self.quorum.balancer.record_operation(node_id, 'read', redis.delay)
+    
+    async def asyncTearDown(self):
+        for redis in self.replicas.values():
+            redis.delay = 0
+            redis.down = False
+        await self.quorum.stop()
+    
+    async def test_reads_skip_slow_replica(self):
+        """Test a quorum of fast replicas answers without the slow one."""
+        ok, nodes = await self.quorum.write('k', b'v1', 60)
+        self.assertTrue(ok)
+        self.assertEqual(len(nodes), 3)
+        
+        started = time.monotonic()
+        value, nodes, consistent = await self.quorum.read('k')
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual(value, b'v1')
+        self.assertEqual(sorted(nodes), ['replica:1', 'replica:2'])
+        self.assertTrue(consistent)
+        self.assertEqual(self.replicas['replica:3'].reads, 0)
+    
+    async def test_hedges_when_replica_stalls(self):
+        """Test a replica slower than its usual latency triggers a hedge."""
+        await self.quorum.write('k', b'v1', 60)
+        self.replicas['replica:2'].delay = 1.0
+        self.replicas['replica:3'].delay = 0.001
+        
+        started = time.monotonic()
+        value, nodes, _ = await self.quorum.read('k')
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(value, b'v1')
+        self.assertIn('replica:3', nodes)
+        self.assertEqual(self.quorum.stats.hedged, 1)
+    
+    async def test_stale_replica_is_repaired(self):
+        """Test replicas returning older versions are overwritten in the background."""
+        await self.quorum.write('k', b'old', 60)
+        old = await self.replicas['replica:2'].get('k')
+        await self.quorum.write('k', b'new', 60)
+        new = await self.replicas['replica:2'].get('k')
+        await self.replicas['replica:2'].set('k', old, ex=60)
+        self.replicas['replica:3'].delay = 0.001
+        
+        value, nodes, consistent = await self.quorum.read('k')
+        self.assertEqual(value, b'new')
+        self.assertFalse(consistent)
+        self.assertNotIn('replica:2', nodes)
+        
+        await asyncio.gather(*self.quorum._repairs)
+        self.assertEqual(await self.replicas['replica:2'].get('k'), new)
+        self.assertGreater(await self.replicas['replica:2'].ttl('k'), 0)
+        self.assertEqual(self.quorum.stats.repairs, 1)
+    
+    async def test_repair_never_overwrites_newer_values(self):
+        """Test a repair racing a newer write leaves the newer value."""
+        await self.quorum.write('k', b'v1', 60)
+        newer = self.quorum._next_version() + b'v2'
+        await self.replicas['replica:1'].set('k', newer)
+        
+        older = await self.replicas['replica:2'].get('k')
+        repaired = await self.replicas['replica:1'].eval(
+            QuorumReplication._REPAIR, 1, 'k', older[:9], older, 0
+        )
+        self.assertEqual(repaired, 0)
+        self.assertEqual(await self.replicas['replica:1'].get('k'), newer)
+    
+    async def test_failures_below_quorum_raise(self):
+        """Test reads fail once too few replicas can answer."""
+        await self.quorum.write('k', b'v1', 60)
+        self.replicas['replica:1'].down = True
+        self.replicas['replica:3'].delay = 0.001
+        value, nodes, _ = await self.quorum.read('k')
+        self.assertEqual((value, sorted(nodes)), (b'v1', ['replica:2', 'replica:3']))
+        
+        self.replicas['replica:2'].down = True
+        with self.assertRaises(QuorumError):
+            await self.quorum.read('k')
+        self.assertEqual(self.quorum.stats.failures, 3)
+    
+    async def test_missing_key_reads_as_none(self):
+        """Test a key absent from a quorum is a miss."""
+        value, nodes, consistent = await self.quorum.read('missing')
+        self.assertIsNone(value)
+        self.assertTrue(consistent)
+
+if __name__ == '__main__':
+    unittest.main()
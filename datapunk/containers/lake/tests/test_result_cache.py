@@ -0,0 +1,216 @@
+import unittest
+from typing import Dict, List, Any
+from ..src.query.executor.query_exec_core import ExecutionOperator
+from ..src.query.executor.caching import (
+    QueryCache, CachingContext, CachingOperator, CachingExecutionEngine,
+    ColumnarCodec, plan_fingerprint
+)
+from ..src.query.parser.query_parser_core import QueryNode, QueryPlan
+
+class CountingOperator(ExecutionOperator):
+    """Operator that yields fixed rows and counts executions."""
+
+    def __init__(self, node: QueryNode, context: Any, rows: List[Dict[str, Any]]):
+        super().__init__(node, context)
+        self.rows = rows
+        self.executions = 0
+
+    def execute(self):
+        self.executions += 1
+        yield from self.rows
+
+class TestQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.rows = [{'id': i, 'name': f'user{i}'} for i in range(10)]
+
+    def test_columnar_roundtrip(self):
+        """Test rows survive columnar encoding, including missing columns."""
+        codec = ColumnarCodec()
+        rows = [{'a': 1, 'b': 'x'}, {'a': 2}, {'b': 'y', 'c': None}]
+        self.assertEqual(list(codec.decode(codec.encode(rows))), rows)
+
+    def test_version_bump_makes_entry_stale(self):
+        """Test writes change the key instead of sweeping entries."""
+        cache = QueryCache()
+        key = cache.make_key('fp', {'users'})
+        cache.set(key, self.rows, {'users'})
+        self.assertEqual(list(cache.get(key)), self.rows)
+
+        cache.bump_version('users')
+        new_key = cache.make_key('fp', {'users'})
+        self.assertNotEqual(key, new_key)
+        self.assertIsNone(cache.get(new_key))
+        # Unrelated tables keep their keys
+        self.assertEqual(cache.make_key('fp', {'orders'}),
+                         cache.make_key('fp', {'orders'}))
+
+    def test_byte_budget_eviction(self):
+        """Test LRU eviction keeps the cache within its byte budget."""
+        cache = QueryCache(max_bytes=1)
+        probe = cache.new_entry()
+        probe.append_chunk(self.rows)
+        cache.max_bytes = probe.size_bytes * 2
+
+        cache.set('a', self.rows)
+        cache.set('b', self.rows)
+        cache.lookup('a')  # 'b' becomes least recently used
+        cache.set('c', self.rows)
+
+        self.assertLessEqual(cache.size_bytes, cache.max_bytes)
+        self.assertIn('a', cache.entries)
+        self.assertNotIn('b', cache.entries)
+        self.assertIn('c', cache.entries)
+
+class TestCachingOperator(unittest.TestCase):
+    def setUp(self):
+        self.context = CachingContext(QueryCache(chunk_size=4))
+        self.node = QueryNode(operation='table_scan', table_name='users',
+                              columns=['id'])
+        self.rows = [{'id': i} for i in range(10)]
+
+    def test_full_result_cached(self):
+        """Test a fully consumed result is served from cache."""
+        inner = CountingOperator(self.node, self.context, self.rows)
+        operator = CachingOperator(self.node, self.context, inner)
+
+        self.assertEqual(list(operator.execute()), self.rows)
+        self.assertEqual(list(operator.execute()), self.rows)
+        self.assertEqual(inner.executions, 1)
+
+    def test_partial_result_cached_as_prefix(self):
+        """Test a partially consumed result is stored as an incomplete prefix."""
+        inner = CountingOperator(self.node, self.context, self.rows)
+        operator = CachingOperator(self.node, self.context, inner)
+        key = self.context.get_cache_key(self.node)
+
+        iterator = operator.execute()
+        prefix = [next(iterator) for _ in range(6)]
+        iterator.close()
+        self.assertEqual(prefix, self.rows[:6])
+        entry = self.context.query_cache.lookup(key)
+        self.assertFalse(entry.complete)
+        self.assertEqual(entry.row_count, 6)
+
+        # A shorter read is served from the prefix alone
+        iterator = operator.execute()
+        self.assertEqual([next(iterator) for _ in range(5)], self.rows[:5])
+        iterator.close()
+        self.assertEqual(inner.executions, 1)
+        self.assertEqual(self.context.query_cache.lookup(key).row_count, 6)
+
+        self.assertEqual(list(operator.execute()), self.rows)
+        self.assertEqual(inner.executions, 2)
+        entry = self.context.query_cache.lookup(key)
+        self.assertTrue(entry.complete)
+        self.assertEqual(entry.row_count, len(self.rows))
+
+    def test_prefix_never_replaces_complete_entry(self):
+        """Test an early-closed execution keeps a complete entry in place."""
+        inner = CountingOperator(self.node, self.context, self.rows)
+        operator = CachingOperator(self.node, self.context, inner)
+
+        partial = operator.execute()
+        next(partial)
+        list(operator.execute())
+        next(partial)
+        partial.close()
+
+        entry = self.context.query_cache.lookup(self.context.get_cache_key(self.node))
+        self.assertTrue(entry.complete)
+        self.assertEqual(list(entry.iter_rows()), self.rows)
+
+    def test_interleaved_executions_store_one_entry(self):
+        """Test concurrent executions of a plan do not duplicate chunks."""
+        inner = CountingOperator(self.node, self.context, self.rows)
+        operator = CachingOperator(self.node, self.context, inner)
+
+        first, second = operator.execute(), operator.execute()
+        for _ in self.rows:
+            next(first)
+            next(second)
+        list(first)
+        list(second)
+
+        cache = self.context.query_cache
+        self.assertEqual(len(cache.entries), 1)
+        self.assertEqual(list(operator.execute()), self.rows)
+        self.assertEqual(cache.size_bytes, sum(cache.entry_sizes.values()))
+
+    def test_write_invalidates(self):
+        """Test a table write forces re-execution."""
+        inner = CountingOperator(self.node, self.context, self.rows)
+        operator = CachingOperator(self.node, self.context, inner)
+
+        list(operator.execute())
+        self.context.query_cache.bump_version('users')
+        list(operator.execute())
+        self.assertEqual(inner.executions, 2)
+
+class TestCachingExecutionEngine(unittest.TestCase):
+    def test_subplan_fingerprint_shared(self):
+        """Test identical subplans in different queries share a fingerprint."""
+        scan_a = QueryNode(operation='table_scan', table_name='users',
+                           columns=['id', 'age'])
+        scan_b = QueryNode(operation='table_scan', table_name='users',
+                           columns=['id', 'age'])
+        filter_node = QueryNode(operation='filter', children=[scan_a],
+                                predicate={'column': 'age', 'op': '>', 'value': 30})
+        project_node = QueryNode(operation='project', children=[scan_b],
+                                 columns=['id'])
+
+        self.assertEqual(plan_fingerprint(filter_node.children[0]),
+                         plan_fingerprint(project_node.children[0]))
+        self.assertNotEqual(plan_fingerprint(filter_node),
+                            plan_fingerprint(project_node))
+
+    def test_scans_are_not_wrapped(self):
+        """Test bare scans bypass the result cache."""
+        engine = CachingExecutionEngine()
+        scan = QueryNode(operation='table_scan', table_name='users', columns=['id'])
+        project = QueryNode(operation='project', children=[scan], columns=['id'])
+
+        root = engine._build_caching_tree(project)
+        self.assertIsInstance(root, CachingOperator)
+        self.assertNotIsInstance(root.children[0], CachingOperator)
+
+    def test_only_root_and_breakers_are_wrapped(self):
+        """Test streaming operators below the root are not cached."""
+        engine = CachingExecutionEngine()
+        scan = QueryNode(operation='table_scan', table_name='users', columns=['id'])
+        aggregate = QueryNode(operation='aggregate', children=[scan], group_by=['id'],
+                              aggregates=[{'function': 'count', 'column': 'id',
+                                           'alias': 'n'}])
+        filter_node = QueryNode(operation='filter', children=[aggregate],
+                                predicate={'column': 'n', 'op': '>', 'value': 1})
+        project = QueryNode(operation='project', children=[filter_node], columns=['id'])
+
+        root = engine._build_caching_tree(project)
+        self.assertIsInstance(root, CachingOperator)
+        filter_operator = root.children[0]
+        self.assertNotIsInstance(filter_operator, CachingOperator)
+        self.assertIsInstance(filter_operator.children[0], CachingOperator)
+
+    def test_parameters_are_part_of_the_key(self):
+        """Test parameterized executions neither fail nor share entries."""
+        engine = CachingExecutionEngine()
+        scan = QueryNode(operation='table_scan', table_name='users', columns=['id'])
+        project = QueryNode(operation='project', children=[scan], columns=['id'])
+
+        first = engine.build_operator_tree(QueryPlan(project), {'min_id': 1})
+        second = engine.build_operator_tree(QueryPlan(project), {'min_id': 2})
+        plain = engine.build_operator_tree(QueryPlan(project))
+
+        self.assertEqual(first.context.get_variable('min_id'), 1)
+        self.assertIs(first.context.query_cache, engine.context.query_cache)
+        self.assertEqual(engine.context.variables, {})
+        keys = {op.context.get_cache_key(project) for op in (first, second, plain)}
+        self.assertEqual(len(keys), 3)
+
+    def test_record_write(self):
+        """Test engine writes bump table versions."""
+        engine = CachingExecutionEngine()
+        engine.record_write('users')
+        self.assertEqual(engine.context.query_cache.versions.get('users'), 1)
+
+if __name__ == '__main__':
+    unittest.main()
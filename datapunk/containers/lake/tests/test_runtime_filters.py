@@ -0,0 +1,222 @@
+import threading
+import unittest
+import pandas as pd
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Any
+from ..src.query.executor.query_exec_core import (
+    ExecutionContext, TableScanOperator, FilterOperator
+)
+from ..src.query.executor.joins import HashJoinOperator
+from ..src.query.executor.runtime_filters import (
+    BloomFilter, RuntimeFilter, build_runtime_filter, push_runtime_filter
+)
+from ..src.query.federation.fed_adapters import PandasAdapter
+from ..src.query.federation.query_fed_core import (
+    FederatedJoin, FederatedQueryPlan, FederationManager
+)
+from ..src.query.parser.query_parser_core import QueryNode, QueryPlan
+from ..src.storage.cache import CacheManager
+from ..src.storage.index.btree import BTreeIndex
+from ..src.storage.index.core import IndexStats
+
+class MockCacheManager(CacheManager):
+    """Mock cache manager for testing."""
+
+    def __init__(self, data: Dict[str, List[Dict[str, Any]]]):
+        self.data = data
+
+    def get(self, key: str) -> List[Dict[str, Any]]:
+        return self.data.get(key, [])
+
+class MockIndex:
+    """Equality and range index over row positions."""
+
+    def __init__(self, rows: List[Dict[str, Any]], column: str):
+        self.rows = rows
+        self.column = column
+        self.lookups = 0
+
+    def search(self, key: Any) -> List[int]:
+        self.lookups += 1
+        return [i for i, row in enumerate(self.rows) if row[self.column] == key]
+
+    def range_search(self, start: Any, end: Any) -> List[int]:
+        self.lookups += 1
+        return [i for i, row in enumerate(self.rows)
+                if start <= row[self.column] <= end]
+
+class TreeIndex(BTreeIndex):
+    """B-tree index with the state and hooks the base class leaves out."""
+
+    def __init__(self, *args, **kwargs):
+        self.stats = IndexStats(0, 1, 0, datetime.now(), 0, 0, 0.0, 0.0)
+        self._lock = threading.RLock()
+        super().__init__(*args, **kwargs)
+
+    def cleanup(self) -> None:
+        pass
+
+    def get_statistics(self):
+        return self.stats
+
+class TestRuntimeFilter(unittest.TestCase):
+    def test_bloom_has_no_false_negatives(self):
+        """Test every inserted value is reported as present."""
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(i)
+        self.assertTrue(all(bloom.might_contain(i) for i in range(1000)))
+        false_positives = sum(bloom.might_contain(i) for i in range(1000, 11000))
+        self.assertLess(false_positives, 500)
+
+    def test_equal_numbers_of_other_types_match(self):
+        """Test the bloom filter treats 7 and 7.0 alike, as the join does."""
+        runtime_filter = build_runtime_filter('k', range(5000))
+        self.assertIsNone(runtime_filter.values)
+        self.assertTrue(runtime_filter.might_contain(7.0))
+        self.assertTrue(runtime_filter.might_contain(Decimal(42)))
+        self.assertTrue(runtime_filter.might_contain(True))
+        bloom = BloomFilter(10)
+        bloom.add(2.5)
+        self.assertTrue(bloom.might_contain(Decimal('2.5')))
+
+    def test_range_prunes_large_filters(self):
+        """Test min/max pruning when the key set exceeds the IN-list threshold."""
+        runtime_filter = RuntimeFilter('id', set(range(100, 200)), in_list_threshold=10)
+        self.assertIsNone(runtime_filter.values)
+        self.assertFalse(runtime_filter.might_contain(5))
+        self.assertTrue(runtime_filter.might_contain(150))
+        self.assertEqual(runtime_filter.to_sql(), "id BETWEEN 100 AND 199")
+        self.assertEqual(runtime_filter.to_mongo(),
+                         {'id': {'$gte': 100, '$lte': 199}})
+
+    def test_in_list_rendering(self):
+        """Test small key sets render as IN-lists."""
+        runtime_filter = build_runtime_filter('name', ["o'neil", 'bob', None])
+        self.assertEqual(runtime_filter.to_sql(), "name IN ('bob', 'o''neil')")
+        self.assertEqual(runtime_filter.to_predicates()[0]['op'], 'in')
+
+    def test_oversized_build_side_skipped(self):
+        """Test no filter is built when the build side is too large."""
+        self.assertIsNone(build_runtime_filter('id', range(10), max_build_keys=5))
+
+class TestRuntimeFilterPushdown(unittest.TestCase):
+    def setUp(self):
+        self.facts = [{'id': i % 50, 'amount': i} for i in range(500)]
+        self.dims = [{'id': 3, 'dept': 'HR'}, {'id': 7, 'dept': 'IT'}]
+        self.context = ExecutionContext()
+        self.context.cache_manager = MockCacheManager({
+            'facts': self.facts,
+            'dims': self.dims
+        })
+
+    def _build_join(self) -> HashJoinOperator:
+        join_node = QueryNode(operation='join',
+                              join_condition={'left': 'id', 'right': 'id'})
+        probe_node = QueryNode(operation='table_scan', table_name='facts',
+                               columns=['id', 'amount'])
+        build_node = QueryNode(operation='table_scan', table_name='dims',
+                               columns=['id', 'dept'])
+        join = HashJoinOperator(join_node, self.context)
+        join.add_child(TableScanOperator(probe_node, self.context))
+        join.add_child(TableScanOperator(build_node, self.context))
+        return join
+
+    def test_hash_join_filters_probe_scan(self):
+        """Test the probe scan only emits rows matching build keys."""
+        join = self._build_join()
+        results = list(join.execute())
+
+        self.assertEqual(len(results), 20)
+        probe_scan = join.children[0]
+        self.assertEqual(len(probe_scan.runtime_filters), 1)
+        self.assertEqual(probe_scan.runtime_filters[0].rows_pruned, 480)
+
+    def test_rerun_replaces_filter(self):
+        """Test executing a join again does not stack up runtime filters."""
+        join = self._build_join()
+        list(join.execute())
+        results = list(join.execute())
+
+        self.assertEqual(len(results), 20)
+        probe_scan = join.children[0]
+        self.assertEqual(len(probe_scan.runtime_filters), 1)
+        self.assertEqual(probe_scan.runtime_filters[0].rows_checked, 500)
+
+    def test_index_lookup_used(self):
+        """Test runtime filter keys drive index point lookups."""
+        index = MockIndex(self.facts, 'id')
+        self.context.register_index('facts', 'id', index)
+
+        join = self._build_join()
+        results = list(join.execute())
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(index.lookups, 2)
+        self.assertEqual(join.children[0].runtime_filters[0].rows_checked, 20)
+
+    def test_btree_index_lookup(self):
+        """Test a B-tree's single-value and missing-key lookups drive the scan."""
+        index = TreeIndex('facts_amount', 'int', 'int', is_unique=True)
+        for position, row in enumerate(self.facts):
+            index.insert(row['amount'], position)
+        self.context.register_index('facts', 'amount', index)
+        scan = TableScanOperator(
+            QueryNode(operation='table_scan', table_name='facts',
+                      columns=['id', 'amount']), self.context)
+
+        scan.add_runtime_filter(build_runtime_filter('amount', [5, 42, 999]))
+        self.assertEqual([r['amount'] for r in scan.execute()], [5, 42])
+
+        scan.runtime_filters = [build_runtime_filter('amount', range(10, 13),
+                                                     in_list_threshold=1)]
+        self.assertEqual([r['amount'] for r in scan.execute()], [10, 11, 12])
+        self.assertEqual(scan.index_lookups, 4)
+
+    def test_push_through_filter(self):
+        """Test filters pass through row-preserving operators."""
+        scan = TableScanOperator(
+            QueryNode(operation='table_scan', table_name='facts',
+                      columns=['id', 'amount']), self.context)
+        filter_op = FilterOperator(
+            QueryNode(operation='filter',
+                      predicate={'column': 'amount', 'op': '>', 'value': 10}),
+            self.context)
+        filter_op.add_child(scan)
+
+        accepted = push_runtime_filter(filter_op, RuntimeFilter('id', {1, 2}))
+        self.assertEqual(accepted, 1)
+        # Scans that don't produce the column are skipped
+        self.assertEqual(push_runtime_filter(filter_op, RuntimeFilter('dept', {'HR'})), 0)
+
+class TestFederatedRuntimeFilters(unittest.TestCase):
+    def test_build_source_filters_probe_source(self):
+        """Test a join's build side restricts the probe source's subplan."""
+        manager = FederationManager()
+        manager.register_source('dims', PandasAdapter({
+            'dims': pd.DataFrame({'id': [3, 7], 'dept': ['HR', 'IT']})
+        }))
+        manager.register_source('facts', PandasAdapter({
+            'facts': pd.DataFrame({'id': [i % 50 for i in range(500)],
+                                   'amount': list(range(500))})
+        }))
+        probe_plan = QueryPlan(QueryNode(operation='select', columns=['id', 'amount']))
+        fed_plan = FederatedQueryPlan(
+            subplans={
+                'facts': probe_plan,
+                'dims': QueryPlan(QueryNode(operation='select', columns=['id', 'dept'])),
+            },
+            dependencies={'facts': [], 'dims': []},
+            joins=[FederatedJoin('dims', 'id', 'facts', 'id')]
+        )
+
+        results = manager.execute_federated_query(fed_plan)
+
+        self.assertEqual(len(results['facts']), 20)
+        self.assertEqual({row['id'] for row in results['facts']}, {3, 7})
+        # The filter went into a copy; the plan can be run again unfiltered
+        self.assertFalse(hasattr(probe_plan.root, 'condition'))
+
+if __name__ == '__main__':
+    unittest.main()
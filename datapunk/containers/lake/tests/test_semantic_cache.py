@@ -0,0 +1,131 @@
+import unittest
+import numpy as np
+from ..src.query.federation.query_fed_cache_strategies import HybridStrategy, SemanticStrategy
+from ..src.storage.index.hnsw import HNSWIndex, IndexFullError
+
+def _clustered(n: int, dim: int = 32, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    points = centers[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal((n, dim))
+    return points.astype(np.float32)
+
+def _exact(data: np.ndarray, query: np.ndarray, k: int) -> set:
+    normed = data / np.linalg.norm(data, axis=1, keepdims=True)
+    return set(np.argsort(-(normed @ (query / np.linalg.norm(query))))[:k].tolist())
+
+class TestHNSWIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data = _clustered(1000)
+        cls.queries = _clustered(50, seed=1)
+        cls.shared = cls._build()
+
+    @classmethod
+    def _build(cls) -> HNSWIndex:
+        index = HNSWIndex('embeddings', 'cache', ['embedding'], dim=32,
+                          capacity=1200, seed=3)
+        for i, vector in enumerate(cls.data):
+            index.insert(i, vector)
+        return index
+
+    def setUp(self):
+        self.index = self.shared
+
+    def _recall(self, exclude: set = frozenset()) -> float:
+        live = np.array([i for i in range(len(self.data)) if i not in exclude])
+        hits = 0
+        for query in self.queries:
+            found = {label for label, _ in self.index.search(query, k=10, ef=100)}
+            truth = {int(live[i]) for i in _exact(self.data[live], query, 10)}
+            hits += len(found & truth)
+        return hits / (10 * len(self.queries))
+
+    def test_recall(self):
+        """Test approximate results match exact cosine neighbours."""
+        self.assertGreater(self._recall(), 0.9)
+
+    def test_deletes_are_hidden_and_slots_reused(self):
+        """Test deleted labels never return and vacuumed slots are reused."""
+        self.index = self._build()
+        removed = set(range(0, 1000, 2))
+        for label in removed:
+            self.index.delete(label)
+        self.index.vacuum()
+
+        self.assertEqual(len(self.index), 500)
+        self.assertGreater(self._recall(exclude=removed), 0.9)
+        for label in removed:
+            self.index.insert(label, self.data[label])
+        self.assertEqual(self.index._next_slot, 1000)
+        self.assertGreater(self._recall(), 0.9)
+
+    def test_threshold_and_filter(self):
+        """Test distance bounds and label filters restrict results."""
+        query = self.data[7]
+        self.assertEqual(self.index.search(query, k=1)[0][0], 7)
+        close = self.index.search(query, k=50, max_distance=1e-4)
+        self.assertEqual([label for label, _ in close], [7])
+        odd = self.index.search(query, k=5, filter=lambda label: label % 2 == 1)
+        self.assertEqual(len(odd), 5)
+        self.assertTrue(all(label % 2 == 1 for label, _ in odd))
+
+    def test_capacity_is_bounded(self):
+        """Test inserts beyond capacity fail instead of growing memory."""
+        small = HNSWIndex('small', 'cache', ['embedding'], dim=4, capacity=2)
+        size = small.memory_bytes()
+        small.insert('a', [1, 0, 0, 0])
+        small.insert('b', [0, 1, 0, 0])
+        with self.assertRaises(IndexFullError):
+            small.insert('c', [0, 0, 1, 0])
+        self.assertEqual(small.memory_bytes(), size)
+
+class KeywordStrategy(SemanticStrategy):
+    """Embeds queries as bags of keywords."""
+
+    VOCABULARY = ['orders', 'customers', 'sum', 'count', 'region', 'date']
+
+    def _query_to_string(self, query):
+        return query
+
+    async def _generate_embedding(self, query_str):
+        words = query_str.lower().split()
+        return np.array([words.count(w) for w in self.VOCABULARY], dtype=np.float32)
+
+class TestSemanticStrategy(unittest.IsolatedAsyncioTestCase):
+    async def test_similar_queries_are_not_recached(self):
+        """Test only queries unlike anything cached are cached."""
+        strategy = KeywordStrategy(similarity_threshold=0.95)
+
+        self.assertTrue(await strategy.should_cache('sum orders region', {}))
+        self.assertFalse(await strategy.should_cache('sum orders region', {}))
+        self.assertFalse(await strategy.should_cache('region sum orders', {}))
+        self.assertTrue(await strategy.should_cache('count customers date', {}))
+
+    async def test_eviction_bounds_entries(self):
+        """Test the least recently used embedding is evicted from the index."""
+        strategy = KeywordStrategy(similarity_threshold=0.99, max_semantic_cache_entries=2)
+        await strategy.should_cache('orders', {})
+        await strategy.should_cache('customers', {})
+        await strategy.should_cache('region', {})
+
+        self.assertEqual(len(strategy.index), 2)
+        self.assertTrue(await strategy.should_cache('orders', {}))
+        strategy.forget(hash('orders'))
+        self.assertNotIn(hash('orders'), strategy.index)
+
+    async def test_eviction_reaches_the_index(self):
+        """Test a cache eviction passed down the strategy stack removes the embedding."""
+        strategy = HybridStrategy()
+        strategy.semantic_strategy = KeywordStrategy(similarity_threshold=0.99)
+        await strategy.semantic_strategy.should_cache('sum orders', {})
+        await strategy.semantic_strategy.should_cache('count customers', {})
+
+        strategy.on_evict('sum orders')
+
+        index = strategy.semantic_strategy.index
+        self.assertNotIn(hash('sum orders'), index)
+        self.assertIn(hash('count customers'), index)
+        self.assertTrue(await strategy.semantic_strategy.should_cache('sum orders', {}))
+
+if __name__ == '__main__':
+    unittest.main()
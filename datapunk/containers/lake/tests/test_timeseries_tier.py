@@ -0,0 +1,144 @@
+import unittest
+from typing import List, Tuple
+import numpy as np
+from ..src.storage.timeseries_tier import GorillaEncoder, TimeSeriesTier, decode_block
+
+T0 = 1_700_000_000_000
+
+def _points(n: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    timestamps = T0 + np.cumsum(rng.choice([1000, 1000, 1000, 999, 1003], n)).astype(np.int64)
+    values = np.round(20 + np.cumsum(rng.normal(0, 0.1, n)), 1)
+    return timestamps, values
+
+class TestGorillaEncoding(unittest.TestCase):
+    def _roundtrip(self, timestamps, values):
+        encoder = GorillaEncoder()
+        for ts, value in zip(timestamps, values):
+            encoder.append(int(ts), float(value))
+        block = encoder.seal()
+        decoded_ts, decoded_values = decode_block(block.data, block.header.count)
+        np.testing.assert_array_equal(decoded_ts, timestamps)
+        np.testing.assert_array_equal(decoded_values, values)
+        return block
+    
+    def test_regular_series_compress(self):
+        """Test a regular gauge round-trips in a fraction of its raw size."""
+        timestamps, values = _points(1000)
+        block = self._roundtrip(timestamps, values)
+        self.assertLess(len(block.data), 1000 * 16 / 3)
+        self.assertEqual(block.header.min, values.min())
+        self.assertAlmostEqual(block.header.sum, values.sum())
+    
+    def test_irregular_and_extreme_values_roundtrip(self):
+        """Test large gaps, negative deltas of delta and special floats survive."""
+        timestamps = np.array([T0, T0 + 1, T0 + 2, T0 + 10_000_000, T0 + 10_000_001,
+                               T0 + 2 ** 40, T0 + 2 ** 40 + 1], dtype=np.int64)
+        values = np.array([0.0, -1.5, 1e300, -0.0, float('inf'), 3.25, 3.25])
+        self._roundtrip(timestamps, values)
+    
+    def test_constant_values_use_one_bit(self):
+        """Test repeated values and intervals cost about two bits per point."""
+        timestamps = T0 + np.arange(500, dtype=np.int64) * 10_000
+        block = self._roundtrip(timestamps, np.full(500, 42.0))
+        self.assertLess(len(block.data), 500 * 2 / 8 + 32)
+
+class TestTimeSeriesTier(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.flushed: List[Tuple[str, list]] = []
+        self.fail = False
+        self.tier = TimeSeriesTier(sink=self._sink, block_points=100)
+        self.timestamps, self.values = _points(1050)
+        self.tier.append_many('cpu', list(zip(self.timestamps.tolist(), self.values.tolist())))
+    
+    async def _sink(self, series, points):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.flushed.append((series, points))
+    
+    def test_scan_returns_range(self):
+        """Test scans decode only the requested half-open range."""
+        start, end = int(self.timestamps[150]), int(self.timestamps[420])
+        timestamps, values = self.tier.scan('cpu', start, end)
+        np.testing.assert_array_equal(timestamps, self.timestamps[150:420])
+        np.testing.assert_array_equal(values, self.values[150:420])
+        self.assertEqual(self.tier.get_stats().blocks, 10)
+    
+    def test_aggregates_skip_whole_blocks(self):
+        """Test aggregates match raw data and use headers for inner blocks."""
+        start, end = int(self.timestamps[50]), int(self.timestamps[1000])
+        window = self.values[50:1000]
+        self.assertAlmostEqual(self.tier.aggregate('cpu', start, end, 'avg'), window.mean())
+        self.assertEqual(self.tier.aggregate('cpu', start, end, 'max'), window.max())
+        self.assertEqual(self.tier.aggregate('cpu', start, end, 'count'), 950)
+        self.assertGreaterEqual(self.tier.get_stats().blocks_skipped, 8)
+        with self.assertRaises(ValueError):
+            self.tier.aggregate('cpu', start, end, 'median')
+    
+    def test_downsample_matches_raw_buckets(self):
+        """Test bucketed aggregates agree with a direct computation."""
+        start, end, bucket = T0, int(self.timestamps[-1]) + 1, 60_000
+        timestamps, values = self.tier.downsample('cpu', start, end, bucket, 'min')
+        
+        keys = (self.timestamps - start) // bucket
+        expected = [self.values[keys == k].min() for k in np.unique(keys)]
+        np.testing.assert_array_equal(timestamps, start + np.unique(keys) * bucket)
+        np.testing.assert_array_equal(values, expected)
+    
+    def test_late_points_are_merged(self):
+        """Test out-of-order points appear in scans and aggregates."""
+        late_ts = int(self.timestamps[10]) + 1
+        self.tier.append('cpu', late_ts, 1000.0)
+        
+        timestamps, values = self.tier.scan('cpu', self.timestamps[10], self.timestamps[12])
+        self.assertEqual(timestamps.tolist(), [self.timestamps[10], late_ts, self.timestamps[11]])
+        self.assertEqual(values[1], 1000.0)
+        self.assertEqual(self.tier.aggregate('cpu', T0, late_ts + 1, 'max'), 1000.0)
+        self.assertEqual(self.tier.get_stats().late_points, 1)
+    
+    def test_late_points_are_compacted(self):
+        """Test a long run of late points is held in blocks, not one growing list."""
+        late = [(int(ts) + 1, 500.0 + i) for i, ts in enumerate(self.timestamps[:250])]
+        for ts, value in reversed(late):
+            self.tier.append('cpu', ts, value)
+        
+        series = self.tier.series['cpu']
+        self.assertEqual(len(series.late_blocks), 2)
+        self.assertEqual(len(series.late), 50)
+        timestamps, values = self.tier.scan('cpu', T0, self.timestamps[250])
+        self.assertEqual(len(timestamps), 500)
+        self.assertTrue((np.diff(timestamps) >= 0).all())
+        self.assertEqual(self.tier.aggregate('cpu', T0, self.timestamps[250], 'max'), 749.0)
+    
+    def test_late_points_do_not_extend_horizon(self):
+        """Test a late point before the first block leaves the horizon alone."""
+        first = int(self.timestamps[0])
+        self.tier.append('cpu', first - 60_000, 1.0)
+        for _ in range(100):
+            self.tier.append('cpu', first - 30_000, 1.0)  # Compacts a late block
+        
+        self.assertEqual(self.tier.horizon('cpu'), first)
+        self.assertTrue(self.tier.covers('cpu', first))
+        self.assertFalse(self.tier.covers('cpu', first - 1))
+    
+    async def test_failed_flush_is_retried(self):
+        """Test points are handed back when the sink fails."""
+        self.fail = True
+        self.assertEqual(await self.tier.flush(), 0)
+        self.fail = False
+        self.assertEqual(await self.tier.flush(), 1050)
+        self.assertEqual([len(points) for _, points in self.flushed], [1050])
+        self.assertEqual(await self.tier.flush(), 0)
+    
+    async def test_eviction_keeps_unflushed_blocks(self):
+        """Test only flushed blocks past retention are dropped."""
+        now = int(self.timestamps[-1]) + self.tier.retention_ms + 1
+        self.assertEqual(self.tier.evict(now), 0)
+        
+        await self.tier.flush()  # Evicts against the wall clock, long past T0
+        self.assertEqual(self.tier.get_stats().blocks, 0)
+        self.assertTrue(self.tier.covers('cpu', self.timestamps[-1]))
+        self.assertFalse(self.tier.covers('cpu', self.timestamps[0]))
+
+if __name__ == '__main__':
+    unittest.main()
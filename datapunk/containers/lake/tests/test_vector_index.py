@@ -0,0 +1,178 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List
+import numpy as np
+from ..src.storage.index.hnsw import HNSWIndex
+from ..src.storage.vector_index import VectorIndexTier
+
+def _clustered(n: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((10, dim))
+    return (centers[rng.integers(0, 10, n)] + 0.3 * rng.standard_normal((n, dim))).astype(np.float32)
+
+class VectorTable:
+    """Stands in for an asyncpg pool over a pgvector table."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.rows: Dict[int, Dict[str, Any]] = {
+            i: {"id": i, "embedding": v.tolist(), "metadata": '{"group": %d}' % (i % 2)}
+            for i, v in enumerate(vectors)}
+        self.streamed = 0
+        self.during_stream = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetchval(self, sql: str) -> int:
+        return len(self.rows)
+
+    async def fetch(self, sql: str, *args: Any) -> List[Dict[str, Any]]:
+        if args:
+            return [self.rows[i] for i in args[0] if i in self.rows]
+        return [{"id": i} for i in self.rows]
+
+    async def cursor(self, sql: str, prefetch: int):
+        for row in list(self.rows.values()):
+            self.streamed += 1
+            if self.streamed == 10 and self.during_stream:
+                self.during_stream()
+            yield row
+            await asyncio.sleep(0)
+
+class TestQuantizedIndex(unittest.TestCase):
+    def test_int8_storage_keeps_recall(self):
+        """Test int8 vectors use a quarter of the memory with similar results."""
+        data = _clustered(500)
+        full = HNSWIndex('f', 'vectors', ['embedding'], dim=16, capacity=500, seed=1)
+        small = HNSWIndex('q', 'vectors', ['embedding'], dim=16, capacity=500,
+                          dtype='int8', seed=1)
+        for i, v in enumerate(data):
+            full.insert(i, v)
+            small.insert(i, v)
+
+        self.assertLess(small.vectors.nbytes + small.scales.nbytes, full.vectors.nbytes / 3)
+        hits = 0
+        for q in _clustered(20, seed=2):
+            truth = {label for label, _ in full.search(q, k=10, ef=100)}
+            hits += len(truth & {label for label, _ in small.search(q, k=10, ef=100)})
+        self.assertGreater(hits / 200, 0.85)
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'snapshot')
+        self.data = _clustered(300)
+        self.index = HNSWIndex('v', 'vectors', ['embedding'], dim=16, capacity=400,
+                               dtype='int8', seed=1)
+        for i, v in enumerate(self.data):
+            self.index.insert(('doc', i), v)
+        self.index.delete(('doc', 5))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_load_maps_arrays_and_matches_results(self):
+        """Test a reloaded snapshot is memory-mapped and answers identically."""
+        self.index.save(self.path)
+        loaded = HNSWIndex.load(self.path)
+
+        self.assertIsInstance(loaded.vectors, np.memmap)
+        self.assertEqual(len(loaded), 299)
+        for q in self.data[:10]:
+            self.assertEqual(loaded.search(q, k=5), self.index.search(q, k=5))
+
+    def test_changes_after_load_leave_snapshot_intact(self):
+        """Test writes to a mapped index are private to the process."""
+        self.index.save(self.path)
+        loaded = HNSWIndex.load(self.path)
+        loaded.insert(('doc', 999), self.data[0] * -1)
+        loaded.delete(('doc', 0))
+
+        again = HNSWIndex.load(self.path)
+        self.assertIn(('doc', 0), again)
+        self.assertNotIn(('doc', 999), again)
+        self.assertEqual(loaded.search(self.data[0] * -1, k=1)[0][0], ('doc', 999))
+
+class TestVectorIndexTier(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data = _clustered(200)
+        self.table = VectorTable(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _tier(self) -> VectorIndexTier:
+        return VectorIndexTier.create(16, 100, snapshot_path=os.path.join(self.tmp, 'tier'))
+
+    async def test_rebuild_and_filtered_search(self):
+        """Test the tier loads the table and filters on metadata."""
+        tier = self._tier()
+        self.assertEqual(await tier.open(self.table), 200)
+
+        nearest = tier.search(self.data[7], k=3)
+        self.assertEqual(nearest[0]['id'], 7)
+        self.assertAlmostEqual(nearest[0]['distance'], 0.0, places=3)
+        odd = tier.search(self.data[8], k=5, filter={'group': 1})
+        self.assertEqual(len(odd), 5)
+        self.assertTrue(all(r['id'] % 2 == 1 for r in odd))
+
+    async def test_writes_during_rebuild_are_kept(self):
+        """Test rows written while the table streams reach the new graph."""
+        tier = self._tier()
+        extra = -self.data[0]
+        self.table.during_stream = lambda: (tier.add(500, extra, {'group': 9}),
+                                            tier.remove(199))
+
+        await tier.rebuild(self.table)
+
+        self.assertIn(500, tier.index)
+        self.assertNotIn(199, tier.index)
+        self.assertEqual(tier.search(extra, k=1)[0]['id'], 500)
+
+    async def test_snapshot_catches_up_with_table(self):
+        """Test reopening applies rows inserted and deleted since the snapshot."""
+        tier = self._tier()
+        await tier.open(self.table)
+        tier.save()
+        del self.table.rows[3]
+        self.table.rows[300] = {'id': 300, 'embedding': (-self.data[1]).tolist(),
+                                'metadata': '{"group": 0}'}
+        self.table.streamed = 0
+
+        reopened = self._tier()
+        changed = await reopened.open(self.table)
+
+        self.assertEqual(changed, 2)
+        self.assertEqual(self.table.streamed, 0)
+        self.assertNotIn(3, reopened.index)
+        self.assertEqual(reopened.search(-self.data[1], k=1)[0]['id'], 300)
+        self.assertEqual(reopened.metadata[300], {'group': 0})
+
+    async def test_snapshot_keeps_uuid_ids(self):
+        """Test UUID row ids survive a snapshot as UUIDs."""
+        self.table.rows = {uuid.UUID(int=i): dict(row, id=uuid.UUID(int=i))
+                           for i, row in self.table.rows.items()}
+        tier = self._tier()
+        await tier.open(self.table)
+        tier.save()
+
+        reopened = self._tier()
+        changed = await reopened.open(self.table)
+
+        self.assertEqual(changed, 0)
+        self.assertEqual(reopened.search(self.data[7], k=1)[0]['id'], uuid.UUID(int=7))
+        self.assertEqual(reopened.metadata[uuid.UUID(int=8)], {'group': 0})
+
+if __name__ == '__main__':
+    unittest.main()
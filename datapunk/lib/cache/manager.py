@@ -1,11 +1,13 @@
-from typing import Optional, Dict, Any, Union, TypeVar, Generic
+from typing import Optional, Dict, Any, Union, TypeVar, Generic, Awaitable, Callable
 from dataclasses import dataclass
 import asyncio
+import time
 from datetime import datetime, timedelta
 from enum import Enum
 import json
 import hashlib
 from ..monitoring import MetricsCollector
+from .stampede import Stamped, StampedeGuard
 
 T = TypeVar('T')  # Cache value type
 
@@ -29,6 +31,8 @@ class CacheConfig:
     cleanup_interval: int = 60  # seconds
     namespace_separator: str = ":"
     default_namespace: str = "default"
+    stale_ttl: int = 60  # seconds stale values are served while refreshing
+    xfetch_beta: float = 1.0  # >1 refreshes earlier ahead of expiry
 
 class CacheEntry(Generic[T]):
     """Represents a cached item"""
@@ -49,6 +53,10 @@ class CacheEntry(Generic[T]):
             self.created_at + timedelta(seconds=ttl)
             if ttl else None
         )
+        # Set by get_or_load: how long the value took to compute and the
+        # epoch time it should be refreshed by (it is kept longer, stale)
+        self.load_seconds = 0.0
+        self.fresh_until: Optional[float] = None
 
     def is_expired(self) -> bool:
         """Check if entry is expired"""
@@ -103,6 +111,12 @@ class CacheManager(Generic[T]):
         self._cache: Dict[str, CacheEntry[T]] = {}
         self._cleanup_task: Optional[asyncio.Task] = None
         self._lock = asyncio.Lock()
+        self.stampede = StampedeGuard(
+            self._read_stamped,
+            self._write_stamped,
+            beta=config.xfetch_beta,
+            stale_ttl=config.stale_ttl
+        )
 
     async def start(self):
         """Start cache manager"""
@@ -116,6 +130,7 @@ class CacheManager(Generic[T]):
                 await self._cleanup_task
             except asyncio.CancelledError:
                 pass
+        await self.stampede.close()
 
     async def get(
         self,
@@ -170,6 +185,31 @@ class CacheManager(Generic[T]):
             
             return entry.value
 
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        ttl: Optional[int] = None,
+        namespace: Optional[str] = None
+    ) -> T:
+        """
+        Read-through get that protects the backing store from stampedes.
+        
+        Stampede handling:
+        - Concurrent misses for a key share one loader call
+        - Hot values are refreshed in the background shortly before
+          expiry (XFetch), so most readers never see a miss
+        - Values past their TTL are served for stale_ttl more seconds
+          while a single background refresh runs
+        
+        NOTE: Loader exceptions propagate to every caller sharing the load
+        """
+        return await self.stampede.get_or_load(
+            self._make_key(key, namespace),
+            loader,
+            ttl or self.config.ttl
+        )
+
     async def set(
         self,
         key: str,
@@ -256,6 +296,45 @@ class CacheManager(Generic[T]):
                     tags={"namespace": namespace or "all"}
                 )
 
+    async def _read_stamped(self, cache_key: str) -> Optional[Stamped]:
+        """Entry as (value, load seconds, fresh until) for the stampede guard"""
+        async with self._lock:
+            entry = self._cache.get(cache_key)
+            if not entry or entry.is_expired():
+                return None
+            entry.access()
+            fresh_until = entry.fresh_until
+            if fresh_until is None:
+                # Entries written by set() are fresh until they expire
+                fresh_until = (
+                    time.time() + (entry.expires_at - datetime.utcnow()).total_seconds()
+                    if entry.expires_at else float("inf")
+                )
+            return entry.value, entry.load_seconds, fresh_until
+    
+    async def _write_stamped(
+        self,
+        cache_key: str,
+        value: T,
+        load_seconds: float,
+        fresh_until: float,
+        ttl: float
+    ):
+        """Store a loaded value, kept stale_ttl past its freshness"""
+        namespace = cache_key.partition(self.config.namespace_separator)[0]
+        async with self._lock:
+            if cache_key not in self._cache and len(self._cache) >= self.config.max_size:
+                await self._evict_entries()
+            entry = CacheEntry(
+                key=cache_key,
+                value=value,
+                ttl=ttl,
+                namespace=namespace
+            )
+            entry.load_seconds = load_seconds
+            entry.fresh_until = fresh_until
+            self._cache[cache_key] = entry
+
     def _make_key(self, key: str, namespace: Optional[str] = None) -> str:
         """
         Generates namespaced cache keys following service mesh conventions.
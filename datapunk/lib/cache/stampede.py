@@ -0,0 +1,267 @@
+"""
+Cache Stampede Protection - Keeps recomputation of hot keys bounded as load grows.
+
+When a popular entry expires, every concurrent reader misses at once and
+recomputes it against the backing store. This module prevents that herd:
+
+Key components:
+- SingleFlight: One loader per key in a process; other callers share its result
+- should_refresh_early: XFetch, probabilistic refresh ahead of expiry
+- RedisLock: Token-checked lock so one node recomputes for the whole cluster
+- StampedeGuard: Read-through loading combining the above with
+  stale-while-revalidate serving
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+from dataclasses import dataclass
+import asyncio
+import inspect
+import logging
+import math
+import random
+import time
+import uuid
+
+Loader = Callable[[], Awaitable[Any]]
+# (value, seconds the last load took, epoch seconds the value is fresh until)
+Stamped = Tuple[Any, float, float]
+LockFactory = Callable[[str], Union['RedisLock', Awaitable['RedisLock']]]
+
+# Returned by a refresh that left the load to another node's lock holder
+_SKIPPED = object()
+
+class _Flight:
+    """A running load and the number of callers awaiting it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Collapses concurrent loads of the same key into one call.
+
+    The loader runs in its own task, which every caller awaits behind a
+    shield, so callers share its result, including its exception. A
+    cancelled caller only stops waiting; the load is cancelled once no
+    caller is left waiting for it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Flight] = {}
+        self.coalesced = 0
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a load for key is running"""
+        flight = self._calls.get(key)
+        return flight is not None and not flight.task.done()
+
+    async def do(self, key: str, loader: Loader) -> Any:
+        """Run loader for key unless a run is already in flight"""
+        flight = self._calls.get(key)
+        if flight is not None and not flight.task.done():
+            self.coalesced += 1
+        else:
+            flight = self._calls[key] = _Flight(asyncio.ensure_future(loader()))
+            flight.task.add_done_callback(lambda _: self._finished(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _finished(self, key: str, flight: _Flight):
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+
+def should_refresh_early(delta: float, expiry: float, beta: float = 1.0,
+                         now: Optional[float] = None) -> bool:
+    """
+    XFetch (Vattani et al.): refresh with a probability rising towards expiry.
+
+    delta is how long the value took to compute. Slow values start refreshing
+    earlier; beta above 1 favours earlier refreshes. Across many readers the
+    expected number of early refreshes per expiry is about one.
+    """
+    now = time.time() if now is None else now
+    # 1 - random() lies in (0, 1], so the log is defined
+    return now - delta * beta * math.log(1.0 - random.random()) >= expiry
+
+class RedisLock:
+    """
+    Lock held in Redis with an expiry, so a crashed holder cannot block others.
+
+    Release only deletes the key while it still holds this lock's token,
+    so a holder that outlived its expiry cannot free someone else's lock.
+    """
+
+    _RELEASE = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, redis: Any, name: str, ttl: float = 10.0):
+        self.redis = redis
+        self.name = name
+        self.ttl = ttl
+        self._token: Optional[str] = None
+
+    async def acquire(self) -> bool:
+        """Try once to take the lock"""
+        token = uuid.uuid4().hex
+        if await self.redis.set(self.name, token, nx=True, px=int(self.ttl * 1000)):
+            self._token = token
+            return True
+        return False
+
+    async def release(self) -> bool:
+        """Release the lock if this instance still holds it"""
+        if self._token is None:
+            return False
+        token, self._token = self._token, None
+        return bool(await self.redis.eval(self._RELEASE, 1, self.name, token))
+
+@dataclass
+class StampedeStats:
+    """Counters describing how misses and refreshes were served"""
+    loads: int = 0
+    early_refreshes: int = 0
+    stale_served: int = 0
+    lock_waits: int = 0
+    lock_timeouts: int = 0
+    refresh_failures: int = 0
+
+class StampedeGuard:
+    """
+    Read-through loading that keeps recomputation of hot keys roughly constant.
+
+    Values are stored with how long they took to compute and the time they
+    are fresh until, and kept stale_ttl seconds longer than that:
+    - Fresh values are served, and XFetch occasionally refreshes one early
+      in the background
+    - Stale values are served while one background refresh runs
+    - Misses are loaded once per process (SingleFlight) and, given a
+      lock_factory, once per cluster; other nodes poll for the result.
+      The factory may return the lock or an awaitable of it
+
+    The cache is reached through read(key) -> Optional[Stamped] and
+    write(key, value, delta, expiry, ttl), so any backend can be guarded.
+    """
+
+    def __init__(
+        self,
+        read: Callable[[str], Awaitable[Optional[Stamped]]],
+        write: Callable[[str, Any, float, float, float], Awaitable[Any]],
+        lock_factory: Optional[LockFactory] = None,
+        beta: float = 1.0,
+        stale_ttl: float = 60.0,
+        lock_wait: float = 5.0,
+        poll_interval: float = 0.05
+    ):
+        self.read = read
+        self.write = write
+        self.lock_factory = lock_factory
+        self.beta = beta
+        self.stale_ttl = stale_ttl
+        self.lock_wait = lock_wait
+        self.poll_interval = poll_interval
+        self.flight = SingleFlight()
+        self.stats = StampedeStats()
+        self._refreshes: set = set()
+        self.logger = logging.getLogger(__name__)
+
+    async def get_or_load(self, key: str, loader: Loader, ttl: float) -> Any:
+        """Cached value for key, loading it with loader when needed"""
+        stamped = await self.read(key)
+        if stamped is not None:
+            value, delta, expiry = stamped
+            now = time.time()
+            if now >= expiry:
+                self.stats.stale_served += 1
+                self._refresh_in_background(key, loader, ttl)
+            elif should_refresh_early(delta, expiry, self.beta, now):
+                self.stats.early_refreshes += 1
+                self._refresh_in_background(key, loader, ttl)
+            return value
+        value = await self.flight.do(key, lambda: self._load_once(key, loader, ttl))
+        if value is _SKIPPED:
+            # Joined a refresh that left the load to another node
+            value = await self._load_once(key, loader, ttl)
+        return value
+
+    async def close(self):
+        """Wait for background refreshes to finish"""
+        if self._refreshes:
+            await asyncio.gather(*list(self._refreshes), return_exceptions=True)
+
+    def _refresh_in_background(self, key: str, loader: Loader, ttl: float):
+        if self.flight.in_flight(key):
+            return
+        task = asyncio.ensure_future(
+            self.flight.do(key, lambda: self._refresh(key, loader, ttl))
+        )
+        self._refreshes.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._refreshes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats.refresh_failures += 1
+            self.logger.warning(f"Background cache refresh failed: {task.exception()}")
+
+    async def _lock(self, key: str) -> Optional[RedisLock]:
+        if self.lock_factory is None:
+            return None
+        lock = self.lock_factory(key)
+        if inspect.isawaitable(lock):
+            lock = await lock
+        return lock
+
+    async def _refresh(self, key: str, loader: Loader, ttl: float) -> Any:
+        # Another node holding the lock is already refreshing this key
+        lock = await self._lock(key)
+        if lock is not None and not await lock.acquire():
+            return _SKIPPED
+        try:
+            return await self._compute(key, loader, ttl)
+        finally:
+            if lock is not None:
+                await lock.release()
+
+    async def _load_once(self, key: str, loader: Loader, ttl: float) -> Any:
+        lock = await self._lock(key)
+        if lock is None:
+            return await self._compute(key, loader, ttl)
+
+        deadline = time.monotonic() + self.lock_wait
+        while not await lock.acquire():
+            self.stats.lock_waits += 1
+            stamped = await self.read(key)
+            if stamped is not None:
+                return stamped[0]
+            if time.monotonic() >= deadline:
+                # The holder may have died; computing twice beats waiting forever
+                self.stats.lock_timeouts += 1
+                return await self._compute(key, loader, ttl)
+            await asyncio.sleep(self.poll_interval)
+        try:
+            # The previous holder may have stored the value just before we got the lock
+            stamped = await self.read(key)
+            if stamped is not None:
+                return stamped[0]
+            return await self._compute(key, loader, ttl)
+        finally:
+            await lock.release()
+
+    async def _compute(self, key: str, loader: Loader, ttl: float) -> Any:
+        started = time.time()
+        value = await loader()
+        now = time.time()
+        self.stats.loads += 1
+        await self.write(key, value, now - started, now + ttl, ttl + self.stale_ttl)
+        return value
@@ -0,0 +1,230 @@
+import pytest
+import asyncio
+import time
+from unittest.mock import patch
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from datapunk_shared.cache.stampede import (
+    SingleFlight,
+    should_refresh_early,
+    RedisLock,
+    StampedeGuard
+)
+
+class DictStore:
+    """Stamped values in a dict, standing in for a cache backend."""
+    def __init__(self):
+        self.data = {}
+
+    async def read(self, key):
+        return self.data.get(key)
+
+    async def write(self, key, value, delta, expiry, ttl):
+        self.data[key] = (value, delta, expiry)
+
+class CountingLoader:
+    """Slow loader that counts its calls."""
+    def __init__(self, value="fresh", delay=0.05):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+@pytest.fixture
+def store():
+    return DictStore()
+
+@pytest.mark.asyncio
+async def test_single_flight_collapses_concurrent_loads():
+    """Test concurrent callers share one load and its result."""
+    flight = SingleFlight()
+    loader = CountingLoader()
+
+    results = await asyncio.gather(*(flight.do("k", loader) for _ in range(100)))
+
+    assert results == ["fresh"] * 100
+    assert loader.calls == 1
+    assert flight.coalesced == 99
+    assert not flight.in_flight("k")
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_failures():
+    """Test every caller sees the loader's exception and the key is retried after."""
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("backend down")
+
+    results = await asyncio.gather(*(flight.do("k", failing) for _ in range(5)),
+                                   return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert await flight.do("k", CountingLoader(delay=0)) == "fresh"
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_leader_cancellation():
+    """Test cancelling the first caller leaves the load running for the others."""
+    flight = SingleFlight()
+    loader = CountingLoader()
+
+    leader = asyncio.ensure_future(flight.do("k", loader))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("k", loader))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == "fresh"
+    assert leader.cancelled()
+    assert loader.calls == 1
+
+@pytest.mark.asyncio
+async def test_single_flight_cancels_load_without_waiters():
+    """Test the load is cancelled once every caller has gone."""
+    flight = SingleFlight()
+    loader = CountingLoader(delay=10)
+
+    callers = [asyncio.ensure_future(flight.do("k", loader)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert not flight.in_flight("k")
+
+def test_xfetch_probability_rises_towards_expiry():
+    """Test early refresh is rare far from expiry and certain past it."""
+    now = 1000.0
+    far = sum(should_refresh_early(1.0, now + 10, now=now) for _ in range(2000))
+    near = sum(should_refresh_early(1.0, now + 0.1, now=now) for _ in range(2000))
+
+    # P(refresh) = exp(-gap / (delta * beta))
+    assert far < 5
+    assert 1600 < near < 1950
+    assert should_refresh_early(1.0, now - 1, now=now)
+    assert not should_refresh_early(0.0, now + 1, now=now)
+
+@pytest.mark.asyncio
+async def test_miss_loads_once(store):
+    """Test a stampede of misses calls the loader once and fills the cache."""
+    guard = StampedeGuard(store.read, store.write)
+    loader = CountingLoader()
+
+    results = await asyncio.gather(*(guard.get_or_load("k", loader, 30) for _ in range(100)))
+
+    assert results == ["fresh"] * 100
+    assert loader.calls == 1
+    value, delta, expiry = store.data["k"]
+    assert value == "fresh"
+    assert delta >= 0.05
+    assert expiry == pytest.approx(time.time() + 30, abs=1)
+
+@pytest.mark.asyncio
+async def test_stale_value_served_during_one_refresh(store):
+    """Test expired values are returned at once while a single refresh runs."""
+    guard = StampedeGuard(store.read, store.write)
+    store.data["k"] = ("stale", 0.05, time.time() - 1)
+    loader = CountingLoader()
+
+    results = await asyncio.gather(*(guard.get_or_load("k", loader, 30) for _ in range(50)))
+    assert results == ["stale"] * 50
+
+    await guard.close()
+    assert loader.calls == 1
+    assert guard.stats.stale_served == 50
+    assert store.data["k"][0] == "fresh"
+    assert await guard.get_or_load("k", loader, 30) == "fresh"
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_stale_value(store):
+    """Test a failing background refresh is counted and the stale value kept."""
+    guard = StampedeGuard(store.read, store.write)
+    store.data["k"] = ("stale", 0.0, time.time() - 1)
+
+    async def failing():
+        raise ConnectionError("backend down")
+
+    assert await guard.get_or_load("k", failing, 30) == "stale"
+    await guard.close()
+    assert guard.stats.refresh_failures == 1
+    assert store.data["k"][0] == "stale"
+
+@pytest.mark.asyncio
+async def test_hot_key_refreshed_early(store):
+    """Test XFetch refreshes a fresh value ahead of its expiry."""
+    guard = StampedeGuard(store.read, store.write)
+    store.data["k"] = ("old", 1.0, time.time() + 10)
+    loader = CountingLoader(delay=0)
+
+    with patch("datapunk_shared.cache.stampede.should_refresh_early", return_value=True):
+        assert await guard.get_or_load("k", loader, 30) == "old"
+    await guard.close()
+
+    assert guard.stats.early_refreshes == 1
+    assert store.data["k"][0] == "fresh"
+
+@pytest.mark.asyncio
+async def test_lock_loads_once_across_nodes():
+    """Test two processes sharing Redis load a missing key once."""
+    server = FakeServer()
+    store = DictStore()
+    loader = CountingLoader(delay=0.1)
+    guards = [
+        StampedeGuard(
+            store.read,
+            store.write,
+            lambda key, redis=FakeAsyncRedis(server=server): RedisLock(redis, f"{key}:lock"),
+            poll_interval=0.01
+        )
+        for _ in range(2)
+    ]
+
+    results = await asyncio.gather(*(
+        guard.get_or_load("k", loader, 30) for guard in guards for _ in range(10)
+    ))
+
+    assert results == ["fresh"] * 20
+    assert loader.calls == 1
+    assert sum(guard.stats.lock_waits for guard in guards) > 0
+
+@pytest.mark.asyncio
+async def test_miss_does_not_take_skipped_refresh_result(store):
+    """Test a miss that joins a refresh left to another node still gets a value."""
+    redis = FakeAsyncRedis()
+    assert await RedisLock(redis, "k:lock", ttl=10).acquire()
+
+    async def lock_factory(key):
+        await asyncio.sleep(0.05)
+        return RedisLock(redis, f"{key}:lock")
+
+    guard = StampedeGuard(store.read, store.write, lock_factory,
+                          lock_wait=0.1, poll_interval=0.01)
+    store.data["k"] = ("stale", 0.0, time.time() - 1)
+    loader = CountingLoader(delay=0)
+
+    assert await guard.get_or_load("k", loader, 30) == "stale"
+    del store.data["k"]
+    assert await guard.get_or_load("k", loader, 30) == "fresh"
+    await guard.close()
+    assert guard.stats.lock_timeouts == 1
+
+@pytest.mark.asyncio
+async def test_lock_release_checks_token():
+    """Test a lock whose expiry passed cannot free its successor's lock."""
+    redis = FakeAsyncRedis()
+    first = RedisLock(redis, "k:lock", ttl=0.05)
+    second = RedisLock(redis, "k:lock", ttl=10)
+
+    assert await first.acquire()
+    assert not await second.acquire()
+    await asyncio.sleep(0.1)
+    assert await second.acquire()
+
+    assert not await first.release()
+    assert await redis.exists("k:lock")
+    assert await second.release()
+    assert not await redis.exists("k:lock")